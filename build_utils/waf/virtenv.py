@@ -154,6 +154,7 @@ def configure(ctx):
     # Misc pip packages:
     pip_mgr.check_package(RUNTIME, 'eventfd', version='0.2')
     pip_mgr.check_package(RUNTIME, 'lucky-humanize', version='0.5.4')
+    pip_mgr.check_package(RUNTIME, 'lz4', version='3.0.2')
     pip_mgr.check_package(RUNTIME, 'numpy', version='1.18.1')
     pip_mgr.check_package(RUNTIME, 'portalocker', version='1.5.2')
     pip_mgr.check_package(RUNTIME, 'posix-ipc', version='1.0.4')
@@ -31,6 +31,8 @@ from .audioproc_pb2 import (
     SetNodePortProperties,
     SetNodeDescription,
     SetNodeParameters,
+    SetPerfStatsLevelRequest,
+    PipelineMutationsRequest,
 )
 from .audioproc_client import (
     AbstractAudioProcClient,
@@ -100,6 +100,10 @@ class AbstractAudioProcClient(object):
     async def pipeline_mutation(self, realm: str, mutation: audioproc_pb2.Mutation) -> None:
         raise NotImplementedError
 
+    async def pipeline_mutations(
+            self, realm: str, mutations: Iterable[audioproc_pb2.Mutation]) -> None:
+        raise NotImplementedError
+
     async def create_plugin_ui(self, realm: str, node_id: str) -> Tuple[int, Tuple[int, int]]:
         raise NotImplementedError
 
@@ -134,6 +138,9 @@ class AbstractAudioProcClient(object):
     async def profile_audio_thread(self, duration: int) -> bytes:
         raise NotImplementedError
 
+    async def set_perf_stats_level(self, level: int) -> None:
+        raise NotImplementedError
+
     async def dump(self) -> None:
         raise NotImplementedError
 
@@ -311,6 +318,14 @@ class AudioProcClient(AbstractAudioProcClient):
                 realm=realm,
                 mutation=mutation))
 
+    async def pipeline_mutations(
+            self, realm: str, mutations: Iterable[audioproc_pb2.Mutation]) -> None:
+        await self._stub.call(
+            'PIPELINE_MUTATIONS',
+            audioproc_pb2.PipelineMutationsRequest(
+                realm=realm,
+                mutations=mutations))
+
     async def create_plugin_ui(self, realm: str, node_id: str) -> Tuple[int, Tuple[int, int]]:
         request = audioproc_pb2.CreatePluginUIRequest(
             realm=realm,
@@ -375,6 +390,11 @@ class AudioProcClient(AbstractAudioProcClient):
         await self._stub.call('PROFILE_AUDIO_THREAD', request, response)
         return response.svg
 
+    async def set_perf_stats_level(self, level: int) -> None:
+        await self._stub.call(
+            'SET_PERF_STATS_LEVEL',
+            audioproc_pb2.SetPerfStatsLevelRequest(level=level))
+
     async def update_project_properties(
             self, realm: str, properties: project_properties_pb2.ProjectProperties) -> None:
         await self._stub.call(
@@ -23,14 +23,17 @@
 import asyncio
 import functools
 import logging
+import os.path
 import subprocess
 import sys
 import time
+import traceback
 import uuid
-from typing import Any, Optional, Dict, Set
+from typing import Any, Optional, Dict, List, Set
 
 import posix_ipc
 
+from noisicaa import constants
 from noisicaa import core
 from noisicaa.core import empty_message_pb2
 from noisicaa.core import ipc
@@ -120,6 +123,7 @@ class AudioProcProcess(core.ProcessBase):
             shm: Optional[str] = None,
             block_size: Optional[int] = None,
             sample_rate: Optional[int] = None,
+            num_workers: Optional[int] = None,
             **kwargs: Any) -> None:
         super().__init__(**kwargs)
         self.shm_name = shm
@@ -129,9 +133,15 @@ class AudioProcProcess(core.ProcessBase):
         self.__urid_mapper = None  # type: lv2.ProxyURIDMapper
         self.__block_size = block_size
         self.__sample_rate = sample_rate
+        self.__num_workers = num_workers
         self.__host_system = None  # type: host_system.HostSystem
         self.__engine = None  # type: engine.Engine
 
+        # Requests, which refer to the nodes of a realm, are handled one after the other. Node
+        # setup suspends the handler, and later requests must not see the realm without the nodes
+        # the client already believes to exist.
+        self.__realm_locks = {}  # type: Dict[str, asyncio.Lock]
+
     async def setup(self) -> None:
         await super().setup()
 
@@ -157,6 +167,9 @@ class AudioProcProcess(core.ProcessBase):
         self.__main_endpoint.add_handler(
             'PIPELINE_MUTATION', self.__handle_pipeline_mutation,
             audioproc_pb2.PipelineMutationRequest, empty_message_pb2.EmptyMessage)
+        self.__main_endpoint.add_handler(
+            'PIPELINE_MUTATIONS', self.__handle_pipeline_mutations,
+            audioproc_pb2.PipelineMutationsRequest, empty_message_pb2.EmptyMessage)
         self.__main_endpoint.add_handler(
             'SEND_NODE_MESSAGES', self.__handle_send_node_messages,
             audioproc_pb2.SendNodeMessagesRequest, empty_message_pb2.EmptyMessage)
@@ -175,6 +188,9 @@ class AudioProcProcess(core.ProcessBase):
         self.__main_endpoint.add_handler(
             'PROFILE_AUDIO_THREAD', self.__handle_profile_audio_thread,
             audioproc_pb2.ProfileAudioThreadRequest, audioproc_pb2.ProfileAudioThreadResponse)
+        self.__main_endpoint.add_handler(
+            'SET_PERF_STATS_LEVEL', self.__handle_set_perf_stats_level,
+            audioproc_pb2.SetPerfStatsLevelRequest, empty_message_pb2.EmptyMessage)
         self.__main_endpoint.add_handler(
             'DUMP', self.__handle_dump,
             empty_message_pb2.EmptyMessage, empty_message_pb2.EmptyMessage)
@@ -198,6 +214,7 @@ class AudioProcProcess(core.ProcessBase):
             self.__host_system.set_block_size(self.__block_size)
         if self.__sample_rate is not None:
             self.__host_system.set_sample_rate(self.__sample_rate)
+        self.__host_system.set_audio_cache_dir(os.path.join(constants.CACHE_DIR, 'audio'))
         self.__host_system.setup()
 
         self.__engine = engine.Engine(
@@ -205,7 +222,8 @@ class AudioProcProcess(core.ProcessBase):
             manager=self.manager,
             server_address=self.server.address,
             host_system=self.__host_system,
-            shm=self.shm)
+            shm=self.shm,
+            num_workers=self.__num_workers or 0)
         self.__engine.notifications.add(
             lambda msg: self.event_loop.call_soon_threadsafe(
                 functools.partial(self.__handle_engine_notification, msg)))
@@ -263,6 +281,14 @@ class AudioProcProcess(core.ProcessBase):
         assert request.name in session.owned_realms
         await self.__engine.delete_realm(request.name)
         session.owned_realms.remove(request.name)
+        self.__realm_locks.pop(request.name, None)
+
+    def __realm_lock(self, realm_name: str) -> asyncio.Lock:
+        try:
+            return self.__realm_locks[realm_name]
+        except KeyError:
+            lock = self.__realm_locks[realm_name] = asyncio.Lock(loop=self.event_loop)
+            return lock
 
     async def __handle_pipeline_mutation(
             self,
@@ -273,38 +299,126 @@ class AudioProcProcess(core.ProcessBase):
         logging.info("Pipeline mutation:\n%s", request)
 
         realm = self.__engine.get_realm(request.realm)
+
+        # The batch is already open while waiting for the lock, so the spec is only updated once
+        # the last of the mutations, which are handled concurrently, is done, and not before the
+        # end of the event loop iteration, so mutations, which arrive back to back, also share a
+        # single recompilation of the realm's graph.
+        with realm.batch_spec_updates(deferred=True):
+            async with self.__realm_lock(request.realm):
+                await self.__apply_pipeline_mutation(realm, request.mutation)
+
+    async def __handle_pipeline_mutations(
+            self,
+            session: Session,
+            request: audioproc_pb2.PipelineMutationsRequest,
+            response: empty_message_pb2.EmptyMessage
+    ) -> None:
+        logging.info("Pipeline mutations (%d):\n%s", len(request.mutations), request)
+
+        realm = self.__engine.get_realm(request.realm)
+
+        async with self.__realm_lock(request.realm):
+            # The whole batch is applied to the graph first, and the realm's program is only
+            # swapped once at the end.
+            with realm.batch_spec_updates():
+                # Set up all new nodes in parallel, before applying the mutations in order.
+                add_nodes = {}  # type: Dict[str, audioproc_pb2.AddNode]
+                for mutation in request.mutations:
+                    if mutation.WhichOneof('type') == 'add_node':
+                        add_nodes.setdefault(mutation.add_node.id, mutation.add_node)
+                results = await asyncio.gather(
+                    *(self.__setup_new_node(realm, add_node) for add_node in add_nodes.values()),
+                    loop=self.event_loop, return_exceptions=True)
+
+                nodes_by_id = {}  # type: Dict[str, engine.Node]
+                errors = []  # type: List[BaseException]
+                for result in results:
+                    if isinstance(result, BaseException):
+                        errors.append(result)
+                    else:
+                        nodes_by_id[result.id] = result
+
+                try:
+                    if errors:
+                        raise errors[0]
+
+                    for mutation in request.mutations:
+                        await self.__apply_pipeline_mutation(realm, mutation, nodes_by_id)
+
+                finally:
+                    # Nodes, which never made it into the graph, must not leak their resources.
+                    for node in nodes_by_id.values():
+                        await self.__discard_node(node)
+
+    async def __setup_new_node(
+            self, realm: engine.Realm, add_node: audioproc_pb2.AddNode) -> engine.Node:
+        logger.info("AddNode():\n%s", add_node.description)
+        kwargs = {}  # type: Dict[str, Any]
+        if add_node.HasField('name'):
+            kwargs['name'] = add_node.name
+        if add_node.HasField('initial_state'):
+            kwargs['initial_state'] = add_node.initial_state
+        if add_node.HasField('child_realm'):
+            kwargs['child_realm'] = add_node.child_realm
+        node = engine.Node.create(
+            host_system=self.__host_system,
+            id=add_node.id,
+            description=add_node.description,
+            **kwargs)
+
+        # The node is set up before it is added to the graph, so it only becomes part of the
+        # realm's program once it is ready.
+        node.set_realm(realm)
+        try:
+            await realm.setup_node(node)
+        except:
+            await self.__discard_node(node)
+            raise
+        return node
+
+    async def __discard_node(self, node: engine.Node) -> None:
+        try:
+            await node.discard()
+        except Exception:  # pylint: disable=broad-except
+            logger.error(
+                "Failed to discard node %s:\n%s", node.id, traceback.format_exc())
+        node.clear_realm()
+
+    async def __apply_pipeline_mutation(
+            self,
+            realm: engine.Realm,
+            mutation: audioproc_pb2.Mutation,
+            new_nodes: Optional[Dict[str, engine.Node]] = None
+    ) -> None:
         graph = realm.graph
+        if new_nodes is None:
+            new_nodes = {}
 
-        mutation_type = request.mutation.WhichOneof('type')
+        mutation_type = mutation.WhichOneof('type')
         if mutation_type == 'add_node':
-            add_node = request.mutation.add_node
-            logger.info("AddNode():\n%s", add_node.description)
-            kwargs = {}  # type: Dict[str, Any]
-            if add_node.HasField('name'):
-                kwargs['name'] = add_node.name
-            if add_node.HasField('initial_state'):
-                kwargs['initial_state'] = add_node.initial_state
-            if add_node.HasField('child_realm'):
-                kwargs['child_realm'] = add_node.child_realm
-            node = engine.Node.create(
-                host_system=self.__host_system,
-                id=add_node.id,
-                description=add_node.description,
-                **kwargs)
-            graph.add_node(node)
-            # TODO: schedule setup in a worker thread.
-            await realm.setup_node(node)
+            add_node = mutation.add_node
+            node = new_nodes.get(add_node.id)
+            if node is None:
+                node = await self.__setup_new_node(realm, add_node)
+            try:
+                graph.add_node(node)
+            except:
+                if add_node.id not in new_nodes:
+                    await self.__discard_node(node)
+                raise
+            new_nodes.pop(add_node.id, None)
             realm.update_spec()
 
         elif mutation_type == 'remove_node':
-            remove_node = request.mutation.remove_node
+            remove_node = mutation.remove_node
             node = graph.find_node(remove_node.id)
             await node.cleanup(deref=True)
             graph.remove_node(node)
             realm.update_spec()
 
         elif mutation_type == 'connect_ports':
-            connect_ports = request.mutation.connect_ports
+            connect_ports = mutation.connect_ports
             node1 = graph.find_node(connect_ports.src_node_id)
             try:
                 port1 = node1.outputs[connect_ports.src_port]
@@ -327,7 +441,7 @@ class AudioProcProcess(core.ProcessBase):
             realm.update_spec()
 
         elif mutation_type == 'disconnect_ports':
-            disconnect_ports = request.mutation.disconnect_ports
+            disconnect_ports = mutation.disconnect_ports
             node1 = graph.find_node(disconnect_ports.src_node_id)
             node2 = graph.find_node(disconnect_ports.dest_node_id)
             node2.inputs[disconnect_ports.dest_port].disconnect(
@@ -335,47 +449,48 @@ class AudioProcProcess(core.ProcessBase):
             realm.update_spec()
 
         elif mutation_type == 'set_control_value':
-            set_control_value = request.mutation.set_control_value
+            set_control_value = mutation.set_control_value
             realm.set_control_value(
                 set_control_value.name,
                 set_control_value.value,
                 set_control_value.generation)
 
         elif mutation_type == 'set_plugin_state':
-            set_plugin_state = request.mutation.set_plugin_state
+            set_plugin_state = mutation.set_plugin_state
             await realm.set_plugin_state(
                 set_plugin_state.node_id,
                 set_plugin_state.state)
 
         elif mutation_type == 'set_node_port_properties':
-            set_node_port_properties = request.mutation.set_node_port_properties
+            set_node_port_properties = mutation.set_node_port_properties
             node = graph.find_node(set_node_port_properties.node_id)
             node.set_port_properties(set_node_port_properties.port_properties)
             realm.update_spec()
 
         elif mutation_type == 'set_node_description':
-            set_node_description = request.mutation.set_node_description
+            set_node_description = mutation.set_node_description
             node = graph.find_node(set_node_description.node_id)
             if await node.set_description(set_node_description.description):
                 realm.update_spec()
 
         elif mutation_type == 'set_node_parameters':
-            set_node_parameters = request.mutation.set_node_parameters
+            set_node_parameters = mutation.set_node_parameters
             node = graph.find_node(set_node_parameters.node_id)
             node.set_parameters(set_node_parameters.parameters)
 
         else:
-            raise ValueError(request.mutation)
+            raise ValueError(mutation)
 
-    def __handle_send_node_messages(
+    async def __handle_send_node_messages(
             self,
             session: Session,
             request: audioproc_pb2.SendNodeMessagesRequest,
             response: empty_message_pb2.EmptyMessage
     ) -> None:
         realm = self.__engine.get_realm(request.realm)
-        for msg in request.messages:
-            realm.send_node_message(msg)
+        async with self.__realm_lock(request.realm):
+            for msg in request.messages:
+                realm.send_node_message(msg)
 
     async def __handle_set_host_parameters(
             self,
@@ -523,6 +638,14 @@ class AudioProcProcess(core.ProcessBase):
 
         response.svg = svg
 
+    async def __handle_set_perf_stats_level(
+            self,
+            session: Session,
+            request: audioproc_pb2.SetPerfStatsLevelRequest,
+            response: empty_message_pb2.EmptyMessage
+    ) -> None:
+        core.PerfStats.set_level(request.level)
+
     async def __handle_dump(
             self,
             session: Session,
@@ -27,6 +27,9 @@ from .spec import (
 from .graph import (
     Node,
 )
+from .realm import (
+    PyRealm as Realm,
+)
 from .buffers import (
     PyBufferType as BufferType,
     PyFloatControlValueBuffer as FloatControlValueBuffer,
@@ -29,6 +29,8 @@
 
 namespace noisicaa {
 
+static const uint32_t span_frame = PerfStats::intern("frame");
+
 NullBackend::NullBackend(
     HostSystem* host_system, const pb::BackendSettings& settings,
     void (*callback)(void*, const string&), void *userdata)
@@ -47,7 +49,9 @@ void NullBackend::cleanup() {
 
 Status NullBackend::begin_block(BlockContext* ctxt) {
   assert(ctxt->perf->current_span_id() == 0);
-  ctxt->perf->start_span("frame");
+  if (PerfStats::level() > PerfStats::Level::OFF) {
+    ctxt->perf->start_span(span_frame);
+  }
 
   _block_start = std::chrono::high_resolution_clock::now();
 
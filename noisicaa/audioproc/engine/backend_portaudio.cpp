@@ -34,6 +34,8 @@
 
 namespace noisicaa {
 
+static const uint32_t span_frame = PerfStats::intern("frame");
+
 PortAudioBackend::PortAudioBackend(
     HostSystem* host_system, const pb::BackendSettings& settings,
     void (*callback)(void*, const string&), void *userdata)
@@ -230,7 +232,9 @@ void PortAudioBackend::device_thread_main(StatusSignal* status) {
 
 Status PortAudioBackend::begin_block(BlockContext* ctxt) {
   assert(ctxt->perf->current_span_id() == 0);
-  ctxt->perf->start_span("frame");
+  if (PerfStats::level() > PerfStats::Level::OFF) {
+    ctxt->perf->start_span(span_frame);
+  }
 
   for (int c = 0 ; c < 2 ; ++c) {
     memset(_samples[c], 0, _host_system->block_size() * sizeof(float));
@@ -31,11 +31,14 @@ extern "C" {
 }
 #include "noisicaa/core/perf_stats.h"
 #include "noisicaa/audioproc/engine/backend_renderer.h"
+#include "noisicaa/audioproc/engine/simd.h"
 #include "noisicaa/host_system/host_system.h"
 #include "noisicaa/audioproc/engine/realm.h"
 
 namespace noisicaa {
 
+static const uint32_t span_frame = PerfStats::intern("frame");
+
 RendererBackend::RendererBackend(
     HostSystem* host_system, const pb::BackendSettings& settings,
     void (*callback)(void*, const string&), void *userdata)
@@ -84,7 +87,9 @@ void RendererBackend::_cleanup() {
 
 Status RendererBackend::begin_block(BlockContext* ctxt) {
   assert(ctxt->perf->current_span_id() == 0);
-  ctxt->perf->start_span("frame");
+  if (PerfStats::level() > PerfStats::Level::OFF) {
+    ctxt->perf->start_span(span_frame);
+  }
 
   for (int c = 0 ; c < 2 ; ++c) {
     _channel_written[c] = false;
@@ -99,18 +104,24 @@ Status RendererBackend::end_block(BlockContext* ctxt) {
   const float* right_in = (float*)_samples[1].get();
   float* out = _outbuf.get();
   int num_samples = 0;
-  SampleTime* stime = ctxt->time_map.get();
-  SampleTime* stime_end = ctxt->time_map.get() + _host_system->block_size();
-  while (stime < stime_end) {
-    if (stime->start_time >= MusicalTime(0)) {
-      *out++ = *left_in;
-      *out++ = *right_in;
-      ++num_samples;
+  const SampleTime* time_map = ctxt->time_map.get();
+  uint32_t block_size = _host_system->block_size();
+  uint32_t pos = 0;
+  while (pos < block_size) {
+    // Interleave each run of samples with non-negative time in one go.
+    while (pos < block_size && time_map[pos].start_time < MusicalTime(0)) {
+      ++pos;
+    }
+    uint32_t start = pos;
+    while (pos < block_size && time_map[pos].start_time >= MusicalTime(0)) {
+      ++pos;
     }
 
-    ++left_in;
-    ++right_in;
-    ++stime;
+    if (pos > start) {
+      simd::interleave_stereo(left_in + start, right_in + start, out, pos - start);
+      out += 2 * (pos - start);
+      num_samples += pos - start;
+    }
   }
 
   if (num_samples > 0) {
@@ -33,7 +33,7 @@ class BackendTest(unittest_engine_mixins.HostSystemMixin, unittest.TestCase):
     def test_output(self):
         realm = PyRealm(
             name='root', host_system=self.host_system,
-            engine=None, parent=None, player=None, callback_address=None)
+            engine=None, event_loop=None, parent=None, player=None, callback_address=None)
 
         backend_settings = backend_settings_pb2.BackendSettings(time_scale=0)
         backend = PyBackend(self.host_system, 'null', backend_settings)
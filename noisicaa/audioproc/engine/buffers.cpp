@@ -27,6 +27,7 @@
 #include "lv2/lv2plug.in/ns/ext/urid/urid.h"
 #include "noisicaa/audioproc/engine/plugin_host.h"
 #include "noisicaa/audioproc/engine/buffers.h"
+#include "noisicaa/audioproc/engine/simd.h"
 #include "noisicaa/host_system/host_system.h"
 
 namespace noisicaa {
@@ -82,28 +83,18 @@ uint32_t FloatAudioBlockBuffer::size(HostSystem* host_system) const {
 }
 
 Status FloatAudioBlockBuffer::clear_buffer(HostSystem* host_system, BufferPtr buf) const {
-  float* ptr = (float*)buf;
-  for (uint32_t i = 0 ; i < host_system->block_size() ; ++i) {
-    *ptr++ = 0.0;
-  }
+  simd::clear((float*)buf, host_system->block_size());
   return Status::Ok();
 }
 
 Status FloatAudioBlockBuffer::mix_buffers(
     HostSystem* host_system, const BufferPtr buf1, BufferPtr buf2) const {
-  float* ptr1 = (float*)buf1;
-  float* ptr2 = (float*)buf2;
-  for (uint32_t i = 0 ; i < host_system->block_size() ; ++i) {
-    *ptr2++ += *ptr1++;
-  }
+  simd::mix((const float*)buf1, (float*)buf2, host_system->block_size());
   return Status::Ok();
 }
 
 Status FloatAudioBlockBuffer::mul_buffer(HostSystem* host_system, BufferPtr buf, float factor) const {
-  float* ptr = (float*)buf;
-  for (uint32_t i = 0 ; i < host_system->block_size() ; ++i) {
-    *ptr++ *= factor;
-  }
+  simd::mul((float*)buf, factor, host_system->block_size());
   return Status::Ok();
 }
 
@@ -108,7 +108,9 @@ void Engine::out_messages_pump_main() {
 
           case MessageType::PERF_STATS: {
             PerfStatsMessage* tmsg = (PerfStatsMessage*)msg;
-            notification.set_perf_stats(tmsg->perf_stats(), tmsg->length);
+            PerfStats perf_stats;
+            perf_stats.deserialize_from(tmsg->perf_stats(), tmsg->length);
+            notification.set_perf_stats(perf_stats.serialize());
             break;
           }
 
@@ -83,7 +83,8 @@ cdef class PyEngine(object):
 
     def __init__(
             self, *,
-            PyHostSystem host_system, event_loop, manager, server_address, shm=None):
+            PyHostSystem host_system, event_loop, manager, server_address, shm=None,
+            num_workers=0):
         self.notifications = core.Callback()
 
         self.__engine = NULL
@@ -92,6 +93,7 @@ cdef class PyEngine(object):
         self.__manager = manager
         self.__server_address = server_address
         self.__shm = shm
+        self.__num_workers = num_workers
 
         self.__realms = {}
         self.__root_realm = None
@@ -105,6 +107,7 @@ cdef class PyEngine(object):
         self.__maintenance_task = None
         self.__plugin_host_address = None
         self.__plugin_host = None
+        self.__plugin_host_lock = asyncio.Lock(loop=self.__event_loop)
 
         self.__bpm = 120
         self.__duration = musical_time.PyMusicalDuration(2, 1)
@@ -209,14 +212,17 @@ cdef class PyEngine(object):
         return out
 
     async def get_plugin_host(self):
-        if self.__plugin_host is None:
-            create_plugin_host_response = editor_main_pb2.CreateProcessResponse()
-            await self.__manager.call(
-                'CREATE_PLUGIN_HOST_PROCESS', None, create_plugin_host_response)
-            self.__plugin_host_address = create_plugin_host_response.address
+        # Nodes are set up concurrently, so make sure that only a single plugin host gets created.
+        async with self.__plugin_host_lock:
+            if self.__plugin_host is None:
+                create_plugin_host_response = editor_main_pb2.CreateProcessResponse()
+                await self.__manager.call(
+                    'CREATE_PLUGIN_HOST_PROCESS', None, create_plugin_host_response)
+                self.__plugin_host_address = create_plugin_host_response.address
 
-            self.__plugin_host = ipc.Stub(self.__event_loop, self.__plugin_host_address)
-            await self.__plugin_host.connect()
+                plugin_host = ipc.Stub(self.__event_loop, self.__plugin_host_address)
+                await plugin_host.connect()
+                self.__plugin_host = plugin_host
 
         return self.__plugin_host
 
@@ -267,11 +273,13 @@ cdef class PyEngine(object):
 
         cdef PyRealm realm = PyRealm(
             engine=self,
+            event_loop=self.__event_loop,
             name=name,
             parent=parent_realm,
             host_system=self.__host_system,
             player=player,
-            callback_address=callback_address)
+            callback_address=callback_address,
+            num_workers=self.__num_workers if parent is None else 0)
         self.__realms[name] = realm
         self.__realm_listeners['%s:notifications' % name] = realm.notifications.add(
             self.notifications.call)
@@ -0,0 +1,53 @@
+// -*- mode: c++ -*-
+
+/*
+ * @begin:license
+ *
+ * Copyright (c) 2015-2019, Benjamin Niemann <pink@odahoda.de>
+ *
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 2 of the License, or
+ * (at your option) any later version.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License along
+ * with this program; if not, write to the Free Software Foundation, Inc.,
+ * 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+ *
+ * @end:license
+ */
+
+#ifndef _NOISICAA_AUDIOPROC_ENGINE_FUTEX_H
+#define _NOISICAA_AUDIOPROC_ENGINE_FUTEX_H
+
+#include <errno.h>
+#include <limits.h>
+#include <stdint.h>
+#include <time.h>
+#include <unistd.h>
+#include <linux/futex.h>
+#include <sys/syscall.h>
+
+namespace noisicaa {
+
+// Thin wrappers around the futex syscall. The futex words are shared with other processes, so
+// the non-private operations must be used.
+
+// Sleep while *addr == expected, until woken up or the (relative) timeout expires.
+inline int futex_wait(uint32_t* addr, uint32_t expected, const struct timespec* timeout) {
+  return syscall(SYS_futex, addr, FUTEX_WAIT, expected, timeout, nullptr, 0);
+}
+
+// Wake up to count waiters sleeping on addr.
+inline int futex_wake(uint32_t* addr, int count = INT_MAX) {
+  return syscall(SYS_futex, addr, FUTEX_WAKE, count, nullptr, nullptr, 0);
+}
+
+}  // namespace noisicaa
+
+#endif
@@ -22,7 +22,7 @@
 
 import logging
 import typing
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import toposort
 
@@ -160,6 +160,11 @@ port_cls_map = {
 
 
 class Node(object):
+    # If True, the opcodes from add_to_spec_pre() only start processing a block and the opcodes
+    # from add_to_spec_finish() wait for it to complete. Graph.compile() places the latter right
+    # before the first node, which uses this node's outputs, so nodes in between run concurrently.
+    split_processing = False
+
     def __init__(
             self, *,
             host_system: host_system_lib.HostSystem, description: node_db.NodeDescription,
@@ -274,6 +279,15 @@ class Node(object):
         logger.info("%s: cleanup()", self.name)
         self.__control_values.clear()
 
+    async def discard(self) -> None:
+        """Clean up a node, which has been set up, but was never added to the realm's program.
+
+        Everything the node registered with the realm during setup() is removed again.
+        """
+        for name in self.__control_values:
+            self.realm.remove_unused_control_value(name)
+        await self.cleanup(deref=True)
+
     def set_session_value(self, key: str, value: session_data_pb2.SessionValue) -> None:
         pass
 
@@ -352,15 +366,30 @@ class Node(object):
     def control_values(self) -> List[control_value.PyControlValue]:
         return [v for _, v in sorted(self.__control_values.items())]
 
+    def get_aliased_port(self, port: Port) -> Optional[Port]:
+        """Returns the upstream port, whose buffer can be used directly for an input port.
+
+        An input port with a single connection doesn't need a buffer of its own, it can just
+        read the buffer of the upstream output port.
+        """
+        if not isinstance(port, InputPort) or len(port.connections) != 1:
+            return None
+
+        if (port.buf_name in self.__control_values
+                and not self.get_port_properties(port.name).exposed):
+            return None
+
+        return port.connections[0]
+
     def add_to_spec_pre(self, spec: spec_lib.PySpec) -> None:
+        # The buffers for all ports have already been added by Graph.compile().
+
         for cv in self.control_values:
             spec.append_control_value(cv)
 
         for port in self.ports:
             port_properties = self.get_port_properties(port.name)
 
-            spec.append_buffer(port.buf_name, port.get_buf_type())
-
             if port.buf_name in self.__control_values and not port_properties.exposed:
                 if port.current_type == node_db.PortDescription.KRATE_CONTROL:
                     spec.append_opcode(
@@ -372,7 +401,7 @@ class Node(object):
                         'FETCH_CONTROL_VALUE_TO_AUDIO',
                         self.__control_values[port.buf_name], port.buf_name)
 
-            elif isinstance(port, InputPort):
+            elif isinstance(port, InputPort) and self.get_aliased_port(port) is None:
                 spec.append_opcode('CLEAR', port.buf_name)
                 for upstream_port in port.connections:
                     spec.append_opcode('MIX', upstream_port.buf_name, port.buf_name)
@@ -380,6 +409,9 @@ class Node(object):
     def add_to_spec_post(self, spec: spec_lib.PySpec) -> None:
         pass
 
+    def add_to_spec_finish(self, spec: spec_lib.PySpec) -> None:
+        pass
+
 
 class ProcessorNode(Node):
     def __init__(self, **kwargs: Any) -> None:
@@ -398,8 +430,9 @@ class ProcessorNode(Node):
         self.__processor = processor_lib.PyProcessor(
             self.realm.name, self.id, self._host_system, self.description)
         self.__processor.set_parameters(self.parameters)
-        self.__processor.setup()
+        # Register the processor first, so its state changes during setup get reported.
         self.realm.add_active_processor(self.__processor)
+        await self.realm.run_setup_task(self.__processor.setup)
 
     async def cleanup(self, deref: bool = False) -> None:
         if self.__processor is not None:
@@ -410,6 +443,11 @@ class ProcessorNode(Node):
 
         await super().cleanup(deref)
 
+    async def discard(self) -> None:
+        if self.__processor is not None:
+            self.realm.remove_unused_processor(self.__processor)
+        await super().discard()
+
     def set_parameters(self, parameters: node_parameters_pb2.NodeParameters) -> None:
         super().set_parameters(parameters)
         if self.__processor is not None:
@@ -438,10 +476,23 @@ class ProcessorNode(Node):
         for port_idx, port in enumerate(self.ports):
             spec.append_opcode('CONNECT_PORT', self.__processor, port_idx, port.buf_name)
 
-        spec.append_opcode('CALL', self.__processor)
+        if self.split_processing:
+            spec.append_opcode('CALL_START', self.__processor)
+        else:
+            spec.append_opcode('CALL', self.__processor)
+
+    def add_to_spec_finish(self, spec: spec_lib.PySpec) -> None:
+        super().add_to_spec_finish(spec)
+
+        if self.split_processing:
+            spec.append_opcode('CALL_FINISH', self.__processor)
 
 
 class PluginNode(ProcessorNode):
+    # Plugins run in the plugin host process, so the engine can do other work, while they are
+    # busy.
+    split_processing = True
+
     def __init__(self, **kwargs: Any) -> None:
         super().__init__(**kwargs)
 
@@ -516,6 +567,12 @@ class ChildRealmNode(Node):
         self.__child_realm = self.realm.child_realms[self.__child_realm_name]
         self.realm.add_active_child_realm(self.__child_realm)
 
+    async def discard(self) -> None:
+        if self.__child_realm is not None:
+            self.realm.remove_unused_child_realm(self.__child_realm)
+            self.__child_realm = None
+        await super().discard()
+
     def add_to_spec_pre(self, spec: spec_lib.PySpec) -> None:
         super().add_to_spec_pre(spec)
 
@@ -532,6 +589,10 @@ class Graph(object):
         self.__realm = realm
         self.__nodes = {}  # type: Dict[str, Node]
 
+        # The topological order of the nodes is kept across compile() calls and only the parts,
+        # which are affected by new connections, get sorted again.
+        self.__sorted_nodes = []  # type: List[Node]
+
     @property
     def nodes(self) -> Set[Node]:
         return set(self.__nodes.values())
@@ -542,27 +603,133 @@ class Graph(object):
     def add_node(self, node: Node) -> None:
         if node.id in self.__nodes:
             raise GraphError("Duplicate node ID '%s'" % node.id)
-        node.set_realm(self.__realm)
+        # Nodes might have already been set up for this realm, before they get added to the graph.
+        if not node.is_owned_by(self.__realm):
+            node.set_realm(self.__realm)
 
         self.__nodes[node.id] = node
+        # A new node has no connections yet, so appending it keeps the order valid.
+        self.__sorted_nodes.append(node)
 
     def remove_node(self, node: Node) -> None:
         if not node.is_owned_by(self.__realm):
             raise GraphError("Node has not been added to this realm")
         node.clear_realm()
         del self.__nodes[node.id]
+        self.__sorted_nodes.remove(node)
 
     def compile(self, bpm: int, duration: audioproc.MusicalDuration) -> spec_lib.PySpec:
         spec = spec_lib.PySpec()
         spec.bpm = bpm
         spec.duration = duration
 
-        sorted_nodes = toposort.toposort_flatten(
-            {node: set(node.parent_nodes) for node in self.__nodes.values()},
-            sort=False)
+        sorted_nodes = self.__update_sorted_nodes()
+
+        self.__add_buffers(spec, sorted_nodes)
 
+        # Each node becomes a job, which depends on the jobs of its upstream nodes. Jobs are
+        # appended in topological order, so sequential execution still works as before.
+        node_jobs = {}  # type: Dict[str, int]
+        unfinished_nodes = {}  # type: Dict[str, Node]
         for node in sorted_nodes:
+            for parent in node.parent_nodes:
+                if parent.id in unfinished_nodes:
+                    self.__add_finish_job(spec, unfinished_nodes.pop(parent.id), node_jobs)
+
+            node_jobs[node.id] = spec.begin_job(
+                sorted({node_jobs[parent.id] for parent in node.parent_nodes}))
             node.add_to_spec_pre(spec)
             node.add_to_spec_post(spec)
+            spec.end_job()
+
+            if node.split_processing:
+                unfinished_nodes[node.id] = node
+
+        for node in unfinished_nodes.values():
+            self.__add_finish_job(spec, node, node_jobs)
 
         return spec
+
+    def __add_finish_job(
+            self, spec: spec_lib.PySpec, node: Node, node_jobs: Dict[str, int]) -> None:
+        # Downstream nodes depend on the finish job instead of the job, which started the node.
+        node_jobs[node.id] = spec.begin_job([node_jobs[node.id]])
+        node.add_to_spec_finish(spec)
+        spec.end_job()
+
+    def __update_sorted_nodes(self) -> List[Node]:
+        positions = {node.id: idx for idx, node in enumerate(self.__sorted_nodes)}
+
+        # Find the range of nodes, which is affected by connections against the current order.
+        lo = len(self.__sorted_nodes)
+        hi = -1
+        for idx, node in enumerate(self.__sorted_nodes):
+            for parent in node.parent_nodes:
+                try:
+                    parent_idx = positions[parent.id]
+                except KeyError:
+                    raise GraphError(
+                        "Node %s is connected to unknown node %s" % (node.id, parent.id))
+                if parent_idx > idx:
+                    lo = min(lo, idx)
+                    hi = max(hi, parent_idx)
+
+        if hi >= 0:
+            # Nodes before the range can't depend on nodes in the range and nodes after the range
+            # only depend on nodes before them, so sorting just the nodes in the range is enough.
+            region = self.__sorted_nodes[lo:hi + 1]
+            region_ids = {node.id for node in region}
+            logger.info("Sorting %d of %d nodes.", len(region), len(self.__sorted_nodes))
+            self.__sorted_nodes[lo:hi + 1] = toposort.toposort_flatten(
+                {node: {parent for parent in node.parent_nodes if parent.id in region_ids}
+                 for node in region},
+                sort=False)
+
+        return list(self.__sorted_nodes)
+
+    def __add_buffers(self, spec: spec_lib.PySpec, sorted_nodes: List[Node]) -> None:
+        # Add the buffers for all ports. Buffers, whose lifetimes do not overlap, share the same
+        # slot in the buffer arena.
+        #
+        # A buffer is used by the node owning the port and, for output ports, by all downstream
+        # nodes. Because the nodes might be executed in parallel, a buffer can only take over a
+        # slot, if all users of the slot's previous buffer are strict ancestors of all users of
+        # the new buffer.
+
+        ancestors = {}  # type: Dict[str, Set[str]]
+        for node in sorted_nodes:
+            ancestors[node.id] = set()
+            for parent in node.parent_nodes:
+                ancestors[node.id].add(parent.id)
+                ancestors[node.id] |= ancestors[parent.id]
+
+        # Each slot is a (type, last buffer name, users of last buffer) tuple.
+        slots = []  # type: List[Tuple[node_db.PortDescription.Type, str, Set[str]]]
+        num_buffers = 0
+        for node in sorted_nodes:
+            for port in node.ports:
+                aliased_port = node.get_aliased_port(port)
+                if aliased_port is not None:
+                    spec.append_buffer_alias(port.buf_name, aliased_port.buf_name)
+                    continue
+
+                users = {node.id}
+                if isinstance(port, OutputPort):
+                    users |= {downstream_port.owner.id for downstream_port in port.connections}
+
+                for idx, (slot_type, slot_buf_name, slot_users) in enumerate(slots):
+                    if slot_type != port.current_type:
+                        continue
+                    if all(slot_users <= ancestors[user] for user in users):
+                        spec.append_buffer_alias(port.buf_name, slot_buf_name)
+                        slots[idx] = (slot_type, port.buf_name, users)
+                        break
+
+                else:
+                    spec.append_buffer(port.buf_name, port.get_buf_type())
+                    slots.append((port.current_type, port.buf_name, users))
+                    num_buffers += 1
+
+        logger.info(
+            "Allocated %d buffers for %d ports.",
+            num_buffers, sum(len(node.ports) for node in sorted_nodes))
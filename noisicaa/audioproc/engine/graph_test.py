@@ -0,0 +1,102 @@
+# @begin:license
+#
+# Copyright (c) 2015-2019, Benjamin Niemann <pink@odahoda.de>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# @end:license
+
+from noisidev import unittest
+from noisidev import unittest_mixins
+from noisidev import unittest_engine_mixins
+from noisicaa import audioproc
+from noisicaa import node_db
+from .realm import PyRealm
+from . import graph as graph_lib
+
+
+class GraphTest(
+        unittest_engine_mixins.HostSystemMixin,
+        unittest_mixins.NodeDBMixin,
+        unittest.AsyncTestCase):
+
+    async def setup_testcase(self):
+        self.realm = PyRealm(
+            parent=None,
+            name='root',
+            host_system=self.host_system,
+            player=None, engine=None, event_loop=self.loop, callback_address=None)
+        await self.realm.setup()
+        self.realm.block_context.create_out_messages()
+        self.nodes = []
+
+    async def cleanup_testcase(self):
+        for node in reversed(self.nodes):
+            self.realm.graph.remove_node(node)
+            await node.cleanup()
+        self.realm.update_spec()
+        await self.realm.cleanup()
+
+    async def add_mixer(self, node_id, *upstream):
+        node = graph_lib.Node.create(
+            id=node_id,
+            host_system=self.host_system,
+            description=self.node_db.get_node_description('builtin://mixer'))
+        self.realm.graph.add_node(node)
+        await self.realm.setup_node(node)
+        self.nodes.append(node)
+
+        for parent in upstream:
+            for channel in ('left', 'right'):
+                node.inputs['in:' + channel].connect(
+                    parent.outputs['out:' + channel], node_db.PortDescription.AUDIO)
+        self.realm.update_spec()
+
+        return node
+
+    def compile(self):
+        return self.realm.graph.compile(120, audioproc.MusicalDuration(4, 1))
+
+    def slots(self, spec, node):
+        return {spec.get_buffer_idx(port.buf_name) for port in node.ports}
+
+    async def test_chain(self):
+        m1 = await self.add_mixer('m1')
+        m2 = await self.add_mixer('m2', m1)
+        m3 = await self.add_mixer('m3', m2)
+
+        spec = self.compile()
+        self.assertLess(spec.num_buffers, sum(len(node.ports) for node in self.realm.graph.nodes))
+
+        # m1's outputs are only used by m1 and m2, which are both done, when m3 runs.
+        out_slot = spec.get_buffer_idx(m1.outputs['out:left'].buf_name)
+        self.assertNotIn(out_slot, self.slots(spec, m2))
+        self.assertIn(out_slot, self.slots(spec, m3))
+
+    async def test_fan_out(self):
+        m1 = await self.add_mixer('m1')
+        m2 = await self.add_mixer('m2', m1)
+        m3 = await self.add_mixer('m3', m1)
+        m4 = await self.add_mixer('m4', m2, m3)
+
+        spec = self.compile()
+
+        # m2 and m3 might run in parallel, so they can't share slots.
+        self.assertFalse(self.slots(spec, m2) & self.slots(spec, m3))
+
+        # m1's outputs must stay live, until both m2 and m3 are done, then m4 can reuse them.
+        out_slot = spec.get_buffer_idx(m1.outputs['out:left'].buf_name)
+        self.assertNotIn(out_slot, self.slots(spec, m2) | self.slots(spec, m3))
+        self.assertIn(out_slot, self.slots(spec, m4))
@@ -168,12 +168,19 @@ struct NodeMessage : Message {
       MessageQueue* queue,
       const string& node_id,
       const LV2_Atom* atom) {
+    return push(queue, node_id.c_str(), atom);
+  }
+
+  static NodeMessage* push(
+      MessageQueue* queue,
+      const char* node_id,
+      const LV2_Atom* atom) {
     NodeMessage* msg = (NodeMessage*)queue->allocate(
         sizeof(NodeMessage) + sizeof(LV2_Atom) + atom->size);
     msg->type = MessageType::NODE_MESSAGE;
     msg->size = sizeof(NodeMessage) + sizeof(LV2_Atom) + atom->size;
 
-    strncpy(msg->node_id, node_id.c_str(), sizeof(msg->node_id));
+    strncpy(msg->node_id, node_id, sizeof(msg->node_id));
     memmove(msg->atom(), atom, sizeof(LV2_Atom) + atom->size);
 
     return msg;
@@ -33,62 +33,54 @@
 #include "noisicaa/audioproc/engine/processor.h"
 #include "noisicaa/audioproc/engine/message_queue.h"
 #include "noisicaa/audioproc/engine/realm.h"
+#include "noisicaa/audioproc/engine/simd.h"
 
 namespace noisicaa {
 
-Status run_END(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
+Status run_END(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
   state->end = true;
   return Status::Ok();
 }
 
-Status run_COPY(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int idx1 = args[0].int_value();
-  int idx2 = args[1].int_value();
-  Buffer* buf1 = state->program->buffers[idx1].get();
-  Buffer* buf2 = state->program->buffers[idx2].get();
+Status run_COPY(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  Buffer* buf1 = args[0].buffer;
+  Buffer* buf2 = args[1].buffer;
   assert(buf1->size() == buf2->size());
   memmove(buf2->data(), buf1->data(), buf2->size());
   return Status::Ok();
 }
 
-Status run_CLEAR(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int idx = args[0].int_value();
-  Buffer* buf = state->program->buffers[idx].get();
+Status run_CLEAR(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  Buffer* buf = args[0].buffer;
   buf->clear();
   return Status::Ok();
 }
 
-Status run_MIX(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int idx1 = args[0].int_value();
-  int idx2 = args[1].int_value();
-  Buffer* buf1 = state->program->buffers[idx1].get();
-  Buffer* buf2 = state->program->buffers[idx2].get();
+Status run_MIX(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  Buffer* buf1 = args[0].buffer;
+  Buffer* buf2 = args[1].buffer;
   buf2->mix(buf1);
   return Status::Ok();
 }
 
-Status run_MUL(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int idx = args[0].int_value();
-  float factor = args[1].float_value();
-  Buffer* buf = state->program->buffers[idx].get();
+Status run_MUL(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  Buffer* buf = args[0].buffer;
+  float factor = args[1].float_value;
   buf->mul(factor);
   return Status::Ok();
 }
 
-Status run_SET_FLOAT(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int idx = args[0].int_value();
-  float value = args[1].float_value();
-  Buffer* buf = state->program->buffers[idx].get();
+Status run_SET_FLOAT(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  Buffer* buf = args[0].buffer;
+  float value = args[1].float_value;
   float* data = (float*)buf->data();
   *data = value;
   return Status::Ok();
 }
 
-Status run_FETCH_CONTROL_VALUE(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int cv_idx = args[0].int_value();
-  int buf_idx = args[1].int_value();
-  ControlValue* cv = state->program->spec->get_control_value(cv_idx);
-  Buffer* buf = state->program->buffers[buf_idx].get();
+Status run_FETCH_CONTROL_VALUE(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  ControlValue* cv = args[0].control_value;
+  Buffer* buf = args[1].buffer;
 
   switch (cv->type()) {
   case ControlValueType::FloatCV: {
@@ -106,11 +98,9 @@ Status run_FETCH_CONTROL_VALUE(BlockContext* ctxt, ProgramState* state, const ve
 }
 
 Status run_FETCH_CONTROL_VALUE_TO_AUDIO(
-    BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int cv_idx = args[0].int_value();
-  int buf_idx = args[1].int_value();
-  ControlValue* cv = state->program->spec->get_control_value(cv_idx);
-  Buffer* buf = state->program->buffers[buf_idx].get();
+    BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  ControlValue* cv = args[0].control_value;
+  Buffer* buf = args[1].buffer;
 
   switch (cv->type()) {
   case ControlValueType::FloatCV: {
@@ -128,11 +118,10 @@ Status run_FETCH_CONTROL_VALUE_TO_AUDIO(
   }
 }
 
-Status run_POST_RMS(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  const string& node_id = args[0].string_value();
-  int port_index = args[1].int_value();
-  int idx = args[2].int_value();
-  Buffer* buf = state->program->buffers[idx].get();
+Status run_POST_RMS(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  const char* node_id = args[0].string_value;
+  int port_index = args[1].int_value;
+  Buffer* buf = args[2].buffer;
 
   float* data = (float*)buf->data();
   float sum = 0.0;
@@ -164,21 +153,21 @@ Status run_POST_RMS(BlockContext* ctxt, ProgramState* state, const vector<OpArg>
   return Status::Ok();
 }
 
-Status run_NOISE(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int idx = args[0].int_value();
-  Buffer* buf = state->program->buffers[idx].get();
+Status run_NOISE(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  Buffer* buf = args[0].buffer;
 
-  float* data = (float*)buf->data();
-  for (uint32_t i = 0 ; i < state->host_system->block_size() ; ++i) {
-    *data++ = 2.0 * drand48() - 1.0;
+  static thread_local uint32_t noise_state[simd::NOISE_STATE_SIZE] = { 0 };
+  if (noise_state[0] == 0) {
+    simd::seed_noise(noise_state, (uint32_t)(lrand48()));
   }
+
+  simd::noise((float*)buf->data(), noise_state, state->host_system->block_size());
   return Status::Ok();
 }
 
-Status run_MIDI_MONKEY(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int idx = args[0].int_value();
-  float prob = args[1].float_value();
-  Buffer* buf = state->program->buffers[idx].get();
+Status run_MIDI_MONKEY(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  Buffer* buf = args[0].buffer;
+  float prob = args[1].float_value;
 
   LV2_Atom_Forge forge;
   lv2_atom_forge_init(&forge, &state->host_system->lv2->urid_map);
@@ -198,7 +187,7 @@ Status run_MIDI_MONKEY(BlockContext* ctxt, ProgramState* state, const vector<OpA
   return Status::Ok();
 }
 
-Status run_SINE(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
+Status run_SINE(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
     // def op_SINE(self, ctxt, state, *, buf_idx, freq):
     //     cdef buffers.Buffer buf = self.__buffers[buf_idx]
     //     assert isinstance(buf.type, buffers.FloatArray), str(buf.type)
@@ -214,26 +203,35 @@ Status run_SINE(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& ar
   return ERROR_STATUS("SINE not implemented yet.");
 }
 
-Status init_CONNECT_PORT(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int processor_idx = args[0].int_value();
-  int port_idx = args[1].int_value();
-  int buf_idx = args[2].int_value();
-  Processor* processor = state->program->spec->get_processor(processor_idx);
-  Buffer* buf = state->program->buffers[buf_idx].get();
+Status init_CONNECT_PORT(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  Processor* processor = args[0].processor;
+  int port_idx = args[1].int_value;
+  Buffer* buf = args[2].buffer;
   processor->connect_port(ctxt, port_idx, buf);
   return Status::Ok();
 }
 
-Status run_CALL(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int processor_idx = args[0].int_value();
-  Processor* processor = state->program->spec->get_processor(processor_idx);
+Status run_CALL(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  Processor* processor = args[0].processor;
   processor->process_block(ctxt, state->program->time_mapper.get());
   return Status::Ok();
 }
 
-Status run_LOG_RMS(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int idx = args[0].int_value();
-  Buffer* buf = state->program->buffers[idx].get();
+Status run_CALL_START(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  Processor* processor = args[0].processor;
+  processor->start_block(ctxt, state->program->time_mapper.get());
+  return Status::Ok();
+}
+
+Status run_CALL_FINISH(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  Processor* processor = args[0].processor;
+  processor->finish_block(ctxt, state->program->time_mapper.get());
+  return Status::Ok();
+}
+
+Status run_LOG_RMS(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  int idx = args[0].int_value;
+  Buffer* buf = args[0].buffer;
 
   float* data = (float*)buf->data();
   float sum = 0.0;
@@ -246,9 +244,9 @@ Status run_LOG_RMS(BlockContext* ctxt, ProgramState* state, const vector<OpArg>&
   return Status::Ok();
 }
 
-Status run_LOG_ATOM(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int idx = args[0].int_value();
-  Buffer* buf = state->program->buffers[idx].get();
+Status run_LOG_ATOM(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  int idx = args[0].int_value;
+  Buffer* buf = args[0].buffer;
 
   LV2_Atom_Sequence* seq = (LV2_Atom_Sequence*)buf->data();
   if (seq->atom.type != state->host_system->lv2->urid.atom_sequence) {
@@ -266,13 +264,10 @@ Status run_LOG_ATOM(BlockContext* ctxt, ProgramState* state, const vector<OpArg>
   return Status::Ok();
 }
 
-Status run_CALL_CHILD_REALM(BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args) {
-  int realm_idx = args[0].int_value();
-  Realm* realm = state->program->spec->get_child_realm(realm_idx);
-  int out_left_idx = args[1].int_value();
-  Buffer* out_left_buf = state->program->buffers[out_left_idx].get();
-  int out_right_idx = args[2].int_value();
-  Buffer* out_right_buf = state->program->buffers[out_right_idx].get();
+Status run_CALL_CHILD_REALM(BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args) {
+  Realm* realm = args[0].realm;
+  Buffer* out_left_buf = args[1].buffer;
+  Buffer* out_right_buf = args[2].buffer;
 
   StatusOr<Program*> stor_program = realm->get_active_program();
   RETURN_IF_ERROR(stor_program);
@@ -344,6 +339,8 @@ struct OpSpec opspecs[NUM_OPCODES] = {
   // processors
   { OpCode::CONNECT_PORT, "CONNECT_PORT", "pib", init_CONNECT_PORT, nullptr },
   { OpCode::CALL, "CALL", "p", nullptr, run_CALL },
+  { OpCode::CALL_START, "CALL_START", "p", nullptr, run_CALL_START },
+  { OpCode::CALL_FINISH, "CALL_FINISH", "p", nullptr, run_CALL_FINISH },
 
   // logging
   { OpCode::LOG_RMS, "LOG_RMS", "b", nullptr, run_LOG_RMS },
@@ -36,6 +36,9 @@ namespace noisicaa {
 using namespace std;
 
 class ProgramState;
+class Processor;
+class ControlValue;
+class Realm;
 
 enum OpCode {
   // control flow
@@ -63,6 +66,8 @@ enum OpCode {
   // processors
   CONNECT_PORT,
   CALL,
+  CALL_START,
+  CALL_FINISH,
 
   // misc
   LOG_RMS,
@@ -96,8 +101,32 @@ private:
   string _string_value;
 };
 
+// An opcode argument, which has been resolved against the buffers, processors, etc. of a program.
+// int_value holds the raw index for resolved arguments.
+struct LinkedOpArg {
+  int64_t int_value;
+  union {
+    float float_value;
+    const char* string_value;
+    Buffer* buffer;
+    Processor* processor;
+    ControlValue* control_value;
+    Realm* realm;
+  };
+};
+
+static const int MaxOpArgs = 4;
+
 typedef Status (*OpFunc)(
-    BlockContext* ctxt, ProgramState* state, const vector<OpArg>& args);
+    BlockContext* ctxt, ProgramState* state, const LinkedOpArg* args);
+
+struct LinkedOp {
+  OpCode opcode;
+  OpFunc init;
+  OpFunc run;
+  LinkedOpArg args[MaxOpArgs];
+  uint32_t perf_name_id;
+};
 
 struct OpSpec {
   OpCode opcode;
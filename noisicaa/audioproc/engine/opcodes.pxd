@@ -43,6 +43,8 @@ cdef extern from "noisicaa/audioproc/engine/opcodes.h" namespace "noisicaa" nogi
         MIDI_MONKEY,
         CONNECT_PORT
         CALL
+        CALL_START
+        CALL_FINISH
         LOG_RMS
         LOG_ATOM
         NUM_OPCODES
@@ -62,7 +64,8 @@ cdef extern from "noisicaa/audioproc/engine/opcodes.h" namespace "noisicaa" nogi
         const string& string_value() const
 
     struct ProgramState
-    ctypedef Status (*OpFunc)(ProgramState*, const vector[OpArg]& args)
+    struct LinkedOpArg
+    ctypedef Status (*OpFunc)(ProgramState*, const LinkedOpArg* args)
 
     struct OpSpec:
         OpCode opcode
@@ -21,6 +21,7 @@
  */
 
 #include <assert.h>
+#include <errno.h>
 #include <fcntl.h>
 #include <poll.h>
 #include <stdlib.h>
@@ -32,6 +33,7 @@
 #include "noisicaa/node_db/node_description.pb.h"
 #include "noisicaa/host_system/host_system.h"
 #include "noisicaa/audioproc/public/plugin_state.pb.h"
+#include "noisicaa/audioproc/engine/futex.h"
 #include "noisicaa/audioproc/engine/plugin_host.h"
 #include "noisicaa/audioproc/engine/plugin_host_lv2.h"
 #include "noisicaa/audioproc/engine/plugin_host_ladspa.h"
@@ -45,7 +47,9 @@ PluginHost::PluginHost(
     _host_system(host_system),
     _spec(spec) {}
 
-PluginHost::~PluginHost() {}
+PluginHost::~PluginHost() {
+  close_signal();
+}
 
 StatusOr<PluginHost*> PluginHost::create(const string& spec_serialized, HostSystem* host_system) {
   pb::PluginInstanceSpec spec;
@@ -121,17 +125,29 @@ Status PluginHost::main_loop(int pipe_fd) {
 
   RETURN_IF_ERROR(set_thread_to_rt_priority(_logger));
 
-  enum State { READ_COMMAND, READ_MEMMAP_SIZE, READ_MEMMAP };
+  enum State { READ_COMMAND, READ_MEMMAP_SIZE, READ_MEMMAP, READ_SIGNAL_PATH };
   State state = READ_COMMAND;
 
   char buf[20480];
   size_t buf_size = 0;
   size_t memmap_size = 0;
   while (!_exit_loop.load()) {
+    // Once the engine gave us a signal segment, blocks are requested through its futex and we
+    // only peek into the pipe for other commands. The timeout makes sure that commands are still
+    // picked up, when no blocks are requested.
+    bool use_signal = _signal != nullptr && _shmem_data != MAP_FAILED;
+    if (use_signal && __atomic_load_n(&_signal->request, __ATOMIC_ACQUIRE) == _last_request) {
+      struct timespec timeout = { 0, 100000000 };
+      int rc = futex_wait(&_signal->request, _last_request, &timeout);
+      if (rc < 0 && errno != EAGAIN && errno != EINTR && errno != ETIMEDOUT) {
+        return OSERROR_STATUS("Failed to wait on futex");
+      }
+    }
+
     struct pollfd fds[] = {
       {pipe_fd, POLLIN, 0},
     };
-    int rc = poll(fds, 1, 1000);
+    int rc = poll(fds, 1, use_signal ? 0 : 1000);
     if (rc < 0) {
       return OSERROR_STATUS("Failed to poll in pipe");
     }
@@ -170,6 +186,8 @@ Status PluginHost::main_loop(int pipe_fd) {
           RETURN_IF_PTHREAD_ERROR(pthread_cond_signal(&_cond->cond));
         } else if (strcmp(buf, "MEMORY_MAP") == 0) {
           state = READ_MEMMAP_SIZE;
+        } else if (strcmp(buf, "SIGNAL") == 0) {
+          state = READ_SIGNAL_PATH;
         } else {
           return ERROR_STATUS("Unknown command '%s' received.", buf);
         }
@@ -219,14 +237,95 @@ Status PluginHost::main_loop(int pipe_fd) {
         }
         break;
       }
+      case READ_SIGNAL_PATH: {
+        char* lf = (char*)memchr(buf, '\n', buf_size);
+        if (lf == nullptr) {
+          break;
+        }
+
+        *lf = 0;
+        RETURN_IF_ERROR(handle_signal(buf));
+        state = READ_COMMAND;
+
+        buf_size -= lf + 1 - buf;
+        memmove(buf, lf + 1, buf_size);
+        if (buf_size > 0) {
+          more = true;
+        }
+        break;
+      }
       }
     } while (more);
+
+    // The engine writes all commands for a block into the pipe, before it requests the block. So
+    // only process it, once the pipe has been drained completely.
+    if (_signal != nullptr
+        && _shmem_data != MAP_FAILED
+        && !(fds[0].revents & POLLIN)
+        && state == READ_COMMAND
+        && buf_size == 0) {
+      RETURN_IF_ERROR(process_requested_block());
+    }
   }
   _logger->info("Main loop finished.");
 
   return Status::Ok();
 }
 
+Status PluginHost::process_requested_block() {
+  uint32_t request = __atomic_load_n(&_signal->request, __ATOMIC_ACQUIRE);
+  if (request == _last_request) {
+    return Status::Ok();
+  }
+
+  RETURN_IF_ERROR(process_block(_block_size));
+
+  _last_request = request;
+  __atomic_store_n(&_signal->response, request, __ATOMIC_RELEASE);
+  futex_wake(&_signal->response);
+
+  return Status::Ok();
+}
+
+Status PluginHost::handle_signal(const char* path) {
+  close_signal();
+
+  _logger->info("Using signal segment %s...", path);
+
+  _signal_fd = shm_open(path, O_RDWR, 0);
+  if (_signal_fd < 0) {
+    return OSERROR_STATUS("Failed to open shmem %s", path);
+  }
+
+  void* data = mmap(nullptr, sizeof(PluginSignal), PROT_READ | PROT_WRITE, MAP_SHARED, _signal_fd, 0);
+  if (data == MAP_FAILED) {
+    return OSERROR_STATUS("Failed to mmap shmem %s", path);
+  }
+
+  _signal = (PluginSignal*)data;
+  if (_signal->magic != 0x7a3c19e5) {
+    close_signal();
+    return ERROR_STATUS("PluginSignal not initialized.");
+  }
+
+  // Only react to requests, which are made from now on.
+  _last_request = __atomic_load_n(&_signal->request, __ATOMIC_ACQUIRE);
+
+  return Status::Ok();
+}
+
+void PluginHost::close_signal() {
+  if (_signal != nullptr) {
+    munmap(_signal, sizeof(PluginSignal));
+    _signal = nullptr;
+  }
+
+  if (_signal_fd >= 0) {
+    close(_signal_fd);
+    _signal_fd = -1;
+  }
+}
+
 void PluginHost::exit_loop() {
   _exit_loop.store(true);
 }
@@ -64,6 +64,17 @@ struct PluginCond {
   bool set;
 };
 
+// Lives in its own shared memory segment for the whole lifetime of a ProcessorPlugin, so its
+// location does not change, when a new program moves the buffers around.
+// The engine increments request to start a block and the plugin host sets response to the same
+// value, once the block is done. Both are used as futex words, so a block only costs a wake up
+// on either side instead of a pipe write and a condition variable round trip.
+struct PluginSignal {
+  uint32_t magic;
+  uint32_t request;
+  uint32_t response;
+};
+
 class PluginHost {
 public:
   virtual ~PluginHost();
@@ -100,6 +111,9 @@ protected:
 
 private:
   Status handle_memory_map(PluginMemoryMapping* map, PluginMemoryMapping::Buffer* buffers);
+  Status handle_signal(const char* path);
+  void close_signal();
+  Status process_requested_block();
 
   atomic<bool> _exit_loop;
 
@@ -110,6 +124,10 @@ private:
 
   PluginCond* _cond = nullptr;
   uint32_t _block_size = 0;
+
+  int _signal_fd = -1;
+  PluginSignal* _signal = nullptr;
+  uint32_t _last_request = 0;
 };
 
 }  // namespace noisicaa
@@ -210,12 +210,28 @@ void Processor::connect_port(BlockContext* ctxt, uint32_t port_idx, Buffer* buf)
 }
 
 void Processor::process_block(BlockContext* ctxt, TimeMapper* time_mapper) {
+  start_block(ctxt, time_mapper);
+  finish_block(ctxt, time_mapper);
+}
+
+void Processor::start_block(BlockContext* ctxt, TimeMapper* time_mapper) {
   for (const auto* buf : _buffers) {
     assert(buf != nullptr);
   }
 
   if (state() == ProcessorState::RUNNING) {
-    Status status = process_block_internal(ctxt, time_mapper);
+    Status status = start_block_internal(ctxt, time_mapper);
+    if (status.is_error()) {
+      _logger->error("Processor %llx: process_block() failed: %s", id(), status.message());
+      RTUnsafe rtu;  // We just crashed... doesn't matter we're now calling unsafe callbacks.
+      set_state(ProcessorState::BROKEN);
+    }
+  }
+}
+
+void Processor::finish_block(BlockContext* ctxt, TimeMapper* time_mapper) {
+  if (state() == ProcessorState::RUNNING) {
+    Status status = finish_block_internal(ctxt, time_mapper);
     if (status.is_error()) {
       _logger->error("Processor %llx: process_block() failed: %s", id(), status.message());
       RTUnsafe rtu;  // We just crashed... doesn't matter we're now calling unsafe callbacks.
@@ -240,6 +256,14 @@ void Processor::process_block(BlockContext* ctxt, TimeMapper* time_mapper) {
   }
 }
 
+Status Processor::start_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) {
+  return process_block_internal(ctxt, time_mapper);
+}
+
+Status Processor::finish_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) {
+  return Status::Ok();
+}
+
 Status Processor::post_process_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) {
   return Status::Ok();
 }
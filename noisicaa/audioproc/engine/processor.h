@@ -90,6 +90,12 @@ public:
   void connect_port(BlockContext* ctxt, uint32_t port_idx, Buffer* buf);
   void process_block(BlockContext* ctxt, TimeMapper* time_mapper);
 
+  // process_block() split in two halves. Processors, which do their work outside of the calling
+  // thread, only start the work in start_block() and wait for it in finish_block(), so other
+  // opcodes can be executed in between.
+  void start_block(BlockContext* ctxt, TimeMapper* time_mapper);
+  void finish_block(BlockContext* ctxt, TimeMapper* time_mapper);
+
   Slot<pb::EngineNotification> notifications;
 
 protected:
@@ -102,6 +108,8 @@ protected:
   virtual Status set_parameters_internal(const pb::NodeParameters& parameters);
   virtual Status set_description_internal(const pb::NodeDescription& description);
   virtual Status process_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) = 0;
+  virtual Status start_block_internal(BlockContext* ctxt, TimeMapper* time_mapper);
+  virtual Status finish_block_internal(BlockContext* ctxt, TimeMapper* time_mapper);
   virtual Status post_process_block_internal(BlockContext* ctxt, TimeMapper* time_mapper);
 
   void clear_all_outputs();
@@ -31,6 +31,8 @@
 
 namespace noisicaa {
 
+static const uint32_t span_csound = PerfStats::intern("csound");
+
 ProcessorCSoundBase::ProcessorCSoundBase(
     const string& realm_name, const string& node_id, const char* logger_name,
     HostSystem* host_system, const pb::NodeDescription& desc)
@@ -102,7 +104,7 @@ void ProcessorCSoundBase::cleanup_internal() {
 }
 
 Status ProcessorCSoundBase::process_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) {
-  PerfTracker tracker(ctxt->perf.get(), "csound");
+  PerfTracker tracker(ctxt->perf.get(), span_csound);
 
   // If there is a next instance, make it the current. The current instance becomes
   // the old instance, which will eventually be destroyed in the main thread.
@@ -32,6 +32,8 @@
 
 namespace noisicaa {
 
+static const uint32_t span_faust = PerfStats::intern("faust");
+
 class FaustControls : public UI {
 public:
   int num_controls() const {
@@ -177,7 +179,7 @@ void ProcessorFaust::cleanup_internal() {
 }
 
 Status ProcessorFaust::process_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) {
-  PerfTracker tracker(ctxt->perf.get(), "faust");
+  PerfTracker tracker(ctxt->perf.get(), span_faust);
 
   float** inputs = _inputs.get();
   float** outputs = _outputs.get();
@@ -33,12 +33,16 @@
 #include "noisicaa/audioproc/public/node_parameters.pb.h"
 #include "noisicaa/audioproc/engine/plugin_host.h"
 #include "noisicaa/audioproc/engine/buffer_arena.h"
+#include "noisicaa/audioproc/engine/futex.h"
 #include "noisicaa/audioproc/engine/processor_plugin.pb.h"
 #include "noisicaa/audioproc/engine/processor_plugin.h"
 #include "noisicaa/audioproc/engine/rtcheck.h"
 
 namespace noisicaa {
 
+static const uint32_t span_plugin = PerfStats::intern("plugin");
+static const uint32_t span_plugin_wait = PerfStats::intern("plugin_wait");
+
 ProcessorPlugin::ProcessorPlugin(
     const string& realm_name, const string& node_id, HostSystem* host_system,
     const pb::NodeDescription& desc)
@@ -52,12 +56,23 @@ ProcessorPlugin::ProcessorPlugin(
 
 Status ProcessorPlugin::setup_internal() {
   _update_memmap = true;
+
+  _signal_arena.reset(new BufferArena(sizeof(PluginSignal), _logger));
+  RETURN_IF_ERROR(_signal_arena->setup());
+  _signal = (PluginSignal*)_signal_arena->address();
+  _signal->magic = 0x7a3c19e5;
+  _signal->request = 0;
+  _signal->response = 0;
+
   return Processor::setup_internal();
 }
 
 void ProcessorPlugin::cleanup_internal() {
   pipe_close();
 
+  _signal = nullptr;
+  _signal_arena.reset();
+
   Processor::cleanup_internal();
 }
 
@@ -74,7 +89,14 @@ Status ProcessorPlugin::set_parameters_internal(const pb::NodeParameters& parame
 }
 
 Status ProcessorPlugin::process_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) {
-  PerfTracker tracker(ctxt->perf.get(), "plugin");
+  RETURN_IF_ERROR(start_block_internal(ctxt, time_mapper));
+  return finish_block_internal(ctxt, time_mapper);
+}
+
+Status ProcessorPlugin::start_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) {
+  PerfTracker tracker(ctxt->perf.get(), span_plugin);
+
+  _block_started = false;
 
   if (_buffers_changed) {
     _update_memmap = true;
@@ -90,12 +112,7 @@ Status ProcessorPlugin::process_block_internal(BlockContext* ctxt, TimeMapper* t
   auto timeout = chrono::seconds(2);
     //chrono::microseconds(1000000 * _host_system->block_size() / _host_system->sample_rate());
 
-  deadline_t deadline = chrono::high_resolution_clock::now() + timeout;
-  auto deadline_nsec = chrono::duration_cast<chrono::nanoseconds>(
-      deadline.time_since_epoch()).count();
-  timespec deadline_timespec;
-  deadline_timespec.tv_sec = deadline_nsec / 1000000000;
-  deadline_timespec.tv_nsec = deadline_nsec % 1000000000;
+  _deadline = chrono::high_resolution_clock::now() + timeout;
 
   uint32_t plugin_cond_idx = _desc.ports_size() - 1;
   PluginCond* plugin_cond = (PluginCond*)_buffers[plugin_cond_idx]->data();
@@ -105,13 +122,23 @@ Status ProcessorPlugin::process_block_internal(BlockContext* ctxt, TimeMapper* t
   }
 
   if (_update_memmap) {
+    if (!_signal_announced) {
+      _logger->info("Sending PluginSignal...");
+
+      char buf[PATH_MAX + 16];
+      snprintf(buf, sizeof(buf), "SIGNAL\n%s\n", _signal_arena->name().c_str());
+      RETURN_IF_ERROR(pipe_write(buf, strlen(buf), _deadline));
+
+      _signal_announced = true;
+    }
+
     _logger->info("Sending PluginMemoryMapping...");
 
     char buf[64];
     snprintf(
         buf, sizeof(buf), "MEMORY_MAP\n%lu\n",
         sizeof(PluginMemoryMapping) + _desc.ports_size() * sizeof(PluginMemoryMapping::Buffer));
-    RETURN_IF_ERROR(pipe_write(buf, strlen(buf), deadline));
+    RETURN_IF_ERROR(pipe_write(buf, strlen(buf), _deadline));
 
     PluginMemoryMapping mapping;
     strncpy(mapping.shmem_path, ctxt->buffer_arena->name().c_str(), PATH_MAX);
@@ -119,7 +146,7 @@ Status ProcessorPlugin::process_block_internal(BlockContext* ctxt, TimeMapper* t
     mapping.block_size = _host_system->block_size();
     mapping.num_buffers = _desc.ports_size();
 
-    RETURN_IF_ERROR(pipe_write((char*)&mapping, sizeof(mapping), deadline));
+    RETURN_IF_ERROR(pipe_write((char*)&mapping, sizeof(mapping), _deadline));
 
     for (int idx = 0 ; idx < _desc.ports_size() ; ++idx) {
       BufferPtr data = _buffers[idx]->data();
@@ -129,29 +156,50 @@ Status ProcessorPlugin::process_block_internal(BlockContext* ctxt, TimeMapper* t
       PluginMemoryMapping::Buffer buf;
       buf.port_index = idx;
       buf.offset = data - ctxt->buffer_arena->address();
-      RETURN_IF_ERROR(pipe_write((char*)&buf, sizeof(buf), deadline));
+      RETURN_IF_ERROR(pipe_write((char*)&buf, sizeof(buf), _deadline));
     }
 
     _update_memmap = false;
   }
 
-  RETURN_IF_PTHREAD_ERROR(pthread_mutex_lock(&plugin_cond->mutex));
-  plugin_cond->set = false;
-  RETURN_IF_PTHREAD_ERROR(pthread_mutex_unlock(&plugin_cond->mutex));
+  // All commands for this block are in the pipe now, so the plugin host can go ahead.
+  _request = __atomic_add_fetch(&_signal->request, 1, __ATOMIC_ACQ_REL);
+  futex_wake(&_signal->request);
+  _block_started = true;
 
-  const char* cmd = "PROCESS_BLOCK\n";
-  RETURN_IF_ERROR(pipe_write(cmd, strlen(cmd), deadline));
+  return Status::Ok();
+}
+
+Status ProcessorPlugin::finish_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) {
+  PerfTracker tracker(ctxt->perf.get(), span_plugin_wait);
+
+  if (!_block_started) {
+    return Status::Ok();
+  }
+  _block_started = false;
+
+  RTUnsafe rtu;  // Sleeping on the futex is a syscall.
 
-  RETURN_IF_PTHREAD_ERROR(pthread_mutex_lock(&plugin_cond->mutex));
-  while (!plugin_cond->set) {
-    if (chrono::high_resolution_clock::now() > deadline) {
+  while (true) {
+    uint32_t response = __atomic_load_n(&_signal->response, __ATOMIC_ACQUIRE);
+    if (response == _request) {
+      break;
+    }
+
+    auto time_remaining = _deadline - chrono::high_resolution_clock::now();
+    auto nsec_remaining = chrono::duration_cast<chrono::nanoseconds>(time_remaining).count();
+    if (nsec_remaining <= 0) {
       return TIMEOUT_STATUS();
     }
 
-    RETURN_IF_PTHREAD_ERROR(pthread_cond_timedwait(
-        &plugin_cond->cond, &plugin_cond->mutex, &deadline_timespec));
+    timespec timeout;
+    timeout.tv_sec = nsec_remaining / 1000000000;
+    timeout.tv_nsec = nsec_remaining % 1000000000;
+    int rc = futex_wait(&_signal->response, response, &timeout);
+    if (rc < 0 && errno != EAGAIN && errno != EINTR && errno != ETIMEDOUT) {
+      return OSERROR_STATUS("Failed to wait on futex");
+    }
   }
-  RETURN_IF_PTHREAD_ERROR(pthread_mutex_unlock(&plugin_cond->mutex));
 
   return Status::Ok();
 }
@@ -166,6 +214,7 @@ Status ProcessorPlugin::pipe_open(const string& path) {
   }
 
   _update_memmap = true;
+  _signal_announced = false;
 
   return Status::Ok();
 }
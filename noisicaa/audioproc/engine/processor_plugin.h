@@ -28,9 +28,12 @@
 #include <stdint.h>
 #include <chrono>
 #include <map>
+#include <memory>
 #include <string>
 #include "noisicaa/core/status.h"
+#include "noisicaa/audioproc/engine/buffer_arena.h"
 #include "noisicaa/audioproc/engine/buffers.h"
+#include "noisicaa/audioproc/engine/plugin_host.h"
 #include "noisicaa/audioproc/engine/processor.h"
 
 namespace noisicaa {
@@ -51,6 +54,8 @@ protected:
   void cleanup_internal() override;
   Status set_parameters_internal(const pb::NodeParameters& parameters);
   Status process_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) override;
+  Status start_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) override;
+  Status finish_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) override;
 
 private:
   typedef chrono::high_resolution_clock::time_point deadline_t;
@@ -61,6 +66,13 @@ private:
 
   int _pipe = -1;
   bool _update_memmap;
+
+  unique_ptr<BufferArena> _signal_arena;
+  PluginSignal* _signal = nullptr;
+  bool _signal_announced = false;
+  bool _block_started = false;
+  uint32_t _request = 0;
+  deadline_t _deadline;
 };
 
 }  // namespace noisicaa
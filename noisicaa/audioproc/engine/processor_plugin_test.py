@@ -107,6 +107,39 @@ class ProcessorPluginTest(
                 plugin_host_pb2.DeletePluginRequest(
                     realm=plugin_spec.realm, node_id=plugin_spec.node_id))
 
+    async def test_plugin_many_blocks(self):
+        async with self.create_process() as plugin_host:
+            plugin_spec = plugin_host_pb2.PluginInstanceSpec()
+            plugin_spec.realm = 'root'
+            plugin_spec.node_id = '1234'
+            plugin_spec.node_description.CopyFrom(self.node_description)
+
+            create_plugin_request = plugin_host_pb2.CreatePluginRequest(spec=plugin_spec)
+            create_plugin_response = plugin_host_pb2.CreatePluginResponse()
+            await plugin_host.call(
+                'CREATE_PLUGIN', create_plugin_request, create_plugin_response)
+            pipe_address = create_plugin_response.pipe_path
+
+            params = node_parameters_pb2.NodeParameters()
+            plugin_params = params.Extensions[processor_plugin_pb2.processor_plugin_parameters]
+            plugin_params.plugin_pipe_path = pipe_address
+            self.processor.set_parameters(params)
+
+            for i in range(100):
+                self.fill_buffer('audio_in', i / 100.0)
+                self.clear_buffer('audio_out')
+                self.process_block()
+                self.assertBufferAllEqual('audio_out', i / 100.0)
+
+            self.assertEqual(self.processor.state, processor.State.RUNNING)
+
+            self.processor.cleanup()
+
+            await plugin_host.call(
+                'DELETE_PLUGIN',
+                plugin_host_pb2.DeletePluginRequest(
+                    realm=plugin_spec.realm, node_id=plugin_spec.node_id))
+
     async def test_pipe_closed(self):
         pipe_address = os.path.join(TEST_OPTS.TMP_DIR, 'pipe.%s' % uuid.uuid4().hex)
         os.mkfifo(pipe_address)
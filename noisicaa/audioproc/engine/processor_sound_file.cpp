@@ -38,6 +38,8 @@ extern "C" {
 
 namespace noisicaa {
 
+static const uint32_t span_sound_file = PerfStats::intern("sound_file");
+
 ProcessorSoundFile::ProcessorSoundFile(
     const string& realm_name, const string& node_id, HostSystem* host_system,
     const pb::NodeDescription& desc)
@@ -57,19 +59,21 @@ Status ProcessorSoundFile::setup_internal() {
       "http://noisicaa.odahoda.de/lv2/processor_sound_file#complete");
 
   StatusOr<AudioFile*> stor_audio_file = _host_system->audio_file->load_audio_file(
-      _desc.sound_file().sound_file_path());
+      _desc.sound_file().sound_file_path(), /* streaming= */ true);
   RETURN_IF_ERROR(stor_audio_file);
 
   _audio_file = stor_audio_file.result();
   _loop = false;
   _playing = true;
   _pos = 0;
+  _playhead = _audio_file->add_playhead(_pos);
 
   return Status::Ok();
 }
 
 void ProcessorSoundFile::cleanup_internal() {
   if (_audio_file != nullptr) {
+    _audio_file->remove_playhead(_playhead);
     _host_system->audio_file->release_audio_file(_audio_file);
     _audio_file = nullptr;
   }
@@ -78,7 +82,7 @@ void ProcessorSoundFile::cleanup_internal() {
 }
 
 Status ProcessorSoundFile::process_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) {
-  PerfTracker tracker(ctxt->perf.get(), "sound_file");
+  PerfTracker tracker(ctxt->perf.get(), span_sound_file);
 
   const float* l_in = _audio_file->channel_data(0);
   const float* r_in = _audio_file->channel_data(1 % _audio_file->num_channels());
@@ -120,6 +124,8 @@ Status ProcessorSoundFile::process_block_internal(BlockContext* ctxt, TimeMapper
     _pos++;
   }
 
+  _audio_file->set_playhead(_playhead, _pos);
+
   return Status::Ok();
 }
 
@@ -57,6 +57,7 @@ protected:
 
 private:
   AudioFile* _audio_file;
+  int _playhead;
   bool _loop;
   bool _playing;
   uint32_t _pos;
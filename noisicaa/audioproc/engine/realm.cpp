@@ -47,6 +47,8 @@
 
 namespace noisicaa {
 
+static const uint32_t span_fill_time_map = PerfStats::intern("fill_time_map");
+
 Program::Program(Logger* logger, uint32_t version)
   : version(version),
     _logger(logger) {
@@ -81,6 +83,106 @@ Status Program::setup(Realm* realm, HostSystem* host_system, const Spec* s) {
   time_mapper->set_bpm(spec->bpm());
   time_mapper->set_duration(spec->duration());
 
+  RETURN_IF_ERROR(link());
+
+  if (spec->num_jobs() > 0) {
+    // Jobs can only replace the sequential execution, if they cover all opcodes.
+    int p = 0;
+    for (int i = 0 ; i < spec->num_jobs() ; ++i) {
+      const Job& job = spec->get_job(i);
+      if (job.begin != p) {
+        break;
+      }
+      p = job.end;
+    }
+
+    if (p == spec->num_ops()) {
+      job_set.reset(new JobSet(spec.get()));
+    } else {
+      _logger->warning("Jobs do not cover all opcodes, using sequential execution.");
+    }
+  }
+
+  return Status::Ok();
+}
+
+Status Program::link() {
+  ops.resize(spec->num_ops());
+  for (int p = 0 ; p < spec->num_ops() ; ++p) {
+    OpCode opcode = spec->get_opcode(p);
+    const OpSpec& opspec = opspecs[opcode];
+    const vector<OpArg>& args = spec->get_opargs(p);
+    size_t num_args = strlen(opspec.argspec);
+    if (num_args > MaxOpArgs || args.size() != num_args) {
+      return ERROR_STATUS(
+          "Opcode %d (%s): expected %d arguments, got %d",
+          p, opspec.name, num_args, args.size());
+    }
+
+    LinkedOp& op = ops[p];
+    op.opcode = opcode;
+    op.init = opspec.init;
+    op.run = opspec.run;
+
+    char perf_label[PerfStats::NAME_LENGTH];
+    snprintf(perf_label, PerfStats::NAME_LENGTH, "opcode(%s)", opspec.name);
+    op.perf_name_id = PerfStats::intern(perf_label);
+
+    for (size_t a = 0 ; a < num_args ; ++a) {
+      const OpArg& arg = args[a];
+      LinkedOpArg& larg = op.args[a];
+      larg.int_value = 0;
+      larg.buffer = nullptr;
+
+      switch (opspec.argspec[a]) {
+      case 'i':
+        larg.int_value = arg.int_value();
+        break;
+      case 'f':
+        larg.float_value = arg.float_value();
+        break;
+      case 's':
+        // The spec is owned by this program, so the string outlives the linked op.
+        larg.string_value = arg.string_value().c_str();
+        break;
+      case 'b':
+        if (arg.int_value() < 0 || arg.int_value() >= (int64_t)buffers.size()) {
+          return ERROR_STATUS("Opcode %d (%s): invalid buffer %ld", p, opspec.name, arg.int_value());
+        }
+        larg.int_value = arg.int_value();
+        larg.buffer = buffers[arg.int_value()].get();
+        break;
+      case 'p':
+        if (arg.int_value() < 0 || arg.int_value() >= spec->num_processors()) {
+          return ERROR_STATUS(
+              "Opcode %d (%s): invalid processor %ld", p, opspec.name, arg.int_value());
+        }
+        larg.int_value = arg.int_value();
+        larg.processor = spec->get_processor(arg.int_value());
+        break;
+      case 'c':
+        if (arg.int_value() < 0 || arg.int_value() >= spec->num_control_values()) {
+          return ERROR_STATUS(
+              "Opcode %d (%s): invalid control value %ld", p, opspec.name, arg.int_value());
+        }
+        larg.int_value = arg.int_value();
+        larg.control_value = spec->get_control_value(arg.int_value());
+        break;
+      case 'r':
+        if (arg.int_value() < 0 || arg.int_value() >= spec->num_child_realms()) {
+          return ERROR_STATUS(
+              "Opcode %d (%s): invalid child realm %ld", p, opspec.name, arg.int_value());
+        }
+        larg.int_value = arg.int_value();
+        larg.realm = spec->get_child_realm(arg.int_value());
+        break;
+      default:
+        return ERROR_STATUS(
+            "Opcode %d (%s): invalid argspec '%c'", p, opspec.name, opspec.argspec[a]);
+      }
+    }
+  }
+
   return Status::Ok();
 }
 
@@ -108,6 +210,16 @@ Status Stack::_push(void* value, size_t size) {
   return Status::Ok();
 }
 
+WorkerContext::WorkerContext(uint32_t block_size, size_t stack_size)
+  : block_context(new BlockContext()),
+    out_messages(new MessageQueue()),
+    stack(new Stack(stack_size)) {
+  block_context->perf.reset(new PerfStats());
+  block_context->alloc_time_map(block_size);
+}
+
+WorkerContext::~WorkerContext() {}
+
 ActiveProcessor::ActiveProcessor(
     Processor* processor, Slot<pb::EngineNotification>::Callback notification_callback)
   : processor(processor),
@@ -182,7 +294,26 @@ Status Realm::setup() {
   return Status::Ok();
 }
 
+Status Realm::setup_workers(uint32_t num_workers) {
+  assert(_worker_pool.get() == nullptr);
+
+  for (uint32_t i = 0 ; i < num_workers ; ++i) {
+    _worker_contexts.emplace_back(new WorkerContext(_host_system->block_size(), 1 << 16));
+  }
+
+  _worker_pool.reset(new WorkerPool(_logger));
+  RETURN_IF_ERROR(_worker_pool->setup(num_workers));
+
+  return Status::Ok();
+}
+
 void Realm::cleanup() {
+  if (_worker_pool.get() != nullptr) {
+    _worker_pool->cleanup();
+    _worker_pool.reset();
+  }
+  _worker_contexts.clear();
+
   Program* program = _next_program.exchange(nullptr);
   if (program != nullptr) {
     delete program;
@@ -293,6 +424,48 @@ Status Realm::add_child_realm(Realm* child) {
   return Status::Ok();
 }
 
+Status Realm::remove_unused_processor(uint64_t processor_id) {
+  const auto& it = _processors.find(processor_id);
+  if (it == _processors.end()) {
+    return ERROR_STATUS("Unknown processor %llx", processor_id);
+  }
+  if (it->second->ref_count > 0) {
+    return ERROR_STATUS("Processor %llx is still in use", processor_id);
+  }
+
+  _logger->info("Deactivating processor %llx", processor_id);
+  _processors.erase(it);
+  return Status::Ok();
+}
+
+Status Realm::remove_unused_control_value(const string& name) {
+  const auto& it = _control_values.find(name);
+  if (it == _control_values.end()) {
+    return ERROR_STATUS("Unknown control value %s", name.c_str());
+  }
+  if (it->second->ref_count > 0) {
+    return ERROR_STATUS("Control value %s is still in use", name.c_str());
+  }
+
+  _logger->info("Deactivating control value %s", name.c_str());
+  _control_values.erase(it);
+  return Status::Ok();
+}
+
+Status Realm::remove_unused_child_realm(const string& name) {
+  const auto& it = _child_realms.find(name);
+  if (it == _child_realms.end()) {
+    return ERROR_STATUS("Unknown child realm %s", name.c_str());
+  }
+  if (it->second->ref_count > 0) {
+    return ERROR_STATUS("Child realm %s is still in use", name.c_str());
+  }
+
+  _logger->info("Deactivating child realm %s", name.c_str());
+  _child_realms.erase(it);
+  return Status::Ok();
+}
+
 StatusOr<Realm*> Realm::get_child_realm(const string& name) {
   const auto& it = _child_realms.find(name);
   if (it == _child_realms.end()) {
@@ -498,7 +671,7 @@ Status Realm::process_block(Program* program) {
   _logger->debug("Process block [%d,%d]", _block_context->sample_pos, _host_system->block_size());
 
   if (_player != nullptr) {
-    PerfTracker tracker(_block_context->perf.get(), "fill_time_map");
+    PerfTracker tracker(_block_context->perf.get(), span_fill_time_map);
 
     _player->fill_time_map(program->time_mapper.get(), _block_context.get());
   }
@@ -509,12 +682,9 @@ Status Realm::process_block(Program* program) {
   if (run_init) {
     _stack->reset();
     while (state.p < spec->num_ops()) {
-      int p = state.p++;
-
-      OpCode opcode = spec->get_opcode(p);
-      OpSpec opspec = opspecs[opcode];
-      if (opspec.init != nullptr) {
-        RETURN_IF_ERROR(opspec.init(_block_context.get(), &state, spec->get_opargs(p)));
+      const LinkedOp& op = program->ops[state.p++];
+      if (op.init != nullptr) {
+        RETURN_IF_ERROR(op.init(_block_context.get(), &state, op.args));
       }
     }
 
@@ -522,27 +692,97 @@ Status Realm::process_block(Program* program) {
     state.p = 0;
   }
 
-  _stack->reset();
-  while (!state.end) {
-    if (state.p == spec->num_ops()) {
-      break;
+  if (_worker_pool.get() != nullptr && program->job_set.get() != nullptr) {
+    RETURN_IF_ERROR(run_jobs(program));
+  } else {
+    _stack->reset();
+    RETURN_IF_ERROR(run_ops(_block_context.get(), &state, spec->num_ops()));
+  }
+
+  _block_context->sample_pos += _host_system->block_size();
+
+  return Status::Ok();
+}
+
+Status Realm::run_ops(BlockContext* ctxt, ProgramState* state, int end) {
+  const LinkedOp* ops = state->program->ops.data();
+
+  while (!state->end && state->p < end) {
+    const LinkedOp& op = ops[state->p++];
+    if (op.run != nullptr) {
+      PerfTracker tracker(ctxt->perf.get(), op.perf_name_id, PerfStats::Level::OPCODE);
+      RETURN_IF_ERROR(op.run(ctxt, state, op.args));
     }
+  }
 
-    int p = state.p++;
+  return Status::Ok();
+}
 
-    OpCode opcode = spec->get_opcode(p);
-    OpSpec opspec = opspecs[opcode];
-    if (opspec.run != nullptr) {
-      char perf_label[PerfStats::NAME_LENGTH];
-      snprintf(perf_label, PerfStats::NAME_LENGTH, "opcode(%s)", opspec.name);
-      PerfTracker tracker(_block_context->perf.get(), perf_label);
-      RETURN_IF_ERROR(opspec.run(_block_context.get(), &state, spec->get_opargs(p)));
+Status Realm::run_jobs(Program* program) {
+  BlockContext* ctxt = _block_context.get();
+  for (auto& worker : _worker_contexts) {
+    BlockContext* wctxt = worker->block_context.get();
+    wctxt->sample_pos = ctxt->sample_pos;
+    wctxt->buffer_arena = ctxt->buffer_arena;
+    wctxt->input_events = ctxt->input_events;
+    memmove(
+        wctxt->time_map.get(), ctxt->time_map.get(),
+        _host_system->block_size() * sizeof(SampleTime));
+    wctxt->perf->reset();
+    worker->out_messages->clear();
+    wctxt->out_messages = ctxt->out_messages != nullptr ? worker->out_messages.get() : nullptr;
+  }
+
+  _job_program = program;
+  Status status = _worker_pool->run(program->job_set.get(), this);
+  _job_program = nullptr;
+
+  // Merge the per-worker perf stats and messages back into the realm's block context.
+  for (auto& worker : _worker_contexts) {
+    BlockContext* wctxt = worker->block_context.get();
+
+    PerfStats* perf = wctxt->perf.get();
+    for (int i = 0 ; i < perf->num_spans() ; ++i) {
+      PerfStats::Span span = perf->span(i);
+      if (span.parent_id == 0) {
+        span.parent_id = ctxt->perf->current_span_id();
+      }
+      ctxt->perf->append_span(span);
+    }
+
+    if (wctxt->out_messages != nullptr) {
+      MessageQueue* out_messages = wctxt->out_messages;
+      Message* msg = out_messages->first();
+      while (!out_messages->is_end(msg)) {
+        ctxt->out_messages->push(msg);
+        msg = out_messages->next(msg);
+      }
+      out_messages->clear();
+      wctxt->out_messages = nullptr;
     }
   }
 
-  _block_context->sample_pos += _host_system->block_size();
+  return status;
+}
 
-  return Status::Ok();
+Status Realm::run_job(int worker_idx, int job_idx) {
+  Program* program = _job_program;
+  const Job& job = program->spec->get_job(job_idx);
+
+  BlockContext* ctxt;
+  Stack* stack;
+  if (worker_idx == 0) {
+    ctxt = _block_context.get();
+    stack = _stack.get();
+  } else {
+    WorkerContext* worker = _worker_contexts[worker_idx - 1].get();
+    ctxt = worker->block_context.get();
+    stack = worker->stack.get();
+  }
+
+  stack->reset();
+  ProgramState state = { _logger, _host_system, program, stack, job.begin, false };
+  return run_ops(ctxt, &state, job.end);
 }
 
 Status Realm::run_maintenance() {
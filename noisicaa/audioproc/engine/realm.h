@@ -34,7 +34,9 @@
 #include "noisicaa/core/refcount.h"
 #include "noisicaa/core/status.h"
 #include "noisicaa/core/slots.inl.h"
+#include "noisicaa/audioproc/engine/opcodes.h"
 #include "noisicaa/audioproc/engine/processor.h"
+#include "noisicaa/audioproc/engine/worker_pool.h"
 
 namespace noisicaa {
 
@@ -49,6 +51,7 @@ class NotificationQueue;
 class Player;
 class TimeMapper;
 class BufferArena;
+class MessageQueue;
 class Realm;
 
 namespace pb {
@@ -68,8 +71,12 @@ public:
   BufferArena* buffer_arena;
   vector<unique_ptr<Buffer>> buffers;
   unique_ptr<TimeMapper> time_mapper;
+  unique_ptr<JobSet> job_set;
+  vector<LinkedOp> ops;
 
 private:
+  Status link();
+
   Logger* _logger;
 };
 
@@ -128,7 +135,16 @@ struct ActiveChildRealm {
   int ref_count;
 };
 
-class Realm : public RefCounted {
+struct WorkerContext {
+  WorkerContext(uint32_t block_size, size_t stack_size);
+  ~WorkerContext();
+
+  unique_ptr<BlockContext> block_context;
+  unique_ptr<MessageQueue> out_messages;
+  unique_ptr<Stack> stack;
+};
+
+class Realm : public RefCounted, public JobRunner {
 public:
   Realm(const string& name, HostSystem* host_system, Player* player);
   virtual ~Realm();
@@ -138,6 +154,9 @@ public:
   Status setup();
   void cleanup();
 
+  // Run the jobs of programs concurrently on num_workers additional threads.
+  Status setup_workers(uint32_t num_workers);
+
   string dump() const;
   void clear_programs();
 
@@ -149,6 +168,12 @@ public:
   Status add_child_realm(Realm* realm);
   StatusOr<Realm*> get_child_realm(const string& name);
 
+  // Remove objects, which have been added, but never became part of a program (e.g. because
+  // they belong to a node, whose setup was aborted).
+  Status remove_unused_processor(uint64_t processor_id);
+  Status remove_unused_control_value(const string& name);
+  Status remove_unused_child_realm(const string& name);
+
   Status set_spec(const Spec* spec);
 
   Status set_float_control_value(const string& name, float value, uint32_t generation);
@@ -161,6 +186,8 @@ public:
 
   Status run_maintenance();
 
+  Status run_job(int worker_idx, int job_idx) override;
+
   StatusOr<BufferArena*> get_buffer_arena(uint32_t size);
   Buffer* get_buffer(const char* name);
 
@@ -168,6 +195,9 @@ private:
   void activate_program(Program* program);
   void deactivate_program(Program* program);
 
+  Status run_ops(BlockContext* ctxt, ProgramState* state, int end);
+  Status run_jobs(Program* program);
+
   void notification_proxy(const pb::EngineNotification& notification);
   void (*_notification_callback)(void*, const string&) = nullptr;
   void* _notification_userdata = nullptr;
@@ -178,6 +208,9 @@ private:
   Player* _player = nullptr;
   unique_ptr<BlockContext> _block_context;
   unique_ptr<Stack> _stack;
+  unique_ptr<WorkerPool> _worker_pool;
+  vector<unique_ptr<WorkerContext>> _worker_contexts;
+  Program* _job_program = nullptr;
   vector<unique_ptr<BufferArena>> _buffer_arenas;
   atomic<Program*> _next_program;
   atomic<Program*> _current_program;
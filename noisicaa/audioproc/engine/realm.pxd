@@ -44,6 +44,7 @@ cdef extern from "noisicaa/audioproc/engine/realm.h" namespace "noisicaa" nogil:
 
         Status setup()
         void cleanup()
+        Status setup_workers(uint32_t num_workers)
         string dump()
         void clear_programs()
         void set_notification_callback(
@@ -52,6 +53,9 @@ cdef extern from "noisicaa/audioproc/engine/realm.h" namespace "noisicaa" nogil:
         Status add_control_value(ControlValue* cv)
         Status add_child_realm(Realm* cv)
         StatusOr[Realm*] get_child_realm(const string& name)
+        Status remove_unused_processor(uint64_t processor_id)
+        Status remove_unused_control_value(const string& name)
+        Status remove_unused_child_realm(const string& name)
         Status set_float_control_value(const string& name, float value, uint32_t generation)
         Status send_processor_message(uint64_t processor_id, const string& msg_serialized)
         Status set_spec(const Spec* spec)
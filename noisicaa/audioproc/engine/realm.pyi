@@ -18,7 +18,8 @@
 #
 # @end:license
 
-from typing import Dict, List, Optional
+import asyncio
+from typing import Any, Callable, ContextManager, Dict, List, Optional, TypeVar
 
 from noisicaa import core
 from noisicaa.core import ipc
@@ -40,6 +41,8 @@ from . import engine as engine_lib
 # array of floats.
 BufferView = List
 
+T = TypeVar('T')
+
 
 class PyProgram(object):
     pass
@@ -50,9 +53,10 @@ class PyRealm(object):
     child_realms = ...  # type: Dict[str, PyRealm]
 
     def __init__(
-            self, *, engine: engine_lib.Engine, name: str, parent: PyRealm,
+            self, *, engine: engine_lib.Engine, event_loop: asyncio.AbstractEventLoop,
+            name: str, parent: PyRealm,
             host_system: host_system_lib.HostSystem, player: player_lib.PyPlayer,
-            callback_address: str) -> None: ...
+            callback_address: str, num_workers: int = 0) -> None: ...
     @property
     def name(self) -> str: ...
     @property
@@ -71,11 +75,16 @@ class PyRealm(object):
     def get_buffer(self, name: str, type: buffers.PyBufferType) -> BufferView: ...
     async def get_plugin_host(self) -> ipc.Stub: ...
     def update_spec(self) -> None: ...
+    def batch_spec_updates(self, deferred: bool = False) -> ContextManager[None]: ...
     def set_spec(self, spec: spec_lib.PySpec) -> None: ...
     async def setup_node(self, node: graph_lib.Node) -> None: ...
+    async def run_setup_task(self, func: Callable[..., T], *args: Any) -> T: ...
     def add_active_processor(self, proc: processor.PyProcessor) -> None: ...
     def add_active_control_value(self, control_value: control_value_lib.PyControlValue) -> None: ...
     def add_active_child_realm(self, child: PyRealm) -> None: ...
+    def remove_unused_processor(self, proc: processor.PyProcessor) -> None: ...
+    def remove_unused_control_value(self, name: str) -> None: ...
+    def remove_unused_child_realm(self, child: PyRealm) -> None: ...
     def set_control_value(self, name: str, value: float, generation: int) -> None: ...
     async def set_plugin_state(self, node: str, state: audioproc.PluginState) -> None: ...
     def send_node_message(self, msg: audioproc.ProcessorMessage) -> None: ...
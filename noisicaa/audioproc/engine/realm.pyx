@@ -18,11 +18,15 @@
 #
 # @end:license
 
+import concurrent.futures
+import contextlib
+import functools
 import logging
+import os
 
 from cpython.ref cimport PyObject
 from cpython.exc cimport PyErr_Fetch, PyErr_Restore
-from libc.stdint cimport uint8_t, uint32_t
+from libc.stdint cimport uint8_t, uint32_t, uint64_t
 from libc.string cimport memmove
 from libcpp.string cimport string
 
@@ -58,23 +62,31 @@ cdef class PyRealm(object):
     def __init__(
             self, *,
             engine,
+            event_loop,
             str name,
             PyRealm parent,
             PyHostSystem host_system,
             PyPlayer player,
-            str callback_address):
+            str callback_address,
+            int num_workers=0):
         self.notifications = core.Callback()
 
         self.__engine = engine
+        self.__event_loop = event_loop
         self.__name = name
         self.__parent = parent
         self.__host_system = host_system
         self.__player = player
         self.__callback_address = callback_address
+        self.__num_workers = num_workers
 
         self.__bpm = 120
         self.__duration = audioproc.MusicalDuration(4, 1)
         self.__graph = graph.Graph(self)
+        self.__spec_batch_depth = 0
+        self.__spec_dirty = False
+        self.__spec_update_handle = None
+        self.__setup_executor = None
 
         self.child_realms = {}
 
@@ -123,11 +135,20 @@ cdef class PyRealm(object):
     async def setup(self):
         logger.info("Setting up realm '%s'...", self.name)
 
+        self.__setup_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 1)
+
         await self.setup_node(self.__sink)
 
         with nogil:
             check(self.__realm.setup())
 
+        cdef uint32_t num_workers = self.__num_workers
+        if num_workers > 0:
+            logger.info("Using %d worker threads for realm '%s'.", num_workers, self.name)
+            with nogil:
+                check(self.__realm.setup_workers(num_workers))
+
         logger.info("Realm '%s' set up.", self.name)
 
     async def cleanup(self):
@@ -135,6 +156,14 @@ cdef class PyRealm(object):
 
         await self.__sink.cleanup()
 
+        if self.__spec_update_handle is not None:
+            self.__spec_update_handle.cancel()
+            self.__spec_update_handle = None
+
+        if self.__setup_executor is not None:
+            self.__setup_executor.shutdown(wait=True)
+            self.__setup_executor = None
+
         if self.__realm != NULL:
             with nogil:
                 self.__realm.decref()
@@ -163,8 +192,42 @@ cdef class PyRealm(object):
         return await self.__engine.get_plugin_host()
 
     def update_spec(self):
+        if self.__spec_batch_depth > 0:
+            self.__spec_dirty = True
+            return
+
+        self.__spec_dirty = False
         self.set_spec(self.__graph.compile(self.__bpm, self.__duration))
 
+    @contextlib.contextmanager
+    def batch_spec_updates(self, deferred=False):
+        """Defer all update_spec() calls until the outermost batch is done.
+
+        So all mutations within a batch only result in a single compilation and program swap.
+        With deferred=True, the outermost batch does not update the spec right away, but at the
+        end of the current event loop iteration, so batches, which end in the same iteration,
+        share a single update.
+        """
+        self.__spec_batch_depth += 1
+        try:
+            yield
+        finally:
+            self.__spec_batch_depth -= 1
+            if self.__spec_batch_depth == 0 and self.__spec_dirty:
+                if deferred:
+                    if self.__spec_update_handle is None:
+                        self.__spec_update_handle = self.__event_loop.call_soon(
+                            self.__deferred_update_spec)
+                else:
+                    self.update_spec()
+
+    def __deferred_update_spec(self):
+        self.__spec_update_handle = None
+        # Nothing to do, if a batch, which was opened in the meantime, is still active or already
+        # did the update.
+        if self.__spec_batch_depth == 0 and self.__spec_dirty:
+            self.update_spec()
+
     def set_spec(self, PySpec spec):
         logger.debug("set_spec:\n%s", spec.dump())
         with nogil:
@@ -189,6 +252,15 @@ cdef class PyRealm(object):
         # if self._shm_data is not None:
         #     self._shm_data[512] = 0
 
+    async def run_setup_task(self, func, *args):
+        """Run a blocking part of a node's setup in a worker thread.
+
+        Expensive initialization (loading soundfonts, compiling csound orchestras, ...) happens
+        off the event loop, so multiple nodes can be set up in parallel.
+        """
+        return await self.__event_loop.run_in_executor(
+            self.__setup_executor, functools.partial(func, *args))
+
     def add_active_processor(self, PyProcessor proc):
         with nogil:
             check(self.__realm.add_processor(proc.get()))
@@ -201,6 +273,21 @@ cdef class PyRealm(object):
         with nogil:
             check(self.__realm.add_child_realm(child.get()))
 
+    def remove_unused_processor(self, PyProcessor proc):
+        cdef uint64_t c_processor_id = proc.id
+        with nogil:
+            check(self.__realm.remove_unused_processor(c_processor_id))
+
+    def remove_unused_control_value(self, name):
+        cdef string c_name = name.encode('utf-8')
+        with nogil:
+            check(self.__realm.remove_unused_control_value(c_name))
+
+    def remove_unused_child_realm(self, PyRealm child):
+        cdef string c_name = child.name.encode('utf-8')
+        with nogil:
+            check(self.__realm.remove_unused_child_realm(c_name))
+
     def set_control_value(self, name, value, generation):
         cdef string c_name = name.encode('utf-8')
         cdef float c_float
@@ -18,6 +18,7 @@
 #
 # @end:license
 
+import asyncio
 import os
 import os.path
 
@@ -48,12 +49,13 @@ class RealmTest(
 
     @async_generator.asynccontextmanager
     @async_generator.async_generator
-    async def create_realm(self, *, parent=None, name='root'):
+    async def create_realm(self, *, parent=None, name='root', num_workers=0):
         realm = PyRealm(
             parent=parent,
             name=name,
             host_system=self.host_system,
-            player=None, engine=None, callback_address=None)
+            player=None, engine=None, event_loop=self.loop, callback_address=None,
+            num_workers=num_workers)
         try:
             await realm.setup()
 
@@ -173,6 +175,50 @@ class RealmTest(
             self.assertEqual(buf2[0], 5.0)
             self.assertEqual(buf2[1], 7.0)
 
+    async def test_process_block_with_workers(self):
+        self.host_system.set_block_size(256)
+        async with self.create_realm(num_workers=3) as realm:
+            spec = PySpec()
+            for name in ('sink:in:left', 'sink:in:right', 'buf1', 'buf2', 'buf3', 'buf4'):
+                spec.append_buffer(
+                    name,
+                    buffers.PyFloatAudioBlockBuffer(node_db.PortDescription.AUDIO))
+
+            job1 = spec.begin_job([])
+            spec.append_opcode('MUL', 'buf1', 2.0)
+            spec.end_job()
+            job2 = spec.begin_job([])
+            spec.append_opcode('MUL', 'buf2', 3.0)
+            spec.end_job()
+            job3 = spec.begin_job([job1, job2])
+            spec.append_opcode('CLEAR', 'buf3')
+            spec.append_opcode('MIX', 'buf1', 'buf3')
+            spec.append_opcode('MIX', 'buf2', 'buf3')
+            spec.end_job()
+            spec.begin_job([job3])
+            spec.append_opcode('COPY', 'buf3', 'buf4')
+            spec.end_job()
+            realm.set_spec(spec)
+
+            program = realm.get_active_program()
+
+            buf1 = realm.get_buffer(
+                'buf1',
+                buffers.PyFloatAudioBlockBuffer(node_db.PortDescription.AUDIO))
+            buf2 = realm.get_buffer(
+                'buf2',
+                buffers.PyFloatAudioBlockBuffer(node_db.PortDescription.AUDIO))
+            buf4 = realm.get_buffer(
+                'buf4',
+                buffers.PyFloatAudioBlockBuffer(node_db.PortDescription.AUDIO))
+
+            buf1[0] = 1.0
+            buf2[0] = 2.0
+
+            realm.process_block(program)
+
+            self.assertEqual(buf4[0], 8.0)
+
     async def test_processor(self):
         self.host_system.set_block_size(256)
         async with self.create_realm() as realm:
@@ -372,3 +418,126 @@ class RealmTest(
             graph.remove_node(mixer)
             await mixer.cleanup()
             realm.update_spec()
+
+    async def test_batch_spec_updates(self):
+        async with self.create_realm() as realm:
+            # Pylint is confused about the type of cdef class members.
+            # pylint: disable=no-member
+            graph = realm.graph
+            sink = graph.find_node('sink')
+
+            with self.assertLogs('noisicaa.audioproc.engine.realm', 'DEBUG') as logs:
+                with realm.batch_spec_updates():
+                    mixer = graph_lib.Node.create(
+                        id='mixer',
+                        host_system=self.host_system,
+                        description=self.node_db.get_node_description('builtin://mixer'))
+                    graph.add_node(mixer)
+                    await realm.setup_node(mixer)
+                    realm.update_spec()
+
+                    sink.inputs['in:left'].connect(
+                        mixer.outputs['out:left'], node_db.PortDescription.AUDIO)
+                    realm.update_spec()
+
+            num_specs = sum(1 for line in logs.output if 'set_spec:' in line)
+            self.assertEqual(num_specs, 1)
+
+            sink.inputs['in:left'].disconnect(mixer.outputs['out:left'])
+            graph.remove_node(mixer)
+            await mixer.cleanup()
+            realm.update_spec()
+
+    async def test_deferred_batch_spec_updates(self):
+        async with self.create_realm() as realm:
+            # Pylint is confused about the type of cdef class members.
+            # pylint: disable=no-member
+            graph = realm.graph
+            sink = graph.find_node('sink')
+
+            mixer = graph_lib.Node.create(
+                id='mixer',
+                host_system=self.host_system,
+                description=self.node_db.get_node_description('builtin://mixer'))
+            mixer.set_realm(realm)
+            await realm.setup_node(mixer)
+
+            with self.assertLogs('noisicaa.audioproc.engine.realm', 'DEBUG') as logs:
+                with realm.batch_spec_updates(deferred=True):
+                    graph.add_node(mixer)
+                    realm.update_spec()
+
+                with realm.batch_spec_updates(deferred=True):
+                    sink.inputs['in:left'].connect(
+                        mixer.outputs['out:left'], node_db.PortDescription.AUDIO)
+                    realm.update_spec()
+
+                self.assertIsNone(realm.get_active_program())
+                await asyncio.sleep(0, loop=self.loop)
+                self.assertIsNotNone(realm.get_active_program())
+
+            num_specs = sum(1 for line in logs.output if 'set_spec:' in line)
+            self.assertEqual(num_specs, 1)
+
+            sink.inputs['in:left'].disconnect(mixer.outputs['out:left'])
+            graph.remove_node(mixer)
+            await mixer.cleanup()
+            realm.update_spec()
+
+    async def test_setup_nodes_concurrently(self):
+        async with self.create_realm() as realm:
+            # Pylint is confused about the type of cdef class members.
+            # pylint: disable=no-member
+            graph = realm.graph
+
+            nodes = []
+            for idx in range(4):
+                node = graph_lib.Node.create(
+                    id='mixer%d' % idx,
+                    host_system=self.host_system,
+                    description=self.node_db.get_node_description('builtin://mixer'))
+                node.set_realm(realm)
+                nodes.append(node)
+
+            await asyncio.gather(*(realm.setup_node(node) for node in nodes), loop=self.loop)
+
+            with realm.batch_spec_updates():
+                for node in nodes:
+                    graph.add_node(node)
+                    realm.update_spec()
+
+            program = realm.get_active_program()
+            self.assertIsNotNone(program)
+
+            for node in nodes:
+                graph.remove_node(node)
+                await node.cleanup()
+            realm.update_spec()
+
+    async def test_discard_node(self):
+        async with self.create_realm() as realm:
+            # Pylint is confused about the type of cdef class members.
+            # pylint: disable=no-member
+            graph = realm.graph
+
+            mixer = graph_lib.Node.create(
+                id='mixer',
+                host_system=self.host_system,
+                description=self.node_db.get_node_description('builtin://mixer'))
+            mixer.set_realm(realm)
+            await realm.setup_node(mixer)
+            await mixer.discard()
+            mixer.clear_realm()
+
+            # The discarded node left nothing behind, so a node with the same id can be added.
+            mixer = graph_lib.Node.create(
+                id='mixer',
+                host_system=self.host_system,
+                description=self.node_db.get_node_description('builtin://mixer'))
+            graph.add_node(mixer)
+            await realm.setup_node(mixer)
+            realm.update_spec()
+
+            graph.remove_node(mixer)
+            await mixer.cleanup()
+            realm.update_spec()
@@ -0,0 +1,312 @@
+/*
+ * @begin:license
+ *
+ * Copyright (c) 2015-2019, Benjamin Niemann <pink@odahoda.de>
+ *
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 2 of the License, or
+ * (at your option) any later version.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License along
+ * with this program; if not, write to the Free Software Foundation, Inc.,
+ * 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+ *
+ * @end:license
+ */
+
+#include <string.h>
+#if defined(__x86_64__) || defined(__i386__)
+#include <immintrin.h>
+#define NOISICAA_SIMD_X86 1
+#endif
+#include "noisicaa/audioproc/engine/simd.h"
+
+namespace noisicaa {
+namespace simd {
+
+namespace {
+
+// Maps the upper 23 bits of a random value to a float in [-1.0, 1.0), by constructing a float in
+// [2.0, 4.0) and shifting it down.
+inline float noise_sample(uint32_t s) {
+  uint32_t bits = (s >> 9) | 0x40000000;
+  float v;
+  memcpy(&v, &bits, sizeof(v));
+  return v - 3.0f;
+}
+
+inline uint32_t xorshift(uint32_t s) {
+  s ^= s << 13;
+  s ^= s >> 17;
+  s ^= s << 5;
+  return s;
+}
+
+// Portable implementations.
+
+void generic_clear(float* buf, uint32_t num_samples) {
+  memset(buf, 0, num_samples * sizeof(float));
+}
+
+void generic_copy(const float* src, float* dest, uint32_t num_samples) {
+  memmove(dest, src, num_samples * sizeof(float));
+}
+
+void generic_mix(const float* src, float* dest, uint32_t num_samples) {
+  for (uint32_t i = 0 ; i < num_samples ; ++i) {
+    dest[i] += src[i];
+  }
+}
+
+void generic_mul(float* buf, float factor, uint32_t num_samples) {
+  for (uint32_t i = 0 ; i < num_samples ; ++i) {
+    buf[i] *= factor;
+  }
+}
+
+void generic_interleave_stereo(
+    const float* left, const float* right, float* dest, uint32_t num_samples) {
+  for (uint32_t i = 0 ; i < num_samples ; ++i) {
+    *dest++ = left[i];
+    *dest++ = right[i];
+  }
+}
+
+void generic_noise(float* buf, uint32_t* state, uint32_t num_samples) {
+  // Uses NOISE_STATE_SIZE interleaved generators, so the vectorized versions can produce the
+  // same sequence.
+  for (uint32_t i = 0 ; i < num_samples ; ++i) {
+    uint32_t& s = state[i % NOISE_STATE_SIZE];
+    s = xorshift(s);
+    buf[i] = noise_sample(s);
+  }
+}
+
+const Kernels generic_kernels = {
+  "generic",
+  generic_clear,
+  generic_copy,
+  generic_mix,
+  generic_mul,
+  generic_interleave_stereo,
+  generic_noise,
+};
+
+#ifdef NOISICAA_SIMD_X86
+
+// SSE2 implementations.
+
+__attribute__((target("sse2")))
+void sse2_mix(const float* src, float* dest, uint32_t num_samples) {
+  uint32_t i = 0;
+  for ( ; i + 4 <= num_samples ; i += 4) {
+    _mm_storeu_ps(dest + i, _mm_add_ps(_mm_loadu_ps(dest + i), _mm_loadu_ps(src + i)));
+  }
+  for ( ; i < num_samples ; ++i) {
+    dest[i] += src[i];
+  }
+}
+
+__attribute__((target("sse2")))
+void sse2_mul(float* buf, float factor, uint32_t num_samples) {
+  __m128 f = _mm_set1_ps(factor);
+  uint32_t i = 0;
+  for ( ; i + 4 <= num_samples ; i += 4) {
+    _mm_storeu_ps(buf + i, _mm_mul_ps(_mm_loadu_ps(buf + i), f));
+  }
+  for ( ; i < num_samples ; ++i) {
+    buf[i] *= factor;
+  }
+}
+
+__attribute__((target("sse2")))
+void sse2_interleave_stereo(
+    const float* left, const float* right, float* dest, uint32_t num_samples) {
+  uint32_t i = 0;
+  for ( ; i + 4 <= num_samples ; i += 4) {
+    __m128 l = _mm_loadu_ps(left + i);
+    __m128 r = _mm_loadu_ps(right + i);
+    _mm_storeu_ps(dest + 2 * i, _mm_unpacklo_ps(l, r));
+    _mm_storeu_ps(dest + 2 * i + 4, _mm_unpackhi_ps(l, r));
+  }
+  for ( ; i < num_samples ; ++i) {
+    dest[2 * i] = left[i];
+    dest[2 * i + 1] = right[i];
+  }
+}
+
+__attribute__((target("sse2")))
+inline __m128i sse2_xorshift(__m128i s) {
+  s = _mm_xor_si128(s, _mm_slli_epi32(s, 13));
+  s = _mm_xor_si128(s, _mm_srli_epi32(s, 17));
+  s = _mm_xor_si128(s, _mm_slli_epi32(s, 5));
+  return s;
+}
+
+__attribute__((target("sse2")))
+inline __m128 sse2_noise_sample(__m128i s) {
+  __m128i bits = _mm_or_si128(_mm_srli_epi32(s, 9), _mm_set1_epi32(0x40000000));
+  return _mm_sub_ps(_mm_castsi128_ps(bits), _mm_set1_ps(3.0f));
+}
+
+__attribute__((target("sse2")))
+void sse2_noise(float* buf, uint32_t* state, uint32_t num_samples) {
+  __m128i s0 = _mm_loadu_si128((const __m128i*)state);
+  __m128i s1 = _mm_loadu_si128((const __m128i*)(state + 4));
+  uint32_t i = 0;
+  for ( ; i + NOISE_STATE_SIZE <= num_samples ; i += NOISE_STATE_SIZE) {
+    s0 = sse2_xorshift(s0);
+    s1 = sse2_xorshift(s1);
+    _mm_storeu_ps(buf + i, sse2_noise_sample(s0));
+    _mm_storeu_ps(buf + i + 4, sse2_noise_sample(s1));
+  }
+  _mm_storeu_si128((__m128i*)state, s0);
+  _mm_storeu_si128((__m128i*)(state + 4), s1);
+
+  if (i < num_samples) {
+    generic_noise(buf + i, state, num_samples - i);
+  }
+}
+
+const Kernels sse2_kernels = {
+  "sse2",
+  generic_clear,
+  generic_copy,
+  sse2_mix,
+  sse2_mul,
+  sse2_interleave_stereo,
+  sse2_noise,
+};
+
+// AVX2 implementations.
+
+__attribute__((target("avx2")))
+void avx2_mix(const float* src, float* dest, uint32_t num_samples) {
+  uint32_t i = 0;
+  for ( ; i + 8 <= num_samples ; i += 8) {
+    _mm256_storeu_ps(
+        dest + i, _mm256_add_ps(_mm256_loadu_ps(dest + i), _mm256_loadu_ps(src + i)));
+  }
+  for ( ; i < num_samples ; ++i) {
+    dest[i] += src[i];
+  }
+}
+
+__attribute__((target("avx2")))
+void avx2_mul(float* buf, float factor, uint32_t num_samples) {
+  __m256 f = _mm256_set1_ps(factor);
+  uint32_t i = 0;
+  for ( ; i + 8 <= num_samples ; i += 8) {
+    _mm256_storeu_ps(buf + i, _mm256_mul_ps(_mm256_loadu_ps(buf + i), f));
+  }
+  for ( ; i < num_samples ; ++i) {
+    buf[i] *= factor;
+  }
+}
+
+__attribute__((target("avx2")))
+void avx2_interleave_stereo(
+    const float* left, const float* right, float* dest, uint32_t num_samples) {
+  uint32_t i = 0;
+  for ( ; i + 8 <= num_samples ; i += 8) {
+    __m256 l = _mm256_loadu_ps(left + i);
+    __m256 r = _mm256_loadu_ps(right + i);
+    // unpack works within 128bit lanes: lo = [l0 r0 l1 r1 | l4 r4 l5 r5],
+    // hi = [l2 r2 l3 r3 | l6 r6 l7 r7]
+    __m256 lo = _mm256_unpacklo_ps(l, r);
+    __m256 hi = _mm256_unpackhi_ps(l, r);
+    _mm256_storeu_ps(dest + 2 * i, _mm256_permute2f128_ps(lo, hi, 0x20));
+    _mm256_storeu_ps(dest + 2 * i + 8, _mm256_permute2f128_ps(lo, hi, 0x31));
+  }
+  for ( ; i < num_samples ; ++i) {
+    dest[2 * i] = left[i];
+    dest[2 * i + 1] = right[i];
+  }
+}
+
+__attribute__((target("avx2")))
+void avx2_noise(float* buf, uint32_t* state, uint32_t num_samples) {
+  __m256i s = _mm256_loadu_si256((const __m256i*)state);
+  __m256i mask = _mm256_set1_epi32(0x40000000);
+  __m256 offset = _mm256_set1_ps(3.0f);
+  uint32_t i = 0;
+  for ( ; i + NOISE_STATE_SIZE <= num_samples ; i += NOISE_STATE_SIZE) {
+    s = _mm256_xor_si256(s, _mm256_slli_epi32(s, 13));
+    s = _mm256_xor_si256(s, _mm256_srli_epi32(s, 17));
+    s = _mm256_xor_si256(s, _mm256_slli_epi32(s, 5));
+    __m256i bits = _mm256_or_si256(_mm256_srli_epi32(s, 9), mask);
+    _mm256_storeu_ps(buf + i, _mm256_sub_ps(_mm256_castsi256_ps(bits), offset));
+  }
+  _mm256_storeu_si256((__m256i*)state, s);
+
+  if (i < num_samples) {
+    generic_noise(buf + i, state, num_samples - i);
+  }
+}
+
+const Kernels avx2_kernels = {
+  "avx2",
+  generic_clear,
+  generic_copy,
+  avx2_mix,
+  avx2_mul,
+  avx2_interleave_stereo,
+  avx2_noise,
+};
+
+#endif
+
+const Kernels* best_kernels() {
+#ifdef NOISICAA_SIMD_X86
+  __builtin_cpu_init();
+  if (__builtin_cpu_supports("avx2")) {
+    return &avx2_kernels;
+  }
+  if (__builtin_cpu_supports("sse2")) {
+    return &sse2_kernels;
+  }
+#endif
+  return &generic_kernels;
+}
+
+}  // namespace
+
+const Kernels* kernels = best_kernels();
+
+bool select_kernels(const char* name) {
+  if (strcmp(name, generic_kernels.name) == 0) {
+    kernels = &generic_kernels;
+    return true;
+  }
+
+#ifdef NOISICAA_SIMD_X86
+  __builtin_cpu_init();
+  if (strcmp(name, sse2_kernels.name) == 0 && __builtin_cpu_supports("sse2")) {
+    kernels = &sse2_kernels;
+    return true;
+  }
+  if (strcmp(name, avx2_kernels.name) == 0 && __builtin_cpu_supports("avx2")) {
+    kernels = &avx2_kernels;
+    return true;
+  }
+#endif
+
+  return false;
+}
+
+void seed_noise(uint32_t* state, uint32_t seed) {
+  for (int i = 0 ; i < NOISE_STATE_SIZE ; ++i) {
+    // xorshift must not be seeded with zero.
+    seed = seed * 1664525 + 1013904223;
+    state[i] = seed != 0 ? seed : 1;
+  }
+}
+
+}  // namespace simd
+}  // namespace noisicaa
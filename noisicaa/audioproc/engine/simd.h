@@ -0,0 +1,94 @@
+// -*- mode: c++ -*-
+
+/*
+ * @begin:license
+ *
+ * Copyright (c) 2015-2019, Benjamin Niemann <pink@odahoda.de>
+ *
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 2 of the License, or
+ * (at your option) any later version.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License along
+ * with this program; if not, write to the Free Software Foundation, Inc.,
+ * 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+ *
+ * @end:license
+ */
+
+#ifndef _NOISICAA_AUDIOPROC_ENGINE_SIMD_H
+#define _NOISICAA_AUDIOPROC_ENGINE_SIMD_H
+
+#include <stdint.h>
+
+namespace noisicaa {
+
+// Vectorized kernels for the float buffer operations of the audio thread.
+//
+// The implementation is picked once at startup, based on the features of the CPU (AVX2, SSE2 or
+// a portable fallback). Buffers do not have to be aligned and the number of samples does not
+// have to be a multiple of the vector width.
+namespace simd {
+
+struct Kernels {
+  const char* name;
+  void (*clear)(float* buf, uint32_t num_samples);
+  void (*copy)(const float* src, float* dest, uint32_t num_samples);
+  void (*mix)(const float* src, float* dest, uint32_t num_samples);
+  void (*mul)(float* buf, float factor, uint32_t num_samples);
+  void (*interleave_stereo)(
+      const float* left, const float* right, float* dest, uint32_t num_samples);
+  void (*noise)(float* buf, uint32_t* state, uint32_t num_samples);
+};
+
+// Number of uint32_t values in the state of a noise generator.
+static const int NOISE_STATE_SIZE = 8;
+
+extern const Kernels* kernels;
+
+// Switch to a different kernel set ("avx2", "sse2" or "generic"). Returns false, if that set is
+// not supported by this CPU. Only meant for tests and benchmarks.
+bool select_kernels(const char* name);
+
+// Initialize the state of a noise generator.
+void seed_noise(uint32_t* state, uint32_t seed);
+
+inline void clear(float* buf, uint32_t num_samples) {
+  kernels->clear(buf, num_samples);
+}
+
+inline void copy(const float* src, float* dest, uint32_t num_samples) {
+  kernels->copy(src, dest, num_samples);
+}
+
+// dest += src
+inline void mix(const float* src, float* dest, uint32_t num_samples) {
+  kernels->mix(src, dest, num_samples);
+}
+
+// buf *= factor
+inline void mul(float* buf, float factor, uint32_t num_samples) {
+  kernels->mul(buf, factor, num_samples);
+}
+
+// dest = [left[0], right[0], left[1], right[1], ...]
+inline void interleave_stereo(
+    const float* left, const float* right, float* dest, uint32_t num_samples) {
+  kernels->interleave_stereo(left, right, dest, num_samples);
+}
+
+// Fill buf with uniformly distributed white noise in the range [-1.0, 1.0).
+inline void noise(float* buf, uint32_t* state, uint32_t num_samples) {
+  kernels->noise(buf, state, num_samples);
+}
+
+}  // namespace simd
+}  // namespace noisicaa
+
+#endif
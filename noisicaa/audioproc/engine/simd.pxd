@@ -0,0 +1,36 @@
+# @begin:license
+#
+# Copyright (c) 2015-2019, Benjamin Niemann <pink@odahoda.de>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# @end:license
+
+from libc.stdint cimport uint32_t
+
+
+cdef extern from "noisicaa/audioproc/engine/simd.h" namespace "noisicaa::simd" nogil:
+    int NOISE_STATE_SIZE
+
+    bint select_kernels(const char* name)
+    void seed_noise(uint32_t* state, uint32_t seed)
+
+    void clear(float* buf, uint32_t num_samples)
+    void copy(const float* src, float* dest, uint32_t num_samples)
+    void mix(const float* src, float* dest, uint32_t num_samples)
+    void mul(float* buf, float factor, uint32_t num_samples)
+    void interleave_stereo(
+        const float* left, const float* right, float* dest, uint32_t num_samples)
+    void noise(float* buf, uint32_t* state, uint32_t num_samples)
@@ -0,0 +1,103 @@
+# @begin:license
+#
+# Copyright (c) 2015-2019, Benjamin Niemann <pink@odahoda.de>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# @end:license
+
+import sys
+import time
+
+from libc.stdint cimport uint32_t
+from libcpp.vector cimport vector
+
+from noisidev import unittest
+from . cimport simd
+
+KERNEL_SETS = [b'generic', b'sse2', b'avx2']
+KERNELS = ['clear', 'copy', 'mix', 'mul', 'interleave_stereo', 'noise']
+
+
+class SimdPerfTest(unittest.TestCase):
+    num_samples = 256
+    num_iterations = 100000
+
+    def cleanup_testcase(self):
+        for name in reversed(KERNEL_SETS):
+            if simd.select_kernels(name):
+                break
+
+    def run_benchmark(self, kernel, out=sys.stdout):
+        cdef vector[float] a
+        cdef vector[float] b
+        cdef vector[float] c
+        cdef uint32_t state[8]
+        cdef uint32_t num_samples = self.num_samples
+        cdef int num_iterations = self.num_iterations
+        cdef int i
+        cdef int k = KERNELS.index(kernel)
+
+        a.resize(num_samples, 0.5)
+        b.resize(num_samples, 0.25)
+        c.resize(2 * num_samples)
+        simd.seed_noise(state, 1)
+
+        for name in KERNEL_SETS:
+            if not simd.select_kernels(name):
+                continue
+
+            passes = []
+            for _ in range(6):
+                t0 = time.perf_counter()
+                with nogil:
+                    for i in range(num_iterations):
+                        if k == 0:
+                            simd.clear(b.data(), num_samples)
+                        elif k == 1:
+                            simd.copy(a.data(), b.data(), num_samples)
+                        elif k == 2:
+                            simd.mix(a.data(), b.data(), num_samples)
+                        elif k == 3:
+                            simd.mul(b.data(), 0.999, num_samples)
+                        elif k == 4:
+                            simd.interleave_stereo(a.data(), b.data(), c.data(), num_samples)
+                        else:
+                            simd.noise(b.data(), state, num_samples)
+                passes.append(time.perf_counter() - t0)
+
+            passes = sorted(passes[1:])[1:-1]
+            t = sum(passes) / len(passes)
+            out.write(
+                "%-18s %-8s \033[32m%7.1fnsec\033[37;0m per block of %d samples\n"
+                % (kernel, name.decode('ascii'), 1e9 * t / num_iterations, num_samples))
+
+    def test_clear(self):
+        self.run_benchmark('clear')
+
+    def test_copy(self):
+        self.run_benchmark('copy')
+
+    def test_mix(self):
+        self.run_benchmark('mix')
+
+    def test_mul(self):
+        self.run_benchmark('mul')
+
+    def test_interleave_stereo(self):
+        self.run_benchmark('interleave_stereo')
+
+    def test_noise(self):
+        self.run_benchmark('noise')
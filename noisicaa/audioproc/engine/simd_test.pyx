@@ -0,0 +1,97 @@
+# @begin:license
+#
+# Copyright (c) 2015-2019, Benjamin Niemann <pink@odahoda.de>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# @end:license
+
+from libc.stdint cimport uint32_t
+from libcpp.vector cimport vector
+
+from noisidev import unittest
+from . cimport simd
+
+KERNEL_SETS = [b'generic', b'sse2', b'avx2']
+
+
+class SimdTest(unittest.TestCase):
+    def setup_testcase(self):
+        self.assertTrue(simd.select_kernels(b'generic'))
+
+    def cleanup_testcase(self):
+        # Restore the best available implementation.
+        for name in reversed(KERNEL_SETS):
+            if simd.select_kernels(name):
+                break
+
+    def run_kernels(self, name, int num_samples):
+        cdef vector[float] a
+        cdef vector[float] b
+        cdef vector[float] c
+        cdef vector[float] n
+        cdef uint32_t state[8]
+
+        a.resize(num_samples)
+        b.resize(num_samples)
+        c.resize(2 * num_samples)
+        n.resize(num_samples)
+        for i in range(num_samples):
+            a[i] = 0.5 * i
+            b[i] = 1.0 - i
+
+        if not simd.select_kernels(name):
+            return None
+
+        simd.mix(a.data(), b.data(), num_samples)
+        simd.mul(b.data(), 1.7, num_samples)
+        simd.interleave_stereo(a.data(), b.data(), c.data(), num_samples)
+        simd.seed_noise(state, 42)
+        simd.noise(n.data(), state, num_samples)
+        return list(b), list(c), list(n)
+
+    def test_generic(self):
+        b, c, n = self.run_kernels(b'generic', 3)
+        for v, e in zip(b, [1.7 * 1.0, 1.7 * (0.0 + 0.5), 1.7 * (-1.0 + 1.0)]):
+            self.assertAlmostEqual(v, e, places=5)
+        self.assertEqual(c[0::2], [0.0, 0.5, 1.0])
+        self.assertEqual(c[1::2], b)
+        for v in n:
+            self.assertGreaterEqual(v, -1.0)
+            self.assertLess(v, 1.0)
+
+    def test_matches_generic(self):
+        for num_samples in (0, 1, 7, 8, 13, 64, 67, 1024):
+            expected = self.run_kernels(b'generic', num_samples)
+            for name in KERNEL_SETS[1:]:
+                with self.subTest(kernels=name, num_samples=num_samples):
+                    result = self.run_kernels(name, num_samples)
+                    if result is None:
+                        continue
+                    self.assertEqual(result, expected)
+
+    def test_clear_copy(self):
+        cdef float a[13]
+        cdef float b[13]
+        for i in range(13):
+            a[i] = i
+            b[i] = -1.0
+        simd.copy(a, b, 13)
+        self.assertEqual([b[i] for i in range(13)], [float(i) for i in range(13)])
+        simd.clear(b, 13)
+        self.assertEqual([b[i] for i in range(13)], [0.0] * 13)
+
+    def test_unknown_kernels(self):
+        self.assertFalse(simd.select_kernels(b'mmx'))
@@ -141,6 +141,25 @@ string Spec::dump(HostSystem* host_system) const {
     }
   }
 
+  if (_jobs.size() > 0) {
+    out += "Jobs:\n";
+    unsigned int i = 0;
+    for (const auto& job : _jobs) {
+      string successors = "";
+      for (size_t s = 0 ; s < job.successors.size() ; ++s) {
+        if (s > 0) {
+          successors += ", ";
+        }
+        successors += sprintf("%d", job.successors[s]);
+      }
+
+      out += sprintf(
+          "% 3u [%d,%d) [dependencies=%d, successors=%s]\n",
+          i, job.begin, job.end, job.num_dependencies, successors.c_str());
+      ++i;
+    }
+  }
+
   return out;
 }
 
@@ -149,6 +168,35 @@ Status Spec::append_opcode(OpCode opcode, const vector<OpArg>& args) {
   return Status::Ok();
 }
 
+StatusOr<int> Spec::begin_job(const vector<int>& dependencies) {
+  if (_in_job) {
+    return ERROR_STATUS("Nested jobs are not supported.");
+  }
+
+  int job_idx = _jobs.size();
+  for (int dep_idx : dependencies) {
+    // Jobs are appended in topological order, so dependencies must already exist.
+    if (dep_idx < 0 || dep_idx >= job_idx) {
+      return ERROR_STATUS("Invalid job dependency %d", dep_idx);
+    }
+    _jobs[dep_idx].successors.push_back(job_idx);
+  }
+
+  _jobs.push_back({(int)_opcodes.size(), (int)_opcodes.size(), (int)dependencies.size(), {}});
+  _in_job = true;
+  return job_idx;
+}
+
+Status Spec::end_job() {
+  if (!_in_job) {
+    return ERROR_STATUS("No active job.");
+  }
+
+  _jobs.back().end = _opcodes.size();
+  _in_job = false;
+  return Status::Ok();
+}
+
 Status Spec::append_buffer(const string& name, BufferType* type) {
   char* name_c = new char[name.size() + 1];
   memmove(name_c, name.c_str(), name.size() + 1);
@@ -157,6 +205,21 @@ Status Spec::append_buffer(const string& name, BufferType* type) {
   return Status::Ok();
 }
 
+Status Spec::append_buffer_alias(const string& name, const string& target) {
+  auto it = _buffer_map.find(target.c_str());
+  if (it == _buffer_map.end()) {
+    return ERROR_STATUS("Invalid buffer name %s", target.c_str());
+  }
+  if (_buffer_map.find(name.c_str()) != _buffer_map.end()) {
+    return ERROR_STATUS("Duplicate buffer name %s", name.c_str());
+  }
+
+  char* name_c = new char[name.size() + 1];
+  memmove(name_c, name.c_str(), name.size() + 1);
+  _buffer_map[name_c] = it->second;
+  return Status::Ok();
+}
+
 StatusOr<int> Spec::get_buffer_idx(const char* name) const {
   auto it = _buffer_map.find(name);
   if (it != _buffer_map.end()) {
@@ -49,6 +49,15 @@ struct Instruction {
   vector<OpArg> args;
 };
 
+// A contiguous range of opcodes, which can be executed concurrently with other jobs, once all
+// jobs it depends on have completed.
+struct Job {
+  int begin;
+  int end;
+  int num_dependencies;
+  vector<int> successors;
+};
+
 class Spec {
 public:
   Spec();
@@ -71,7 +80,14 @@ public:
   OpCode get_opcode(int idx) const { return _opcodes[idx].opcode; }
   const OpArg& get_oparg(int idx, int arg) const { return _opcodes[idx].args[arg]; }
 
+  StatusOr<int> begin_job(const vector<int>& dependencies);
+  Status end_job();
+  int num_jobs() const { return _jobs.size(); }
+  const Job& get_job(int idx) const { return _jobs[idx]; }
+
   Status append_buffer(const string& name, BufferType* type);
+  // Make 'name' refer to the same buffer as the existing buffer 'target'.
+  Status append_buffer_alias(const string& name, const string& target);
   int num_buffers() const { return _buffers.size(); }
   const BufferType* get_buffer(int idx) const { return _buffers[idx].get(); }
   StatusOr<int> get_buffer_idx(const char* name) const;
@@ -103,6 +119,9 @@ private:
 
   vector<Instruction> _opcodes;
 
+  vector<Job> _jobs;
+  bool _in_job = false;
+
   vector<Processor*> _processors;
   map<uint64_t, int> _processor_map;
 
@@ -33,6 +33,12 @@ from .realm cimport Realm
 
 
 cdef extern from "noisicaa/audioproc/engine/spec.h" namespace "noisicaa" nogil:
+    struct Job:
+        int begin
+        int end
+        int num_dependencies
+        vector[int] successors
+
     cppclass Spec:
         void set_bpm(uint32_t bpm)
         uint32_t bpm() const
@@ -45,7 +51,13 @@ cdef extern from "noisicaa/audioproc/engine/spec.h" namespace "noisicaa" nogil:
         OpCode get_opcode(int idx) const
         const OpArg& get_oparg(int idx, int arg) const
 
+        StatusOr[int] begin_job(const vector[int]& dependencies)
+        Status end_job()
+        int num_jobs() const
+        const Job& get_job(int idx) const
+
         Status append_buffer(const string& name, BufferType* type)
+        Status append_buffer_alias(const string& name, const string& target)
         int num_buffers() const
         const BufferType* get_buffer(int idx) const
         StatusOr[int] get_buffer_idx(const char* name) const
@@ -18,7 +18,7 @@
 #
 # @end:license
 
-from typing import Any, Dict
+from typing import Any, Dict, Iterable
 
 from noisicaa import audioproc
 from . import buffers
@@ -33,10 +33,15 @@ opname = ...  # type: Dict[int, str]
 class PySpec(object):
     bpm = ...  # type: int
     duration = ...  # type: audioproc.MusicalDuration
+    num_buffers = ...  # type: int
 
     def __init__(self) -> None: ...
     def dump(self) -> str: ...
+    def begin_job(self, dependencies: Iterable[int]) -> int: ...
+    def end_job(self) -> None: ...
+    def get_buffer_idx(self, name: str) -> int: ...
     def append_buffer(self, name: str, buf_type: buffers.PyBufferType) -> None: ...
+    def append_buffer_alias(self, name: str, target: str) -> None: ...
     def append_control_value(self, cv: control_value.PyControlValue) -> None: ...
     def append_processor(self, processor: processor_lib.PyProcessor) -> None: ...
     def append_child_realm(self, child_realm: realm.PyRealm) -> None: ...
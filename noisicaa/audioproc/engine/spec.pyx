@@ -48,6 +48,8 @@ opcode_map = {
     'MIDI_MONKEY':                  OpCode.MIDI_MONKEY,
     'CONNECT_PORT':                 OpCode.CONNECT_PORT,
     'CALL':                         OpCode.CALL,
+    'CALL_START':                   OpCode.CALL_START,
+    'CALL_FINISH':                  OpCode.CALL_FINISH,
     'LOG_RMS':                      OpCode.LOG_RMS,
     'LOG_ATOM':                     OpCode.LOG_ATOM,
 }
@@ -119,12 +121,44 @@ cdef class PySpec(object):
     def duration(self, PyMusicalDuration value):
         self.__spec.set_duration(value.get())
 
+    def begin_job(self, dependencies):
+        cdef vector[int] c_dependencies
+        for dep in dependencies:
+            c_dependencies.push_back(dep)
+        cdef StatusOr[int] stor_job = self.__spec.begin_job(c_dependencies)
+        check(stor_job)
+        return stor_job.result()
+
+    def end_job(self):
+        check(self.__spec.end_job())
+
+    @property
+    def num_buffers(self):
+        return int(self.__spec.num_buffers())
+
+    def get_buffer_idx(self, name):
+        if isinstance(name, str):
+            name = name.encode('ascii')
+        assert(isinstance(name, bytes))
+        cdef StatusOr[int] stor_idx = self.__spec.get_buffer_idx(name)
+        check(stor_idx)
+        return stor_idx.result()
+
     def append_buffer(self, name, PyBufferType buf_type):
         if isinstance(name, str):
             name = name.encode('ascii')
         assert(isinstance(name, bytes))
         check(self.__spec.append_buffer(name, buf_type.release()))
 
+    def append_buffer_alias(self, name, target):
+        if isinstance(name, str):
+            name = name.encode('ascii')
+        assert(isinstance(name, bytes))
+        if isinstance(target, str):
+            target = target.encode('ascii')
+        assert(isinstance(target, bytes))
+        check(self.__spec.append_buffer_alias(name, target))
+
     def append_control_value(self, PyControlValue cv):
         check(self.__spec.append_control_value(cv.get()))
 
@@ -42,6 +42,17 @@ class TestSpec(unittest.TestCase):
         self.assertEqual(spec.get_buffer_idx(b'buf1').result(), 0)
         self.assertEqual(spec.get_buffer_idx(b'buf2').result(), 1)
 
+    def test_buffer_alias(self):
+        cdef Spec spec
+        check(spec.append_buffer(b'buf1', new FloatAudioBlockBuffer(node_db.PortDescription.AUDIO)))
+        check(spec.append_buffer(b'buf2', new FloatAudioBlockBuffer(node_db.PortDescription.AUDIO)))
+        check(spec.append_buffer_alias(b'buf3', b'buf2'))
+        self.assertEqual(spec.num_buffers(), 2)
+        self.assertEqual(spec.get_buffer_idx(b'buf3').result(), 1)
+
+        self.assertTrue(spec.append_buffer_alias(b'buf4', b'unknown').is_error())
+        self.assertTrue(spec.append_buffer_alias(b'buf1', b'buf2').is_error())
+
     def test_opcodes(self):
         cdef Spec spec
         check(spec.append_buffer(b'buf1', new FloatAudioBlockBuffer(node_db.PortDescription.AUDIO)))
@@ -78,3 +89,37 @@ class TestSpec(unittest.TestCase):
         arg = &spec.get_oparg(2, 1)
         self.assertEqual(arg.type(), OpArgType.FLOAT)
         self.assertEqual(arg.float_value(), 0.5)
+
+    def test_jobs(self):
+        cdef Spec spec
+        cdef vector[int] deps
+
+        job1 = spec.begin_job(deps).result()
+        check(spec.append_opcode(OpCode.NOOP, vector[OpArg]()))
+        check(spec.end_job())
+        job2 = spec.begin_job(deps).result()
+        check(spec.append_opcode(OpCode.NOOP, vector[OpArg]()))
+        check(spec.append_opcode(OpCode.NOOP, vector[OpArg]()))
+        check(spec.end_job())
+        deps.push_back(job1)
+        deps.push_back(job2)
+        job3 = spec.begin_job(deps).result()
+        check(spec.append_opcode(OpCode.NOOP, vector[OpArg]()))
+        check(spec.end_job())
+
+        self.assertEqual(spec.num_jobs(), 3)
+        self.assertEqual(spec.get_job(job1).begin, 0)
+        self.assertEqual(spec.get_job(job1).end, 1)
+        self.assertEqual(list(spec.get_job(job1).successors), [job3])
+        self.assertEqual(spec.get_job(job2).begin, 1)
+        self.assertEqual(spec.get_job(job2).end, 3)
+        self.assertEqual(list(spec.get_job(job2).successors), [job3])
+        self.assertEqual(spec.get_job(job3).num_dependencies, 2)
+        self.assertEqual(spec.get_job(job3).begin, 3)
+        self.assertEqual(spec.get_job(job3).end, 4)
+
+    def test_job_invalid_dependency(self):
+        cdef Spec spec
+        cdef vector[int] deps
+        deps.push_back(0)
+        self.assertTrue(spec.begin_job(deps).is_error())
@@ -0,0 +1,279 @@
+/*
+ * @begin:license
+ *
+ * Copyright (c) 2015-2019, Benjamin Niemann <pink@odahoda.de>
+ *
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 2 of the License, or
+ * (at your option) any later version.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License along
+ * with this program; if not, write to the Free Software Foundation, Inc.,
+ * 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+ *
+ * @end:license
+ */
+
+#include <errno.h>
+#include <string.h>
+#include <sys/syscall.h>
+#include <unistd.h>
+
+#include "noisicaa/core/logging.h"
+#include "noisicaa/audioproc/engine/realtime.h"
+#include "noisicaa/audioproc/engine/rtcheck.h"
+#include "noisicaa/audioproc/engine/spec.h"
+#include "noisicaa/audioproc/engine/worker_pool.h"
+
+namespace noisicaa {
+
+namespace {
+
+inline void cpu_relax() {
+#if defined(__x86_64__) || defined(__i386__)
+  __builtin_ia32_pause();
+#else
+  this_thread::yield();
+#endif
+}
+
+}  // namespace
+
+JobQueue::JobQueue(size_t capacity) {
+  size_t size = 2;
+  while (size < capacity) {
+    size <<= 1;
+  }
+  _mask = size - 1;
+  _cells.reset(new Cell[size]);
+  reset();
+}
+
+void JobQueue::reset() {
+  for (size_t i = 0 ; i <= _mask ; ++i) {
+    _cells[i].sequence.store(i, memory_order_relaxed);
+  }
+  _enqueue_pos.store(0, memory_order_relaxed);
+  _dequeue_pos.store(0, memory_order_relaxed);
+}
+
+bool JobQueue::push(int job) {
+  Cell* cell;
+  size_t pos = _enqueue_pos.load(memory_order_relaxed);
+  while (true) {
+    cell = &_cells[pos & _mask];
+    size_t seq = cell->sequence.load(memory_order_acquire);
+    intptr_t diff = (intptr_t)seq - (intptr_t)pos;
+    if (diff == 0) {
+      if (_enqueue_pos.compare_exchange_weak(pos, pos + 1, memory_order_relaxed)) {
+        break;
+      }
+    } else if (diff < 0) {
+      return false;
+    } else {
+      pos = _enqueue_pos.load(memory_order_relaxed);
+    }
+  }
+
+  cell->job = job;
+  cell->sequence.store(pos + 1, memory_order_release);
+  return true;
+}
+
+bool JobQueue::pop(int* job) {
+  Cell* cell;
+  size_t pos = _dequeue_pos.load(memory_order_relaxed);
+  while (true) {
+    cell = &_cells[pos & _mask];
+    size_t seq = cell->sequence.load(memory_order_acquire);
+    intptr_t diff = (intptr_t)seq - (intptr_t)(pos + 1);
+    if (diff == 0) {
+      if (_dequeue_pos.compare_exchange_weak(pos, pos + 1, memory_order_relaxed)) {
+        break;
+      }
+    } else if (diff < 0) {
+      return false;
+    } else {
+      pos = _dequeue_pos.load(memory_order_relaxed);
+    }
+  }
+
+  *job = cell->job;
+  cell->sequence.store(pos + _mask + 1, memory_order_release);
+  return true;
+}
+
+JobSet::JobSet(const Spec* spec)
+  : spec(spec),
+    pending(new atomic<int>[spec->num_jobs()]),
+    ready(spec->num_jobs()),
+    remaining(0) {}
+
+void JobSet::reset() {
+  ready.reset();
+  for (int i = 0 ; i < spec->num_jobs() ; ++i) {
+    const Job& job = spec->get_job(i);
+    pending[i].store(job.num_dependencies, memory_order_relaxed);
+    if (job.num_dependencies == 0) {
+      bool ok = ready.push(i);
+      assert(ok);
+    }
+  }
+  remaining.store(spec->num_jobs(), memory_order_release);
+}
+
+WorkerPool::WorkerPool(Logger* logger)
+  : _logger(logger),
+    _stop(false),
+    _busy_workers(0),
+    _failed(false) {
+  _error_message[0] = 0;
+}
+
+WorkerPool::~WorkerPool() {
+  cleanup();
+}
+
+Status WorkerPool::setup(uint32_t num_workers) {
+  if (sem_init(&_start, 0, 0) < 0) {
+    return OSERROR_STATUS("Failed to create semaphore");
+  }
+  _start_initialized = true;
+
+  _stop = false;
+  _logger->info("Starting %d worker threads...", num_workers);
+  for (uint32_t i = 0 ; i < num_workers ; ++i) {
+    _threads.emplace_back(new thread(&WorkerPool::worker_main, this, i + 1));
+  }
+
+  return Status::Ok();
+}
+
+void WorkerPool::cleanup() {
+  if (_threads.size() > 0) {
+    _logger->info("Stopping %lu worker threads...", _threads.size());
+    _stop = true;
+    for (size_t i = 0 ; i < _threads.size() ; ++i) {
+      sem_post(&_start);
+    }
+    for (auto& thread : _threads) {
+      thread->join();
+    }
+    _threads.clear();
+    _logger->info("Worker threads stopped.");
+  }
+
+  if (_start_initialized) {
+    sem_destroy(&_start);
+    _start_initialized = false;
+  }
+}
+
+Status WorkerPool::run(JobSet* job_set, JobRunner* runner) {
+  job_set->reset();
+
+  _failed.store(false, memory_order_relaxed);
+  _job_set = job_set;
+  _runner = runner;
+  _busy_workers.store(_threads.size(), memory_order_relaxed);
+
+  // sem_post() acts as a release barrier for the state set above.
+  for (size_t i = 0 ; i < _threads.size() ; ++i) {
+    sem_post(&_start);
+  }
+
+  process_jobs(0);
+
+  // All jobs are done, but some workers might still be on their way out of process_jobs().
+  while (_busy_workers.load(memory_order_acquire) > 0) {
+    cpu_relax();
+  }
+
+  _job_set = nullptr;
+  _runner = nullptr;
+
+  if (_failed.load(memory_order_acquire)) {
+    return Status::Error(_error_file, _error_line, "%s", _error_message);
+  }
+
+  return Status::Ok();
+}
+
+void WorkerPool::set_error(const Status& status) {
+  bool expected = false;
+  if (_failed.compare_exchange_strong(expected, true, memory_order_acq_rel)) {
+    _error_file = status.file();
+    _error_line = status.line();
+    strncpy(_error_message, status.message(), sizeof(_error_message) - 1);
+    _error_message[sizeof(_error_message) - 1] = 0;
+  }
+}
+
+void WorkerPool::process_jobs(int worker_idx) {
+  JobSet* job_set = _job_set;
+  const Spec* spec = job_set->spec;
+
+  while (job_set->remaining.load(memory_order_acquire) > 0) {
+    int job_idx;
+    if (!job_set->ready.pop(&job_idx)) {
+      cpu_relax();
+      continue;
+    }
+
+    // After a failure the remaining jobs are only drained, so the DAG still completes.
+    if (!_failed.load(memory_order_relaxed)) {
+      Status status = _runner->run_job(worker_idx, job_idx);
+      if (status.is_error()) {
+        set_error(status);
+      }
+    }
+
+    const Job& job = spec->get_job(job_idx);
+    for (int succ_idx : job.successors) {
+      if (job_set->pending[succ_idx].fetch_sub(1, memory_order_acq_rel) == 1) {
+        bool ok = job_set->ready.push(succ_idx);
+        assert(ok);
+      }
+    }
+
+    job_set->remaining.fetch_sub(1, memory_order_acq_rel);
+  }
+}
+
+void WorkerPool::worker_main(int worker_idx) {
+  _logger->info("Worker %d: PID=%d TID=%ld", worker_idx, getpid(), syscall(__NR_gettid));
+
+  Status status = set_thread_to_rt_priority(_logger);
+  if (status.is_error()) {
+    _logger->error(
+        "Worker %d: Failed to set RT priority: %s:%d %s",
+        worker_idx, status.file(), status.line(), status.message());
+  }
+
+  RTSafe rts;  // Enable rtchecker in worker thread.
+
+  while (true) {
+    if (sem_wait(&_start) < 0) {
+      if (errno == EINTR) {
+        continue;
+      }
+      _logger->error("Worker %d: sem_wait() failed: %s", worker_idx, strerror(errno));
+      break;
+    }
+
+    if (_stop) {
+      break;
+    }
+
+    process_jobs(worker_idx);
+    _busy_workers.fetch_sub(1, memory_order_release);
+  }
+}
+
+}  // namespace noisicaa
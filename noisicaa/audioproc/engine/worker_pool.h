@@ -0,0 +1,126 @@
+// -*- mode: c++ -*-
+
+/*
+ * @begin:license
+ *
+ * Copyright (c) 2015-2019, Benjamin Niemann <pink@odahoda.de>
+ *
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation; either version 2 of the License, or
+ * (at your option) any later version.
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License along
+ * with this program; if not, write to the Free Software Foundation, Inc.,
+ * 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+ *
+ * @end:license
+ */
+
+#ifndef _NOISICAA_AUDIOPROC_ENGINE_WORKER_POOL_H
+#define _NOISICAA_AUDIOPROC_ENGINE_WORKER_POOL_H
+
+#include <atomic>
+#include <memory>
+#include <thread>
+#include <vector>
+#include <semaphore.h>
+#include <stddef.h>
+#include <stdint.h>
+#include "noisicaa/core/status.h"
+
+namespace noisicaa {
+
+using namespace std;
+
+class Logger;
+class Spec;
+
+// Bounded, lock-free multi-producer/multi-consumer queue of job indices.
+// Based on Dmitry Vyukov's bounded MPMC queue.
+class JobQueue {
+public:
+  JobQueue(size_t capacity);
+
+  // Must not be called concurrently with push() or pop().
+  void reset();
+
+  bool push(int job);
+  bool pop(int* job);
+
+private:
+  struct Cell {
+    atomic<size_t> sequence;
+    int job;
+  };
+
+  size_t _mask;
+  unique_ptr<Cell[]> _cells;
+  alignas(64) atomic<size_t> _enqueue_pos;
+  alignas(64) atomic<size_t> _dequeue_pos;
+};
+
+// Per-program scheduling state for the jobs of a Spec.
+class JobSet {
+public:
+  JobSet(const Spec* spec);
+
+  // Prepare for the next block. Must not be called while workers are running the jobs.
+  void reset();
+
+  const Spec* spec;
+  unique_ptr<atomic<int>[]> pending;
+  JobQueue ready;
+  atomic<int> remaining;
+};
+
+class JobRunner {
+public:
+  virtual ~JobRunner() {}
+  virtual Status run_job(int worker_idx, int job_idx) = 0;
+};
+
+class WorkerPool {
+public:
+  WorkerPool(Logger* logger);
+  ~WorkerPool();
+
+  Status setup(uint32_t num_workers);
+  void cleanup();
+
+  // Number of threads, which can run jobs concurrently, including the calling thread.
+  uint32_t num_workers() const { return _threads.size() + 1; }
+
+  // Runs all jobs of job_set and returns once all of them have completed. The calling thread
+  // participates as worker 0, the pool threads are workers 1..N.
+  Status run(JobSet* job_set, JobRunner* runner);
+
+private:
+  void worker_main(int worker_idx);
+  void process_jobs(int worker_idx);
+  void set_error(const Status& status);
+
+  Logger* _logger;
+  vector<unique_ptr<thread>> _threads;
+  sem_t _start;
+  bool _start_initialized = false;
+  atomic<bool> _stop;
+
+  JobSet* _job_set = nullptr;
+  JobRunner* _runner = nullptr;
+  atomic<int> _busy_workers;
+
+  atomic<bool> _failed;
+  const char* _error_file = nullptr;
+  int _error_line = 0;
+  char _error_message[Status::MaxMessageLength];
+};
+
+}  // namespace noisicaa
+
+#endif
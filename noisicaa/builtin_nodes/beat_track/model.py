@@ -66,6 +66,8 @@ class BeatTrackConnector(base_track.MeasuredTrackConnector):
 
 
 class Beat(_model.Beat):
+    __slots__ = ()
+
     def create(
             self, *,
             time: Optional[audioproc.MusicalDuration] = None,
@@ -103,6 +103,8 @@ class ControlTrackConnector(node_connector.NodeConnector):
 
 
 class ControlPoint(_model.ControlPoint):
+    __slots__ = ()
+
     def create(
             self, *,
             time: Optional[audioproc.MusicalTime] = None, value: float = None,
@@ -44,6 +44,8 @@ bool control_point_comp(const ControlPoint &e1, const ControlPoint &e2) {
 
 namespace noisicaa {
 
+static const uint32_t span_cvgenerator = PerfStats::intern("cvgenerator");
+
 void CVRecipe::apply_mutation(Logger* logger, pb::ProcessorMessage* msg) {
   if (msg->HasExtension(pb::cvgenerator_add_control_point)) {
     const pb::CVGeneratorAddControlPoint& m =
@@ -104,7 +106,7 @@ Status ProcessorCVGenerator::handle_message_internal(pb::ProcessorMessage* msg)
 }
 
 Status ProcessorCVGenerator::process_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) {
-  PerfTracker tracker(ctxt->perf.get(), "cvgenerator");
+  PerfTracker tracker(ctxt->perf.get(), span_cvgenerator);
 
   CVRecipe* recipe = _recipe_manager.get_current();
 
@@ -83,6 +83,8 @@ class EditControlPointsTool(tools.ToolBase):
 
             self.__move_range = (range_left, range_right)
 
+            self.project.begin_gesture('%s: Change control point' % self.track.track.name)
+
             evt.accept()
             return
 
@@ -98,6 +100,7 @@ class EditControlPointsTool(tools.ToolBase):
         if evt.button() == Qt.RightButton and self.__moving_point is not None:
             self.track.setPointPos(self.__moving_point, self.__moving_point_original_pos)
             self.__moving_point = None
+            self.project.end_gesture()
             evt.accept()
             return
 
@@ -160,6 +163,7 @@ class EditControlPointsTool(tools.ToolBase):
             with self.project.apply_mutations('%s: Change control point' % self.track.track.name):
                 self.track.highlightedPoint().point.time = new_time
                 self.track.highlightedPoint().point.value = new_value
+            self.project.end_gesture()
 
             evt.accept()
             return
@@ -173,6 +177,7 @@ class EditControlPointsTool(tools.ToolBase):
             if self.__moving_point is not None:
                 self.track.setPointPos(self.__moving_point, self.__moving_point_original_pos)
                 self.__moving_point = None
+                self.project.end_gesture()
 
             time = self.track.xToTime(evt.pos().x())
             for point in self.track.track.points:
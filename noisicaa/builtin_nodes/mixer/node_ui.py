@@ -65,6 +65,8 @@ class MixerNodeWidget(ui_base.ProjectMixin, core.AutoCleanupMixin, QtWidgets.QWi
         self.__hp_cutoff_control.connect(
             self.__hp_cutoff_dial.valueChanged,
             self.__hp_cutoff_dial.setValue)
+        self.__hp_cutoff_control.connectDrag(
+            self.__hp_cutoff_dial.dragStarted, self.__hp_cutoff_dial.dragFinished)
 
         self.__hp_cutoff_label = QtWidgets.QLabel("HP", self)
         self.__hp_cutoff_label.setFont(label_font)
@@ -84,6 +86,8 @@ class MixerNodeWidget(ui_base.ProjectMixin, core.AutoCleanupMixin, QtWidgets.QWi
         self.__lp_cutoff_control.connect(
             self.__lp_cutoff_dial.valueChanged,
             self.__lp_cutoff_dial.setValue)
+        self.__lp_cutoff_control.connectDrag(
+            self.__lp_cutoff_dial.dragStarted, self.__lp_cutoff_dial.dragFinished)
 
         self.__lp_cutoff_label = QtWidgets.QLabel("LP", self)
         self.__lp_cutoff_label.setFont(label_font)
@@ -100,6 +104,8 @@ class MixerNodeWidget(ui_base.ProjectMixin, core.AutoCleanupMixin, QtWidgets.QWi
         self.__gain_dial.setDisplayFunc(lambda value: '%+.2fdB' % value)
         self.__gain_control.connect(
             self.__gain_dial.valueChanged, self.__gain_dial.setValue)
+        self.__gain_control.connectDrag(
+            self.__gain_dial.dragStarted, self.__gain_dial.dragFinished)
 
         self.__gain_slider = gain_slider.GainSlider(self)
         self.__gain_slider.setRange(-40.0, 20.0)
@@ -107,6 +113,8 @@ class MixerNodeWidget(ui_base.ProjectMixin, core.AutoCleanupMixin, QtWidgets.QWi
         self.__gain_slider.setDisplayFunc(lambda value: '%+.2fdB' % value)
         self.__gain_control.connect(
             self.__gain_slider.valueChanged, self.__gain_slider.setValue)
+        self.__gain_control.connectDrag(
+            self.__gain_slider.dragStarted, self.__gain_slider.dragFinished)
 
         self.__gain_label = QtWidgets.QLabel("Gain", self)
         self.__gain_label.setFont(label_font)
@@ -124,6 +132,8 @@ class MixerNodeWidget(ui_base.ProjectMixin, core.AutoCleanupMixin, QtWidgets.QWi
         self.__pan_control.connect(
             self.__pan_dial.valueChanged,
             self.__pan_dial.setValue)
+        self.__pan_control.connectDrag(
+            self.__pan_dial.dragStarted, self.__pan_dial.dragFinished)
 
         self.__pan_label = QtWidgets.QLabel("Pan", self)
         self.__pan_label.setFont(label_font)
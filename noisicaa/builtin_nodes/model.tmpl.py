@@ -44,6 +44,8 @@ if typing.TYPE_CHECKING:
 
 {% for cls in desc.classes %}
 class {{cls.name}}({{cls.super_class|join(', ')}}):  # pylint: disable=abstract-method
+    __slots__ = ()
+
     class {{cls.name}}Spec(music.ObjectSpec):
         proto_type = '{{cls.proto_ext_name}}'
         proto_ext = model_registry_pb2.{{cls.proto_ext_name}}
@@ -51,12 +53,6 @@ class {{cls.name}}({{cls.super_class|join(', ')}}):  # pylint: disable=abstract-
         {{prop.name}} = music.{{prop|prop_cls}}({{prop|prop_cls_type}}{% if prop.HasField("allow_none") %}, allow_none={{prop.allow_none}}{% endif %}{% if prop.HasField("default") %}, default={{prop.default}}{% endif %})
 {%- endfor %}
 
-    def __init__(self, **kwargs: typing.Any) -> None:
-        super().__init__(**kwargs)
-{% for prop in cls.properties %}
-        self.change_callbacks['{{prop.name}}'] = core.Callback[music.{{prop|change_cls}}]()
-{%- endfor %}
-
 {% for prop in cls.properties %}
     def _get_{{prop.name}}(self) -> {{prop|py_type}}:
         return self.get_property_value('{{prop.name}}')
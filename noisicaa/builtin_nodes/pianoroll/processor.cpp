@@ -58,6 +58,8 @@ bool event_comp(const PianoRollEvent &e1, const PianoRollEvent &e2) {
 
 namespace noisicaa {
 
+static const uint32_t span_pianoroll = PerfStats::intern("pianoroll");
+
 string PianoRollEvent::to_string() const {
   const char* type_str = "??";
   switch (type) {
@@ -335,7 +337,7 @@ void ProcessorPianoRoll::note_off(
 }
 
 Status ProcessorPianoRoll::process_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) {
-  PerfTracker tracker(ctxt->perf.get(), "pianoroll");
+  PerfTracker tracker(ctxt->perf.get(), span_pianoroll);
 
   PianoRoll* pianoroll = _pianoroll_manager.get_current();
 
@@ -162,6 +162,8 @@ class PianoRollTrackConnector(node_connector.NodeConnector):
 
 
 class PianoRollEvent(_model.PianoRollEvent):
+    __slots__ = ()
+
     def create(self, *, midi_event: value_types.MidiEvent = None, **kwargs: Any) -> None:
         super().create(**kwargs)
 
@@ -258,6 +260,8 @@ class Interval(object):
 
 
 class PianoRollSegment(_model.PianoRollSegment):
+    __slots__ = ()
+
     def create(self, *, duration: audioproc.MusicalDuration = None, **kwargs: Any) -> None:
         super().create(**kwargs)
 
@@ -302,6 +306,8 @@ class PianoRollSegment(_model.PianoRollSegment):
 
 
 class PianoRollSegmentRef(_model.PianoRollSegmentRef):
+    __slots__ = ()
+
     def create(
             self, *,
             time: audioproc.MusicalTime = None,
@@ -22,11 +22,14 @@
 
 import asyncio
 import base64
+import concurrent.futures
 import contextlib
 import logging
+import mmap
 import os
 import os.path
 import subprocess
+import threading
 import time as time_lib
 from typing import Any, Optional, List, Callable, Iterator
 
@@ -42,6 +45,7 @@ from noisicaa.music import node_connector
 from noisicaa.music import samples as samples_lib
 from . import processor_messages
 from . import node_description
+from . import peaks
 from . import _model
 
 logger = logging.getLogger(__name__)
@@ -115,6 +119,8 @@ class SampleTrackConnector(node_connector.NodeConnector):
 
 
 class SampleRef(_model.SampleRef):
+    __slots__ = ()
+
     def create(
             self, *,
             time: Optional[audioproc.MusicalTime] = None,
@@ -130,6 +136,10 @@ class SampleLoadError(Exception):
     pass
 
 
+class SampleImportCancelled(Exception):
+    pass
+
+
 class SampleReader(object):
     def __init__(self) -> None:
         self.sample_rate = None  # type: int
@@ -201,10 +211,38 @@ class FFMpegReader(SampleReader):
         return samples
 
 
+def detect_mime_type(path: str) -> str:
+    """Guess the MIME type of an audio file from its leading magic bytes."""
+
+    try:
+        with open(path, 'rb') as fp:
+            header = fp.read(12)
+    except OSError as exc:
+        raise SampleLoadError(str(exc)) from None
+
+    if header[0:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return 'audio/x-wav'
+    if header[0:4] == b'fLaC':
+        return 'audio/x-flac'
+    if header[0:3] == b'ID3':
+        return 'audio/mpeg'
+    if len(header) >= 2 and header[0] == 0xff:
+        # ADTS frames use the (otherwise reserved) MPEG layer 0, so they must be checked first.
+        if header[1] & 0xf6 == 0xf0:
+            return 'audio/x-hx-aac-adts'
+        if header[1] & 0xe0 == 0xe0 and header[1] & 0x06 != 0:
+            return 'audio/mpeg'
+    return 'application/octet-stream'
+
+
+def is_sample_file(path: str) -> bool:
+    mtype = detect_mime_type(path)
+    return mtype in SndFileReader.mime_types or mtype in FFMpegReader.mime_types
+
+
 @contextlib.contextmanager
 def open_sample(path: str) -> Iterator[SampleReader]:
-    mtype = subprocess.check_output(
-        ['/usr/bin/file', '--mime-type', '--brief', path]).decode('ascii').strip()
+    mtype = detect_mime_type(path)
 
     reader = None  # type: SampleReader
     if mtype in SndFileReader.mime_types:
@@ -232,42 +270,166 @@ class LoadedSample(object):
     def discard(self) -> None:
         for raw_path in self.raw_paths:
             raw_path = os.path.join(self.__data_dir, raw_path)
-            if os.path.exists(raw_path):
-                os.unlink(raw_path)
+            for path in (raw_path, peaks.peaks_path(raw_path)):
+                if os.path.exists(path):
+                    os.unlink(path)
 
 
-class SampleTrack(_model.SampleTrack):
-    def create_node_connector(
-            self, message_cb: Callable[[audioproc.ProcessorMessage], None],
-            audioproc_client: audioproc.AbstractAudioProcClient,
-    ) -> SampleTrackConnector:
-        return SampleTrackConnector(
-            node=self, message_cb=message_cb, audioproc_client=audioproc_client)
+class RawChannelWriter(object):
+    """Writes a single channel into a preallocated, memory mapped raw sample file.
 
-    @property
-    def description(self) -> node_db.NodeDescription:
-        return node_description.SampleTrackDescription
+    The file is grown if the reader delivers more samples than announced (the length reported
+    for compressed formats is only an estimate) and truncated to the actual length on close().
+    """
 
-    async def load_sample(
-            self,
+    def __init__(self, path: str, capacity: int) -> None:
+        self.num_samples = 0
+
+        self.__fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        self.__map = None  # type: mmap.mmap
+        self.__buf = None  # type: numpy.ndarray
+        self.__capacity = 0
+
+        try:
+            # Empty files can't be mapped.
+            self.__resize(max(1, capacity))
+        except:
+            self.close()
+            raise
+
+    def __unmap(self) -> None:
+        if self.__map is not None:
+            # The numpy view must be gone, before the mmap can be closed.
+            self.__buf = None
+            self.__map.close()
+            self.__map = None
+
+    def __resize(self, capacity: int) -> None:
+        self.__unmap()
+        os.ftruncate(self.__fd, 4 * capacity)
+        self.__map = mmap.mmap(self.__fd, 4 * capacity)
+        self.__buf = numpy.frombuffer(self.__map, dtype=numpy.float32)
+        self.__capacity = capacity
+
+    def write(self, samples: numpy.ndarray) -> None:
+        end = self.num_samples + len(samples)
+        if end > self.__capacity:
+            self.__resize(max(end, 2 * self.__capacity))
+        self.__buf[self.num_samples:end] = samples
+        self.num_samples = end
+
+    def close(self) -> None:
+        if self.__fd < 0:
+            return
+
+        try:
+            self.__unmap()
+            os.ftruncate(self.__fd, 4 * self.num_samples)
+        finally:
+            os.close(self.__fd)
+            self.__fd = -1
+
+
+class SampleImportJob(object):
+    """Import of a single file, running on one of the worker threads of a SampleImporter.
+
+    The progress_cb is called on the event loop. If it raises an exception, the import is
+    cancelled and wait() raises that exception.
+    """
+
+    chunk_size = 65536
+
+    def __init__(
+            self, *,
             path: str,
+            data_dir: str,
             event_loop: asyncio.AbstractEventLoop,
-            progress_cb: Callable[[float], None] = None,
-    ) -> LoadedSample:
-        smpl = LoadedSample(self.project.data_dir)
-        smpl.path = path
+            progress_cb: Callable[[float], None] = None
+    ) -> None:
+        self.path = path
+
+        self.__data_dir = data_dir
+        self.__event_loop = event_loop
+        self.__progress_cb = progress_cb
+        self.__progress = 0.0
+        self.__cancelled = threading.Event()
+        self.__error = None  # type: Exception
+        self.__future = None  # type: concurrent.futures.Future
+
+    @property
+    def progress(self) -> float:
+        if self.done and self.__future.exception() is None:
+            return 1.0
+        return self.__progress
+
+    @property
+    def done(self) -> bool:
+        return self.__future is not None and self.__future.done()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.__cancelled.is_set()
+
+    def cancel(self) -> None:
+        self.__cancelled.set()
+
+    def start(self, executor: concurrent.futures.Executor) -> None:
+        assert self.__future is None
+        self.__future = executor.submit(self.__main)
+
+    async def wait(self) -> LoadedSample:
+        assert self.__future is not None
+
+        done_fut = asyncio.wrap_future(self.__future, loop=self.__event_loop)
+        try:
+            smpl = await asyncio.shield(done_fut, loop=self.__event_loop)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        except SampleImportCancelled:
+            if self.__error is not None:
+                raise self.__error
+            raise
+
+        if self.__error is not None:
+            # The progress_cb failed, after the last chunk was already written.
+            smpl.discard()
+            raise self.__error
+
+        return smpl
+
+    def __report_progress(self, progress: float) -> None:
+        self.__progress = progress
+        if self.__progress_cb is None or self.cancelled:
+            return
+
+        try:
+            self.__progress_cb(progress)
+        except Exception as exc:  # pylint: disable=broad-except
+            self.__error = exc
+            self.cancel()
+
+    def __check_cancelled(self) -> None:
+        if self.cancelled:
+            raise SampleImportCancelled("Import of '%s' was cancelled." % self.path)
+
+    def __main(self) -> LoadedSample:
+        self.__check_cancelled()
+
+        smpl = LoadedSample(self.__data_dir)
+        smpl.path = self.path
 
         sample_name_base = base64.b32encode(os.urandom(15)).decode('ascii')
         sample_path_base = os.path.join('samples', sample_name_base)
 
         os.makedirs(
-            os.path.dirname(os.path.join(self.project.data_dir, sample_path_base)),
+            os.path.dirname(os.path.join(self.__data_dir, sample_path_base)),
             exist_ok=True)
 
-        logger.info("Importing sample from '%s' as '%s'...", path, sample_name_base)
+        logger.info("Importing sample from '%s' as '%s'...", self.path, sample_name_base)
         t0 = time_lib.time()
         next_progress = t0 + 0.5
-        with open_sample(path) as reader:
+        with open_sample(self.path) as reader:
             logger.info("Sample rate: %d", reader.sample_rate)
             logger.info("Num samples: approx. %d", reader.num_samples)
             logger.info("Num channels: %d", reader.num_channels)
@@ -276,41 +438,169 @@ class SampleTrack(_model.SampleTrack):
             smpl.raw_paths = [
                 sample_path_base + '-ch%02d.raw' % ch
                 for ch in range(reader.num_channels)]
-            raw_fps = []
             try:
-                for raw_path in smpl.raw_paths:
-                    raw_path = os.path.join(self.project.data_dir, raw_path)
-                    raw_fps.append(open(raw_path, 'wb'))
+                writers = []  # type: List[RawChannelWriter]
+                try:
+                    for raw_path in smpl.raw_paths:
+                        writers.append(RawChannelWriter(
+                            os.path.join(self.__data_dir, raw_path), reader.num_samples))
+
+                    smpl.num_samples = 0
+                    while True:
+                        self.__check_cancelled()
+
+                        data = reader.read_samples(self.chunk_size)
+                        if len(data) == 0:
+                            break
+                        assert data.shape[1] == len(writers), (data.shape, len(writers))
+
+                        # Each column is a strided view into the interleaved frames, so numpy
+                        # deinterleaves it while copying into the mapped file.
+                        for ch, writer in enumerate(writers):
+                            writer.write(data[:, ch])
+                        smpl.num_samples += len(data)
+
+                        if time_lib.time() >= next_progress:
+                            self.__event_loop.call_soon_threadsafe(
+                                self.__report_progress,
+                                min(1.0, float(smpl.num_samples) / max(1, reader.num_samples)))
+                            next_progress = time_lib.time() + 0.1
+
+                finally:
+                    for writer in writers:
+                        writer.close()
 
-                smpl.num_samples = 0
-                while True:
-                    data = reader.read_samples(10240)
-                    if len(data) == 0:
-                        break
-                    smpl.num_samples += len(data)
-
-                    data = data.transpose()
-                    assert len(data) == len(raw_fps), (len(data), len(raw_fps))
-                    for fp, samples in zip(raw_fps, data):
-                        fp.write(samples.tobytes('C'))
-
-                    if progress_cb is not None and time_lib.time() >= next_progress:
-                        progress_cb(min(1.0, float(smpl.num_samples) / reader.num_samples))
-                        next_progress = time_lib.time() + 0.1
+                for raw_path in smpl.raw_paths:
+                    self.__check_cancelled()
+                    raw_path = os.path.join(self.__data_dir, raw_path)
+                    peaks.PeakPyramid.build_from_file(raw_path).save(peaks.peaks_path(raw_path))
 
-                    await asyncio.sleep(0, loop=event_loop)
+                self.__check_cancelled()
 
             except:
                 smpl.discard()
                 raise
 
-            finally:
-                for fp in raw_fps:
-                    fp.close()
+        logger.info("Sample '%s' imported in %.3fsec", self.path, time_lib.time() - t0)
+        return smpl
 
-            logger.info("Sample imported in %.3fsec", time_lib.time() - t0)
 
-        return smpl
+class SampleImporter(object):
+    """Imports audio files into a project, decoding several files at once on worker threads."""
+
+    def __init__(
+            self, *,
+            data_dir: str,
+            event_loop: asyncio.AbstractEventLoop,
+            max_workers: int = None
+    ) -> None:
+        self.__data_dir = data_dir
+        self.__event_loop = event_loop
+
+        if max_workers is None:
+            max_workers = min(8, os.cpu_count() or 1)
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    def close(self) -> None:
+        # Cancelled jobs clean up after themselves, no need to wait for them.
+        self.__executor.shutdown(wait=False)
+
+    def start_import(
+            self, path: str, progress_cb: Callable[[float], None] = None
+    ) -> SampleImportJob:
+        job = SampleImportJob(
+            path=path,
+            data_dir=self.__data_dir,
+            event_loop=self.__event_loop,
+            progress_cb=progress_cb)
+        job.start(self.__executor)
+        return job
+
+    async def wait(self, jobs: List[SampleImportJob]) -> List[LoadedSample]:
+        """Wait for all jobs to complete.
+
+        If any job fails, all other jobs are cancelled, already imported samples are discarded
+        and the first error is raised.
+        """
+
+        waiters = [asyncio.ensure_future(job.wait(), loop=self.__event_loop) for job in jobs]
+        if not waiters:
+            return []
+
+        try:
+            _, pending = await asyncio.wait(
+                waiters, loop=self.__event_loop, return_when=asyncio.FIRST_EXCEPTION)
+            if pending:
+                for job in jobs:
+                    job.cancel()
+                await asyncio.wait(pending, loop=self.__event_loop)
+
+        except asyncio.CancelledError:
+            for job in jobs:
+                job.cancel()
+            for waiter in waiters:
+                if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                    waiter.result().discard()
+                else:
+                    waiter.cancel()
+            raise
+
+        errors = [
+            waiter.exception() for waiter in waiters
+            if not waiter.cancelled() and waiter.exception() is not None]
+        if errors:
+            for waiter in waiters:
+                if not waiter.cancelled() and waiter.exception() is None:
+                    waiter.result().discard()
+            # Report the error, which caused the other jobs to be cancelled.
+            errors.sort(key=lambda exc: isinstance(exc, SampleImportCancelled))
+            raise errors[0]
+
+        return [waiter.result() for waiter in waiters]
+
+
+class SampleTrack(_model.SampleTrack):
+    def create_node_connector(
+            self, message_cb: Callable[[audioproc.ProcessorMessage], None],
+            audioproc_client: audioproc.AbstractAudioProcClient,
+    ) -> SampleTrackConnector:
+        return SampleTrackConnector(
+            node=self, message_cb=message_cb, audioproc_client=audioproc_client)
+
+    @property
+    def description(self) -> node_db.NodeDescription:
+        return node_description.SampleTrackDescription
+
+    async def load_sample(
+            self,
+            path: str,
+            event_loop: asyncio.AbstractEventLoop,
+            progress_cb: Callable[[float], None] = None,
+    ) -> LoadedSample:
+        loaded_samples = await self.load_samples([path], event_loop, progress_cb)
+        return loaded_samples[0]
+
+    async def load_samples(
+            self,
+            paths: List[str],
+            event_loop: asyncio.AbstractEventLoop,
+            progress_cb: Callable[[float], None] = None,
+    ) -> List[LoadedSample]:
+        importer = SampleImporter(data_dir=self.project.data_dir, event_loop=event_loop)
+        try:
+            jobs = []  # type: List[SampleImportJob]
+
+            def job_progress(_: float) -> None:
+                if progress_cb is not None:
+                    progress_cb(sum(job.progress for job in jobs) / len(jobs))
+
+            for path in paths:
+                jobs.append(importer.start_import(path, job_progress))
+
+            return await importer.wait(jobs)
+
+        finally:
+            importer.close()
 
     def create_sample(
             self,
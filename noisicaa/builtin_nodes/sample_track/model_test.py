@@ -32,6 +32,7 @@ from noisicaa.music import project
 from noisicaa.music import samples
 from noisicaa.builtin_nodes import processor_message_registry_pb2
 from . import model
+from . import peaks
 
 
 class SampleTrackConnectorTest(unittest_mixins.NodeDBMixin, unittest.AsyncTestCase):
@@ -188,6 +189,69 @@ class SampleTrackTest(base_track_test.TrackTestMixin, unittest.AsyncTestCase):
         self.assertEqual(loaded_sample.sample_rate, 44100)
         self.assertEqual(len(loaded_sample.raw_paths), 2)
 
+    async def test_load_samples(self):
+        paths = [
+            os.path.join(unittest.TESTDATA_DIR, 'future-thunder1.wav'),
+            os.path.join(unittest.TESTDATA_DIR, 'future-thunder1.flac'),
+            os.path.join(unittest.TESTDATA_DIR, 'future-thunder1.wav'),
+        ]
+        track = await self._add_track()
+        loaded_samples = await track.load_samples(paths, self.loop)
+        self.assertEqual([loaded_sample.path for loaded_sample in loaded_samples], paths)
+        self.assertEqual(
+            [loaded_sample.num_samples for loaded_sample in loaded_samples],
+            [126208, 126208, 126208])
+        raw_paths = set()
+        for loaded_sample in loaded_samples:
+            for raw_path in loaded_sample.raw_paths:
+                self.assertEqual(
+                    os.path.getsize(os.path.join(self.project.data_dir, raw_path)), 4 * 126208)
+                raw_paths.add(raw_path)
+        self.assertEqual(len(raw_paths), 6)
+
+    async def test_load_samples_unsupported(self):
+        paths = [
+            os.path.join(unittest.TESTDATA_DIR, 'future-thunder1.wav'),
+            os.path.join(unittest.TESTDATA_DIR, 'future-thunder1.readme'),
+        ]
+        track = await self._add_track()
+        with self.assertRaises(model.SampleLoadError):
+            await track.load_samples(paths, self.loop)
+        samples_dir = os.path.join(self.project.data_dir, 'samples')
+        if os.path.isdir(samples_dir):
+            self.assertEqual(os.listdir(samples_dir), [])
+
+    async def test_cancel_import(self):
+        importer = model.SampleImporter(
+            data_dir=self.project.data_dir, event_loop=self.loop, max_workers=1)
+        try:
+            path = os.path.join(unittest.TESTDATA_DIR, 'future-thunder1.wav')
+            job1 = importer.start_import(path)
+            job2 = importer.start_import(path)
+            job2.cancel()
+
+            loaded_sample = await job1.wait()
+            with self.assertRaises(model.SampleImportCancelled):
+                await job2.wait()
+
+            expected_files = []
+            for raw_path in loaded_sample.raw_paths:
+                expected_files.append(os.path.basename(raw_path))
+                expected_files.append(os.path.basename(peaks.peaks_path(raw_path)))
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(self.project.data_dir, 'samples'))),
+                sorted(expected_files))
+        finally:
+            importer.close()
+
+    def test_detect_mime_type(self):
+        self.assertEqual(
+            model.detect_mime_type(os.path.join(unittest.TESTDATA_DIR, 'future-thunder1.wav')),
+            'audio/x-wav')
+        self.assertEqual(
+            model.detect_mime_type(os.path.join(unittest.TESTDATA_DIR, 'future-thunder1.readme')),
+            'application/octet-stream')
+
     async def test_create_sample(self):
         track = await self._add_track()
         loaded_sample = await track.load_sample(
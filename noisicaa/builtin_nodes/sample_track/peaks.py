@@ -0,0 +1,247 @@
+#!/usr/bin/python3
+
+# @begin:license
+#
+# Copyright (c) 2015-2019, Benjamin Niemann <pink@odahoda.de>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# @end:license
+
+import logging
+import os
+import os.path
+import struct
+from typing import List, Tuple
+
+import numpy
+
+logger = logging.getLogger(__name__)
+
+# Number of samples, which are summarized by a single entry of each level.
+BLOCK_SIZES = (256, 4096, 65536)
+
+# Columns of the level arrays.
+MIN = 0
+MAX = 1
+MEAN_SQUARE = 2
+
+_MAGIC = b'NPEAKS01'
+_HEADER = struct.Struct('<8sQI')
+_BLOCK_SIZE = struct.Struct('<I')
+
+
+def peaks_path(raw_path: str) -> str:
+    return os.path.splitext(raw_path)[0] + '.peaks'
+
+
+def _summarize(samples: numpy.ndarray, block_size: int) -> numpy.ndarray:
+    if len(samples) == 0:
+        return numpy.zeros((0, 3), dtype=numpy.float32)
+
+    starts = numpy.arange(0, len(samples), block_size)
+    counts = numpy.diff(numpy.append(starts, len(samples)))
+
+    level = numpy.empty((len(starts), 3), dtype=numpy.float32)
+    level[:, MIN] = numpy.minimum.reduceat(samples, starts)
+    level[:, MAX] = numpy.maximum.reduceat(samples, starts)
+    level[:, MEAN_SQUARE] = (
+        numpy.add.reduceat(numpy.square(samples, dtype=numpy.float64), starts) / counts)
+    return level
+
+
+def _merge(
+        level: numpy.ndarray, block_size: int, factor: int, num_samples: int
+) -> numpy.ndarray:
+    if len(level) == 0:
+        return level
+
+    # Only the last block can be shorter than block_size.
+    counts = numpy.full(len(level), block_size, dtype=numpy.float64)
+    counts[-1] = num_samples - (len(level) - 1) * block_size
+
+    starts = numpy.arange(0, len(level), factor)
+    merged = numpy.empty((len(starts), 3), dtype=numpy.float32)
+    merged[:, MIN] = numpy.minimum.reduceat(level[:, MIN], starts)
+    merged[:, MAX] = numpy.maximum.reduceat(level[:, MAX], starts)
+    merged[:, MEAN_SQUARE] = (
+        numpy.add.reduceat(level[:, MEAN_SQUARE] * counts, starts)
+        / numpy.add.reduceat(counts, starts))
+    return merged
+
+
+class PeakPyramid(object):
+    """Min, max and mean square of a channel at several resolutions.
+
+    Level i has one row per BLOCK_SIZES[i] samples, so drawing a waveform never has to look at
+    more than a few entries per pixel, no matter how far the view is zoomed out.
+    """
+
+    def __init__(self, num_samples: int, levels: List[Tuple[int, numpy.ndarray]]) -> None:
+        self.num_samples = num_samples
+        self.levels = levels
+
+    @classmethod
+    def build(cls, samples: numpy.ndarray) -> 'PeakPyramid':
+        # Process the samples in slices, which are a multiple of all block sizes, to keep the
+        # memory usage for temporaries bounded.
+        slice_size = 16 * BLOCK_SIZES[-1]
+        parts = [
+            _summarize(samples[pos:pos + slice_size], BLOCK_SIZES[0])
+            for pos in range(0, len(samples), slice_size)]
+        if parts:
+            base = numpy.concatenate(parts)
+        else:
+            base = _summarize(samples, BLOCK_SIZES[0])
+
+        levels = [(BLOCK_SIZES[0], base)]
+        for block_size in BLOCK_SIZES[1:]:
+            prev_block_size, prev_level = levels[-1]
+            levels.append((
+                block_size,
+                _merge(prev_level, prev_block_size, block_size // prev_block_size,
+                       len(samples))))
+
+        return cls(len(samples), levels)
+
+    @classmethod
+    def build_from_file(cls, raw_path: str) -> 'PeakPyramid':
+        if os.path.getsize(raw_path) == 0:
+            # Empty files can't be mapped.
+            return cls.build(numpy.zeros(0, dtype=numpy.float32))
+
+        samples = numpy.memmap(raw_path, dtype=numpy.float32, mode='r')
+        try:
+            return cls.build(samples)
+        finally:
+            del samples
+
+    @classmethod
+    def load(cls, path: str) -> 'PeakPyramid':
+        with open(path, 'rb') as fp:
+            magic, num_samples, num_levels = _HEADER.unpack(fp.read(_HEADER.size))
+            if magic != _MAGIC:
+                raise ValueError("'%s' is not a peaks file." % path)
+
+            block_sizes = [
+                _BLOCK_SIZE.unpack(fp.read(_BLOCK_SIZE.size))[0]
+                for _ in range(num_levels)]
+            levels = []
+            for block_size in block_sizes:
+                num_blocks = (num_samples + block_size - 1) // block_size
+                level = numpy.fromfile(fp, dtype=numpy.float32, count=3 * num_blocks)
+                if len(level) != 3 * num_blocks:
+                    raise ValueError("'%s' is truncated." % path)
+                levels.append((block_size, level.reshape(num_blocks, 3)))
+
+        return cls(num_samples, levels)
+
+    def save(self, path: str) -> None:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as fp:
+            fp.write(_HEADER.pack(_MAGIC, self.num_samples, len(self.levels)))
+            for block_size, _ in self.levels:
+                fp.write(_BLOCK_SIZE.pack(block_size))
+            for _, level in self.levels:
+                fp.write(level.astype(numpy.float32).tobytes('C'))
+        os.replace(tmp_path, path)
+
+    def summarize_columns(
+            self, raw: numpy.ndarray, boundaries: numpy.ndarray
+    ) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """Compute the waveform for a row of pixel columns.
+
+        Column i covers the samples from boundaries[i] to boundaries[i + 1] (inclusive), which
+        may be outside of the sample. The summary is taken from the coarsest level, which still
+        has at least one entry per column, or directly from the raw samples, if the view is
+        zoomed in further than that.
+
+        Returns (valid, min, max, rms). Columns with valid == False are outside of the sample.
+        """
+
+        width = len(boundaries) - 1
+        num_samples = self.num_samples
+
+        starts = boundaries[:-1]
+        valid = (starts >= 0) & (starts < num_samples - 1)
+        minimum = numpy.zeros(width, dtype=numpy.float32)
+        maximum = numpy.zeros(width, dtype=numpy.float32)
+        rms = numpy.full(width, numpy.nan, dtype=numpy.float32)
+
+        columns = numpy.flatnonzero(valid)
+        if len(columns) == 0:
+            return valid, minimum, maximum, rms
+        c0 = columns[0]
+        c1 = columns[-1] + 1
+
+        starts = starts[c0:c1]
+        ends = numpy.maximum(numpy.minimum(num_samples, boundaries[c0 + 1:c1 + 1] + 1), starts + 1)
+
+        samples_per_column = float(boundaries[-1] - boundaries[0]) / max(1, width)
+        block_size = 1
+        data = None  # type: numpy.ndarray
+        for level_block_size, level in self.levels:
+            if level_block_size <= samples_per_column:
+                block_size = level_block_size
+                data = level
+
+        if data is None:
+            samples = raw[starts[0]:ends[-1]]
+            indices = starts - starts[0]
+            minimum[c0:c1] = numpy.minimum.reduceat(samples, indices)
+            maximum[c0:c1] = numpy.maximum.reduceat(samples, indices)
+            mean_square = (
+                numpy.add.reduceat(numpy.square(samples, dtype=numpy.float64), indices)
+                / numpy.maximum(1, numpy.diff(numpy.append(indices, len(samples)))))
+
+        else:
+            # Round the column edges to the nearest block, so adjacent columns share the blocks,
+            # which straddle their common edge, without leaving gaps.
+            last_block = (ends[-1] + block_size - 1) // block_size
+            first_blocks = numpy.minimum((starts + block_size // 2) // block_size, last_block - 1)
+            blocks = data[first_blocks[0]:last_block]
+            indices = first_blocks - first_blocks[0]
+            minimum[c0:c1] = numpy.minimum.reduceat(blocks[:, MIN], indices)
+            maximum[c0:c1] = numpy.maximum.reduceat(blocks[:, MAX], indices)
+            mean_square = (
+                numpy.add.reduceat(blocks[:, MEAN_SQUARE], indices)
+                / numpy.maximum(1, numpy.diff(numpy.append(indices, len(blocks)))))
+
+        # Like the min/max, the RMS of very short spans isn't meaningful.
+        rms[c0:c1] = numpy.where(ends - starts > 10, numpy.sqrt(mean_square), numpy.nan)
+
+        return valid, minimum, maximum, rms
+
+
+def load_or_build(raw_path: str) -> PeakPyramid:
+    """Load the peaks for a raw file, creating them, if they are missing or outdated."""
+
+    path = peaks_path(raw_path)
+    num_samples = os.path.getsize(raw_path) // 4
+    try:
+        pyramid = PeakPyramid.load(path)
+    except (OSError, ValueError, struct.error):
+        pass
+    else:
+        if pyramid.num_samples == num_samples:
+            return pyramid
+
+    logger.info("Building peaks for '%s'...", raw_path)
+    pyramid = PeakPyramid.build_from_file(raw_path)
+    try:
+        pyramid.save(path)
+    except OSError as exc:
+        logger.warning("Failed to write peaks to '%s': %s", path, exc)
+    return pyramid
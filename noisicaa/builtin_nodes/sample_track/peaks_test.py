@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+
+# @begin:license
+#
+# Copyright (c) 2015-2019, Benjamin Niemann <pink@odahoda.de>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# @end:license
+
+import os
+import os.path
+import shutil
+import uuid
+
+import numpy
+
+from noisidev import unittest
+from noisicaa.constants import TEST_OPTS
+from . import peaks
+
+
+class PeakPyramidTest(unittest.TestCase):
+    def setup_testcase(self):
+        self.path = os.path.join(TEST_OPTS.TMP_DIR, 'peaks-%s' % uuid.uuid4().hex)
+        os.makedirs(self.path)
+        self.addCleanup(shutil.rmtree, self.path, ignore_errors=True)
+
+    def _make_raw(self, samples):
+        raw_path = os.path.join(self.path, 'sample-ch00.raw')
+        samples.astype(numpy.float32).tofile(raw_path)
+        return raw_path
+
+    def test_levels(self):
+        samples = numpy.random.uniform(-1.0, 1.0, 3 * 65536 + 1000).astype(numpy.float32)
+        pyramid = peaks.PeakPyramid.build(samples)
+        self.assertEqual(pyramid.num_samples, len(samples))
+        self.assertEqual([block_size for block_size, _ in pyramid.levels], [256, 4096, 65536])
+
+        for block_size, level in pyramid.levels:
+            num_blocks = (len(samples) + block_size - 1) // block_size
+            self.assertEqual(level.shape, (num_blocks, 3))
+            for idx in (0, num_blocks // 2, num_blocks - 1):
+                block = samples[idx * block_size:(idx + 1) * block_size]
+                self.assertEqual(level[idx, peaks.MIN], block.min())
+                self.assertEqual(level[idx, peaks.MAX], block.max())
+                self.assertAlmostEqual(
+                    level[idx, peaks.MEAN_SQUARE], numpy.mean(block.astype(numpy.float64) ** 2),
+                    places=5)
+
+    def test_empty(self):
+        raw_path = self._make_raw(numpy.zeros(0))
+        pyramid = peaks.load_or_build(raw_path)
+        self.assertEqual(pyramid.num_samples, 0)
+        valid, _, _, _ = pyramid.summarize_columns(
+            numpy.zeros(0, dtype=numpy.float32), numpy.arange(11))
+        self.assertFalse(valid.any())
+
+    def test_save_load(self):
+        raw_path = self._make_raw(numpy.random.uniform(-1.0, 1.0, 100000))
+        pyramid = peaks.load_or_build(raw_path)
+        self.assertTrue(os.path.isfile(peaks.peaks_path(raw_path)))
+
+        loaded = peaks.PeakPyramid.load(peaks.peaks_path(raw_path))
+        self.assertEqual(loaded.num_samples, pyramid.num_samples)
+        for (block_size, level), (loaded_block_size, loaded_level) in zip(
+                pyramid.levels, loaded.levels):
+            self.assertEqual(loaded_block_size, block_size)
+            numpy.testing.assert_array_equal(loaded_level, level)
+
+    def test_rebuild_outdated(self):
+        raw_path = self._make_raw(numpy.zeros(1000))
+        peaks.load_or_build(raw_path)
+        raw_path = self._make_raw(numpy.zeros(2000))
+        self.assertEqual(peaks.load_or_build(raw_path).num_samples, 2000)
+
+    def test_summarize_columns(self):
+        samples = numpy.zeros(1000000, dtype=numpy.float32)
+        samples[500000] = 0.75
+        samples[500001] = -0.5
+        pyramid = peaks.PeakPyramid.build(samples)
+
+        # Summarized from the 4096 and 256 sample levels and from the raw samples.
+        for samples_per_column in (4500, 1000, 10):
+            boundaries = numpy.arange(
+                500000 - 100 * samples_per_column, 500000 + 100 * samples_per_column + 1,
+                samples_per_column)
+            valid, minimum, maximum, rms = pyramid.summarize_columns(samples, boundaries)
+            self.assertTrue(valid.all())
+            self.assertEqual(maximum.max(), 0.75)
+            self.assertEqual(minimum.min(), -0.5)
+            self.assertEqual(numpy.argmax(maximum), 100)
+            self.assertTrue((rms >= 0.0).all())
+
+    def test_summarize_columns_outside(self):
+        samples = numpy.ones(1000, dtype=numpy.float32)
+        pyramid = peaks.PeakPyramid.build(samples)
+        valid, minimum, maximum, _ = pyramid.summarize_columns(
+            samples, numpy.arange(-500, 1600, 100))
+        numpy.testing.assert_array_equal(valid, [False] * 5 + [True] * 10 + [False] * 5)
+        self.assertTrue((minimum[valid] == 1.0).all())
+        self.assertTrue((maximum[valid] == 1.0).all())
@@ -20,6 +20,7 @@
  * @end:license
  */
 
+#include <string.h>
 #include <algorithm>
 
 #include "noisicaa/core/perf_stats.h"
@@ -46,17 +47,23 @@ bool sample_comp(const Sample &e1, const Sample &e2) {
 
 namespace noisicaa {
 
+static const uint32_t span_sample_script = PerfStats::intern("sample_script");
+
 SampleScript::SampleScript(Logger* logger, HostSystem* host_system)
   : _logger(logger),
     _host_system(host_system) {}
 
 SampleScript::~SampleScript() {
+  clear_voices();
   for (auto& sample : samples) {
     _host_system->audio_file->release_audio_file(sample.audio_file);
   }
 }
 
 void SampleScript::apply_mutation(Logger* logger, pb::ProcessorMessage* msg) {
+  // The voices point into samples, so they must go before samples is changed.
+  clear_voices();
+
   if (msg->HasExtension(pb::sample_script_add_sample)) {
     const pb::SampleScriptAddSample& m =
       msg->GetExtension(pb::sample_script_add_sample);
@@ -65,7 +72,8 @@ void SampleScript::apply_mutation(Logger* logger, pb::ProcessorMessage* msg) {
       _host_system->audio_file->load_raw_file(
           m.sample_rate(),
           m.num_samples(),
-          {m.channel_paths().begin(), m.channel_paths().end()});
+          {m.channel_paths().begin(), m.channel_paths().end()},
+          /* streaming= */ true);
     if (!stor_audio_file.is_error()) {
       Sample sample;
       sample.id = m.id();
@@ -95,12 +103,109 @@ void SampleScript::apply_mutation(Logger* logger, pb::ProcessorMessage* msg) {
     assert(false);
   }
 
-  // Invalidate script's cursor (so ProcessorSampleScript::process_block() is forced to do a seek
-  // first).
+  voices.reserve(samples.size());
+
+  // Invalidate script's cursor and sample positions (so ProcessorSampleScript::process_block()
+  // is forced to recompute them first).
   offset = -1;
   tmap_serialnum = 0;
 }
 
+void SampleScript::clear_voices() {
+  for (auto& voice : voices) {
+    voice.sample->audio_file->remove_playhead(voice.playhead);
+  }
+  voices.clear();
+}
+
+void SampleScript::update_positions(TimeMapper* time_mapper) {
+  MusicalTime max_end_time(0, 1);
+  for (auto& sample : samples) {
+    sample.start_pos = time_mapper->musical_to_sample_time(sample.time);
+    sample.end_time = time_mapper->sample_to_musical_time(
+        sample.start_pos + sample.audio_file->num_samples());
+    max_end_time = max(max_end_time, sample.end_time);
+    sample.max_end_time = max_end_time;
+  }
+
+  tmap_serialnum = time_mapper->serialnum();
+  offset = -1;
+}
+
+void SampleScript::seek(TimeMapper* time_mapper, const MusicalTime& time) {
+  clear_voices();
+
+  // All samples before first have ended before time (max_end_time is monotonic) and all samples
+  // from last on start at or after time. Only the ones in between can be playing at time.
+  auto first = upper_bound(
+      samples.begin(), samples.end(), time,
+      [](const MusicalTime& t, const Sample& s) { return t < s.max_end_time; });
+  auto last = lower_bound(
+      first, samples.end(), time,
+      [](const Sample& s, const MusicalTime& t) { return s.time < t; });
+
+  uint64_t pos = time_mapper->musical_to_sample_time(time);
+  for (auto it = first ; it != last ; ++it) {
+    if (it->end_time > time && pos - it->start_pos < it->audio_file->num_samples()) {
+      // We seeked into an audio file.
+      uint32_t file_offset = pos - it->start_pos;
+      voices.emplace_back(
+          Voice { &*it, file_offset, 0, it->audio_file->add_playhead(file_offset) });
+    }
+  }
+
+  // The samples from last on are started by render(), when their time is reached.
+  offset = last - samples.begin();
+}
+
+void SampleScript::render(
+    const SampleTime* stime, float* out_l, float* out_r, uint32_t num_frames) {
+  // Start all samples, which begin in this run of frames, at the frame, whose time range
+  // contains the start time of the sample.
+  const SampleTime* stime_end = stime + num_frames;
+  while ((size_t)offset < samples.size() && samples[offset].time < stime_end[-1].end_time) {
+    const Sample& sample = samples[offset];
+    const SampleTime* start = upper_bound(
+        stime, stime_end, sample.time,
+        [](const MusicalTime& t, const SampleTime& st) { return t < st.end_time; });
+    voices.emplace_back(
+        Voice { &sample, 0, (uint32_t)(start - stime), sample.audio_file->add_playhead(0) });
+    ++offset;
+  }
+
+  // Audio files are played back at one sample per frame, once they started.
+  for (size_t idx = 0 ; idx < voices.size() ; ) {
+    Voice& voice = voices[idx];
+    AudioFile* audio_file = voice.sample->audio_file;
+
+    uint32_t length = min(
+        num_frames - voice.start_frame, audio_file->num_samples() - voice.file_offset);
+
+    const float* l_in = audio_file->channel_data(0) + voice.file_offset;
+    const float* r_in =
+      audio_file->channel_data(1 % audio_file->num_channels()) + voice.file_offset;
+    float* l_out = out_l + voice.start_frame;
+    float* r_out = out_r + voice.start_frame;
+    for (uint32_t i = 0 ; i < length ; ++i) {
+      *l_out++ += *l_in++;
+      *r_out++ += *r_in++;
+    }
+
+    voice.file_offset += length;
+    voice.start_frame = 0;
+    if (voice.file_offset >= audio_file->num_samples()) {
+      // End of audio file reached. The order of voices doesn't matter, so just move the last one
+      // into the free slot.
+      audio_file->remove_playhead(voice.playhead);
+      voice = voices.back();
+      voices.pop_back();
+    } else {
+      audio_file->set_playhead(voice.playhead, voice.file_offset);
+      ++idx;
+    }
+  }
+}
+
 ProcessorSampleScript::ProcessorSampleScript(
     const string& realm_name, const string& node_id, HostSystem* host_system,
     const pb::NodeDescription& desc)
@@ -133,114 +238,51 @@ Status ProcessorSampleScript::handle_message_internal(pb::ProcessorMessage* msg)
 }
 
 Status ProcessorSampleScript::process_block_internal(BlockContext* ctxt, TimeMapper* time_mapper) {
-  PerfTracker tracker(ctxt->perf.get(), "sample_script");
+  PerfTracker tracker(ctxt->perf.get(), span_sample_script);
 
   SampleScript* script = _script_manager.get_current();
 
   float* out_l_ptr = (float*)_buffers[0]->data();
   float* out_r_ptr = (float*)_buffers[1]->data();
+  uint32_t block_size = _host_system->block_size();
+  memset(out_l_ptr, 0, block_size * sizeof(float));
+  memset(out_r_ptr, 0, block_size * sizeof(float));
+
+  if (script->samples.size() == 0) {
+    // No samples, always silence.
+    return Status::Ok();
+  }
+
+  if (script->tmap_serialnum != time_mapper->serialnum()) {
+    script->update_positions(time_mapper);
+  }
 
   SampleTime* stime = ctxt->time_map.get();
-  for (uint32_t sample_pos = 0 ; sample_pos < _host_system->block_size() ; ++sample_pos, ++stime) {
-    if (stime->start_time.numerator() < 0) {
+  uint32_t frame = 0;
+  while (frame < block_size) {
+    if (stime[frame].start_time.numerator() < 0) {
       // playback turned off
       script->offset = -1;
-      *out_l_ptr++ = 0.0;
-      *out_r_ptr++ = 0.0;
+      ++frame;
       continue;
     }
 
-    float lvalue, rvalue;
-    if (script->samples.size() == 0) {
-      // No samples, always silence.
-      lvalue = 0.0;
-      rvalue = 0.0;
-    } else {
-      if (script->offset < 0
-          || script->tmap_serialnum != time_mapper->serialnum()
-          || script->current_time != stime->start_time) {
-        // seek to new time.
-
-        // TODO: We could to better than a sequential search.
-        // - Do a binary search to find the new script->offset.
-
-        script->offset = 0;
-        script->tmap_serialnum = time_mapper->serialnum();
-        script->current_audio_file = nullptr;
-        while ((size_t)script->offset < script->samples.size()) {
-          const Sample& sample = script->samples[script->offset];
-
-          MusicalTime sample_end_time = time_mapper->sample_to_musical_time(
-              time_mapper->musical_to_sample_time(sample.time)
-              + sample.audio_file->num_samples());
-
-          if (sample.time <= stime->start_time && sample_end_time >= stime->end_time) {
-            // We seeked into an audio file.
-            script->current_audio_file = sample.audio_file;
-            script->file_offset = time_mapper->musical_to_sample_time(stime->start_time)
-              - time_mapper->musical_to_sample_time(sample.time);
-            ++script->offset;
-            break;
-          } else if (sample.time >= stime->start_time) {
-            // We seeked into some empty space before an audio file.
-            break;
-          }
-
-          ++script->offset;
-        }
-      }
-
-      if ((size_t)script->offset < script->samples.size()) {
-        const Sample& sample = script->samples[script->offset];
-        assert(sample.time >= stime->start_time);
-        if (sample.time < stime->end_time) {
-          // Next audio file start playing.
-          script->current_audio_file = sample.audio_file;
-          script->file_offset = 0;
-        }
-      }
-
-      if (script->current_audio_file == nullptr) {
-        // No audio file playing, output silence.
-        lvalue = 0.0;
-        rvalue = 0.0;
-      }
-      else if (script->file_offset >= script->current_audio_file->num_samples()) {
-        // End of audio file reached.
-        script->current_audio_file = nullptr;
-        lvalue = 0.0;
-        rvalue = 0.0;
-      } else {
-        AudioFile* audio_file = script->current_audio_file;
-        float values[2];
-        for (int ch = 0 ; ch < 2 ; ++ch) {
-          const float* channel_data = audio_file->channel_data(ch % audio_file->num_channels());
-          values[ch] = channel_data[script->file_offset];
-        }
-        lvalue = values[0];
-        rvalue = values[1];
-
-        ++script->file_offset;
-      }
-
-      // Advance to next audio file, if needed. Might skip some audio files, if
-      // they are so close together that they all fall into the same sample.
-      while ((size_t)script->offset < script->samples.size()) {
-        const Sample& sample = script->samples[script->offset];
-        assert(sample.time >= stime->start_time);
-        if (sample.time >= stime->end_time) {
-          // no more audio files at this sample.
-          break;
-        }
-
-        ++script->offset;
-      }
+    // Process the run of contiguous frames at once.
+    uint32_t run_end = frame + 1;
+    while (run_end < block_size
+           && stime[run_end].start_time.numerator() >= 0
+           && stime[run_end].start_time == stime[run_end - 1].end_time) {
+      ++run_end;
     }
 
-    *out_l_ptr++ = lvalue;
-    *out_r_ptr++ = rvalue;
+    if (script->offset < 0 || script->current_time != stime[frame].start_time) {
+      // seek to new time.
+      script->seek(time_mapper, stime[frame].start_time);
+    }
 
-    script->current_time = stime->end_time;
+    script->render(stime + frame, out_l_ptr + frame, out_r_ptr + frame, run_end - frame);
+    script->current_time = stime[run_end - 1].end_time;
+    frame = run_end;
   }
 
   return Status::Ok();
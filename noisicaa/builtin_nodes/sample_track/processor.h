@@ -48,6 +48,24 @@ public:
   uint64_t id;
   MusicalTime time;
   AudioFile* audio_file;
+
+  // Cached timeline position of the sample. The sample is playing from time until end_time.
+  // max_end_time is the latest end_time of all samples up to and including this one, so samples
+  // can be searched for by their end time, even though they are sorted by their start time.
+  uint64_t start_pos;
+  MusicalTime end_time;
+  MusicalTime max_end_time;
+};
+
+// A sample, which is currently playing.
+class Voice {
+public:
+  const Sample* sample;
+  uint32_t file_offset;
+  // Frame within the current run, at which the sample starts playing.
+  uint32_t start_frame;
+  // The voice's playhead in the sample's audio file.
+  int playhead;
 };
 
 class SampleScript : public ManagedState<pb::ProcessorMessage> {
@@ -58,14 +76,20 @@ public:
   vector<Sample> samples;
 
   uint32_t tmap_serialnum = 0;
+  // Index of the next sample to start playing, or -1, if the script must seek first.
   int offset = -1;
   MusicalTime current_time = MusicalTime(0, 1);
 
-  AudioFile* current_audio_file = nullptr;
-  uint32_t file_offset;
+  // Capacity is reserved for all samples, so the audio thread never has to allocate.
+  vector<Voice> voices;
 
   void apply_mutation(Logger* logger, pb::ProcessorMessage* msg) override;
 
+  void clear_voices();
+  void update_positions(TimeMapper* time_mapper);
+  void seek(TimeMapper* time_mapper, const MusicalTime& time);
+  void render(const SampleTime* stime, float* out_l, float* out_r, uint32_t num_frames);
+
 private:
   Logger* _logger;
   HostSystem* _host_system;
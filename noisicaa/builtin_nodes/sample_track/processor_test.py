@@ -21,6 +21,7 @@
 import math
 import os
 import os.path
+import shutil
 import struct
 
 from noisidev import unittest
@@ -89,6 +90,38 @@ class ProcessorSampleScriptTest(
         self.assertTrue(all(math.isclose(v, 0.0) for v in self.buffers['out:left'][:1024]))
         self.assertTrue(any(not math.isclose(v, 0.0) for v in self.buffers['out:left'][1024:]))
 
+    def test_overlapping_samples(self):
+        paths = []
+        for idx, value in enumerate([0.25, 0.5]):
+            path = os.path.join(TEST_OPTS.TMP_DIR, 'const%d.raw' % idx)
+            with open(path, 'wb') as fp:
+                fp.write(struct.pack('@f', value) * 2048)
+            paths.append(path)
+
+        self.processor.handle_message(processor_messages.add_sample(
+            node_id='123',
+            id=0x0001,
+            time=musical_time.PyMusicalTime(0, 1),
+            sample_rate=self.sample_rate,
+            num_samples=2048,
+            channel_paths=[paths[0]]))
+        self.processor.handle_message(processor_messages.add_sample(
+            node_id='123',
+            id=0x0002,
+            time=musical_time.PyMusicalTime(1024, 44100),
+            sample_rate=self.sample_rate,
+            num_samples=2048,
+            channel_paths=[paths[1]]))
+
+        # Samples start at the frame, which covers their musical time, and then advance by one
+        # sample per frame.
+        self.process_block()
+        out = self.buffers['out:left']
+        self.assertTrue(all(math.isclose(v, 0.25) for v in out[:1024]))
+        self.assertTrue(all(math.isclose(v, 0.75) for v in out[1024:2048]))
+        self.assertTrue(all(math.isclose(v, 0.5) for v in out[2048:3072]))
+        self.assertTrue(all(math.isclose(v, 0.0) for v in out[3072:4096]))
+
     def test_remove_sample(self):
         self.processor.handle_message(processor_messages.add_sample(
             node_id='123',
@@ -132,3 +165,162 @@ class ProcessorSampleScriptTest(
 
         self.process_block()
         self.assertBufferIsNotQuiet('out:left')
+
+    def test_streaming_sample(self):
+        # Long enough to exceed the preload window, so the file gets streamed.
+        path = os.path.join(TEST_OPTS.TMP_DIR, 'long_sample.raw')
+        num_samples = 10 * self.sample_rate
+        f = 200 / self.sample_rate * math.pi / 180
+        samples = [math.sin(f * n) for n in range(num_samples)]
+        with open(path, 'wb') as fp:
+            fp.write(struct.pack('@%df' % num_samples, *samples))
+
+        self.processor.handle_message(processor_messages.add_sample(
+            node_id='123',
+            id=0x0001,
+            time=musical_time.PyMusicalTime(0, 1),
+            sample_rate=self.sample_rate,
+            num_samples=num_samples,
+            channel_paths=[path]))
+
+        self.process_block()
+        block_size = self.host_system.block_size
+        for a, b in zip(self.buffers['out:left'][:block_size], samples[:block_size]):
+            self.assertAlmostEqual(a, b, places=5)
+
+        # Seek past the preload window.
+        self.ctxt.clear_time_map(block_size)
+        it = self.time_mapper.find(musical_time.PyMusicalTime(2, 1))
+        prev_mtime = next(it)
+        for s in range(block_size):
+            mtime = next(it)
+            self.ctxt.set_sample_time(s, prev_mtime, mtime)
+            prev_mtime = mtime
+
+        self.process_block()
+        self.assertBufferIsNotQuiet('out:left')
+
+
+class AudioFileCacheTest(
+        unittest_processor_mixins.ProcessorTestMixin,
+        unittest.TestCase):
+    def setup_testcase(self):
+        self.cache_dir = os.path.join(TEST_OPTS.TMP_DIR, 'audio_cache')
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+        # Samples with a different rate than the engine's get resampled and cached.
+        self.sample_rate = 22050
+        self.num_samples = 1 * self.sample_rate
+        self.paths = []
+        for freq in [200, 300, 400]:
+            path = os.path.join(TEST_OPTS.TMP_DIR, 'sample%d.raw' % freq)
+            with open(path, 'wb') as fp:
+                f = freq / self.sample_rate * math.pi / 180
+                for n in range(self.num_samples):
+                    fp.write(struct.pack('@f', math.sin(f * n)))
+            self.paths.append(path)
+
+        # Each entry is a 64KiB header followed by the resampled data, padded to 64KiB. There is
+        # only room for two entries.
+        num_resampled = -(-self.num_samples * self.host_system.sample_rate // self.sample_rate)
+        self.entry_size = 65536 + -(-4 * num_resampled // 65536) * 65536
+
+        self.host_system.set_block_size(4096)
+        self.setup_cache()
+
+        self.node_description = self.node_db['builtin://sample-track']
+        self.create_processor()
+
+    def setup_cache(self):
+        self.host_system.cleanup()
+        self.host_system.set_audio_cache_dir(self.cache_dir)
+        self.host_system.set_audio_cache_size(2 * self.entry_size)
+        self.host_system.setup()
+
+    def cache_entries(self):
+        return {
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if name.endswith('.f32')}
+
+    def add_sample(self, sample_id, path):
+        entries = self.cache_entries()
+        self.processor.handle_message(processor_messages.add_sample(
+            node_id='123',
+            id=sample_id,
+            time=musical_time.PyMusicalTime(0, 1),
+            sample_rate=self.sample_rate,
+            num_samples=self.num_samples,
+            channel_paths=[path]))
+        return self.cache_entries() - entries
+
+    def test_load_twice(self):
+        new_entries = self.add_sample(0x0001, self.paths[0])
+        self.assertEqual(len(new_entries), 1)
+        entry, = new_entries
+        self.process_block()
+        self.assertBufferIsNotQuiet('out:left')
+        expected = list(self.buffers['out:left'])
+
+        self.processor.handle_message(processor_messages.remove_sample(
+            node_id='123',
+            id=0x0001))
+        os.utime(entry, (1000, 1000))
+
+        # The second load is served from the cache, which marks the entry as recently used.
+        self.assertEqual(self.add_sample(0x0002, self.paths[0]), set())
+        self.assertGreater(os.path.getmtime(entry), 1000)
+        self.process_block()
+        self.assertEqual(list(self.buffers['out:left']), expected)
+
+    def test_hash_index(self):
+        path = self.paths[0]
+        self.assertEqual(len(self.add_sample(0x0001, path)), 1)
+        self.processor.handle_message(processor_messages.remove_sample(
+            node_id='123',
+            id=0x0001))
+
+        # The file is not hashed again, as long as its size and mtime did not change. So this
+        # finds the previous entry, even though the contents are different.
+        stat = os.stat(path)
+        with open(path, 'r+b') as fp:
+            fp.write(struct.pack('@f', 0.5))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.add_sample(0x0002, path), set())
+        self.processor.handle_message(processor_messages.remove_sample(
+            node_id='123',
+            id=0x0002))
+
+        # After touching the file, its contents are hashed again.
+        os.utime(path, (5000, 5000))
+        self.assertEqual(len(self.add_sample(0x0003, path)), 1)
+
+    def test_eviction(self):
+        entry1, = self.add_sample(0x0001, self.paths[0])
+        entry2, = self.add_sample(0x0002, self.paths[1])
+        self.assertEqual(os.path.getsize(entry1), self.entry_size)
+
+        # The least recently used entry is evicted, when a third entry is added.
+        os.utime(entry1, (2000, 2000))
+        os.utime(entry2, (1000, 1000))
+
+        entry3, = self.add_sample(0x0003, self.paths[2])
+        self.assertEqual(self.cache_entries(), {entry1, entry3})
+
+        # The evicted sample stays playable.
+        self.process_block()
+        self.assertBufferIsNotQuiet('out:left')
+
+    def test_stale_temp_files(self):
+        stale_path = os.path.join(self.cache_dir, 'stale.f32.tmp.abcdef')
+        active_path = os.path.join(self.cache_dir, 'active.f32.tmp.abcdef')
+        for path in (stale_path, active_path):
+            with open(path, 'wb') as fp:
+                fp.write(b'\0' * 1024)
+        os.utime(stale_path, (1000, 1000))
+
+        # Temp files are cleaned up, when the cache is set up.
+        self.setup_cache()
+        self.assertFalse(os.path.exists(stale_path))
+        self.assertTrue(os.path.exists(active_path))
@@ -47,9 +47,14 @@ from noisicaa.ui.track_list import base_track_editor
 from noisicaa.ui.track_list import time_view_mixin
 from noisicaa.ui.track_list import tools
 from . import model
+from . import peaks
 
 logger = logging.getLogger(__name__)
 
+# ARGB32 pixel values for the waveform.
+MINMAX_COLOR = 0xff3c3c3c
+RMS_COLOR = 0xff6464b4
+
 
 class EditSamplesTool(tools.ToolBase):
     track = None  # type: SampleTrackEditor
@@ -74,66 +79,23 @@ class EditSamplesTool(tools.ToolBase):
             "Wav (*.wav)",
             "MP3 (*.mp3)",
         ]
-        path, selected_filter = QtWidgets.QFileDialog.getOpenFileName(
+        paths, selected_filter = QtWidgets.QFileDialog.getOpenFileNames(
             parent=self.track,
-            caption="Add Sample to track \"%s\"" % self.track.track.name,
+            caption="Add Samples to track \"%s\"" % self.track.track.name,
             directory=self.get_session_value(
                 'sample-track:add-sample-dialog:directory', None),
             filter=';;'.join(filters),
             initialFilter=self.get_session_value(
                 'sample-track:add-sample-dialog:selected-filter', filters[1]),
         )
-        if not path:
+        if not paths:
             return
 
-        self.set_session_value('sample-track:add-sample-dialog:directory', os.path.dirname(path))
+        self.set_session_value(
+            'sample-track:add-sample-dialog:directory', os.path.dirname(paths[0]))
         self.set_session_value('sample-track:add-sample-dialog:selected-filter', selected_filter)
 
-        self.call_async(self.onAddSample(path, time))
-
-    async def onAddSample(self, path: str, time: audioproc.MusicalTime) -> None:
-        progress_dialog = QtWidgets.QProgressDialog(self.track)
-        progress_dialog.setModal(True)
-        progress_dialog.setLabelText("Importing sample...")
-
-        class Cancelled(Exception):
-            pass
-
-        def progress_cb(progress: float) -> None:
-            if progress_dialog.wasCanceled():
-                raise Cancelled()
-            progress_dialog.show()
-            progress_dialog.setValue(int(100 * progress))
-
-        try:
-            try:
-                loaded_sample = await self.track.track.load_sample(
-                    path, self.event_loop, progress_cb)
-            finally:
-                progress_dialog.close()
-
-        except model.SampleLoadError as exc:
-            dialog = QtWidgets.QMessageBox(self.track)
-            dialog.setObjectName('sample-load-error')
-            dialog.setWindowTitle("noisicaä - Error")
-            dialog.setIcon(QtWidgets.QMessageBox.Critical)
-            dialog.setText("Failed to import sample from \"%s\"." % path)
-            dialog.setInformativeText(str(exc))
-            buttons = QtWidgets.QMessageBox.StandardButtons()
-            buttons |= QtWidgets.QMessageBox.Close
-            dialog.setStandardButtons(buttons)
-            # TODO: Even with the size grip enabled, the dialog window is not resizable.
-            # Might be a bug in Qt: https://bugreports.qt.io/browse/QTBUG-41932
-            dialog.setSizeGripEnabled(True)
-            dialog.setModal(True)
-            dialog.show()
-            return
-
-        except Cancelled:
-            return
-
-        with self.project.apply_mutations('%s: Import audio file' % self.track.track.name):
-            self.track.track.create_sample(time, loaded_sample)
+        self.call_async(self.track.importSamples(paths, time))
 
     def onDeleteSample(self, smpl: model.SampleRef) -> None:
         with self.project.apply_mutations('%s: Delete segment' % self.track.track.name):
@@ -145,9 +107,10 @@ class EditSamplesTool(tools.ToolBase):
         menu = QtWidgets.QMenu(self.track)
         menu.setObjectName('context-menu')
 
-        add_sample_action = QtWidgets.QAction("Import audio file...", menu)
+        add_sample_action = QtWidgets.QAction("Import audio files...", menu)
         add_sample_action.setObjectName('add-sample')
-        add_sample_action.setStatusTip("Import an audio file and add it as a segment to the track.")
+        add_sample_action.setStatusTip(
+            "Import audio files and add them as segments to the track.")
         add_sample_action.triggered.connect(functools.partial(self.onAddSampleSync, time))
         menu.addAction(add_sample_action)
 
@@ -236,14 +199,20 @@ class SampleItem(core.AutoCleanupMixin, object):
 
         self.__raw_fps = []  # type: List[BinaryIO]
         self.__raws = []  # type: List[mmap.mmap]
+        self.__raw_paths = []  # type: List[str]
         for ch in self.__sample.sample.channels:
             raw_path = os.path.join(
                 self.__sample.project.data_dir, ch.raw_path)
+            self.__raw_paths.append(raw_path)
             fp = open(raw_path, 'rb')
             self.__raw_fps.append(fp)
             buf = mmap.mmap(fp.fileno(), 0, prot=mmap.PROT_READ)
             self.__raws.append(buf)
 
+        # Loaded (or built, for samples imported by older versions) on first use by the render
+        # thread.
+        self.__peaks = [None] * len(self.__raws)  # type: List[peaks.PeakPyramid]
+
         self.__tile_cache = {}  # type: Dict[Tuple[int, int], Tuple[int, QtGui.QImage]]
         self.__tile_cache_version = 0
         self.__render_queue = asyncio.Queue(loop=self.__event_loop)  # type: asyncio.Queue[Tuple]
@@ -379,46 +348,42 @@ class SampleItem(core.AutoCleanupMixin, object):
     ) -> QtGui.QImage:
         t_start = time_lib.time()
 
-        minmax_color = QtGui.QColor(60, 60, 60)
-        rms_color = QtGui.QColor(100, 100, 180)
-
-        img = QtGui.QImage(size, QtGui.QImage.Format_ARGB32)
-        img.fill(QtGui.QColor(0, 0, 0, 0))
-        painter = QtGui.QPainter(img)
-        try:
-            tmap = self.__sample.project.time_mapper
-            begin_samplepos = tmap.musical_to_sample_time(self.__sample.time)
-            num_samples = self.__sample.sample.num_samples
-            duration_per_pixel = self.__track_editor.durationPerPixel()
-            resample_factor = self.__sample.sample.sample_rate / tmap.sample_rate
-            height = size.height()
-
-            t0 = self.__track_editor.xToTime(tile_x)
-            s0 = int((tmap.musical_to_sample_time(t0) - begin_samplepos) * resample_factor)
-            for x in range(size.width()):
-                t1 = t0 + duration_per_pixel
-                s1 = int((tmap.musical_to_sample_time(t1) - begin_samplepos) * resample_factor)
-
-                if 0 <= s0 < num_samples - 1:
-                    cnt = max(min(num_samples, s1 + 1) - s0, 1)
-                    samples = numpy.frombuffer(
-                        self.__raws[ch], dtype=numpy.float32, offset=s0 * 4, count=cnt)
-
-                    y_min = max(0, min(height - 1, int(height - samples.min() * height) // 2))
-                    y_max = max(0, min(height - 1, int(height - samples.max() * height) // 2))
-                    painter.fillRect(x, y_max, 1, y_min - y_max + 1, minmax_color)
-
-                    if cnt > 10:
-                        rms = numpy.sqrt(numpy.mean(samples ** 2))
-                        rms_top = max(0, int(height - rms * height) // 2)
-                        rms_bottom = min(height - 1, int(height + rms * height) // 2)
-                        painter.fillRect(x, rms_top, 1, rms_bottom - rms_top + 1, rms_color)
-
-                t0 = t1
-                s0 = s1
-
-        finally:
-            painter.end()
+        if self.__peaks[ch] is None:
+            self.__peaks[ch] = peaks.load_or_build(self.__raw_paths[ch])
+        pyramid = self.__peaks[ch]
+
+        tmap = self.__sample.project.time_mapper
+        begin_samplepos = tmap.musical_to_sample_time(self.__sample.time)
+        duration_per_pixel = self.__track_editor.durationPerPixel()
+        resample_factor = self.__sample.sample.sample_rate / tmap.sample_rate
+        width = size.width()
+        height = size.height()
+
+        # The mapping from musical time to samples is linear, so only the edges of the tile
+        # need to be converted.
+        t0 = self.__track_editor.xToTime(tile_x)
+        t1 = t0 + duration_per_pixel * width
+        s0 = (tmap.musical_to_sample_time(t0) - begin_samplepos) * resample_factor
+        s1 = (tmap.musical_to_sample_time(t1) - begin_samplepos) * resample_factor
+        boundaries = numpy.linspace(s0, s1, width + 1).astype(numpy.int64)
+
+        raw = numpy.frombuffer(self.__raws[ch], dtype=numpy.float32)
+        valid, minimum, maximum, rms = pyramid.summarize_columns(raw, boundaries)
+
+        y_min = numpy.clip((height - minimum * height).astype(numpy.int64) // 2, 0, height - 1)
+        y_max = numpy.clip((height - maximum * height).astype(numpy.int64) // 2, 0, height - 1)
+        has_rms = valid & ~numpy.isnan(rms)
+        rms = numpy.where(has_rms, rms, 0.0)
+        rms_top = numpy.maximum(0, (height - rms * height).astype(numpy.int64) // 2)
+        rms_bottom = numpy.minimum(height - 1, (height + rms * height).astype(numpy.int64) // 2)
+
+        y = numpy.arange(height)[:, numpy.newaxis]
+        pixels = numpy.zeros((height, width), dtype=numpy.uint32)
+        pixels[valid & (y >= y_max) & (y <= y_min)] = MINMAX_COLOR
+        pixels[has_rms & (y >= rms_top) & (y <= rms_bottom)] = RMS_COLOR
+
+        img = QtGui.QImage(
+            pixels.tobytes('C'), width, height, 4 * width, QtGui.QImage.Format_ARGB32).copy()
 
         logger.debug(
             "SampleRef #%016x, channel #%d: rendered cache tile %d in %.2fms",
@@ -511,6 +476,7 @@ class SampleTrackEditor(time_view_mixin.ContinuousTimeMixin, base_track_editor.B
         self.playbackPositionChanged.connect(self.__playbackPositionChanged)
 
         self.setDefaultHeight(120)
+        self.setAcceptDrops(True)
 
     @property
     def track(self) -> model.SampleTrack:
@@ -566,6 +532,102 @@ class SampleTrackEditor(time_view_mixin.ContinuousTimeMixin, base_track_editor.B
             x = self.timeToX(self.__playback_time)
             self.update(x - self.xOffset(), 0, 2, self.height())
 
+    async def importSamples(self, paths: List[str], time: audioproc.MusicalTime) -> None:
+        progress_dialog = QtWidgets.QProgressDialog(self)
+        progress_dialog.setModal(True)
+        if len(paths) == 1:
+            progress_dialog.setLabelText("Importing sample...")
+        else:
+            progress_dialog.setLabelText("Importing %d samples..." % len(paths))
+
+        class Cancelled(Exception):
+            pass
+
+        def progress_cb(progress: float) -> None:
+            if progress_dialog.wasCanceled():
+                raise Cancelled()
+            progress_dialog.show()
+            progress_dialog.setValue(int(100 * progress))
+
+        try:
+            try:
+                loaded_samples = await self.track.load_samples(
+                    paths, self.event_loop, progress_cb)
+            finally:
+                progress_dialog.close()
+
+        except model.SampleLoadError as exc:
+            dialog = QtWidgets.QMessageBox(self)
+            dialog.setObjectName('sample-load-error')
+            dialog.setWindowTitle("noisicaä - Error")
+            dialog.setIcon(QtWidgets.QMessageBox.Critical)
+            if len(paths) == 1:
+                dialog.setText("Failed to import sample from \"%s\"." % paths[0])
+            else:
+                dialog.setText("Failed to import %d samples." % len(paths))
+            dialog.setInformativeText(str(exc))
+            buttons = QtWidgets.QMessageBox.StandardButtons()
+            buttons |= QtWidgets.QMessageBox.Close
+            dialog.setStandardButtons(buttons)
+            # TODO: Even with the size grip enabled, the dialog window is not resizable.
+            # Might be a bug in Qt: https://bugreports.qt.io/browse/QTBUG-41932
+            dialog.setSizeGripEnabled(True)
+            dialog.setModal(True)
+            dialog.show()
+            return
+
+        except Cancelled:
+            return
+
+        # Multiple samples are placed one after the other, starting at time.
+        tmap = self.project.time_mapper
+        with self.project.apply_mutations('%s: Import audio file' % self.track.name):
+            for loaded_sample in loaded_samples:
+                self.track.create_sample(time, loaded_sample)
+                num_samples = int(math.ceil(
+                    loaded_sample.num_samples * tmap.sample_rate / loaded_sample.sample_rate))
+                time = tmap.sample_to_musical_time(
+                    tmap.musical_to_sample_time(time) + num_samples)
+
+    def __droppedPaths(self, mime_data: QtCore.QMimeData) -> List[str]:
+        paths = []  # type: List[str]
+        for url in mime_data.urls():
+            if not url.isLocalFile():
+                continue
+
+            path = url.toLocalFile()
+            if os.path.isdir(path):
+                # Only pick up the audio files from a dropped folder, it's common to have other
+                # files (like READMEs or cover images) next to them.
+                for dirpath, dirnames, filenames in os.walk(path):
+                    dirnames.sort()
+                    for filename in sorted(filenames):
+                        file_path = os.path.join(dirpath, filename)
+                        if model.is_sample_file(file_path):
+                            paths.append(file_path)
+
+            elif os.path.isfile(path):
+                paths.append(path)
+
+        return paths
+
+    def dragEnterEvent(self, evt: QtGui.QDragEnterEvent) -> None:
+        if any(url.isLocalFile() for url in evt.mimeData().urls()):
+            evt.acceptProposedAction()
+            return
+
+        super().dragEnterEvent(evt)
+
+    def dropEvent(self, evt: QtGui.QDropEvent) -> None:
+        paths = self.__droppedPaths(evt.mimeData())
+        if paths:
+            evt.acceptProposedAction()
+            time = self.xToTime(evt.pos().x() + self.xOffset())
+            self.call_async(self.importSamples(paths, time))
+            return
+
+        super().dropEvent(evt)
+
     def setHighlightedSample(self, sample: SampleItem) -> None:
         if sample is self.__highlighted_sample:
             return
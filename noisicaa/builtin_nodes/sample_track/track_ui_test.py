@@ -22,17 +22,21 @@
 
 import asyncio
 import os.path
+import shutil
 import time
+import uuid
 from unittest import mock
 
 from PyQt5.QtCore import Qt
 from PyQt5 import QtCore
+from PyQt5 import QtGui
 from PyQt5 import QtWidgets
 
 from noisidev import profutil
 from noisidev import unittest
 from noisidev import uitest
 from noisicaa import audioproc
+from noisicaa.constants import TEST_OPTS
 from noisicaa.ui.track_list import track_editor_tests
 from . import track_ui
 
@@ -64,8 +68,8 @@ class SampleTrackEditorItemTest(track_editor_tests.TrackEditorItemTestMixin, uit
             await self.moveMouse(QtCore.QPoint(ti.timeToX(MT(2, 4)), ti.height() // 2))
 
             with mock.patch(
-                    'PyQt5.QtWidgets.QFileDialog.getOpenFileName',
-                    return_value=(SMPL_PATH, None)):
+                    'PyQt5.QtWidgets.QFileDialog.getOpenFileNames',
+                    return_value=([SMPL_PATH], None)):
                 menu = await self.openContextMenu()
                 await self.triggerMenuAction(menu, 'add-sample')
 
@@ -83,6 +87,60 @@ class SampleTrackEditorItemTest(track_editor_tests.TrackEditorItemTestMixin, uit
                 self.renderWidget()
                 await asyncio.sleep(0.2, loop=self.loop)
 
+    async def test_add_multiple_samples(self):
+        assert len(self.track.samples) == 0
+
+        with self._trackItem() as ti:
+            await self.moveMouse(QtCore.QPoint(ti.timeToX(MT(2, 4)), ti.height() // 2))
+
+            with mock.patch(
+                    'PyQt5.QtWidgets.QFileDialog.getOpenFileNames',
+                    return_value=([SMPL_PATH, SMPL_PATH], None)):
+                menu = await self.openContextMenu()
+                await self.triggerMenuAction(menu, 'add-sample')
+
+                t0 = time.time()
+                while len(self.track.samples) < 2:
+                    if t0 > time.time() + 10:
+                        raise TimeoutError
+                    await asyncio.sleep(0.2, loop=self.loop)
+
+            self.assertEqual(self.track.samples[0].time, MT(2, 4))
+            # The second sample is placed right after the first one.
+            self.assertGreater(self.track.samples[1].time, MT(2, 4))
+            self.assertNotEqual(
+                self.track.samples[0].sample.channels[0].raw_path,
+                self.track.samples[1].sample.channels[0].raw_path)
+
+    async def test_drop_folder(self):
+        assert len(self.track.samples) == 0
+
+        folder = os.path.join(TEST_OPTS.TMP_DIR, 'samples-%s' % uuid.uuid4().hex)
+        os.makedirs(folder)
+        self.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+        shutil.copy(SMPL_PATH, os.path.join(folder, 'a.wav'))
+        shutil.copy(SMPL_PATH, os.path.join(folder, 'b.wav'))
+        shutil.copy(NON_SMPL_PATH, os.path.join(folder, 'cover.svg'))
+
+        with self._trackItem() as ti:
+            mime_data = QtCore.QMimeData()
+            mime_data.setUrls([QtCore.QUrl.fromLocalFile(folder)])
+            evt = QtGui.QDropEvent(
+                QtCore.QPointF(ti.timeToX(MT(1, 4)), ti.height() // 2),
+                Qt.CopyAction, mime_data, Qt.LeftButton, Qt.NoModifier)
+            ti.dropEvent(evt)
+            self.assertTrue(evt.isAccepted())
+
+            t0 = time.time()
+            while len(self.track.samples) < 2:
+                if t0 > time.time() + 10:
+                    raise TimeoutError
+                await asyncio.sleep(0.2, loop=self.loop)
+
+        self.assertEqual(
+            [smpl.sample.path for smpl in self.track.samples],
+            [os.path.join(folder, 'a.wav'), os.path.join(folder, 'b.wav')])
+
     async def test_add_sample_load_error(self):
         assert len(self.track.samples) == 0
 
@@ -90,8 +148,8 @@ class SampleTrackEditorItemTest(track_editor_tests.TrackEditorItemTestMixin, uit
             await self.moveMouse(QtCore.QPoint(ti.timeToX(MT(2, 4)), ti.height() // 2))
 
             with mock.patch(
-                    'PyQt5.QtWidgets.QFileDialog.getOpenFileName',
-                    return_value=(NON_SMPL_PATH, None)):
+                    'PyQt5.QtWidgets.QFileDialog.getOpenFileNames',
+                    return_value=([NON_SMPL_PATH], None)):
                 menu = await self.openContextMenu()
                 await self.triggerMenuAction(menu, 'add-sample')
 
@@ -74,6 +74,8 @@ class ScoreTrackConnector(base_track.MeasuredTrackConnector):
 
 
 class Note(_model.Note):
+    __slots__ = ()
+
     def __str__(self) -> str:
         n = ''
         if len(self.pitches) == 1:
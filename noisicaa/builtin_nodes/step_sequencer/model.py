@@ -35,6 +35,8 @@ logger = logging.getLogger(__name__)
 
 
 class StepSequencerStep(_model.StepSequencerStep):
+    __slots__ = ()
+
     def setup(self) -> None:
         super().setup()
 
@@ -156,6 +156,7 @@ class StepSequencerNodeWidget(ui_base.ProjectMixin, core.AutoCleanupMixin, QtWid
             node=self.__node, name='tempo', context=self.context)
         self.add_cleanup_function(self.__tempo_connector.cleanup)
         self.__tempo_connector.connect(self.__tempo.valueChanged, self.__tempo.setValue)
+        self.__tempo_connector.connectDrag(self.__tempo.dragStarted, self.__tempo.dragFinished)
 
         self.__num_steps = QtWidgets.QSpinBox()
         self.__num_steps.setSuffix(" steps")
@@ -332,6 +333,8 @@ class StepSequencerNodeWidget(ui_base.ProjectMixin, core.AutoCleanupMixin, QtWid
                     step_value.setDisplayFunc(functools.partial(self.__stepValueText, channel))
                     step_value.valueChanged.connect(
                         functools.partial(self.__stepValueEdited, step, step_value))
+                    step_value.dragStarted.connect(self.__stepValueDragStarted)
+                    step_value.dragFinished.connect(self.project.end_gesture)
                     self.__matrix_listeners.add(step.value_changed.add(
                         functools.partial(self.__stepValueChanged, step, step_value)))
                     self.__step_layout.addWidget(step_value, row + 1, col + 2)
@@ -486,6 +489,10 @@ class StepSequencerNodeWidget(ui_base.ProjectMixin, core.AutoCleanupMixin, QtWid
             with self.project.apply_mutations('%s: Change step value' % self.__node.name):
                 step.value = value
 
+    def __stepValueDragStarted(self) -> None:
+        # All changes made while dragging the dial are undone as a single step.
+        self.project.begin_gesture('%s: Change step value' % self.__node.name)
+
     def __stepEnabledChanged(
             self,
             step: model.StepSequencerStep,
@@ -25,14 +25,17 @@ import enum
 import functools
 import io
 import logging
+import mmap
 import os
 import os.path
 import random
 import struct
+import tempfile
+import threading
 import time
 import traceback
 from typing import (
-    cast, Any, Optional, Union, Dict, List, Set, Callable, Awaitable, Sequence, Type,
+    cast, Any, Optional, Union, Dict, List, Set, Callable, Awaitable, Sequence, Tuple, Type,
     Generic, TypeVar)
 try:
     from typing import Coroutine
@@ -75,6 +78,191 @@ frame_header = struct.Struct('=L?')
 request_header = struct.Struct('=Qc')
 
 
+# A message, which consists of just this frame, wakes up a receiver, which is parked on its shared
+# memory ring.
+ring_doorbell = request_header.pack(0, b'R')
+
+# Acquiring a lock implies a full memory barrier, which the ring needs between publishing its own
+# state and looking at the state of the other side.
+_barrier_lock = threading.Lock()
+
+def _memory_barrier() -> None:
+    with _barrier_lock:
+        pass
+
+
+class ShmRing(object):
+    """Single producer/single consumer ring buffer in a shared memory file.
+
+    Each direction of a connection gets its own ring. Messages are stored as a length prefixed
+    record, which contains the frames in the same encoding as on the socket. The reader drains the
+    ring until it is empty and then parks, and only a parked reader gets woken up by a doorbell
+    message over the socket. Messages, which are too large for the ring, go over the socket tagged
+    with the ring position at that point, so they are still processed in the order they were sent.
+    """
+
+    header = struct.Struct('=QQQ')  # write_pos, read_pos, reader_parked
+    record_header = struct.Struct('=L')
+    wrap_marker = 0xffffffff
+
+    def __init__(self, path: str, size: int = None) -> None:
+        self.__path = path
+
+        fd = os.open(path, os.O_RDWR)
+        try:
+            if size is not None:
+                assert size % self.record_header.size == 0, size
+                os.ftruncate(fd, self.header.size + size)
+            self.__mmap = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+
+        # The reader starts out parked, so the first message rings the doorbell.
+        if size is not None:
+            struct.pack_into('=Q', self.__mmap, 16, 1)
+
+        self.__view = memoryview(self.__mmap)
+        self.__capacity = len(self.__mmap) - self.header.size
+        self.__data_offset = self.header.size
+
+    @classmethod
+    def create(cls, directory: str, size: int) -> 'ShmRing':
+        fd, path = tempfile.mkstemp(prefix='ipc-ring-', dir=directory)
+        os.close(fd)
+        return cls(path, size)
+
+    @property
+    def path(self) -> str:
+        return self.__path
+
+    @property
+    def capacity(self) -> int:
+        return self.__capacity
+
+    @property
+    def write_pos(self) -> int:
+        return struct.unpack_from('=Q', self.__mmap, 0)[0]
+
+    def unlink(self) -> None:
+        if os.path.exists(self.__path):
+            os.unlink(self.__path)
+
+    def close(self) -> None:
+        if not self.__mmap.closed:
+            self.__view.release()
+            self.__mmap.close()
+
+    def __padded(self, length: int) -> int:
+        align = self.record_header.size
+        return (length + align - 1) // align * align
+
+    def write(self, frames: Sequence[bytes]) -> bool:
+        """Append a message to the ring.
+
+        Returns False, if the message does not fit into the ring right now, in which case the
+        caller must fall back to the socket.
+        """
+
+        length = sum(frame_header.size + len(frame) for frame in frames)
+        record_size = self.record_header.size + self.__padded(length)
+        if record_size > self.__capacity:
+            return False
+
+        write_pos, read_pos, _ = self.header.unpack_from(self.__mmap, 0)
+        offset = write_pos % self.__capacity
+        skip = self.__capacity - offset
+        if skip >= record_size:
+            skip = 0
+        if self.__capacity - (write_pos - read_pos) < skip + record_size:
+            return False
+
+        mm = self.__mmap
+        if skip:
+            self.record_header.pack_into(mm, self.__data_offset + offset, self.wrap_marker)
+            offset = 0
+
+        pos = self.__data_offset + offset
+        self.record_header.pack_into(mm, pos, length)
+        pos += self.record_header.size
+        last_idx = len(frames) - 1
+        for idx, frame in enumerate(frames):
+            frame_header.pack_into(mm, pos, len(frame), idx != last_idx)
+            pos += frame_header.size
+            mm[pos:pos + len(frame)] = frame
+            pos += len(frame)
+
+        # Only publish the new write position after the record is complete.
+        struct.pack_into('=Q', mm, 0, write_pos + skip + record_size)
+        return True
+
+    def wake_reader(self) -> bool:
+        """Check if the reader must be signalled about the messages written so far.
+
+        Returns True (and clears the flag), if the reader is parked.
+        """
+
+        _memory_barrier()
+        if not struct.unpack_from('=Q', self.__mmap, 16)[0]:
+            return False
+        struct.pack_into('=Q', self.__mmap, 16, 0)
+        return True
+
+    def readable(self, until: int = None) -> bool:
+        """Check if there is a message, which was written before position 'until'."""
+
+        write_pos, read_pos, _ = self.header.unpack_from(self.__mmap, 0)
+        if until is not None:
+            write_pos = min(write_pos, until)
+        return read_pos < write_pos
+
+    def park(self) -> bool:
+        """Mark the reader as waiting for a doorbell.
+
+        Returns False (and does not park), if a message was written in the meantime, which must
+        be read first.
+        """
+
+        struct.pack_into('=Q', self.__mmap, 16, 1)
+        _memory_barrier()
+        if self.readable():
+            struct.pack_into('=Q', self.__mmap, 16, 0)
+            return False
+        return True
+
+    def read(self) -> Tuple[List[memoryview], int]:
+        """Get the next message from the ring.
+
+        The frames are views into the ring, which must be released, before the returned read
+        position is passed to consume().
+        """
+
+        mm = self.__mmap
+        write_pos, read_pos, _ = self.header.unpack_from(mm, 0)
+        assert read_pos < write_pos, "Ring is empty"
+
+        offset = read_pos % self.__capacity
+        length, = self.record_header.unpack_from(mm, self.__data_offset + offset)
+        if length == self.wrap_marker:
+            read_pos += self.__capacity - offset
+            offset = 0
+            length, = self.record_header.unpack_from(mm, self.__data_offset)
+
+        frames = []  # type: List[memoryview]
+        pos = self.__data_offset + offset + self.record_header.size
+        end = pos + length
+        while pos < end:
+            frame_size, _ = frame_header.unpack_from(mm, pos)
+            pos += frame_header.size
+            frames.append(self.__view[pos:pos + frame_size])
+            pos += frame_size
+
+        read_pos += self.record_header.size + self.__padded(length)
+        return frames, read_pos
+
+    def consume(self, read_pos: int) -> None:
+        struct.pack_into('=Q', self.__mmap, 8, read_pos)
+
+
 class ConnState(enum.Enum):
     READ_HEADER = 1
     READ_DATA = 2
@@ -97,42 +285,117 @@ class FrameProtocol(asyncio.Protocol):
         self.more = None
         self.inbuf = bytearray()
 
+        self.rx_ring = None  # type: ShmRing
+        self.tx_ring = None  # type: ShmRing
+
     def connection_made(self, transport: asyncio.BaseTransport) -> None:
         self.transport = cast(asyncio.WriteTransport, transport)
 
+    def connection_lost(self, exc: Exception) -> None:
+        super().connection_lost(exc)
+        self.close_rings()
+
+    def close_rings(self) -> None:
+        if self.rx_ring is not None:
+            self.rx_ring.close()
+            self.rx_ring = None
+        if self.tx_ring is not None:
+            self.tx_ring.close()
+            self.tx_ring = None
+
+    def send_frames(self, frames: Sequence[bytes]) -> None:
+        if self.tx_ring is not None:
+            if self.tx_ring.write(frames):
+                if self.tx_ring.wake_reader():
+                    self.__write_frames([ring_doorbell])
+                return
+
+            # Does not fit into the ring, so the receiver has to process the ring up to the
+            # current position, before it handles this message.
+            frames = [request_header.pack(self.tx_ring.write_pos, b'F')] + list(frames)
+
+        self.__write_frames(frames)
+
+    def __write_frames(self, frames: Sequence[bytes]) -> None:
+        last_idx = len(frames) - 1
+        for idx, frame in enumerate(frames):
+            self.transport.write(frame_header.pack(len(frame), idx != last_idx))
+            self.transport.write(frame)
+
     def data_received(self, data: bytes) -> None:
         self.inbuf.extend(data)
 
-        while self.inbuf:
-            if self.state == ConnState.READ_HEADER:
-                if len(self.inbuf) < frame_header.size:
-                    break
+        # Only consume the processed data once at the end, removing each frame from the front of
+        # the buffer as soon as it was read would be quadratic in the number of buffered frames.
+        pos = 0
+        end = len(self.inbuf)
+        view = memoryview(self.inbuf)
+        try:
+            while pos < end:
+                if self.state == ConnState.READ_HEADER:
+                    if end - pos < frame_header.size:
+                        break
 
-                self.frame_size, self.more = frame_header.unpack_from(self.inbuf)
-                del self.inbuf[:frame_header.size]
-                if self.frame_size == 0:
-                    self.frames.append(b'')
-                    if not self.more:
-                        self.handle_message(self.frames)
-                        self.frames = []
+                    self.frame_size, self.more = frame_header.unpack_from(self.inbuf, pos)
+                    pos += frame_header.size
+                    if self.frame_size == 0:
+                        self.__frame_received(b'')
 
-                else:
-                    self.state = ConnState.READ_DATA
+                    else:
+                        self.state = ConnState.READ_DATA
 
-            elif self.state == ConnState.READ_DATA:
-                if len(self.inbuf) < self.frame_size:
-                    break
-                frame = bytes(self.inbuf[:self.frame_size])
-                del self.inbuf[:self.frame_size]
+                elif self.state == ConnState.READ_DATA:
+                    if end - pos < self.frame_size:
+                        break
+                    frame = bytes(view[pos:pos + self.frame_size])
+                    pos += self.frame_size
 
-                self.frames.append(frame)
-                if not self.more:
-                    self.handle_message(self.frames)
-                    self.frames = []
+                    self.state = ConnState.READ_HEADER
+                    self.__frame_received(frame)
 
-                self.frame_size = None
-                self.more = None
-                self.state = ConnState.READ_HEADER
+        finally:
+            view.release()
+            del self.inbuf[:pos]
+
+    def __frame_received(self, frame: bytes) -> None:
+        self.frames.append(frame)
+        if not self.more:
+            frames = self.frames
+            self.frames = []
+            self.frame_size = None
+            self.more = None
+
+            if self.rx_ring is not None:
+                if len(frames) == 1 and frames[0] == ring_doorbell:
+                    self.__read_ring()
+                    return
+
+                if len(frames[0]) == request_header.size:
+                    ring_pos, request_type = request_header.unpack(frames[0])
+                    if request_type == b'F':
+                        self.__read_ring(ring_pos)
+                        self.handle_message(frames[1:])
+                        self.__read_ring()
+                        return
+
+            self.handle_message(frames)
+
+    def __read_ring(self, until: int = None) -> None:
+        ring = self.rx_ring
+        while True:
+            while ring.readable(until):
+                frames, read_pos = ring.read()
+                try:
+                    # The frames point directly into the ring, so handlers must not hold on to
+                    # them, after they returned.
+                    self.handle_message(cast(List[bytes], frames))
+                finally:
+                    for frame in frames:
+                        frame.release()
+                    ring.consume(read_pos)
+
+            if until is not None or ring.park():
+                break
 
     def handle_message(self, frame: List[bytes]) -> None:
         raise NotImplementedError
@@ -285,12 +548,6 @@ class ServerProtocol(FrameProtocol):
             "%s: Draining connection with %d active requests",
             self.__server.id, len(self.__active_requests))
 
-    def send_frames(self, frames: Sequence[bytes]) -> None:
-        last_idx = len(frames) - 1
-        for idx, frame in enumerate(frames):
-            self.transport.write(frame_header.pack(len(frame), idx != last_idx))
-            self.transport.write(frame)
-
     def connection_made(self, transport: asyncio.BaseTransport) -> None:
         super().connection_made(transport)
         self.logger.info("%s: Accepted new connection.", self.__server.id)
@@ -307,25 +564,30 @@ class ServerProtocol(FrameProtocol):
         self.__closed.set()
 
     def handle_message(self, frames: List[bytes]) -> None:
+        # The frames might be views into the shared memory ring, which are only valid until this
+        # method returns.
+        header = bytes(frames[0])
+
         if self.__drain:
-            self.send_frames([frames[0], b'CLOSED'])
+            self.send_frames([header, b'CLOSED'])
             return
 
-        request_id, request_type = request_header.unpack(frames[0])
+        request_id, request_type = request_header.unpack(header)
         if request_type == b'C':
             try:
                 assert self.__endpoint is not None
                 assert len(frames) == 3
-                handler = self.__endpoint.get_handler(frames[1])
+                handler = self.__endpoint.get_handler(bytes(frames[1]))
+                request = handler.parse_request(frames[2])
 
             except Exception:  # pylint: disable=broad-except
                 self.send_frames(
-                    [frames[0], b'EXC', str(traceback.format_exc()).encode('utf-8')])
+                    [header, b'EXC', str(traceback.format_exc()).encode('utf-8')])
 
             else:
                 self.__active_requests.add(request_id)
-                task = self.__server.event_loop.create_task(handler.run(frames[2], self.__session))
-                task.add_done_callback(functools.partial(self.send_response, frames[0]))
+                task = self.__server.event_loop.create_task(handler.run(request, self.__session))
+                task.add_done_callback(functools.partial(self.send_response, header))
 
         elif request_type == b'S':
             response_frames = None
@@ -337,22 +599,40 @@ class ServerProtocol(FrameProtocol):
                     if len(frames) == 3:
                         start_session_request.ParseFromString(frames[2])
                     self.__server.event_loop.create_task(
-                        self.__start_session(frames[0], endpoint, start_session_request))
+                        self.__start_session(header, endpoint, start_session_request))
                 else:
                     assert len(frames) == 2
-                    response_frames = [frames[0], b'OK', b'']
+                    response_frames = [header, b'OK', b'']
 
                 self.__endpoint = endpoint
 
             except Exception:  # pylint: disable=broad-except
-                self.send_frames([frames[0], b'EXC', str(traceback.format_exc()).encode('utf-8')])
+                self.send_frames([header, b'EXC', str(traceback.format_exc()).encode('utf-8')])
 
             else:
                 if response_frames:
                     self.send_frames(response_frames)
 
         elif request_type == b'P':
-            self.send_frames([frames[0], b'PONG'])
+            self.send_frames([header, b'PONG'])
+
+        elif request_type == b'M':
+            try:
+                assert len(frames) == 3
+                assert self.rx_ring is None and self.tx_ring is None
+                self.rx_ring = ShmRing(frames[1].decode('utf-8'))
+                tx_ring = ShmRing(frames[2].decode('utf-8'))
+
+            except Exception:  # pylint: disable=broad-except
+                self.close_rings()
+                self.send_frames([header, b'EXC', str(traceback.format_exc()).encode('utf-8')])
+
+            else:
+                # The response must still go over the socket, the client only starts reading
+                # from its ring, once it got it.
+                self.send_frames([header, b'OK', b''])
+                self.tx_ring = tx_ring
+                self.logger.info("%s: Using shared memory rings.", self.__server.id)
 
         else:
             raise ValueError(request_type)
@@ -394,11 +674,14 @@ class CommandHandler(object):
         self.request_cls = request_cls
         self.response_cls = response_cls
 
-    async def run(self, payload: bytes, session: Optional[Session]) -> List[bytes]:
+    def parse_request(self, payload: bytes) -> protobuf.Message:
+        request = self.request_cls()
+        if len(payload) > 0:
+            request.ParseFromString(payload)
+        return request
+
+    async def run(self, request: protobuf.Message, session: Optional[Session]) -> List[bytes]:
         try:
-            request = self.request_cls()
-            if len(payload) > 0:
-                request.ParseFromString(payload)
             response = self.response_cls()
 
             if session is not None:
@@ -651,10 +934,19 @@ class ClientProtocol(FrameProtocol):
 
 
 class Stub(object):
-    def __init__(self, event_loop: asyncio.AbstractEventLoop, server_address: str) -> None:
+    def __init__(
+            self,
+            event_loop: asyncio.AbstractEventLoop,
+            server_address: str,
+            *,
+            shared_memory: bool = False,
+            ring_size: int = 4 << 20,
+    ) -> None:
         self.id = uuid.uuid4().hex
         self.__event_loop = event_loop
         self.__server_address = server_address
+        self.__shared_memory = shared_memory
+        self.__ring_size = ring_size
 
         p = urllib.parse.urlparse(server_address)
         assert p.scheme == 'ipc', server_address
@@ -716,8 +1008,40 @@ class Stub(object):
                 self.__session_id = struct.unpack('=Q', serialized_response)[0]
                 logger.info("%s: Session ID = %016x", self.id, self.session_id)
 
+            if self.__shared_memory:
+                await self.__setup_rings()
+
             self.__connected = True
 
+    async def __setup_rings(self) -> None:
+        if os.path.isdir('/dev/shm'):
+            ring_dir = '/dev/shm'
+        else:
+            ring_dir = os.path.dirname(self.__socket_path)
+
+        tx_ring = ShmRing.create(ring_dir, self.__ring_size)
+        rx_ring = ShmRing.create(ring_dir, self.__ring_size)
+        try:
+            # The server might start to use its ring right after its response, so we have to be
+            # ready to read from it before the request is sent.
+            self.__protocol.rx_ring = rx_ring
+            await self.__call_internal(
+                b'M', [tx_ring.path.encode('utf-8'), rx_ring.path.encode('utf-8')])
+            self.__protocol.tx_ring = tx_ring
+
+        except Exception:
+            self.__protocol.rx_ring = None
+            rx_ring.close()
+            tx_ring.close()
+            raise
+
+        finally:
+            # Both sides have the files mapped now (or never will), so they can go.
+            tx_ring.unlink()
+            rx_ring.unlink()
+
+        logger.info("%s: Using shared memory rings.", self.id)
+
     async def close(self) -> None:
         async with self.__lock:
             if not self.__connected:
@@ -752,13 +1076,15 @@ class Stub(object):
         request_id, request_type = request_header.unpack(frames[0])
         response_future = self.__pending_requests[request_id]
 
-        if request_type in (b'C', b'S'):
+        if request_type in (b'C', b'S', b'M'):
+            # The frames might be views into the shared memory ring, so the payload has to be
+            # copied for the caller.
             if frames[1] == b'OK':
-                response_future.set_result(frames[2])
+                response_future.set_result(bytes(frames[2]))
 
             elif frames[1] == b'EXC':
                 response_future.set_exception(
-                    RemoteException(self.__server_address, frames[2].decode('utf-8')))
+                    RemoteException(self.__server_address, bytes(frames[2]).decode('utf-8')))
 
             elif frames[1] == b'CLOSED':
                 response_future.set_exception(ConnectionClosed())
@@ -781,10 +1107,7 @@ class Stub(object):
         self.__pending_requests[request_id] = response_future
         try:
             frames.insert(0, request_header.pack(request_id, request_type))
-            last_idx = len(frames) - 1
-            for idx, frame in enumerate(frames):
-                self.__transport.write(frame_header.pack(len(frame), idx != last_idx))
-                self.__transport.write(frame)
+            self.__protocol.send_frames(frames)
 
             response = await response_future
 
@@ -40,3 +40,7 @@ class IPCPerfTest(ipc_test.IPCPerfTestBase):
         for _ in range(10000):
             request.t.add(numerator=random.randint(0, 4), denominator=random.randint(1, 2))
         await self.run_test(request, 100)
+
+
+class IPCSharedMemoryPerfTest(IPCPerfTest):
+    shared_memory = True
@@ -201,6 +201,113 @@ class IPCTest(unittest.AsyncTestCase):
                 for i, response in enumerate(responses):
                     self.assertEqual(response.num, 4 + 2 * i)
 
+    async def test_shared_memory(self):
+        async with ipc.Server(self.loop, name='test', socket_dir=TEST_OPTS.TMP_DIR) as server:
+            async def handler(request, response):
+                response.num = request.num + len(request.t)
+            endpoint = ipc.ServerEndpoint('main')
+            endpoint.add_handler(
+                'foo', handler, ipc_test_pb2.TestRequest, ipc_test_pb2.TestResponse)
+            await server.add_endpoint(endpoint)
+
+            async with ipc.Stub(
+                    self.loop, server.address, shared_memory=True, ring_size=1024) as stub:
+                await stub.ping()
+
+                # Enough requests to wrap around the rings a couple of times, some of them too
+                # large for the rings, so they have to go over the socket.
+                for i in range(200):
+                    request = ipc_test_pb2.TestRequest()
+                    request.num = i
+                    for _ in range(i % 7 * 40):
+                        request.t.add(numerator=1, denominator=2)
+                    response = ipc_test_pb2.TestResponse()
+                    await stub.call('foo', request, response)
+                    self.assertEqual(response.num, i + i % 7 * 40)
+
+    async def test_shared_memory_concurrent(self):
+        async with ipc.Server(self.loop, name='test', socket_dir=TEST_OPTS.TMP_DIR) as server:
+            async def handler(request, response):
+                await asyncio.sleep(0.001 * (request.num % 3), loop=self.loop)
+                response.num = request.num + len(request.t)
+            endpoint = ipc.ServerEndpoint('main')
+            endpoint.add_handler(
+                'foo', handler, ipc_test_pb2.TestRequest, ipc_test_pb2.TestResponse)
+            await server.add_endpoint(endpoint)
+
+            async with ipc.Stub(
+                    self.loop, server.address, shared_memory=True, ring_size=1024) as stub:
+                # Many requests in flight, so messages pile up in the rings while the reader is
+                # busy, mixed with some, which are too large for the rings.
+                async def call(i):
+                    request = ipc_test_pb2.TestRequest()
+                    request.num = i
+                    for _ in range(i % 5 * 30):
+                        request.t.add(numerator=1, denominator=2)
+                    response = ipc_test_pb2.TestResponse()
+                    await stub.call('foo', request, response)
+                    return response.num
+
+                results = await asyncio.gather(*[call(i) for i in range(200)], loop=self.loop)
+                self.assertEqual(results, [i + i % 5 * 30 for i in range(200)])
+
+
+class ShmRingTest(unittest.TestCase):
+    def test_park(self):
+        ring = ipc.ShmRing.create(TEST_OPTS.TMP_DIR, 1024)
+        try:
+            reader = ipc.ShmRing(ring.path)
+            try:
+                # The reader starts parked.
+                self.assertTrue(ring.write([b'foo']))
+                self.assertTrue(ring.wake_reader())
+                self.assertTrue(ring.write([b'bar', b'baz']))
+                self.assertFalse(ring.wake_reader())
+
+                frames, read_pos = reader.read()
+                self.assertEqual([bytes(frame) for frame in frames], [b'foo'])
+                for frame in frames:
+                    frame.release()
+                reader.consume(read_pos)
+                self.assertFalse(reader.park())
+
+                frames, read_pos = reader.read()
+                self.assertEqual([bytes(frame) for frame in frames], [b'bar', b'baz'])
+                for frame in frames:
+                    frame.release()
+                reader.consume(read_pos)
+                self.assertFalse(reader.readable())
+                self.assertTrue(reader.park())
+
+                self.assertTrue(ring.write([b'foo']))
+                self.assertTrue(ring.wake_reader())
+
+            finally:
+                reader.close()
+
+        finally:
+            ring.close()
+            ring.unlink()
+
+    def test_readable_until(self):
+        ring = ipc.ShmRing.create(TEST_OPTS.TMP_DIR, 1024)
+        try:
+            self.assertTrue(ring.write([b'foo']))
+            pos = ring.write_pos
+            self.assertTrue(ring.write([b'bar']))
+
+            self.assertTrue(ring.readable(pos))
+            frames, read_pos = ring.read()
+            for frame in frames:
+                frame.release()
+            ring.consume(read_pos)
+            self.assertFalse(ring.readable(pos))
+            self.assertTrue(ring.readable())
+
+        finally:
+            ring.close()
+            ring.unlink()
+
 
 class TestSubprocess(process_manager.SubprocessMixin, process_manager.ProcessBase):
     async def run(self):
@@ -221,6 +328,8 @@ class TestSubprocess(process_manager.SubprocessMixin, process_manager.ProcessBas
 
 
 class IPCPerfTestBase(unittest.AsyncTestCase):
+    shared_memory = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -236,7 +345,7 @@ class IPCPerfTestBase(unittest.AsyncTestCase):
         self.proc = await self.mgr.start_subprocess(
             'test', 'noisicaa.core.ipc_test.TestSubprocess')
 
-        self.stub = ipc.Stub(self.loop, self.proc.address)
+        self.stub = ipc.Stub(self.loop, self.proc.address, shared_memory=self.shared_memory)
         await self.stub.connect()
 
         # Set CPUs to performance mode, so test results are not skewed by variable CPU frequency.
@@ -304,3 +413,7 @@ class IPCPerfTest(IPCPerfTestBase):
         request = ipc_test_pb2.TestRequest()
         request.t.add(numerator=random.randint(0, 4), denominator=random.randint(1, 2))
         await self.run_test(request, 10, out=io.StringIO())
+
+
+class IPCSharedMemoryPerfTest(IPCPerfTest):
+    shared_memory = True
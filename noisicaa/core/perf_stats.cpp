@@ -22,12 +22,63 @@
 
 #include "stdlib.h"
 #include <chrono>
+#include <deque>
+#include <map>
 #include <memory>
+#include <mutex>
 #include <random>
+#include <thread>
 #include "noisicaa/core/perf_stats.h"
 
 namespace noisicaa {
 
+namespace {
+
+struct NameTable {
+  NameTable() {
+    names.emplace_back("");
+    ids.emplace(names.back(), 0);
+  }
+
+  mutex lock;
+  deque<string> names;
+  map<string, uint32_t> ids;
+};
+
+NameTable* name_table() {
+  static NameTable table;
+  return &table;
+}
+
+}  // namespace
+
+atomic<int> PerfStats::_level(PerfStats::Level::OFF);
+
+uint32_t PerfStats::intern(const char* name) {
+  NameTable* table = name_table();
+  lock_guard<mutex> guard(table->lock);
+
+  const auto& it = table->ids.find(name);
+  if (it != table->ids.end()) {
+    return it->second;
+  }
+
+  uint32_t name_id = table->names.size();
+  table->names.emplace_back(name);
+  table->ids.emplace(table->names.back(), name_id);
+  return name_id;
+}
+
+string PerfStats::name(uint32_t name_id) {
+  NameTable* table = name_table();
+  lock_guard<mutex> guard(table->lock);
+
+  if (name_id >= table->names.size()) {
+    return "";
+  }
+  return table->names[name_id];
+}
+
 PerfStats::PerfStats()
   : PerfStats(nullptr) {}
 
@@ -44,19 +95,23 @@ void PerfStats::reset() {
   _stack.clear();
 }
 
-void PerfStats::start_span(const char* name) {
-  start_span(name, current_span_id());
+void PerfStats::start_span(uint32_t name_id) {
+  start_span(name_id, current_span_id());
 }
 
-void PerfStats::start_span(const char* name, uint64_t parent_id) {
-  static mt19937_64 rand(time(0));
+void PerfStats::start_span(uint32_t name_id, uint64_t parent_id) {
+  static thread_local mt19937_64 rand(time(0) ^ hash<thread::id>()(this_thread::get_id()));
   uint64_t id = rand();
 
   _stack.push_back(_spans.size());
-  _spans.emplace_back(Span{id, name, parent_id, get_time_nsec(), 0});
+  _spans.emplace_back(Span{id, name_id, parent_id, get_time_nsec(), 0});
 }
 
 void PerfStats::end_span() {
+  if (_stack.empty()) {
+    return;
+  }
+
   _spans[_stack.back()].end_time_nsec = get_time_nsec();
   _stack.pop_back();
 }
@@ -101,17 +156,53 @@ void PerfStats::serialize_to(char* buf) const {
   assert(p - buf == serialized_size());
 }
 
-void PerfStats::deserialize(const string& data) {
-  assert(_spans.size() == 0);
+void PerfStats::deserialize_from(const char* buf, size_t length) {
+  reset();
 
-  const char* p = data.c_str();
+  const char* p = buf;
   size_t num_spans = *((size_t*)p);
   p += sizeof(size_t);
-  assert(data.size() == sizeof(size_t) + num_spans * sizeof(Span));
+  assert(length == sizeof(size_t) + num_spans * sizeof(Span));
   for (size_t i = 0 ; i < num_spans ; ++i) {
     _spans.emplace_back(*((Span*)p));
     p += sizeof(Span);
   }
 }
 
+string PerfStats::serialize() const {
+  string data(sizeof(size_t) + _spans.size() * sizeof(SerializedSpan), 0);
+
+  char* p = (char*)data.data();
+  *((size_t*)p) = _spans.size();
+  p += sizeof(size_t);
+  for (const auto& span : _spans) {
+    SerializedSpan* sspan = (SerializedSpan*)p;
+    sspan->id = span.id;
+    strncpy(sspan->name, name(span.name_id).c_str(), NAME_LENGTH - 1);
+    sspan->name[NAME_LENGTH - 1] = 0;
+    sspan->parent_id = span.parent_id;
+    sspan->start_time_nsec = span.start_time_nsec;
+    sspan->end_time_nsec = span.end_time_nsec;
+    p += sizeof(SerializedSpan);
+  }
+
+  return data;
+}
+
+void PerfStats::deserialize(const string& data) {
+  reset();
+
+  const char* p = data.c_str();
+  size_t num_spans = *((size_t*)p);
+  p += sizeof(size_t);
+  assert(data.size() == sizeof(size_t) + num_spans * sizeof(SerializedSpan));
+  for (size_t i = 0 ; i < num_spans ; ++i) {
+    const SerializedSpan* sspan = (const SerializedSpan*)p;
+    _spans.emplace_back(Span{
+        sspan->id, intern(sspan->name), sspan->parent_id,
+        sspan->start_time_nsec, sspan->end_time_nsec});
+    p += sizeof(SerializedSpan);
+  }
+}
+
 }  // namespace noisicaa
@@ -25,8 +25,10 @@
 #ifndef _NOISICAA_CORE_PERF_STATS_H
 #define _NOISICAA_CORE_PERF_STATS_H
 
+#include <atomic>
 #include <functional>
 #include <memory>
+#include <string>
 #include <vector>
 #include <assert.h>
 #include <stdint.h>
@@ -40,26 +42,20 @@ class PerfStats {
 public:
   static const size_t NAME_LENGTH = 128;
 
-  struct Span {
-    Span() {
-      this->id = 0;
-      memset(this->name, 0, NAME_LENGTH);
-      this->parent_id = 0;
-      this->start_time_nsec = 0;
-      this->end_time_nsec = 0;
-    };
-
-    Span(uint64_t id, const char* name, uint64_t parent_id, uint64_t start_time_nsec, uint64_t end_time_nsec) {
-      this->id = id;
-      assert(strlen(name) < NAME_LENGTH);
-      strncpy(this->name, name, NAME_LENGTH);
-      this->parent_id = parent_id;
-      this->start_time_nsec = start_time_nsec;
-      this->end_time_nsec = end_time_nsec;
-    };
+  enum Level {
+    // Do not record any spans.
+    OFF = 0,
+    // Record spans for blocks and processors.
+    PROCESSOR = 1,
+    // Additionally record a span for every opcode.
+    OPCODE = 2,
+  };
 
+  // Span names are interned into a process wide table, so spans are small fixed size records,
+  // which can be recorded without copying strings around.
+  struct Span {
     uint64_t id;
-    char name[NAME_LENGTH];
+    uint32_t name_id;
     uint64_t parent_id;
     uint64_t start_time_nsec;
     uint64_t end_time_nsec;
@@ -70,10 +66,17 @@ public:
   PerfStats();
   PerfStats(clock_func_t clock);
 
+  // Not realtime safe, call these outside of the audio thread (e.g. in static initializers).
+  static uint32_t intern(const char* name);
+  static string name(uint32_t name_id);
+
+  static Level level() { return (Level)_level.load(memory_order_relaxed); }
+  static void set_level(Level level) { _level.store(level, memory_order_relaxed); }
+
   void reset();
 
-  void start_span(const char* name, uint64_t parent_id);
-  void start_span(const char* name);
+  void start_span(uint32_t name_id, uint64_t parent_id);
+  void start_span(uint32_t name_id);
   void end_span();
   void append_span(const Span& span);
 
@@ -81,11 +84,26 @@ public:
   int num_spans() const { return _spans.size(); }
   Span span(int idx) const { return _spans[idx]; }
 
+  // Compact serialization with interned name IDs, only valid within the same process.
   size_t serialized_size() const;
   void serialize_to(char* buf) const;
+  void deserialize_from(const char* buf, size_t length);
+
+  // Serialization with resolved span names, which can be passed to other processes.
+  string serialize() const;
   void deserialize(const string& data);
 
 private:
+  struct SerializedSpan {
+    uint64_t id;
+    char name[NAME_LENGTH];
+    uint64_t parent_id;
+    uint64_t start_time_nsec;
+    uint64_t end_time_nsec;
+  };
+
+  static atomic<int> _level;
+
   clock_func_t _clock;
   uint64_t get_time_nsec() const;
 
@@ -95,12 +113,18 @@ private:
 
 class PerfTracker {
 public:
-  PerfTracker(PerfStats* stats, const char* name)
-    : _stats(stats) {
-    _stats->start_span(name);
+  PerfTracker(
+      PerfStats* stats, uint32_t name_id, PerfStats::Level level = PerfStats::Level::PROCESSOR)
+    : _stats(nullptr) {
+    if (PerfStats::level() >= level) {
+      _stats = stats;
+      _stats->start_span(name_id);
+    }
   }
   ~PerfTracker() {
-    _stats->end_span();
+    if (_stats != nullptr) {
+      _stats->end_span();
+    }
   }
 
 private:
@@ -19,16 +19,21 @@
 # @end:license
 
 from cpython.ref cimport PyObject
-from libc.stdint cimport uint64_t
+from libc.stdint cimport uint32_t, uint64_t
 from libcpp.functional cimport function
 from libcpp.memory cimport unique_ptr
 from libcpp.string cimport string
 
 cdef extern from "noisicaa/core/perf_stats.h" namespace "noisicaa" nogil:
     cppclass PerfStats:
+        enum Level:
+            OFF "noisicaa::PerfStats::Level::OFF"
+            PROCESSOR "noisicaa::PerfStats::Level::PROCESSOR"
+            OPCODE "noisicaa::PerfStats::Level::OPCODE"
+
         struct Span:
             uint64_t id
-            char name[128]
+            uint32_t name_id
             uint64_t parent_id
             uint64_t start_time_nsec
             uint64_t end_time_nsec
@@ -38,9 +43,18 @@ cdef extern from "noisicaa/core/perf_stats.h" namespace "noisicaa" nogil:
         PerfStats()
         PerfStats(clock_func_t clock)
 
+        @staticmethod
+        uint32_t intern(const char* name)
+        @staticmethod
+        string name(uint32_t name_id)
+        @staticmethod
+        Level level()
+        @staticmethod
+        void set_level(Level level)
+
         void reset()
-        void start_span(const char* name, uint64_t parent_id)
-        void start_span(const char* name)
+        void start_span(uint32_t name_id, uint64_t parent_id)
+        void start_span(uint32_t name_id)
         void end_span()
         void append_span(const Span& span)
         uint64_t current_span_id() const
@@ -49,6 +63,8 @@ cdef extern from "noisicaa/core/perf_stats.h" namespace "noisicaa" nogil:
 
         size_t serialized_size() const
         void serialize_to(char* buf) const
+        void deserialize_from(const char* buf, size_t length)
+        string serialize() const
         void deserialize(const string& data)
 
 
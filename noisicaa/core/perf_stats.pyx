@@ -20,8 +20,6 @@
 #
 # @end:license
 
-from libc.string cimport strncpy
-
 import contextlib
 import random
 import threading
@@ -33,6 +31,11 @@ cdef extern from "<functional>" namespace "std" nogil:
     cdef PerfStats.clock_func_t bind(uint64_t (PyObject*), PyObject*) except +
 
 
+LEVEL_OFF = 0
+LEVEL_PROCESSOR = 1
+LEVEL_OPCODE = 2
+
+
 class Span(object):
     def __init__(self):
         self.id = None
@@ -95,7 +98,7 @@ cdef class PyPerfStats(object):
             span = self.__stats.span(idx)
             s = Span()
             s.id = int(span.id)
-            s.name = bytes(span.name).decode('utf-8')
+            s.name = bytes(PerfStats.name(span.name_id)).decode('utf-8')
             s.parent_id = int(span.parent_id)
             s.start_time_nsec = int(span.start_time_nsec)
             s.end_time_nsec = int(span.end_time_nsec)
@@ -113,20 +116,27 @@ cdef class PyPerfStats(object):
         self.__stats.reset()
 
     def serialize(self):
-        buf = bytearray(self.__stats.serialized_size())
-        self.__stats.serialize_to(buf)
-        return bytes(buf)
+        return bytes(self.__stats.serialize())
 
     def deserialize(self, bytes data):
-        self.__stats.reset()
         self.__stats.deserialize(data)
 
+    @staticmethod
+    def get_level():
+        return int(PerfStats.level())
+
+    @staticmethod
+    def set_level(int level):
+        if not LEVEL_OFF <= level <= LEVEL_OPCODE:
+            raise ValueError("Invalid perf stats level %d" % level)
+        PerfStats.set_level(<PerfStats.Level>level)
+
     def start_span(self, name, parent_id=None):
-        name = name.encode('utf-8')
+        cdef uint32_t name_id = PerfStats.intern(name.encode('utf-8'))
         if parent_id is not None:
-            self.__stats.start_span(name, parent_id)
+            self.__stats.start_span(name_id, parent_id)
         else:
-            self.__stats.start_span(name)
+            self.__stats.start_span(name_id)
 
     def end_span(self):
         self.__stats.end_span()
@@ -143,7 +153,7 @@ cdef class PyPerfStats(object):
         cdef PerfStats.Span span
         for s in msg.spans:
             span.id = s.id
-            strncpy(span.name, s.name.encode('utf-8'), 128)
+            span.name_id = PerfStats.intern(s.name.encode('utf-8'))
             if s.parent_id == 0:
                 span.parent_id = self.current_span_id
             else:
@@ -97,3 +97,30 @@ class PerfStatsTest(unittest.TestCase):
         self.assertEqual(pf1.spans[1].parent_id, pf1.spans[0].id)
         self.assertEqual(pf1.spans[1].start_time_nsec, 1)
         self.assertEqual(pf1.spans[1].end_time_nsec, 2)
+
+    def test_serialize(self):
+        pf1 = TestPerfStats()
+        with pf1.track('1'):
+            pf1.fake_time += 1
+            with pf1.track('2'):
+                pf1.fake_time += 1
+
+        pf2 = TestPerfStats()
+        pf2.deserialize(pf1.serialize())
+        self.assertEqual(len(pf2), 2)
+        self.assertEqual(pf2.spans[0].name, '1')
+        self.assertEqual(pf2.spans[0].id, pf1.spans[0].id)
+        self.assertEqual(pf2.spans[1].name, '2')
+        self.assertEqual(pf2.spans[1].parent_id, pf1.spans[0].id)
+        self.assertEqual(pf2.spans[1].end_time_nsec, 2)
+
+    def test_set_level(self):
+        self.assertEqual(perf_stats.PyPerfStats.get_level(), perf_stats.LEVEL_OFF)
+        try:
+            perf_stats.PyPerfStats.set_level(perf_stats.LEVEL_OPCODE)
+            self.assertEqual(perf_stats.PyPerfStats.get_level(), perf_stats.LEVEL_OPCODE)
+        finally:
+            perf_stats.PyPerfStats.set_level(perf_stats.LEVEL_OFF)
+
+        with self.assertRaises(ValueError):
+            perf_stats.PyPerfStats.set_level(3)
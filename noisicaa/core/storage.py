@@ -24,12 +24,16 @@ import collections
 import enum
 import hashlib
 import logging
+import mmap
 import os
 import os.path
+import re
 import time
 import struct
-from typing import cast, Dict, List, Set, Tuple, IO
+import zlib
+from typing import cast, Any, Iterator, List, Optional, Set, Tuple, IO
 
+import lz4.frame
 from mypy_extensions import TypedDict
 import portalocker
 
@@ -73,6 +77,88 @@ def _reverse_action(action: bytes) -> bytes:
     return ACTION_BACKWARD.value
 
 
+class RecordFile(object):
+    """A file of fixed size records, which is accessed through a memory map.
+
+    Opening the file does not read its contents, and records can be accessed in O(1). Appended
+    records are kept in memory, until they are written to the file. Once enough of them have
+    accumulated, the file is mapped again, so the memory usage is bounded by that threshold.
+    """
+
+    remap_threshold = 1 << 16
+
+    def __init__(self, path: str, formatter: struct.Struct) -> None:
+        self.__path = path
+        self.__formatter = formatter
+
+        self.__fp = open(path, mode='r+b', buffering=0)
+        self.__fp.seek(0, os.SEEK_END)
+        self.__map = None  # type: mmap.mmap
+        self.__mapped_count = 0
+        self.__tail = bytearray()
+        self.__written = 0
+
+        size = os.fstat(self.__fp.fileno()).st_size
+        if size % self.__formatter.size != 0:
+            self.__fp.close()
+            raise CorruptedProjectError("Malformed %s file." % os.path.basename(path))
+
+        self.__remap()
+
+    def __remap(self) -> None:
+        assert self.__written == len(self.__tail)
+
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+
+        size = os.fstat(self.__fp.fileno()).st_size
+        if size > 0:
+            self.__map = mmap.mmap(self.__fp.fileno(), size, access=mmap.ACCESS_READ)
+        self.__mapped_count = size // self.__formatter.size
+        self.__tail.clear()
+        self.__written = 0
+
+    def close(self) -> None:
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+        self.__fp.close()
+
+    def __len__(self) -> int:
+        return self.__mapped_count + len(self.__tail) // self.__formatter.size
+
+    def __getitem__(self, idx: int) -> Tuple[Any, ...]:
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+
+        if idx < self.__mapped_count:
+            return self.__formatter.unpack_from(self.__map, idx * self.__formatter.size)
+        return self.__formatter.unpack_from(
+            self.__tail, (idx - self.__mapped_count) * self.__formatter.size)
+
+    def __iter__(self) -> Iterator[Tuple[Any, ...]]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def append(self, *values: Any) -> None:
+        self.__tail += self.__formatter.pack(*values)
+
+    def write(self) -> None:
+        """Write all appended records to the file."""
+
+        if self.__written < len(self.__tail):
+            self.__fp.write(self.__tail[self.__written:])
+            self.__fp.flush()
+            self.__written = len(self.__tail)
+
+        if len(self.__tail) >= self.remap_threshold:
+            self.__remap()
+
+    def sync(self) -> None:
+        os.fdatasync(self.__fp.fileno())
+
+
 class ProjectStorage(object):
     MAGIC = b'NOISICAA\n'
 
@@ -83,33 +169,54 @@ class ProjectStorage(object):
         self.path = None  # type: str
         self.header_data = None  # type: HeaderData
         self.file_lock = None  # type: IO
-        self.log_index_fp = None  # type: IO[bytes]
-        self.log_history_fp = None  # type: IO[bytes]
-        self.checkpoint_index_fp = None  # type: IO[bytes]
 
         self.next_log_number = None  # type: int
         self.log_file_number = 0
         self.log_fp = None  # type: IO[bytes]
-        self.log_fp_map = {}  # type: Dict[int, IO]
+        # Bounded pool of file objects for reading older log files.
+        self.log_fp_map = collections.OrderedDict()  # type: collections.OrderedDict[int, IO[bytes]]
+        self.log_fp_pool_size = 8
         self.log_index_formatter = struct.Struct('>QQ')
-        self.log_index = None # type: bytearray
+        self.log_index = None # type: RecordFile
 
         self.log_history_formatter = struct.Struct('>cQQQ')
         self.next_sequence_number = None  # type: int
         self.undo_count = None  # type: int
         self.redo_count = None  # type: int
-        self.log_history = None  # type: bytearray
+        self.log_history = None  # type: RecordFile
 
         self.next_checkpoint_number = None  # type: int
+        self.next_checkpoint_file_number = None  # type: int
+        # File number of the latest full checkpoint, which new delta checkpoints are based on.
+        self.full_checkpoint_file_number = None  # type: Optional[int]
         self.checkpoint_index_formatter = struct.Struct('>QQ')
-        self.checkpoint_index = None  # type: bytearray
+        self.checkpoint_index = None  # type: RecordFile
 
+        # LRU cache of log entries, bounded by the total size of the cached entries.
         self.log_entry_cache = collections.OrderedDict()  # type: collections.OrderedDict[int, LogEntry]
-        self.log_entry_cache_size = 20
+        self.log_entry_cache_bytes = 0
+        self.log_entry_cache_max_bytes = 16 << 20
 
         self.written_log_number = None  # type: int
         self.written_sequence_number = None  # type: int
 
+        # Durability barrier: the log files are fdatasync'ed, once this many entries have been
+        # written since the last sync, or the last sync is at least this many seconds ago. Either
+        # can be set to None to disable that trigger.
+        self.sync_entries = 100  # type: Optional[int]
+        self.sync_interval = 1.0  # type: Optional[float]
+        self.unsynced_entries = 0
+        self.last_sync_time = None  # type: float
+
+        # A new log file is started, once the current one reaches this size.
+        self.log_segment_size = 64 << 20  # type: Optional[int]
+
+        # Compaction drops history entries, log entries and checkpoints, which are not needed to
+        # restore the project and undo at least undo_depth steps. It only starts, once at least
+        # compaction_threshold history entries can be dropped.
+        self.undo_depth = 10000  # type: Optional[int]
+        self.compaction_threshold = 1000
+
     def open(self, path: str) -> None:
         assert self.path is None
 
@@ -132,6 +239,13 @@ class ProjectStorage(object):
         self.file_lock = self.acquire_file_lock(
             os.path.join(self.path, "lock"))
 
+        recovered = self._recover_compaction()
+
+        log_file_numbers = [
+            int(m.group(1))
+            for m in (self.log_file_re.match(fname) for fname in os.listdir(self.path))
+            if m is not None]
+        self.log_file_number = max(log_file_numbers, default=0)
         log_path = os.path.join(self.path, 'log.%06d' % self.log_file_number)
         if os.path.exists(log_path):
             mode = 'a+b'
@@ -139,22 +253,14 @@ class ProjectStorage(object):
             mode = 'w+b'
         self.log_fp = open(log_path, mode=mode, buffering=0)
 
-        self.log_index_fp = open(
-            os.path.join(self.path, 'log.index'),
-            mode='r+b', buffering=0)
-        self.log_index = bytearray(self.log_index_fp.read())
-        self.next_log_number = len(self.log_index) // self.log_index_formatter.size
-        if len(self.log_index) != self.next_log_number * self.log_index_formatter.size:
-            raise CorruptedProjectError("Malformed log.index file.")
+        self.log_index = RecordFile(
+            os.path.join(self.path, 'log.index'), self.log_index_formatter)
+        self.next_log_number = len(self.log_index)
         self.written_log_number = self.next_log_number - 1
 
-        self.log_history_fp = open(
-            os.path.join(self.path, 'log.history'),
-            mode='r+b', buffering=0)
-        self.log_history = bytearray(self.log_history_fp.read())
-        self.next_sequence_number = len(self.log_history) // self.log_history_formatter.size
-        if len(self.log_history) != self.next_sequence_number * self.log_history_formatter.size:
-            raise CorruptedProjectError("Malformed log.history file.")
+        self.log_history = RecordFile(
+            os.path.join(self.path, 'log.history'), self.log_history_formatter)
+        self.next_sequence_number = len(self.log_history)
         self.written_sequence_number = self.next_sequence_number - 1
 
         if self.written_sequence_number >= 0:
@@ -164,23 +270,34 @@ class ProjectStorage(object):
             self.undo_count = 0
             self.redo_count = 0
 
-        self.checkpoint_index_fp = open(
-            os.path.join(self.path, 'checkpoint.index'),
-            mode='r+b', buffering=0)
-        self.checkpoint_index = bytearray(self.checkpoint_index_fp.read())
-        self.next_checkpoint_number = (
-            len(self.checkpoint_index) // self.checkpoint_index_formatter.size)
-        if len(self.checkpoint_index) != (
-                self.next_checkpoint_number * self.checkpoint_index_formatter.size):
-            raise CorruptedProjectError("Malformed checkpoint.index file.")
+        self.checkpoint_index = RecordFile(
+            os.path.join(self.path, 'checkpoint.index'), self.checkpoint_index_formatter)
+        self.next_checkpoint_number = len(self.checkpoint_index)
+        if self.next_checkpoint_number > 0:
+            latest_file_number = self._get_checkpoint_entry(self.next_checkpoint_number - 1)[1]
+            self.next_checkpoint_file_number = latest_file_number + 1
+            header = self._read_checkpoint_header(latest_file_number)
+            if header.HasField('base_checkpoint'):
+                self.full_checkpoint_file_number = header.base_checkpoint
+            else:
+                self.full_checkpoint_file_number = latest_file_number
+        else:
+            self.next_checkpoint_file_number = 0
+            self.full_checkpoint_file_number = None
+
+        self.unsynced_entries = 0
+        self.last_sync_time = time.time()
+
+        if recovered:
+            self._remove_unused_files()
 
         os.utime(os.path.join(self.path, 'project.noise'))
 
     def get_restore_info(self) -> Tuple[int, List[Tuple[Action, int]]]:
         assert self.next_checkpoint_number > 0
 
-        seq_number, checkpoint_number = self._get_checkpoint_entry(
-            self.next_checkpoint_number - 1)
+        checkpoint_number = self.next_checkpoint_number - 1
+        seq_number, _ = self._get_checkpoint_entry(checkpoint_number)
 
         actions = []
         for snum in range(seq_number, self.next_sequence_number):
@@ -219,16 +336,18 @@ class ProjectStorage(object):
     def close(self) -> None:
         assert self.path is not None, "Project already closed."
 
+        self.sync()
+
         os.utime(os.path.join(self.path, 'project.noise'))
         self.path = None
 
-        if self.log_index_fp is not None:
-            self.log_index_fp.close()
-            self.log_index_fp = None
+        if self.log_index is not None:
+            self.log_index.close()
+            self.log_index = None
 
-        if self.log_history_fp is not None:
-            self.log_history_fp.close()
-            self.log_history_fp = None
+        if self.log_history is not None:
+            self.log_history.close()
+            self.log_history = None
 
         if self.log_fp is not None:
             self.log_fp.close()
@@ -238,9 +357,9 @@ class ProjectStorage(object):
             log_fp.close()
         self.log_fp_map.clear()
 
-        if self.checkpoint_index_fp is not None:
-            self.checkpoint_index_fp.close()
-            self.checkpoint_index_fp = None
+        if self.checkpoint_index is not None:
+            self.checkpoint_index.close()
+            self.checkpoint_index = None
 
         self.release_file_lock(self.file_lock)
         self.file_lock = None
@@ -258,59 +377,104 @@ class ProjectStorage(object):
         logger.info("Releasing file lock.")
         lock_fp.close()
 
-    def _write_log(
-            self, seq_number: int, history_entry: HistoryEntry, log_entry: LogEntry) -> None:
-        log_number = history_entry[1]
+    def _write_logs(
+            self, entries: List[Tuple[int, HistoryEntry, Optional[LogEntry]]]) -> None:
+        if not entries:
+            return
+
+        logger.info(
+            "Writing log entries #%d..#%d...", entries[0][0], entries[-1][0])
+
+        # Collect everything first, so each file gets a single write for the whole batch. The
+        # history entries have already been added by the caller.
+        log_data = []  # type: List[bytes]
+        if self.log_segment_size is not None and self.log_fp.tell() >= self.log_segment_size:
+            self._rotate_log()
+
+        offset = self.log_fp.tell()
+        for _, history_entry, log_entry in entries:
+            if log_entry is not None:
+                self.log_index.append(self.log_file_number, offset)
+                log_data.append(struct.pack('>Q', len(log_entry)))
+                log_data.append(log_entry)
+                offset += struct.calcsize('>Q') + len(log_entry)
+
+        if log_data:
+            self.log_fp.write(b''.join(log_data))
+            self.log_fp.flush()
+            self.log_index.write()
 
-        logger.info("Writing log entry #%d...", seq_number)
+        self.log_history.write()
 
-        if log_entry is not None:
-            offset = self.log_fp.tell()
+        for seq_number, history_entry, log_entry in entries:
+            assert seq_number > self.written_sequence_number
+            self.written_sequence_number = seq_number
 
-            self.log_fp.write(struct.pack('>Q', len(log_entry)))
-            self.log_fp.write(log_entry)
-            self.log_fp.flush()
+            if log_entry is not None:
+                log_number = history_entry[1]
+                assert log_number > self.written_log_number
+                self.written_log_number = log_number
+        self.flush_cache(self.log_entry_cache_max_bytes)
+
+        self.unsynced_entries += len(entries)
+        self._maybe_sync()
+
+    def _maybe_sync(self) -> None:
+        if self.sync_entries is not None and self.unsynced_entries >= self.sync_entries:
+            self.sync()
+        elif (self.sync_interval is not None
+              and time.time() - self.last_sync_time >= self.sync_interval):
+            self.sync()
+
+    def sync(self) -> None:
+        """Flush all written log entries to disk."""
+
+        if self.unsynced_entries == 0:
+            return
 
-            packed_index_entry = self.log_index_formatter.pack(
-                self.log_file_number, offset)
-            self.log_index_fp.write(packed_index_entry)
-            self.log_index_fp.flush()
+        logger.info("Syncing %d log entries...", self.unsynced_entries)
+        os.fdatasync(self.log_fp.fileno())
+        self.log_index.sync()
+        self.log_history.sync()
 
-        packed_history_entry = self.log_history_formatter.pack(
-            *history_entry)
-        self.log_history_fp.write(packed_history_entry)
-        self.log_history_fp.flush()
+        self.unsynced_entries = 0
+        self.last_sync_time = time.time()
 
-        assert seq_number > self.written_sequence_number
-        self.written_sequence_number = seq_number
+    def _rotate_log(self) -> None:
+        os.fdatasync(self.log_fp.fileno())
+        self.log_fp.close()
 
-        if log_entry is not None:
-            self.log_index += packed_index_entry
-            assert log_number > self.written_log_number
-            self.written_log_number = log_number
+        self.log_file_number += 1
+        log_path = os.path.join(self.path, 'log.%06d' % self.log_file_number)
+        logger.info("Starting new log file %s...", log_path)
+        self.log_fp = open(log_path, mode='w+b', buffering=0)
 
     def _write_checkpoint(
-            self, seq_number: int, checkpoint_number: int, checkpoint: Checkpoint) -> None:
+            self, seq_number: int, checkpoint_number: int, checkpoint: Checkpoint,
+            base_checkpoint: Optional[int] = None) -> None:
         checkpoint_path = os.path.join(
             self.path,
             'checkpoint.%06d' % checkpoint_number)
         logger.info("Writing checkpoint %s...", checkpoint_path)
+        compressed = lz4.frame.compress(checkpoint)
         with open(checkpoint_path, mode='wb', buffering=0) as fp:
             header = storage_pb2.FileHeader()
             header.type = 'checkpoint'
             header.version = self.VERSION
             header.create_timestamp = int(time.time())
             header.size = len(checkpoint)
-            header.checksum_type = storage_pb2.FileHeader.MD5
-            header.checksum = hashlib.md5(checkpoint).digest()
+            header.compression = storage_pb2.FileHeader.LZ4
+            header.compressed_size = len(compressed)
+            header.checksum_type = storage_pb2.FileHeader.CRC32
+            header.checksum = struct.pack('>L', zlib.crc32(checkpoint))
+            if base_checkpoint is not None:
+                header.base_checkpoint = base_checkpoint
             self._write_file_header(fp, header)
 
-            fp.write(checkpoint)
+            fp.write(compressed)
 
-        packed_index_entry = self.checkpoint_index_formatter.pack(
-            seq_number, checkpoint_number)
-        self.checkpoint_index_fp.write(packed_index_entry)
-        self.checkpoint_index_fp.flush()
+        self.checkpoint_index.append(seq_number, checkpoint_number)
+        self.checkpoint_index.write()
 
     def _write_file_header(self, fp: IO[bytes], header: storage_pb2.FileHeader) -> None:
         fp.write(self.MAGIC)
@@ -337,40 +501,39 @@ class ProjectStorage(object):
         return header
 
     def get_history_entry(self, seq_number: int) -> HistoryEntry:
-        size = self.log_history_formatter.size
-        offset = seq_number * size
-        packed_entry = self.log_history[offset:offset+size]
-        return cast(HistoryEntry, self.log_history_formatter.unpack(packed_entry))
+        return cast(HistoryEntry, self.log_history[seq_number])
 
     def _add_history_entry(self, entry: HistoryEntry) -> None:
-        packed_entry = self.log_history_formatter.pack(*entry)
-        self.log_history += packed_entry
+        self.log_history.append(*entry)
 
     def _get_log_fp(self, file_number: int) -> IO[bytes]:
+        if file_number == self.log_file_number:
+            return self.log_fp
+
         try:
-            return self.log_fp_map[file_number]
+            log_fp = self.log_fp_map[file_number]
+            self.log_fp_map.move_to_end(file_number)  # pylint: disable=no-member
         except KeyError:
             log_fp = open(
                 os.path.join(
                     self.path,
                     'log.%06d' % file_number),
-                mode='r+b', buffering=0)
-            self.log_fp_map[self.log_file_number] = log_fp
-            return log_fp
+                mode='rb', buffering=0)
+            self.log_fp_map[file_number] = log_fp
+            while len(self.log_fp_map) > self.log_fp_pool_size:
+                _, old_fp = self.log_fp_map.popitem(last=False)  # pylint: disable=no-member
+                old_fp.close()
+        return log_fp
 
     def _read_log_entry(self, log_number: int) -> LogEntry:
-        size = self.log_index_formatter.size
-        offset = log_number * size
-        packed_index_entry = self.log_index[offset:offset+size]
-        file_number, file_offset = self.log_index_formatter.unpack(
-            packed_index_entry)
-
-        log_fp = self._get_log_fp(file_number)
-        log_fp.seek(file_offset, os.SEEK_SET)
+        file_number, file_offset = self.log_index[log_number]
 
+        # pread does not touch the file position, which matters for the log file, which is
+        # currently being appended to.
+        fd = self._get_log_fp(file_number).fileno()
         entry_len, = struct.unpack(
-            '>Q', log_fp.read(struct.calcsize('>Q')))
-        return log_fp.read(entry_len)
+            '>Q', os.pread(fd, struct.calcsize('>Q'), file_offset))
+        return os.pread(fd, entry_len, file_offset + struct.calcsize('>Q'))
 
     def get_log_entry(self, log_number: int) -> LogEntry:
         try:
@@ -382,47 +545,56 @@ class ProjectStorage(object):
         return entry
 
     def _add_log_entry(self, log_number: int, entry: LogEntry) -> None:
+        old_entry = self.log_entry_cache.get(log_number)
+        if old_entry is not None:
+            self.log_entry_cache_bytes -= len(old_entry)
         self.log_entry_cache[log_number] = entry
-        self.flush_cache(self.log_entry_cache_size)
+        self.log_entry_cache_bytes += len(entry)
+        self.flush_cache(self.log_entry_cache_max_bytes)
 
     def _get_checkpoint_entry(self, checkpoint_number: int) -> CheckpointIndexEntry:
-        size = self.checkpoint_index_formatter.size
-        offset = checkpoint_number * size
-        packed_entry = self.checkpoint_index[offset:offset+size]
-        return cast(CheckpointIndexEntry, self.checkpoint_index_formatter.unpack(packed_entry))
-
-    def flush_cache(self, cache_size: int) -> None:
-        entries_to_drop = len(self.log_entry_cache) - cache_size
-        if entries_to_drop > 0:
+        return cast(CheckpointIndexEntry, self.checkpoint_index[checkpoint_number])
+
+    def flush_cache(self, max_bytes: int) -> None:
+        bytes_to_drop = self.log_entry_cache_bytes - max_bytes
+        if bytes_to_drop > 0:
             dropped_entries = set()  # type: Set[int]
-            for ln in self.log_entry_cache.keys():
-                if len(dropped_entries) >= entries_to_drop:
+            for ln, entry in self.log_entry_cache.items():
+                if bytes_to_drop <= 0:
                     break
                 if ln > self.written_log_number:
                     continue
                 dropped_entries.add(ln)
+                bytes_to_drop -= len(entry)
 
             for ln in dropped_entries:
-                del self.log_entry_cache[ln]
+                self.log_entry_cache_bytes -= len(self.log_entry_cache.pop(ln))
 
     def append_log_entry(self, entry: LogEntry) -> None:
-        assert self.path is not None, "Project already closed."
+        self.append_log_entries([entry])
 
-        assert self.next_log_number not in self.log_entry_cache
+    def append_log_entries(self, entries: List[LogEntry]) -> None:
+        assert self.path is not None, "Project already closed."
 
         self.undo_count = 0
         self.redo_count = 0
 
-        history_entry = (
-            ACTION_FORWARD.value, self.next_log_number,
-            self.undo_count, self.redo_count)
+        writes = []  # type: List[Tuple[int, HistoryEntry, Optional[LogEntry]]]
+        for entry in entries:
+            assert self.next_log_number not in self.log_entry_cache
 
-        self._add_history_entry(history_entry)
-        self._add_log_entry(self.next_log_number, entry)
-        self._write_log(self.next_sequence_number, history_entry, entry)
+            history_entry = (
+                ACTION_FORWARD.value, self.next_log_number,
+                self.undo_count, self.redo_count)
 
-        self.next_log_number += 1
-        self.next_sequence_number += 1
+            self._add_history_entry(history_entry)
+            self._add_log_entry(self.next_log_number, entry)
+            writes.append((self.next_sequence_number, history_entry, entry))
+
+            self.next_log_number += 1
+            self.next_sequence_number += 1
+
+        self._write_logs(writes)
 
     @property
     def can_undo(self) -> bool:
@@ -459,7 +631,7 @@ class ProjectStorage(object):
         history_entry = (_reverse_action(action), log_number, self.undo_count, self.redo_count)
         self._add_history_entry(history_entry)
 
-        self._write_log(self.next_sequence_number, history_entry, None)
+        self._write_logs([(self.next_sequence_number, history_entry, None)])
 
         self.next_sequence_number += 1
 
@@ -474,7 +646,7 @@ class ProjectStorage(object):
         history_entry = (action, log_number, self.undo_count, self.redo_count)
         self._add_history_entry(history_entry)
 
-        self._write_log(self.next_sequence_number, history_entry, None)
+        self._write_logs([(self.next_sequence_number, history_entry, None)])
 
         self.next_sequence_number += 1
 
@@ -485,39 +657,258 @@ class ProjectStorage(object):
         seq_number, _ = self._get_checkpoint_entry(self.next_checkpoint_number - 1)
         return self.next_sequence_number - seq_number
 
-    def add_checkpoint(self, checkpoint: Checkpoint) -> None:
-        self._write_checkpoint(
-            self.next_sequence_number, self.next_checkpoint_number, checkpoint)
+    def add_checkpoint(self, checkpoint: Checkpoint, *, delta: bool = False) -> None:
+        """Add a new checkpoint.
+
+        A delta checkpoint is stored as an addition to the latest full checkpoint, how it is
+        applied is up to the caller (see get_checkpoint_chain()).
+        """
 
-        packed_index_entry = self.checkpoint_index_formatter.pack(
-            self.next_sequence_number, self.next_checkpoint_number)
-        self.checkpoint_index += packed_index_entry
+        if delta:
+            assert self.full_checkpoint_file_number is not None
+            base_checkpoint = self.full_checkpoint_file_number  # type: Optional[int]
+        else:
+            base_checkpoint = None
+
+        self._write_checkpoint(
+            self.next_sequence_number, self.next_checkpoint_file_number, checkpoint,
+            base_checkpoint)
+        if not delta:
+            self.full_checkpoint_file_number = self.next_checkpoint_file_number
         self.next_checkpoint_number += 1
+        self.next_checkpoint_file_number += 1
 
-    def get_checkpoint(self, checkpoint_number: int) -> Checkpoint:
-        checkpoint_number = self._get_checkpoint_entry(checkpoint_number)[1]
+    log_file_re = re.compile(r'^log\.(\d{6})$')
+    checkpoint_file_re = re.compile(r'^checkpoint\.(\d{6})$')
+    compacted_files = ('log.index', 'log.history', 'checkpoint.index')
+    compaction_marker = 'compaction.commit'
+
+    def compaction_cutoff(self) -> int:
+        """Returns the first sequence number, which must be kept.
+
+        That is the latest checkpoint, which still leaves undo_depth entries of history and all
+        entries needed to redo the current undos.
+        """
+
+        if self.undo_depth is None:
+            return 0
 
+        limit = min(
+            self.next_sequence_number - self.undo_depth,
+            self.next_sequence_number - 2 * self.undo_count)
+        for idx in range(self.next_checkpoint_number - 1, -1, -1):
+            seq_number, _ = self._get_checkpoint_entry(idx)
+            if seq_number <= limit:
+                return seq_number
+        return 0
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self.compaction_cutoff() >= self.compaction_threshold
+
+    def compact(self) -> None:
+        """Drop everything before compaction_cutoff() and renumber the remaining entries.
+
+        The new index files are written next to the old ones and then committed with a marker
+        file, so an interrupted compaction is either rolled back or completed by the next open().
+        """
+
+        assert self.path is not None, "Project already closed."
+
+        cutoff = self.compaction_cutoff()
+        if cutoff == 0:
+            return
+
+        self.sync()
+        assert self.written_sequence_number == self.next_sequence_number - 1
+        assert self.written_log_number == self.next_log_number - 1
+
+        first_log_number = min(
+            (self.get_history_entry(snum)[1]
+             for snum in range(cutoff, self.next_sequence_number)),
+            default=self.next_log_number)
+
+        logger.info(
+            "Compacting project: dropping %d history entries and %d log entries...",
+            cutoff, first_log_number)
+
+        contents = {
+            'log.index': [
+                self.log_index_formatter.pack(*self.log_index[lnum])
+                for lnum in range(first_log_number, self.next_log_number)],
+            'log.history': [
+                self.log_history_formatter.pack(
+                    action, log_number - first_log_number, undo_count, redo_count)
+                for action, log_number, undo_count, redo_count in (
+                    self.get_history_entry(snum)
+                    for snum in range(cutoff, self.next_sequence_number))],
+            'checkpoint.index': [
+                self.checkpoint_index_formatter.pack(seq_number - cutoff, file_number)
+                for seq_number, file_number in self.checkpoint_index
+                if seq_number >= cutoff],
+        }
+
+        for fname in self.compacted_files:
+            with open(os.path.join(self.path, fname + '.new'), mode='wb', buffering=0) as fp:
+                fp.write(b''.join(contents[fname]))
+                os.fdatasync(fp.fileno())
+
+        marker_path = os.path.join(self.path, self.compaction_marker)
+        with open(marker_path, mode='wb') as fp:
+            os.fdatasync(fp.fileno())
+        self._sync_dir()
+
+        self.log_index.close()
+        self.log_history.close()
+        self.checkpoint_index.close()
+
+        for fname in self.compacted_files:
+            path = os.path.join(self.path, fname)
+            os.replace(path + '.new', path)
+        os.unlink(marker_path)
+        self._sync_dir()
+
+        self.log_index = RecordFile(
+            os.path.join(self.path, 'log.index'), self.log_index_formatter)
+        self.log_history = RecordFile(
+            os.path.join(self.path, 'log.history'), self.log_history_formatter)
+        self.checkpoint_index = RecordFile(
+            os.path.join(self.path, 'checkpoint.index'), self.checkpoint_index_formatter)
+
+        self.next_log_number -= first_log_number
+        self.written_log_number -= first_log_number
+        self.next_sequence_number -= cutoff
+        self.written_sequence_number -= cutoff
+        self.next_checkpoint_number = len(self.checkpoint_index)
+
+        cache = collections.OrderedDict()  # type: collections.OrderedDict[int, LogEntry]
+        for log_number, entry in self.log_entry_cache.items():
+            if log_number >= first_log_number:
+                cache[log_number - first_log_number] = entry
+        self.log_entry_cache = cache
+        self.log_entry_cache_bytes = sum(len(entry) for entry in cache.values())
+
+        self._remove_unused_files()
+
+    def _sync_dir(self) -> None:
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _recover_compaction(self) -> bool:
+        marker_path = os.path.join(self.path, self.compaction_marker)
+        if os.path.exists(marker_path):
+            logger.info("Completing interrupted compaction...")
+            for fname in self.compacted_files:
+                path = os.path.join(self.path, fname)
+                if os.path.exists(path + '.new'):
+                    os.replace(path + '.new', path)
+            os.unlink(marker_path)
+            self._sync_dir()
+            return True
+
+        for fname in self.compacted_files:
+            path = os.path.join(self.path, fname + '.new')
+            if os.path.exists(path):
+                logger.info("Discarding incomplete compaction file %s...", path)
+                os.unlink(path)
+        return False
+
+    def _remove_unused_files(self) -> None:
+        if len(self.log_index) > 0:
+            first_log_file_number = self.log_index[0][0]
+        else:
+            first_log_file_number = self.log_file_number
+        checkpoint_file_numbers = set()  # type: Set[int]
+        for _, file_number in self.checkpoint_index:
+            checkpoint_file_numbers.add(file_number)
+            header = self._read_checkpoint_header(file_number)
+            if header.HasField('base_checkpoint'):
+                checkpoint_file_numbers.add(header.base_checkpoint)
+
+        for fname in os.listdir(self.path):
+            m = self.log_file_re.match(fname)
+            if m is not None and int(m.group(1)) < first_log_file_number:
+                log_fp = self.log_fp_map.pop(int(m.group(1)), None)
+                if log_fp is not None:
+                    log_fp.close()
+                logger.info("Removing unused log file %s...", fname)
+                os.unlink(os.path.join(self.path, fname))
+
+            m = self.checkpoint_file_re.match(fname)
+            if m is not None and int(m.group(1)) not in checkpoint_file_numbers:
+                logger.info("Removing unused checkpoint file %s...", fname)
+                os.unlink(os.path.join(self.path, fname))
+
+    def _read_checkpoint_header(self, file_number: int) -> storage_pb2.FileHeader:
+        checkpoint_path = os.path.join(self.path, 'checkpoint.%06d' % file_number)
+        with open(checkpoint_path, mode='rb') as fp:
+            return self._read_checkpoint_file_header(fp)
+
+    def _read_checkpoint_file_header(self, fp: IO[bytes]) -> storage_pb2.FileHeader:
+        header = self._read_file_header(fp)
+        if header.type != 'checkpoint':
+            raise CorruptedProjectError("Not a checkpoint file")
+        if header.version not in self.SUPPORTED_VERSIONS:
+            raise UnsupportedFileVersionError("File version %d not supported" % header.version)
+        return header
+
+    def _read_checkpoint_file(self, file_number: int) -> Tuple[Checkpoint, Optional[int]]:
         checkpoint_path = os.path.join(
             self.path,
-            'checkpoint.%06d' % checkpoint_number)
+            'checkpoint.%06d' % file_number)
         logger.info("Reading checkpoint %s...", checkpoint_path)
         with open(checkpoint_path, mode='rb') as fp:
-            header = self._read_file_header(fp)
-            if header.type != 'checkpoint':
-                raise CorruptedProjectError("Not a checkpoint file")
-            if header.version not in self.SUPPORTED_VERSIONS:
-                raise UnsupportedFileVersionError("File version %d not supported" % header.version)
-
-            checkpoint = fp.read(header.size)
-            if len(checkpoint) != header.size:
-                raise CorruptedProjectError("Truncated file")
+            header = self._read_checkpoint_file_header(fp)
+
+            if header.compression == storage_pb2.FileHeader.NONE:
+                checkpoint = fp.read(header.size)
+                if len(checkpoint) != header.size:
+                    raise CorruptedProjectError("Truncated file")
+            elif header.compression == storage_pb2.FileHeader.LZ4:
+                compressed = fp.read(header.compressed_size)
+                if len(compressed) != header.compressed_size:
+                    raise CorruptedProjectError("Truncated file")
+                try:
+                    checkpoint = lz4.frame.decompress(compressed)
+                except RuntimeError as exc:
+                    raise CorruptedProjectError("Failed to decompress checkpoint: %s" % exc)
+                if len(checkpoint) != header.size:
+                    raise CorruptedProjectError("Size mismatch")
+            else:
+                raise UnsupportedFileVersionError(
+                    "Compression %d not supported" % header.compression)
 
             if header.checksum_type == storage_pb2.FileHeader.MD5:
                 checksum = hashlib.md5(checkpoint).digest()
-                if checksum != header.checksum:
-                    raise CorruptedProjectError("Checksum mismatch")
+            elif header.checksum_type == storage_pb2.FileHeader.CRC32:
+                checksum = struct.pack('>L', zlib.crc32(checkpoint))
             else:
                 raise UnsupportedFileVersionError(
                     "Checksum type %d not supported" % header.checksum_type)
+            if checksum != header.checksum:
+                raise CorruptedProjectError("Checksum mismatch")
 
-            return checkpoint
+            if header.HasField('base_checkpoint'):
+                return checkpoint, header.base_checkpoint
+            return checkpoint, None
+
+    def get_checkpoint(self, checkpoint_number: int) -> Checkpoint:
+        file_number = self._get_checkpoint_entry(checkpoint_number)[1]
+        checkpoint, _ = self._read_checkpoint_file(file_number)
+        return checkpoint
+
+    def get_checkpoint_chain(self, checkpoint_number: int) -> List[Checkpoint]:
+        """Returns the checkpoint, preceded by the full checkpoint, if it is a delta."""
+
+        file_number = self._get_checkpoint_entry(checkpoint_number)[1]
+        checkpoint, base_checkpoint = self._read_checkpoint_file(file_number)
+        if base_checkpoint is None:
+            return [checkpoint]
+
+        base, base_of_base = self._read_checkpoint_file(base_checkpoint)
+        if base_of_base is not None:
+            raise CorruptedProjectError("Delta checkpoint is not based on a full checkpoint")
+        return [base, checkpoint]
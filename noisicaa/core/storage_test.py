@@ -20,31 +20,69 @@
 #
 # @end:license
 
-import builtins
-
-from mox3 import stubout
-from pyfakefs import fake_filesystem
+import os.path
+import shutil
+import struct
+import uuid
 
 from noisidev import unittest
-from . import fileutil
+from noisicaa.constants import TEST_OPTS
 from . import storage
 
 
+class RecordFileTest(unittest.TestCase):
+    def setup_testcase(self):
+        self.path = os.path.join(TEST_OPTS.TMP_DIR, 'records-%s' % uuid.uuid4().hex)
+        open(self.path, 'wb').close()
+        self.addCleanup(os.unlink, self.path)
+
+    def test_append_and_remap(self):
+        formatter = struct.Struct('>QQ')
+
+        rf = storage.RecordFile(self.path, formatter)
+        rf.remap_threshold = 10 * formatter.size
+        try:
+            for i in range(25):
+                rf.append(i, 2 * i)
+                if i % 3 == 0:
+                    rf.write()
+                self.assertEqual(len(rf), i + 1)
+                self.assertEqual(rf[i], (i, 2 * i))
+            rf.write()
+
+            self.assertEqual(list(rf), [(i, 2 * i) for i in range(25)])
+            with self.assertRaises(IndexError):
+                rf[25]  # pylint: disable=pointless-statement
+        finally:
+            rf.close()
+
+        self.assertEqual(os.path.getsize(self.path), 25 * formatter.size)
+
+        rf = storage.RecordFile(self.path, formatter)
+        try:
+            self.assertEqual(len(rf), 25)
+            self.assertEqual(rf[17], (17, 34))
+        finally:
+            rf.close()
+
+    def test_malformed(self):
+        with open(self.path, 'wb') as fp:
+            fp.write(b'abc')
+        with self.assertRaises(storage.CorruptedProjectError):
+            storage.RecordFile(self.path, struct.Struct('>QQ'))
+
+
 class StorageTest(unittest.TestCase):
     def setup_testcase(self):
-        self.stubs = stubout.StubOutForTesting()
-        self.addCleanup(self.stubs.SmartUnsetAll)
+        # The storage maps its index files into memory, so this needs a real filesystem.
+        self.path = os.path.join(TEST_OPTS.TMP_DIR, 'storage-%s' % uuid.uuid4().hex)
+        self.addCleanup(shutil.rmtree, self.path, ignore_errors=True)
 
-        # Setup fake filesystem.
-        self.fs = fake_filesystem.FakeFilesystem()
-        self.fake_os = fake_filesystem.FakeOsModule(self.fs)
-        self.fake_open = fake_filesystem.FakeFileOpen(self.fs)
-        self.stubs.SmartSet(storage, 'os', self.fake_os)
-        self.stubs.SmartSet(fileutil, 'os', self.fake_os)
-        self.stubs.SmartSet(builtins, 'open', self.fake_open)
+    def project_file(self, name):
+        return os.path.join(self.path, name)
 
     def test_index_management(self):
-        ps = storage.ProjectStorage.create('/foo')
+        ps = storage.ProjectStorage.create(self.path)
         try:
             self.assertFalse(ps.can_undo)
             self.assertFalse(ps.can_redo)
@@ -109,7 +147,7 @@ class StorageTest(unittest.TestCase):
 
             self.assertEqual(ps.next_sequence_number, 7)
 
-            entries = list(ps.log_history_formatter.iter_unpack(ps.log_history))
+            entries = list(ps.log_history)
             self.assertEqual(
                 entries,
                 [(b'f', 0, 0, 0),
@@ -123,22 +161,22 @@ class StorageTest(unittest.TestCase):
             ps.close()
 
         self.assertTrue(
-            self.fake_os.path.isfile('/foo/project.noise'))
+            os.path.isfile(self.project_file('project.noise')))
         self.assertTrue(
-            self.fake_os.path.isfile('/foo/log.index'))
+            os.path.isfile(self.project_file('log.index')))
         self.assertEqual(
-            self.fake_os.path.getsize('/foo/log.index'),
+            os.path.getsize(self.project_file('log.index')),
             3 * ps.log_index_formatter.size)
         self.assertTrue(
-            self.fake_os.path.isfile('/foo/log.history'))
+            os.path.isfile(self.project_file('log.history')))
         self.assertEqual(
-            self.fake_os.path.getsize('/foo/log.history'),
+            os.path.getsize(self.project_file('log.history')),
             7 * ps.log_history_formatter.size)
         self.assertTrue(
-            self.fake_os.path.isfile('/foo/log.000000'))
+            os.path.isfile(self.project_file('log.000000')))
 
     def test_undo_the_undone(self):
-        ps = storage.ProjectStorage.create('/foo')
+        ps = storage.ProjectStorage.create(self.path)
         try:
             ps.append_log_entry(b'bla1')
             ps.undo()
@@ -165,7 +203,7 @@ class StorageTest(unittest.TestCase):
             ps.close()
 
     def test_open(self):
-        ps = storage.ProjectStorage.create('/foo')
+        ps = storage.ProjectStorage.create(self.path)
         try:
             ps.add_checkpoint(b'blurp1')
             ps.append_log_entry(b'bla1')
@@ -181,7 +219,7 @@ class StorageTest(unittest.TestCase):
             ps.close()
 
         ps = storage.ProjectStorage()
-        ps.open('/foo')
+        ps.open(self.path)
         try:
             self.assertEqual(ps.undo_count, 2)
             self.assertEqual(ps.redo_count, 1)
@@ -214,7 +252,7 @@ class StorageTest(unittest.TestCase):
             ps.close()
 
     def test_checkpoints(self):
-        ps = storage.ProjectStorage.create('/foo')
+        ps = storage.ProjectStorage.create(self.path)
         try:
             ps.add_checkpoint(b'blurp1')
             self.assertEqual(ps.logs_since_last_checkpoint, 0)
@@ -225,9 +263,7 @@ class StorageTest(unittest.TestCase):
             ps.add_checkpoint(b'blurp2')
             self.assertEqual(ps.logs_since_last_checkpoint, 0)
 
-            entries = list(
-                ps.checkpoint_index_formatter.iter_unpack(
-                    ps.checkpoint_index))
+            entries = list(ps.checkpoint_index)
             self.assertEqual(
                 entries,
                 [(0, 0),
@@ -237,11 +273,243 @@ class StorageTest(unittest.TestCase):
             ps.close()
 
         self.assertTrue(
-            self.fake_os.path.isfile('/foo/checkpoint.index'))
+            os.path.isfile(self.project_file('checkpoint.index')))
         self.assertEqual(
-            self.fake_os.path.getsize('/foo/checkpoint.index'),
+            os.path.getsize(self.project_file('checkpoint.index')),
             2 * ps.checkpoint_index_formatter.size)
         self.assertTrue(
-            self.fake_os.path.isfile('/foo/checkpoint.000000'))
+            os.path.isfile(self.project_file('checkpoint.000000')))
         self.assertTrue(
-            self.fake_os.path.isfile('/foo/checkpoint.000001'))
+            os.path.isfile(self.project_file('checkpoint.000001')))
+
+    def test_append_log_entries(self):
+        ps = storage.ProjectStorage.create(self.path)
+        try:
+            ps.sync_entries = 4
+            ps.sync_interval = None
+
+            ps.append_log_entries([b'bla1', b'bla2', b'bla3'])
+            self.assertEqual(ps.unsynced_entries, 3)
+            self.assertEqual(ps.next_sequence_number, 3)
+            self.assertEqual(
+                ps.get_log_entry_to_undo(),
+                (storage.ACTION_BACKWARD, b'bla3'))
+
+            ps.undo()
+            self.assertEqual(ps.unsynced_entries, 0)
+
+            ps.append_log_entries([b'bla4', b'bla5'])
+            self.assertEqual(ps.unsynced_entries, 2)
+
+        finally:
+            ps.close()
+
+        self.assertEqual(
+            os.path.getsize(self.project_file('log.index')),
+            5 * ps.log_index_formatter.size)
+
+        ps = storage.ProjectStorage()
+        ps.open(self.path)
+        try:
+            self.assertEqual(
+                [ps.get_log_entry(i) for i in range(5)],
+                [b'bla1', b'bla2', b'bla3', b'bla4', b'bla5'])
+            self.assertEqual(
+                list(ps.log_history),
+                [(b'f', 0, 0, 0),
+                 (b'f', 1, 0, 0),
+                 (b'f', 2, 0, 0),
+                 (b'b', 2, 1, 0),
+                 (b'f', 3, 0, 0),
+                 (b'f', 4, 0, 0)])
+        finally:
+            ps.close()
+
+    def test_log_entry_cache(self):
+        ps = storage.ProjectStorage.create(self.path)
+        try:
+            ps.log_entry_cache_max_bytes = 1000
+            ps.append_log_entries([b'%03d' % i + b'x' * 97 for i in range(20)])
+
+            self.assertEqual(len(ps.log_entry_cache), 10)
+            self.assertEqual(ps.log_entry_cache_bytes, 1000)
+            self.assertEqual(list(ps.log_entry_cache), list(range(10, 20)))
+
+            # Entries, which are not cached anymore, are read from the log file.
+            self.assertEqual(ps.get_log_entry(3), b'003' + b'x' * 97)
+            self.assertEqual(list(ps.log_entry_cache), list(range(11, 20)) + [3])
+            self.assertEqual(ps.log_entry_cache_bytes, 1000)
+
+            ps.flush_cache(0)
+            self.assertEqual(len(ps.log_entry_cache), 0)
+            self.assertEqual(ps.log_entry_cache_bytes, 0)
+
+        finally:
+            ps.close()
+
+    def test_log_rotation(self):
+        ps = storage.ProjectStorage.create(self.path)
+        try:
+            ps.log_segment_size = 100
+            for i in range(20):
+                ps.append_log_entry(b'bla%d' % i * 10)
+            self.assertGreater(ps.log_file_number, 0)
+            ps.flush_cache(0)
+            self.assertEqual(ps.get_log_entry(3), b'bla3' * 10)
+        finally:
+            ps.close()
+
+        self.assertTrue(os.path.isfile(self.project_file('log.000001')))
+
+        ps = storage.ProjectStorage()
+        ps.open(self.path)
+        try:
+            self.assertGreater(ps.log_file_number, 0)
+            self.assertEqual(
+                [ps.get_log_entry(i) for i in range(20)],
+                [b'bla%d' % i * 10 for i in range(20)])
+        finally:
+            ps.close()
+
+    def test_compaction(self):
+        ps = storage.ProjectStorage.create(self.path)
+        try:
+            ps.log_segment_size = 30
+            ps.undo_depth = 4
+            ps.compaction_threshold = 1
+            ps.add_checkpoint(b'blurp0')
+            for i in range(10):
+                ps.append_log_entry(b'bla%d' % i)
+                if i % 3 == 2:
+                    ps.add_checkpoint(b'blurp%d' % (i + 1))
+            ps.undo()
+
+            # Latest checkpoint leaving undo_depth entries of history.
+            self.assertEqual(ps.compaction_cutoff(), 6)
+            self.assertTrue(ps.needs_compaction)
+            ps.compact()
+            self.assertEqual(ps.compaction_cutoff(), 0)
+
+            self.assertEqual(ps.next_sequence_number, 5)
+            self.assertEqual(ps.next_log_number, 4)
+            self.assertEqual(list(ps.checkpoint_index), [(0, 2), (3, 3)])
+            self.assertFalse(os.path.exists(self.project_file('checkpoint.000000')))
+            self.assertFalse(os.path.exists(self.project_file('log.000000')))
+            self.assertFalse(os.path.exists(self.project_file('log.000001')))
+            self.assertTrue(os.path.exists(self.project_file('log.000002')))
+
+            self.assertEqual(
+                ps.get_log_entry_to_undo(),
+                (storage.ACTION_BACKWARD, b'bla8'))
+            self.assertEqual(
+                ps.get_log_entry_to_redo(),
+                (storage.ACTION_FORWARD, b'bla9'))
+            ps.flush_cache(0)
+            ps.redo()
+            ps.append_log_entry(b'bla10')
+
+        finally:
+            ps.close()
+
+        ps = storage.ProjectStorage()
+        ps.open(self.path)
+        try:
+            checkpoint_number, actions = ps.get_restore_info()
+            self.assertEqual(ps.get_checkpoint(checkpoint_number), b'blurp9')
+            self.assertEqual(
+                [(action, ps.get_log_entry(log_number)) for action, log_number in actions],
+                [(storage.ACTION_FORWARD, b'bla9'),
+                 (storage.ACTION_BACKWARD, b'bla9'),
+                 (storage.ACTION_FORWARD, b'bla9'),
+                 (storage.ACTION_FORWARD, b'bla10')])
+        finally:
+            ps.close()
+
+    def test_compaction_recovery(self):
+        ps = storage.ProjectStorage.create(self.path)
+        try:
+            ps.add_checkpoint(b'blurp0')
+            ps.append_log_entry(b'bla1')
+        finally:
+            ps.close()
+
+        # Leftovers of a compaction, which did not get committed, are discarded.
+        with open(self.project_file('log.index.new'), 'wb') as fp:
+            fp.write(b'garbage')
+        ps = storage.ProjectStorage()
+        ps.open(self.path)
+        try:
+            self.assertFalse(os.path.exists(self.project_file('log.index.new')))
+            self.assertEqual(ps.get_log_entry(0), b'bla1')
+        finally:
+            ps.close()
+
+        # A committed compaction is completed.
+        with open(self.project_file('log.history.new'), 'wb') as fp:
+            fp.write(b'')
+        open(self.project_file('compaction.commit'), 'wb').close()
+        ps = storage.ProjectStorage()
+        ps.open(self.path)
+        try:
+            self.assertFalse(os.path.exists(self.project_file('compaction.commit')))
+            self.assertEqual(ps.next_sequence_number, 0)
+        finally:
+            ps.close()
+
+    def test_delta_checkpoints(self):
+        ps = storage.ProjectStorage.create(self.path)
+        try:
+            ps.undo_depth = 1
+            ps.compaction_threshold = 1
+            ps.add_checkpoint(b'full1')
+            ps.append_log_entry(b'bla1')
+            ps.add_checkpoint(b'delta1', delta=True)
+            self.assertEqual(ps.get_checkpoint_chain(0), [b'full1'])
+            self.assertEqual(ps.get_checkpoint_chain(1), [b'full1', b'delta1'])
+
+            ps.append_log_entry(b'bla2')
+            ps.add_checkpoint(b'delta2', delta=True)
+            ps.append_log_entry(b'bla3')
+
+            # The full checkpoint is still needed by the retained delta.
+            ps.compact()
+            self.assertEqual(ps.next_checkpoint_number, 1)
+            self.assertTrue(os.path.exists(self.project_file('checkpoint.000000')))
+            self.assertFalse(os.path.exists(self.project_file('checkpoint.000001')))
+
+        finally:
+            ps.close()
+
+        ps = storage.ProjectStorage()
+        ps.open(self.path)
+        try:
+            checkpoint_number, _ = ps.get_restore_info()
+            self.assertEqual(ps.get_checkpoint_chain(checkpoint_number), [b'full1', b'delta2'])
+
+            ps.add_checkpoint(b'full2')
+            ps.add_checkpoint(b'delta3', delta=True)
+            self.assertEqual(
+                ps.get_checkpoint_chain(ps.next_checkpoint_number - 1), [b'full2', b'delta3'])
+        finally:
+            ps.close()
+
+    def test_checkpoint_checksum(self):
+        ps = storage.ProjectStorage.create(self.path)
+        try:
+            ps.add_checkpoint(b'blurp' * 100)
+        finally:
+            ps.close()
+
+        with open(self.project_file('checkpoint.000000'), 'r+b') as fp:
+            fp.seek(-6, os.SEEK_END)
+            b = fp.read(1)
+            fp.seek(-6, os.SEEK_END)
+            fp.write(bytes([b[0] ^ 0xff]))
+
+        ps = storage.ProjectStorage()
+        ps.open(self.path)
+        try:
+            with self.assertRaises(storage.CorruptedProjectError):
+                ps.get_checkpoint(0)
+        finally:
+            ps.close()
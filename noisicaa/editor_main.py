@@ -214,6 +214,10 @@ class Editor(object):
             sample_rate=(
                 request.host_parameters.sample_rate
                 if request.host_parameters.HasField('sample_rate')
+                else None),
+            num_workers=(
+                request.num_workers
+                if request.HasField('num_workers')
                 else None))
         response.address = proc.address
 
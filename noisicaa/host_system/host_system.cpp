@@ -37,7 +37,7 @@ HostSystem::~HostSystem() {
 Status HostSystem::setup() {
   RETURN_IF_ERROR(lv2->setup());
   RETURN_IF_ERROR(csound->setup());
-  RETURN_IF_ERROR(audio_file->setup(_sample_rate));
+  RETURN_IF_ERROR(audio_file->setup(_sample_rate, _audio_cache_dir, _audio_cache_size));
   return Status::Ok();
 }
 
@@ -51,6 +51,12 @@ public:
   void set_block_size(uint32_t block_size) { _block_size = block_size; }
   void set_sample_rate(uint32_t sample_rate) { _sample_rate = sample_rate; }
 
+  // Where resampled audio files are cached. An empty path disables the cache.
+  const string& audio_cache_dir() const { return _audio_cache_dir; }
+  uint64_t audio_cache_size() const { return _audio_cache_size; }
+  void set_audio_cache_dir(const string& path) { _audio_cache_dir = path; }
+  void set_audio_cache_size(uint64_t size) { _audio_cache_size = size; }
+
   unique_ptr<LV2SubSystem> lv2;
   unique_ptr<CSoundSubSystem> csound;
   unique_ptr<AudioFileSubSystem> audio_file;
@@ -58,6 +64,8 @@ public:
 private:
   uint32_t _block_size = 4096;
   uint32_t _sample_rate = 44100;
+  string _audio_cache_dir;
+  uint64_t _audio_cache_size = 4ULL << 30;
 };
 
 }  // namespace noisicaa
@@ -18,7 +18,8 @@
 #
 # @end:license
 
-from libc.stdint cimport uint32_t
+from libc.stdint cimport uint32_t, uint64_t
+from libcpp.string cimport string
 from libcpp.memory cimport unique_ptr
 from noisicaa.core.status cimport Status
 from noisicaa.lv2 cimport urid_mapper
@@ -38,6 +39,10 @@ cdef extern from "noisicaa/host_system/host_system.h" namespace "noisicaa" nogil
         uint32_t sample_rate() const
         void set_block_size(uint32_t block_size)
         void set_sample_rate(uint32_t sample_rate)
+        const string& audio_cache_dir() const
+        uint64_t audio_cache_size() const
+        void set_audio_cache_dir(const string& path)
+        void set_audio_cache_size(uint64_t size)
 
         unique_ptr[LV2SubSystem] lv2
 
@@ -24,9 +24,13 @@ from noisicaa import lv2
 class PyHostSystem(object):
     block_size = ...  # type: int
     sample_rate = ...  # type: int
+    audio_cache_dir = ...  # type: str
+    audio_cache_size = ...  # type: int
 
     def __init__(self, mapper: lv2.URIDMapper) -> None: ...
     def setup(self) -> None: ...
     def cleanup(self) -> None: ...
     def set_block_size(self, block_size: int) -> None: ...
     def set_sample_rate(self, sample_rate: int) -> None: ...
+    def set_audio_cache_dir(self, path: str) -> None: ...
+    def set_audio_cache_size(self, size: int) -> None: ...
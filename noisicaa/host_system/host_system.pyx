@@ -53,3 +53,17 @@ cdef class PyHostSystem(object):
 
     def set_sample_rate(self, sample_rate):
         self.__host_system.set_sample_rate(sample_rate)
+
+    @property
+    def audio_cache_dir(self):
+        return bytes(self.__host_system.audio_cache_dir()).decode('utf-8')
+
+    def set_audio_cache_dir(self, path):
+        self.__host_system.set_audio_cache_dir(path.encode('utf-8'))
+
+    @property
+    def audio_cache_size(self):
+        return self.__host_system.audio_cache_size()
+
+    def set_audio_cache_size(self, size):
+        self.__host_system.set_audio_cache_size(size)
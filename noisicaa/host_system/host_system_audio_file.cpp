@@ -20,10 +20,24 @@
  * @end:license
  */
 
+#include <dirent.h>
+#include <errno.h>
+#include <fcntl.h>
+#include <stdio.h>
+#include <string.h>
+#include <time.h>
+#include <unistd.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <sys/time.h>
+#include <algorithm>
+#include <chrono>
 #include "sndfile.h"
 extern "C" {
 #include "libswresample/swresample.h"
 #include "libavutil/channel_layout.h"
+#include "libavutil/mem.h"
+#include "libavutil/sha.h"
 }
 
 #include "noisicaa/core/logging.h"
@@ -32,35 +46,676 @@ extern "C" {
 
 namespace noisicaa {
 
-AudioFile::AudioFile(const string& key, uint32_t num_samples, float** channel_data)
+namespace {
+
+// madvise() and mlock() want page aligned ranges.
+void page_range(const float* data, uint32_t begin, uint32_t end, char** addr, size_t* length) {
+  static const uintptr_t page_size = sysconf(_SC_PAGESIZE);
+  uintptr_t b = (uintptr_t)(data + begin) & ~(page_size - 1);
+  uintptr_t e = (uintptr_t)(data + end);
+  *addr = (char*)b;
+  *length = e > b ? e - b : 0;
+}
+
+struct AudioFileCacheHeader {
+  char magic[8];
+  uint32_t num_channels;
+  uint32_t num_samples;
+};
+
+const char cache_magic[8] = { 'N', 'C', 'A', 'C', 'H', 'E', '0', '1' };
+
+string sha_hex_digest(struct AVSHA* sha) {
+  uint8_t digest[20];
+  av_sha_final(sha, digest);
+
+  char hex[2 * sizeof(digest) + 1];
+  for (size_t i = 0 ; i < sizeof(digest) ; ++i) {
+    snprintf(hex + 2 * i, 3, "%02x", digest[i]);
+  }
+  return string(hex);
+}
+
+size_t cache_channel_size(uint32_t num_samples) {
+  size_t size = num_samples * sizeof(float);
+  return (size + AudioFileCache::cache_alignment - 1) & ~(AudioFileCache::cache_alignment - 1);
+}
+
+}  // namespace
+
+AudioFileChannel::AudioFileChannel(float* data, uint32_t num_samples, bool mapped)
+  : _data(data),
+    _num_samples(num_samples),
+    _mapped(mapped) {}
+
+AudioFileChannel::~AudioFileChannel() {
+  if (_mapped) {
+    munmap(_data, _num_samples * sizeof(float));
+  } else {
+    delete[] _data;
+  }
+}
+
+StatusOr<AudioFileChannel*> AudioFileChannel::allocate(uint32_t num_samples) {
+  return new AudioFileChannel(new float[num_samples], num_samples, false);
+}
+
+StatusOr<AudioFileChannel*> AudioFileChannel::map_file(
+    const string& path, uint32_t num_samples, size_t offset) {
+  int fd = open(path.c_str(), O_RDONLY);
+  if (fd < 0) {
+    return OSERROR_STATUS("Failed to open file %s", path.c_str());
+  }
+
+  auto close_fd = scopeGuard([fd]() { close(fd); });
+
+  struct stat s;
+  if (fstat(fd, &s) < 0) {
+    return OSERROR_STATUS("Failed to stat file %s", path.c_str());
+  }
+  if ((size_t)s.st_size < offset + num_samples * sizeof(float)) {
+    return ERROR_STATUS(
+        "File %s too short (%ld < %lu)",
+        path.c_str(), s.st_size, offset + num_samples * sizeof(float));
+  }
+
+  void* data = mmap(nullptr, num_samples * sizeof(float), PROT_READ, MAP_SHARED, fd, offset);
+  if (data == MAP_FAILED) {
+    return OSERROR_STATUS("Failed to mmap file %s", path.c_str());
+  }
+
+  madvise(data, num_samples * sizeof(float), MADV_SEQUENTIAL);
+
+  return new AudioFileChannel((float*)data, num_samples, true);
+}
+
+StatusOr<AudioFileChannel*> AudioFileChannel::map_temp_file(
+    const string& dir, uint32_t num_samples) {
+  string path = dir + "/noisicaa-audio-XXXXXX";
+  int fd = mkstemp(&path[0]);
+  if (fd < 0) {
+    return OSERROR_STATUS("Failed to create temp file %s", path.c_str());
+  }
+
+  // The file stays alive as long as it is mapped.
+  unlink(path.c_str());
+  auto close_fd = scopeGuard([fd]() { close(fd); });
+
+  if (ftruncate(fd, num_samples * sizeof(float)) < 0) {
+    return OSERROR_STATUS("Failed to resize temp file %s", path.c_str());
+  }
+
+  void* data = mmap(
+      nullptr, num_samples * sizeof(float), PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+  if (data == MAP_FAILED) {
+    return OSERROR_STATUS("Failed to mmap temp file %s", path.c_str());
+  }
+
+  return new AudioFileChannel((float*)data, num_samples, true);
+}
+
+Status AudioFileChannel::pin(uint32_t num_samples) {
+  if (!_mapped) {
+    return Status::Ok();
+  }
+
+  char* addr;
+  size_t length;
+  page_range(_data, 0, min(num_samples, _num_samples), &addr, &length);
+  if (mlock(addr, length) < 0) {
+    // Most likely RLIMIT_MEMLOCK is too low. At least try to get the pages into memory.
+    madvise(addr, length, MADV_WILLNEED);
+    return OSERROR_STATUS("Failed to lock preload window");
+  }
+  return Status::Ok();
+}
+
+void AudioFileChannel::will_need(uint32_t begin, uint32_t end) {
+  if (!_mapped || begin >= end) {
+    return;
+  }
+
+  char* addr;
+  size_t length;
+  page_range(_data, begin, min(end, _num_samples), &addr, &length);
+  madvise(addr, length, MADV_WILLNEED);
+}
+
+void AudioFileChannel::dont_need(uint32_t begin, uint32_t end) {
+  if (!_mapped || begin >= end) {
+    return;
+  }
+
+  // Only release whole pages, which are completely within the range, so we do not drop pages,
+  // which are shared with the pinned preload window.
+  static const uintptr_t page_size = sysconf(_SC_PAGESIZE);
+  uintptr_t b = ((uintptr_t)(_data + begin) + page_size - 1) & ~(page_size - 1);
+  uintptr_t e = (uintptr_t)(_data + min(end, _num_samples)) & ~(page_size - 1);
+  if (e > b) {
+    madvise((void*)b, e - b, MADV_DONTNEED);
+  }
+}
+
+AudioFile::AudioFile(
+    const string& key, uint32_t num_samples, vector<unique_ptr<AudioFileChannel>>* channels)
   : _key(key),
-    _num_samples(num_samples) {
-  for (float** cdat = channel_data ; *cdat != nullptr ; ++cdat) {
-    _channel_data.emplace_back(*cdat);
+    _num_samples(num_samples),
+    _channels(move(*channels)),
+    _streaming(false) {
+  for (const auto& channel : _channels) {
+    _streaming |= channel->is_mapped();
+  }
+  for (auto& playhead : _playheads) {
+    playhead.store(no_playhead, memory_order_relaxed);
+  }
+}
+
+int AudioFile::add_playhead(uint32_t pos) {
+  for (int idx = 0 ; idx < max_playheads ; ++idx) {
+    uint32_t expected = no_playhead;
+    if (_playheads[idx].compare_exchange_strong(expected, pos, memory_order_relaxed)) {
+      return idx;
+    }
+  }
+  return -1;
+}
+
+void AudioFile::remove_playhead(int playhead) {
+  if (playhead >= 0) {
+    _playheads[playhead].store(no_playhead, memory_order_relaxed);
+  }
+}
+
+void AudioFile::prefetch(uint32_t preload_samples, uint32_t window_samples) {
+  uint32_t min_playhead = no_playhead;
+  for (auto& it : _playheads) {
+    uint32_t playhead = it.load(memory_order_relaxed);
+    if (playhead == no_playhead) {
+      continue;
+    }
+
+    min_playhead = min(min_playhead, playhead);
+    for (auto& channel : _channels) {
+      channel->will_need(playhead, playhead + window_samples);
+    }
+  }
+
+  if (min_playhead == no_playhead) {
+    // Nothing is playing, keep the pages around the positions, where playback stopped.
+    return;
+  }
+
+  // Release the pages, which all voices have left behind, except for the pinned preload window.
+  uint32_t release_end = min_playhead > window_samples ? min_playhead - window_samples : 0;
+  release_end = max(release_end, preload_samples);
+  if (release_end > _released_until) {
+    for (auto& channel : _channels) {
+      channel->dont_need(max(_released_until, preload_samples), release_end);
+    }
+  }
+  _released_until = release_end;
+}
+
+const char* AudioFileCache::resampler_quality = "swr-default";
+const char* AudioFileCache::tmp_suffix = ".tmp.";
+const char* AudioFileCache::hash_index_suffix = ".sha1";
+
+AudioFileCache::AudioFileCache(Logger* logger)
+  : _logger(logger) {}
+
+Status AudioFileCache::setup(const string& cache_dir, uint64_t max_bytes) {
+  _cache_dir = cache_dir;
+  _max_bytes = max_bytes;
+
+  if (_cache_dir.empty()) {
+    return Status::Ok();
+  }
+
+  // Create the directory and its parents, if necessary.
+  for (size_t pos = 1 ; pos != string::npos ; ) {
+    pos = _cache_dir.find('/', pos + 1);
+    string dir = _cache_dir.substr(0, pos);
+    if (mkdir(dir.c_str(), 0700) < 0 && errno != EEXIST) {
+      return OSERROR_STATUS("Failed to create directory %s", dir.c_str());
+    }
+  }
+
+  evict(_max_bytes);
+
+  return Status::Ok();
+}
+
+StatusOr<string> AudioFileCache::hash_files(const vector<string>& paths, size_t num_bytes) {
+  // Hashing the contents of large files is expensive, so the result is remembered in an index
+  // file, which is named after the paths, sizes and mtimes of the files.
+  struct AVSHA* sha = av_sha_alloc();
+  if (sha == nullptr) {
+    return ERROR_STATUS("Failed to allocate SHA context.");
+  }
+  auto free_sha = scopeGuard([sha]() { av_free(sha); });
+  av_sha_init(sha, 160);
+
+  for (const auto& path : paths) {
+    struct stat s;
+    if (stat(path.c_str(), &s) < 0) {
+      return OSERROR_STATUS("Failed to stat file %s", path.c_str());
+    }
+
+    string file_key =
+      path
+      + ":" + to_string(s.st_size)
+      + ":" + to_string(s.st_mtim.tv_sec) + "." + to_string(s.st_mtim.tv_nsec)
+      + ":" + to_string(s.st_ino) + "\n";
+    av_sha_update(sha, (const uint8_t*)file_key.c_str(), file_key.size());
+  }
+  string num_bytes_key = to_string(num_bytes);
+  av_sha_update(sha, (const uint8_t*)num_bytes_key.c_str(), num_bytes_key.size());
+
+  string index_path = _cache_dir + "/" + sha_hex_digest(sha) + hash_index_suffix;
+
+  FILE* fp = fopen(index_path.c_str(), "rb");
+  if (fp != nullptr) {
+    char content_hash[40];
+    size_t bytes_read = fread(content_hash, 1, 40, fp);
+    fclose(fp);
+    if (bytes_read == 40) {
+      // Mark the index file as recently used.
+      utimes(index_path.c_str(), nullptr);
+      return string(content_hash, 40);
+    }
+    _logger->warning("Ignoring corrupt hash index file %s", index_path.c_str());
+  }
+
+  StatusOr<string> stor_content_hash = hash_contents(paths, num_bytes);
+  RETURN_IF_ERROR(stor_content_hash);
+  store_hash_index(index_path, stor_content_hash.result());
+  return stor_content_hash;
+}
+
+void AudioFileCache::store_hash_index(const string& path, const string& content_hash) {
+  // Failures are only logged, the file will just be hashed again next time.
+  string tmp_path = path + tmp_suffix + "XXXXXX";
+  int fd = mkstemp(&tmp_path[0]);
+  if (fd < 0) {
+    _logger->warning("Failed to create hash index file %s: %s", tmp_path.c_str(), strerror(errno));
+    return;
+  }
+
+  ssize_t written = write(fd, content_hash.c_str(), content_hash.size());
+  int rc = close(fd);
+  if (written != (ssize_t)content_hash.size() || rc < 0
+      || rename(tmp_path.c_str(), path.c_str()) < 0) {
+    _logger->warning("Failed to write hash index file %s: %s", path.c_str(), strerror(errno));
+    unlink(tmp_path.c_str());
+  }
+}
+
+StatusOr<string> AudioFileCache::hash_contents(const vector<string>& paths, size_t num_bytes) {
+  struct AVSHA* sha = av_sha_alloc();
+  if (sha == nullptr) {
+    return ERROR_STATUS("Failed to allocate SHA context.");
+  }
+  auto free_sha = scopeGuard([sha]() { av_free(sha); });
+  av_sha_init(sha, 160);
+
+  unique_ptr<uint8_t[]> buf(new uint8_t[65536]);
+  for (const auto& path : paths) {
+    FILE* fp = fopen(path.c_str(), "rb");
+    if (fp == nullptr) {
+      return OSERROR_STATUS("Failed to open file %s", path.c_str());
+    }
+    auto close_fp = scopeGuard([fp]() { fclose(fp); });
+
+    size_t total = 0;
+    while (num_bytes == 0 || total < num_bytes) {
+      size_t chunk = 65536;
+      if (num_bytes > 0) {
+        chunk = min(chunk, num_bytes - total);
+      }
+      size_t bytes_read = fread(buf.get(), 1, chunk, fp);
+      if (bytes_read == 0) {
+        if (ferror(fp)) {
+          return OSERROR_STATUS("Failed to read file %s", path.c_str());
+        }
+        break;
+      }
+      av_sha_update(sha, buf.get(), bytes_read);
+      total += bytes_read;
+    }
+  }
+
+  return sha_hex_digest(sha);
+}
+
+string AudioFileCache::make_key(
+    const string& content_hash, uint32_t source_rate, uint32_t target_rate) const {
+  return content_hash
+    + "-" + to_string(source_rate)
+    + "-" + to_string(target_rate)
+    + "-" + resampler_quality;
+}
+
+string AudioFileCache::entry_path(const string& key) const {
+  return _cache_dir + "/" + key + ".f32";
+}
+
+StatusOr<bool> AudioFileCache::lookup(
+    const string& key, vector<unique_ptr<AudioFileChannel>>* channels, uint32_t* num_samples) {
+  string path = entry_path(key);
+
+  AudioFileCacheHeader header;
+  FILE* fp = fopen(path.c_str(), "rb");
+  if (fp == nullptr) {
+    if (errno == ENOENT) {
+      return false;
+    }
+    return OSERROR_STATUS("Failed to open cache entry %s", path.c_str());
+  }
+  size_t header_read = fread(&header, sizeof(header), 1, fp);
+  fclose(fp);
+  if (header_read != 1 || memcmp(header.magic, cache_magic, sizeof(cache_magic)) != 0) {
+    return ERROR_STATUS("Corrupt cache entry %s", path.c_str());
+  }
+
+  for (uint32_t ch = 0 ; ch < header.num_channels ; ++ch) {
+    StatusOr<AudioFileChannel*> stor_channel = AudioFileChannel::map_file(
+        path, header.num_samples,
+        cache_alignment + ch * cache_channel_size(header.num_samples));
+    RETURN_IF_ERROR(stor_channel);
+    channels->emplace_back(stor_channel.result());
+  }
+
+  // Mark the entry as recently used.
+  utimes(path.c_str(), nullptr);
+
+  *num_samples = header.num_samples;
+  return true;
+}
+
+Status AudioFileCache::store(
+    const string& key, const vector<unique_ptr<AudioFileChannel>>& channels,
+    uint32_t num_samples) {
+  string path = entry_path(key);
+
+  // The cache directory is shared by all processes, which might convert the same file at the
+  // same time, so each one writes to its own temp file.
+  string tmp_path = path + tmp_suffix + "XXXXXX";
+  int fd = mkstemp(&tmp_path[0]);
+  if (fd < 0) {
+    return OSERROR_STATUS("Failed to create cache entry %s", tmp_path.c_str());
+  }
+  FILE* fp = fdopen(fd, "wb");
+  if (fp == nullptr) {
+    close(fd);
+    unlink(tmp_path.c_str());
+    return OSERROR_STATUS("Failed to create cache entry %s", tmp_path.c_str());
+  }
+  auto close_fp = scopeGuard([&fp]() { if (fp != nullptr) { fclose(fp); } });
+  auto remove_tmp = scopeGuard([&tmp_path]() { unlink(tmp_path.c_str()); });
+
+  AudioFileCacheHeader header;
+  memcpy(header.magic, cache_magic, sizeof(cache_magic));
+  header.num_channels = channels.size();
+  header.num_samples = num_samples;
+
+  size_t channel_size = cache_channel_size(num_samples);
+  size_t data_size = num_samples * sizeof(float);
+  if (fwrite(&header, sizeof(header), 1, fp) != 1) {
+    return OSERROR_STATUS("Failed to write cache entry %s", tmp_path.c_str());
+  }
+  for (uint32_t ch = 0 ; ch < channels.size() ; ++ch) {
+    if (fseek(fp, cache_alignment + ch * channel_size, SEEK_SET) < 0
+        || fwrite(channels[ch]->data(), 1, data_size, fp) != data_size) {
+      return OSERROR_STATUS("Failed to write cache entry %s", tmp_path.c_str());
+    }
+  }
+
+  int rc = fclose(fp);
+  fp = nullptr;
+  if (rc != 0) {
+    return OSERROR_STATUS("Failed to write cache entry %s", tmp_path.c_str());
+  }
+
+  if (rename(tmp_path.c_str(), path.c_str()) < 0) {
+    return OSERROR_STATUS("Failed to rename cache entry %s", tmp_path.c_str());
+  }
+
+  evict(_max_bytes);
+
+  return Status::Ok();
+}
+
+void AudioFileCache::evict(uint64_t max_bytes) {
+  if (_cache_dir.empty() || max_bytes == 0) {
+    return;
+  }
+
+  DIR* dir = opendir(_cache_dir.c_str());
+  if (dir == nullptr) {
+    return;
+  }
+
+  struct Entry {
+    string path;
+    time_t mtime;
+    uint64_t size;
+  };
+  vector<Entry> entries;
+  uint64_t total_size = 0;
+  time_t now = time(nullptr);
+  for (struct dirent* de = readdir(dir) ; de != nullptr ; de = readdir(dir)) {
+    string name = de->d_name;
+    bool is_tmp = name.find(tmp_suffix) != string::npos;
+    size_t index_suffix_len = strlen(hash_index_suffix);
+    bool is_hash_index =
+      !is_tmp
+      && name.size() > index_suffix_len
+      && name.compare(name.size() - index_suffix_len, index_suffix_len, hash_index_suffix) == 0;
+    if (!is_tmp
+        && !is_hash_index
+        && (name.size() < 4 || name.compare(name.size() - 4, 4, ".f32") != 0)) {
+      continue;
+    }
+
+    string path = _cache_dir + "/" + name;
+    struct stat s;
+    if (stat(path.c_str(), &s) < 0) {
+      continue;
+    }
+
+    if (is_hash_index) {
+      // Index files are tiny and not counted towards the size of the cache. Those of files,
+      // which have been modified, moved or deleted, are not used anymore and eventually expire.
+      if (now - s.st_mtime > hash_index_max_age) {
+        unlink(path.c_str());
+      }
+      continue;
+    }
+
+    if (is_tmp) {
+      // Temp files are left behind, when a process crashed while storing an entry. Those of
+      // other processes, which are still being written, use space, but must not be touched.
+      if (now - s.st_mtime > tmp_max_age) {
+        _logger->info("Removing stale cache temp file %s", path.c_str());
+        unlink(path.c_str());
+      } else {
+        total_size += s.st_size;
+      }
+      continue;
+    }
+
+    entries.emplace_back(Entry { path, s.st_mtime, (uint64_t)s.st_size });
+    total_size += s.st_size;
+  }
+  closedir(dir);
+
+  if (total_size <= max_bytes) {
+    return;
+  }
+
+  sort(entries.begin(), entries.end(), [](const Entry& a, const Entry& b) {
+      return a.mtime < b.mtime;
+    });
+
+  // Entries, which are currently mapped, stay valid after unlinking them.
+  for (const auto& entry : entries) {
+    if (total_size <= max_bytes) {
+      break;
+    }
+
+    _logger->info("Evicting cache entry %s", entry.path.c_str());
+    if (unlink(entry.path.c_str()) == 0) {
+      total_size -= entry.size;
+    }
   }
 }
 
 AudioFileSubSystem::AudioFileSubSystem()
-  : _logger(LoggerRegistry::get_logger("noisicaa.host_system.audio_file")) {}
+  : _logger(LoggerRegistry::get_logger("noisicaa.host_system.audio_file")),
+    _cache(_logger) {}
 
 AudioFileSubSystem::~AudioFileSubSystem() {
   cleanup();
 }
 
-Status AudioFileSubSystem::setup(uint32_t sample_rate) {
+Status AudioFileSubSystem::setup(
+    uint32_t sample_rate, const string& cache_dir, uint64_t cache_size) {
   _sample_rate = sample_rate;
+
+  Status status = _cache.setup(cache_dir, cache_size);
+  if (status.is_error()) {
+    // Not fatal, we just can't use the cache.
+    _logger->warning("Failed to setup audio file cache: %s", status.message());
+    _cache.setup("", 0);
+  }
+
+  // The temp files can be as large as the converted files, so they should rather be on the same
+  // disk as the cache than in $TMPDIR, which is often a tmpfs.
+  if (_cache.enabled()) {
+    _temp_dir = cache_dir;
+  } else {
+    const char* tmpdir = getenv("TMPDIR");
+    _temp_dir = tmpdir != nullptr ? tmpdir : "/tmp";
+  }
+
+  _preload_samples = preload_seconds * _sample_rate;
+  _prefetch_samples = prefetch_seconds * _sample_rate;
+
+  _stop = false;
+  _prefetch_thread.reset(new thread(&AudioFileSubSystem::prefetch_main, this));
+
   return Status::Ok();
 }
 
 void AudioFileSubSystem::cleanup() {
+  if (_prefetch_thread.get() != nullptr) {
+    {
+      lock_guard<mutex> lock(_map_mutex);
+      _stop = true;
+      _cond.notify_all();
+    }
+
+    _prefetch_thread->join();
+    _prefetch_thread.reset();
+  }
+
+  lock_guard<mutex> lock(_map_mutex);
   _map.clear();
 }
 
-StatusOr<AudioFile*> AudioFileSubSystem::load_audio_file(const string& path) {
-  const auto& it = _map.find(path);
-  if (it != _map.end()) {
-    it->second->ref();
-    return it->second.get();
+void AudioFileSubSystem::prefetch_main() {
+  unique_lock<mutex> lock(_map_mutex);
+  while (!_stop) {
+    for (auto& it : _map) {
+      if (it.second->is_streaming()) {
+        it.second->prefetch(_preload_samples, _prefetch_samples);
+      }
+    }
+
+    _cond.wait_for(lock, chrono::milliseconds(50));
+  }
+}
+
+StatusOr<AudioFileChannel*> AudioFileSubSystem::create_channel(
+    uint32_t num_samples, bool streaming) {
+  if (streaming && num_samples > _preload_samples) {
+    return AudioFileChannel::map_temp_file(_temp_dir, num_samples);
+  }
+  return AudioFileChannel::allocate(num_samples);
+}
+
+AudioFile* AudioFileSubSystem::add_audio_file(
+    const string& key, uint32_t num_samples, vector<unique_ptr<AudioFileChannel>>* channels) {
+  for (auto& channel : *channels) {
+    Status status = channel->pin(_preload_samples);
+    if (status.is_error()) {
+      _logger->warning("%s: %s", key.c_str(), status.message());
+    }
+  }
+
+  AudioFile* audio_file = new AudioFile(key, num_samples, channels);
+  audio_file->ref();
+
+  lock_guard<mutex> lock(_map_mutex);
+  _map.emplace(key, unique_ptr<AudioFile>(audio_file));
+
+  return audio_file;
+}
+
+AudioFile* AudioFileSubSystem::load_cached_file(
+    const string& key, const vector<string>& paths, size_t num_bytes, uint32_t source_rate,
+    bool streaming, string* cache_key) {
+  StatusOr<string> stor_hash = _cache.hash_files(paths, num_bytes);
+  if (stor_hash.is_error()) {
+    _logger->warning("Failed to hash '%s': %s", key.c_str(), stor_hash.message());
+    return nullptr;
+  }
+  *cache_key = _cache.make_key(stor_hash.result(), source_rate, _sample_rate);
+
+  vector<unique_ptr<AudioFileChannel>> channels;
+  uint32_t num_samples;
+  StatusOr<bool> stor_found = _cache.lookup(*cache_key, &channels, &num_samples);
+  if (stor_found.is_error()) {
+    _logger->warning("Failed to load '%s' from cache: %s", key.c_str(), stor_found.message());
+    return nullptr;
+  }
+  if (!stor_found.result()) {
+    return nullptr;
+  }
+
+  if (!streaming || num_samples <= _preload_samples) {
+    // Keep the samples in memory.
+    for (auto& channel : channels) {
+      StatusOr<AudioFileChannel*> stor_copy = AudioFileChannel::allocate(num_samples);
+      if (stor_copy.is_error()) {
+        return nullptr;
+      }
+      memcpy(stor_copy.result()->data(), channel->data(), num_samples * sizeof(float));
+      channel.reset(stor_copy.result());
+    }
+  }
+
+  _logger->info("Loaded '%s' from cache", key.c_str());
+  return add_audio_file(key, num_samples, &channels);
+}
+
+void AudioFileSubSystem::store_cached_file(
+    const string& cache_key, const vector<unique_ptr<AudioFileChannel>>& channels,
+    uint32_t num_samples) {
+  Status status = _cache.store(cache_key, channels, num_samples);
+  if (status.is_error()) {
+    _logger->warning("Failed to store audio file in cache: %s", status.message());
+  }
+}
+
+StatusOr<AudioFile*> AudioFileSubSystem::load_audio_file(const string& path, bool streaming) {
+  {
+    lock_guard<mutex> lock(_map_mutex);
+    const auto& it = _map.find(path);
+    if (it != _map.end()) {
+      it->second->ref();
+      return it->second.get();
+    }
   }
 
   _logger->info("Load audio file '%s'", path.c_str());
@@ -82,10 +737,21 @@ StatusOr<AudioFile*> AudioFileSubSystem::load_audio_file(const string& path) {
   _logger->info("sections: %d", sfinfo.sections);
   _logger->info("seekable: %d", sfinfo.seekable);
 
+  string cache_key;
+  if (_cache.enabled()) {
+    AudioFile* audio_file = load_cached_file(
+        path, {path}, 0, sfinfo.samplerate, streaming, &cache_key);
+    if (audio_file != nullptr) {
+      return audio_file;
+    }
+  }
+
   uint32_t num_samples = av_rescale_rnd(sfinfo.frames, _sample_rate, sfinfo.samplerate, AV_ROUND_UP);
-  vector<unique_ptr<float>> channel_data;
+  vector<unique_ptr<AudioFileChannel>> channel_data;
   for (int i = 0 ; i < sfinfo.channels ; ++i) {
-    channel_data.emplace_back(new float[num_samples]);
+    StatusOr<AudioFileChannel*> stor_channel = create_channel(num_samples, streaming);
+    RETURN_IF_ERROR(stor_channel);
+    channel_data.emplace_back(stor_channel.result());
   }
 
   SwrContext* ctxt = swr_alloc_set_opts(
@@ -118,7 +784,7 @@ StatusOr<AudioFile*> AudioFileSubSystem::load_audio_file(const string& path) {
     }
 
     for (int i = 0 ; i < sfinfo.channels ; ++i) {
-      out_planes[i] = (uint8_t*)(channel_data[i].get() + out_pos);
+      out_planes[i] = (uint8_t*)(channel_data[i]->data() + out_pos);
     }
 
     int samples_written = swr_convert(
@@ -137,7 +803,7 @@ StatusOr<AudioFile*> AudioFileSubSystem::load_audio_file(const string& path) {
 
   // Flush out any samples that swr_convert might have buffered.
   for (int i = 0 ; i < sfinfo.channels ; ++i) {
-    out_planes[i] = (uint8_t*)(channel_data[i].get() + out_pos);
+    out_planes[i] = (uint8_t*)(channel_data[i]->data() + out_pos);
   }
   int samples_written = swr_convert(
       ctxt,
@@ -154,21 +820,15 @@ StatusOr<AudioFile*> AudioFileSubSystem::load_audio_file(const string& path) {
   // In case we have written less than we anticipated.
   num_samples = out_pos;
 
-  unique_ptr<float*> cdat(new float*[channel_data.size() + 1]);
-  for (uint32_t ch = 0 ; ch < channel_data.size() ; ++ch) {
-    cdat.get()[ch] = channel_data[ch].release();
+  if (!cache_key.empty()) {
+    store_cached_file(cache_key, channel_data, num_samples);
   }
-  cdat.get()[channel_data.size()] = nullptr;
 
-  AudioFile* audio_file = new AudioFile(path, num_samples, cdat.get());
-  audio_file->ref();
-  _map.emplace(path, unique_ptr<AudioFile>(audio_file));
-
-  return audio_file;
+  return add_audio_file(path, num_samples, &channel_data);
 }
 
 StatusOr<AudioFile*> AudioFileSubSystem::load_raw_file(
-    uint32_t sample_rate, uint32_t num_samples, const vector<string>& paths) {
+    uint32_t sample_rate, uint32_t num_samples, const vector<string>& paths, bool streaming) {
   string key;
   key += to_string(sample_rate);
   key += ":";
@@ -177,17 +837,43 @@ StatusOr<AudioFile*> AudioFileSubSystem::load_raw_file(
     key += ":" + p;
   }
 
-  const auto& it = _map.find(key);
-  if (it != _map.end()) {
-    it->second->ref();
-    return it->second.get();
+  {
+    lock_guard<mutex> lock(_map_mutex);
+    const auto& it = _map.find(key);
+    if (it != _map.end()) {
+      it->second->ref();
+      return it->second.get();
+    }
+  }
+
+  if (streaming && sample_rate == _sample_rate && num_samples > _preload_samples) {
+    // The raw files already have the right format, so we can use them directly.
+    vector<unique_ptr<AudioFileChannel>> channel_data;
+    for (const auto& path : paths) {
+      StatusOr<AudioFileChannel*> stor_channel = AudioFileChannel::map_file(path, num_samples);
+      RETURN_IF_ERROR(stor_channel);
+      channel_data.emplace_back(stor_channel.result());
+    }
+
+    return add_audio_file(key, num_samples, &channel_data);
+  }
+
+  string cache_key;
+  if (_cache.enabled() && sample_rate != _sample_rate) {
+    AudioFile* audio_file = load_cached_file(
+        key, paths, num_samples * sizeof(float), sample_rate, streaming, &cache_key);
+    if (audio_file != nullptr) {
+      return audio_file;
+    }
   }
 
   uint32_t num_channels = paths.size();
   uint32_t scaled_num_samples = av_rescale_rnd(num_samples, _sample_rate, sample_rate, AV_ROUND_UP);
-  vector<unique_ptr<float>> channel_data;
-  for (int i = 0 ; i < num_channels ; ++i) {
-    channel_data.emplace_back(new float[scaled_num_samples]);
+  vector<unique_ptr<AudioFileChannel>> channel_data;
+  for (uint32_t i = 0 ; i < num_channels ; ++i) {
+    StatusOr<AudioFileChannel*> stor_channel = create_channel(scaled_num_samples, streaming);
+    RETURN_IF_ERROR(stor_channel);
+    channel_data.emplace_back(stor_channel.result());
   }
 
   SwrContext* ctxt = swr_alloc_set_opts(
@@ -228,7 +914,7 @@ StatusOr<AudioFile*> AudioFileSubSystem::load_raw_file(
         return ERROR_STATUS("Failed to read all samples (%d != %d)", in_pos, num_samples);
       }
 
-      out_planes[0] = (uint8_t*)(channel_data[ch].get() + out_pos);
+      out_planes[0] = (uint8_t*)(channel_data[ch]->data() + out_pos);
 
       int samples_written = swr_convert(
           ctxt,
@@ -245,7 +931,7 @@ StatusOr<AudioFile*> AudioFileSubSystem::load_raw_file(
     }
 
     // Flush out any samples that swr_convert might have buffered.
-    out_planes[0] = (uint8_t*)(channel_data[ch].get() + out_pos);
+    out_planes[0] = (uint8_t*)(channel_data[ch]->data() + out_pos);
     int samples_written = swr_convert(
         ctxt,
         out_planes, scaled_num_samples - out_pos,
@@ -260,25 +946,21 @@ StatusOr<AudioFile*> AudioFileSubSystem::load_raw_file(
     ++ch;
   }
 
-  unique_ptr<float*> cdat(new float*[channel_data.size() + 1]);
-  for (uint32_t ch = 0 ; ch < channel_data.size() ; ++ch) {
-    cdat.get()[ch] = channel_data[ch].release();
+  if (!cache_key.empty()) {
+    store_cached_file(cache_key, channel_data, scaled_num_samples);
   }
-  cdat.get()[channel_data.size()] = nullptr;
 
-  AudioFile* audio_file = new AudioFile(key, scaled_num_samples, cdat.get());
-  audio_file->ref();
-  _map.emplace(key, unique_ptr<AudioFile>(audio_file));
-
-  return audio_file;
+  return add_audio_file(key, scaled_num_samples, &channel_data);
 }
 
 void AudioFileSubSystem::acquire_audio_file(AudioFile* audio_file) {
+  lock_guard<mutex> lock(_map_mutex);
   assert(_map.find(audio_file->key()) != _map.end());
   audio_file->ref();
 }
 
 void AudioFileSubSystem::release_audio_file(AudioFile* audio_file) {
+  lock_guard<mutex> lock(_map_mutex);
   auto it = _map.find(audio_file->key());
   assert(it != _map.end());
   assert(audio_file->ref_count() > 0);
@@ -25,9 +25,15 @@
 #ifndef _NOISICAA_HOST_SYSTEM_HOST_SYSTEM_AUDIO_FILE_H
 #define _NOISICAA_HOST_SYSTEM_HOST_SYSTEM_AUDIO_FILE_H
 
+#include <stdint.h>
 #include <stdlib.h>
+#include <time.h>
+#include <atomic>
+#include <condition_variable>
 #include <map>
 #include <memory>
+#include <mutex>
+#include <thread>
 #include <vector>
 #include "noisicaa/core/status.h"
 
@@ -35,24 +41,134 @@ namespace noisicaa {
 
 class Logger;
 
+// The samples of a single channel, either in a heap buffer or in a memory mapped file.
+class AudioFileChannel {
+public:
+  ~AudioFileChannel();
+
+  static StatusOr<AudioFileChannel*> allocate(uint32_t num_samples);
+  // Map an existing file with raw float samples (read-only). offset must be a multiple of the
+  // page size.
+  static StatusOr<AudioFileChannel*> map_file(
+      const string& path, uint32_t num_samples, size_t offset = 0);
+  // Map an anonymous, disk-backed temporary file in dir, which is removed when the channel is
+  // destroyed.
+  static StatusOr<AudioFileChannel*> map_temp_file(const string& dir, uint32_t num_samples);
+
+  float* data() const { return _data; }
+  bool is_mapped() const { return _mapped; }
+
+  // Lock the samples in [0, num_samples) into memory.
+  Status pin(uint32_t num_samples);
+  // Ask the kernel to page in the samples in [begin, end).
+  void will_need(uint32_t begin, uint32_t end);
+  // Release the pages for the samples in [begin, end). They are paged in again, when needed.
+  void dont_need(uint32_t begin, uint32_t end);
+
+private:
+  AudioFileChannel(float* data, uint32_t num_samples, bool mapped);
+
+  float* _data;
+  uint32_t _num_samples;
+  bool _mapped;
+};
+
 class AudioFile {
 public:
-  AudioFile(const string& key, uint32_t num_samples, float** channel_data);
+  AudioFile(const string& key, uint32_t num_samples, vector<unique_ptr<AudioFileChannel>>* channels);
 
   const string& key() const { return _key; }
   uint32_t num_samples() const { return _num_samples; }
-  uint32_t num_channels() const { return _channel_data.size(); }
-  const float* channel_data(uint32_t ch) const { return _channel_data[ch].get(); }
+  uint32_t num_channels() const { return _channels.size(); }
+  const float* channel_data(uint32_t ch) const { return _channels[ch]->data(); }
+  bool is_streaming() const { return _streaming; }
 
   uint32_t ref_count() const { return _ref_count; }
   void ref() { ++_ref_count; }
   void deref() { --_ref_count; }
 
+  // Each voice, which plays this file, claims its own playhead to tell the prefetcher, where
+  // its playback currently is. Pages are only released, once all voices have left them behind.
+  // These are lock-free and cheap enough to be called from the audio thread once per block.
+  // add_playhead() returns -1, if all playheads are in use. That voice is then not seen by the
+  // prefetcher, and set_playhead()/remove_playhead() ignore it.
+  int add_playhead(uint32_t pos);
+  void set_playhead(int playhead, uint32_t pos) {
+    if (playhead >= 0) {
+      _playheads[playhead].store(pos, memory_order_relaxed);
+    }
+  }
+  void remove_playhead(int playhead);
+
+  static const int max_playheads = 32;
+
+  // Called from the prefetch thread of the AudioFileSubSystem.
+  void prefetch(uint32_t preload_samples, uint32_t window_samples);
+
 private:
   uint32_t _ref_count = 0;
   string _key;
   uint32_t _num_samples;
-  vector<unique_ptr<float>> _channel_data;
+  vector<unique_ptr<AudioFileChannel>> _channels;
+  bool _streaming;
+
+  static const uint32_t no_playhead = UINT32_MAX;
+  atomic<uint32_t> _playheads[max_playheads];
+  uint32_t _released_until = 0;
+};
+
+// On-disk cache of decoded and resampled audio files, so they do not have to be converted again,
+// when a project is reopened or the engine's sample rate changes.
+//
+// Entries are keyed by the SHA1 of the source data, the source and target sample rates and the
+// resampler quality. The SHA1 of each source is remembered in a small index file per path, size
+// and mtime, so unchanged files are not read again to compute it. Each entry is a single file with a header followed by the planar f32 data
+// of all channels, each channel aligned to cache_alignment, so it can be mapped directly. The
+// file's mtime is updated on every hit and the least recently used entries are evicted, when
+// the total size exceeds the limit.
+class AudioFileCache {
+public:
+  AudioFileCache(Logger* logger);
+
+  Status setup(const string& cache_dir, uint64_t max_bytes);
+
+  bool enabled() const { return !_cache_dir.empty(); }
+
+  // Computes the content part of the cache key. If num_bytes is non-zero, only that many bytes
+  // of each file are used. The files are only read, if their path, size or mtime changed since
+  // the last call.
+  StatusOr<string> hash_files(const vector<string>& paths, size_t num_bytes = 0);
+
+  string make_key(
+      const string& content_hash, uint32_t source_rate, uint32_t target_rate) const;
+
+  // Returns false, if there is no entry for key.
+  StatusOr<bool> lookup(
+      const string& key, vector<unique_ptr<AudioFileChannel>>* channels, uint32_t* num_samples);
+  Status store(
+      const string& key, const vector<unique_ptr<AudioFileChannel>>& channels,
+      uint32_t num_samples);
+
+  // Removes the least recently used entries, until the cache is not larger than max_bytes.
+  // Temp files older than tmp_max_age seconds and hash index files, which have not been used for
+  // hash_index_max_age seconds, are removed as well.
+  void evict(uint64_t max_bytes);
+
+  static const size_t cache_alignment = 65536;
+  static const char* resampler_quality;
+  static const char* tmp_suffix;
+  static const time_t tmp_max_age = 3600;
+  static const char* hash_index_suffix;
+  static const time_t hash_index_max_age = 30 * 24 * 3600;
+
+private:
+  string entry_path(const string& key) const;
+  StatusOr<string> hash_contents(const vector<string>& paths, size_t num_bytes);
+  void store_hash_index(const string& path, const string& content_hash);
+
+  Logger* _logger;
+  string _cache_dir;
+  uint64_t _max_bytes = 0;
 };
 
 class AudioFileSubSystem {
@@ -60,19 +176,52 @@ public:
   AudioFileSubSystem();
   ~AudioFileSubSystem();
 
-  Status setup(uint32_t sample_rate);
+  Status setup(uint32_t sample_rate, const string& cache_dir = "", uint64_t cache_size = 0);
   void cleanup();
 
-  StatusOr<AudioFile*> load_audio_file(const string& path);
-  StatusOr<AudioFile*> load_raw_file(uint32_t sample_rate, uint32_t num_samples, const vector<string>& paths);
+  // In streaming mode the samples are not held in memory. Instead the files are memory mapped
+  // and paged in ahead of the playhead by a prefetch thread. Only the first preload_seconds
+  // of each file are pinned in memory. Files shorter than that are always loaded completely.
+  StatusOr<AudioFile*> load_audio_file(const string& path, bool streaming = false);
+  StatusOr<AudioFile*> load_raw_file(
+      uint32_t sample_rate, uint32_t num_samples, const vector<string>& paths,
+      bool streaming = false);
 
   void acquire_audio_file(AudioFile* audio_file);
   void release_audio_file(AudioFile* audio_file);
 
+  static constexpr float preload_seconds = 2.0;
+  static constexpr float prefetch_seconds = 10.0;
+
 private:
+  StatusOr<AudioFileChannel*> create_channel(uint32_t num_samples, bool streaming);
+  AudioFile* add_audio_file(
+      const string& key, uint32_t num_samples, vector<unique_ptr<AudioFileChannel>>* channels);
+  // Returns nullptr, if the file is not in the cache. cache_key is set, if the file could be
+  // hashed, so it can be stored under that key after converting it.
+  AudioFile* load_cached_file(
+      const string& key, const vector<string>& paths, size_t num_bytes, uint32_t source_rate,
+      bool streaming, string* cache_key);
+  void store_cached_file(
+      const string& cache_key, const vector<unique_ptr<AudioFileChannel>>& channels,
+      uint32_t num_samples);
+
+  void prefetch_main();
+
   Logger* _logger;
   uint32_t _sample_rate = 0;
+  uint32_t _preload_samples = 0;
+  uint32_t _prefetch_samples = 0;
+  AudioFileCache _cache;
+  // Directory for the temp files, which back streamed files, that had to be converted.
+  string _temp_dir;
+
+  mutex _map_mutex;
   map<string, unique_ptr<AudioFile>> _map;
+
+  unique_ptr<thread> _prefetch_thread;
+  bool _stop = false;
+  condition_variable _cond;
 };
 
 }  // namespace noisicaa
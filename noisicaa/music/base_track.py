@@ -51,6 +51,8 @@ class Track(_model.Track, graph.BaseNode):  # pylint: disable=abstract-method
 
 
 class Measure(_model.Measure, model_base.ProjectChild):
+    __slots__ = ()
+
     @property
     def track(self) -> 'MeasuredTrack':
         return cast(MeasuredTrack, self.parent)
@@ -66,6 +68,8 @@ class Measure(_model.Measure, model_base.ProjectChild):
 
 
 class MeasureReference(_model.MeasureReference, model_base.ProjectChild):
+    __slots__ = ()
+
     def create(self, *, measure: Optional[Measure] = None, **kwargs: Any) -> None:
         super().create(**kwargs)
 
@@ -46,6 +46,8 @@ ObjectBase = model_base.ObjectBase
 
 {% for cls in desc.classes %}
 class {{cls.name}}({{cls.super_class|join(', ')}}):  # pylint: disable=abstract-method
+    __slots__ = ()
+
     class {{cls.name}}Spec(model_base.ObjectSpec):
 {%- if not cls.is_abstract %}
         proto_type = '{{cls.proto_ext_name}}'
@@ -55,14 +57,6 @@ class {{cls.name}}({{cls.super_class|join(', ')}}):  # pylint: disable=abstract-
         {{prop.name}} = model_base.{{prop|prop_cls}}({{prop|prop_cls_type}}{% if prop.HasField("allow_none") %}, allow_none={{prop.allow_none}}{% endif %}{% if prop.HasField("default") %}, default={{prop.default}}{% endif %})
 {%- endfor %}
 
-{% if cls.properties %}
-    def __init__(self, **kwargs: typing.Any) -> None:
-        super().__init__(**kwargs)
-{% for prop in cls.properties %}
-        self.change_callbacks['{{prop.name}}'] = core.Callback[model_base.{{prop|change_cls}}]()
-{%- endfor %}
-{% endif %}
-
 {% for prop in cls.properties %}
     def _get_{{prop.name}}(self) -> {{prop|py_type}}:
         return self.get_property_value('{{prop.name}}')
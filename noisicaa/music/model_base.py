@@ -28,7 +28,8 @@ import typing
 from typing import (
     cast, overload,
     Any, Optional, Union,
-    Iterable, Iterator, MutableMapping, Sequence, MutableSequence, Dict, Type, Generic, TypeVar)
+    Iterable, Iterator, MutableMapping, Sequence, MutableSequence, Dict, List, Tuple, Type,
+    Generic, TypeVar)
 
 from google.protobuf import message as protobuf
 from google.protobuf.internal import containers as protobuf_containers
@@ -373,10 +374,29 @@ class ObjectList(Generic[OBJECT], BaseList[OBJECT]):
             raise InvalidReferenceError(
                 "%s.%s[%s]" % (type(self._instance).__name__, self._prop_name, idx))
 
+    def get_id(self, idx: int) -> int:
+        return self._pb[idx]
+
+    def index_of_id(self, obj_id: int) -> int:
+        return list(self._pb).index(obj_id)
+
     def set(self, idx: int, value: OBJECT) -> None:
         self.delete(idx)
         self.insert(idx, value)
 
+    # The indices of the list members are not updated eagerly, when the list changes. Instead
+    # the list's generation is bumped, whenever the position of existing members changes, and
+    # members with an outdated generation recompute all indices, when their index is needed.
+    @property
+    def generation(self) -> int:
+        return self._instance.get_list_generation(self._prop_name)
+
+    def update_indices(self) -> None:
+        for idx, obj_id in enumerate(self._pb):
+            obj = self.__pool.get_materialized(obj_id)
+            if obj is not None:
+                obj.set_index(idx)
+
     def insert(self, idx: int, obj: OBJECT) -> None:
         _checktype(obj, self.__otype)
         if idx < 0 or idx > len(self._pb):
@@ -385,8 +405,9 @@ class ObjectList(Generic[OBJECT], BaseList[OBJECT]):
         obj.attach(self._instance)
         obj.set_parent_container(self)
         self._pb.insert(idx, obj.id)
-        for i in range(idx, len(self._pb)):
-            self.__pool[self._pb[i]].set_index(i)
+        if idx < len(self._pb) - 1:
+            self._instance.bump_list_generation(self._prop_name)
+        obj.set_index(idx)
         if not self._instance.in_setup:
             self._instance.property_changed(
                 PropertyListInsert(self._instance, self._prop_name, idx, obj))
@@ -396,8 +417,8 @@ class ObjectList(Generic[OBJECT], BaseList[OBJECT]):
         old_child.detach()
         old_child.clear_parent_container()
         del self._pb[idx]
-        for i in range(idx, len(self._pb)):
-            self.__pool[self._pb[i]].set_index(i)
+        if idx < len(self._pb):
+            self._instance.bump_list_generation(self._prop_name)
         if not self._instance.in_setup:
             self._instance.property_changed(
                 PropertyListDelete(self._instance, self._prop_name, idx, old_child))
@@ -408,12 +429,7 @@ class ObjectList(Generic[OBJECT], BaseList[OBJECT]):
         obj_id = self._pb[old_index]
         del self._pb[old_index]
         self._pb.insert(new_index, obj_id)
-        if new_index > old_index:
-            for i in range(old_index, new_index + 1):
-                self.__pool[self._pb[i]].set_index(i)
-        else:
-            for i in range(new_index, old_index + 1):
-                self.__pool[self._pb[i]].set_index(i)
+        self._instance.bump_list_generation(self._prop_name)
         if not self._instance.in_setup:
             self._instance.property_changed(
                 PropertyListMove(self._instance, self._prop_name, old_index, new_index))
@@ -692,6 +708,13 @@ class ObjectListProperty(Generic[OBJECT], PropertyBase):
         raise TypeError("%s cannot be assigned." % self.name)
 
 
+class _ChangeCallbacks(Dict[str, core.Callback]):
+    def __missing__(self, prop_name: str) -> core.Callback:
+        callback = core.Callback[PropertyChange]()
+        self[prop_name] = callback
+        return callback
+
+
 class ObjectSpecMeta(type):
     def __new__(mcs, name: str, parents: Any, dct: Dict[str, Any]) -> Any:
         spec = cast('ObjectSpec', super().__new__(mcs, name, parents, dct))
@@ -708,10 +731,23 @@ class ObjectSpec(object, metaclass=ObjectSpecMeta):
     proto_ext = None  # type: protobuf_descriptor.FieldDescriptor
 
 
+# The property descriptors of each model class, shared by all its instances.
+_class_properties = {}  # type: Dict[Type[ObjectBase], Dict[str, PropertyBase]]
+
+
 class ObjectBase(object):
     # Do not complain about 'id' arguments.
     # pylint: disable=redefined-builtin
 
+    # Projects can contain a huge number of objects, so keep the instances as small as possible.
+    # Subclasses should also declare (usually empty) __slots__, or their instances get a
+    # __dict__ again.
+    __slots__ = (
+        '__proto', '_pool', '__properties', '__change_callbacks', '__object_changed',
+        '__parent', '__parent_container', '__index', '__index_generation',
+        '__list_generations', 'in_setup', '__weakref__',
+    )
+
     class ObjectBaseSpec(ObjectSpec):
         id = Property(int)
 
@@ -723,31 +759,57 @@ class ObjectBase(object):
 
         return None
 
-    def __init__(self, *, pb: model_base_pb2.ObjectBase, pool: 'Pool') -> None:
-        self.__proto = pb
-        self._pool = pool
-
-        self.change_callbacks = {}  # type: Dict[str, core.Callback]
+    @classmethod
+    def get_class_properties(cls) -> Dict[str, PropertyBase]:
+        try:
+            return _class_properties[cls]
+        except KeyError:
+            pass
 
-        self.__properties = {}  # type: Dict[str, PropertyBase]
-        for cls in self.__class__.__mro__:
-            if not issubclass(cls, ObjectBase):
+        properties = {}  # type: Dict[str, PropertyBase]
+        for base_cls in cls.__mro__:
+            if not issubclass(base_cls, ObjectBase):
                 continue  # pragma: no coverage
 
-            spec = cls.get_spec()
+            spec = base_cls.get_spec()
             if spec is None:
                 continue
 
             for prop_name, prop in spec.__dict__.items():
                 if isinstance(prop, PropertyBase):
-                    self.__properties[prop_name] = prop
+                    properties[prop_name] = prop
+
+        _class_properties[cls] = properties
+        return properties
+
+    def __init__(self, *, pb: model_base_pb2.ObjectBase, pool: 'Pool') -> None:
+        self.__proto = pb
+        self._pool = pool
+
+        self.__properties = self.get_class_properties()
+
+        # Listener containers are only created, when somebody is actually interested in changes.
+        self.__change_callbacks = None  # type: Dict[str, core.Callback]
+        self.__object_changed = None  # type: core.Callback[PropertyChange]
 
         self.__parent = None  # type: ObjectBase
         self.__parent_container = None  # type: ObjectList
         self.__index = None  # type: int
+        self.__index_generation = None  # type: int
+        self.__list_generations = None  # type: Dict[str, int]
         self.in_setup = True
 
-        self.object_changed = core.Callback[PropertyChange]()
+    @property
+    def change_callbacks(self) -> Dict[str, core.Callback]:
+        if self.__change_callbacks is None:
+            self.__change_callbacks = _ChangeCallbacks()
+        return self.__change_callbacks
+
+    @property
+    def object_changed(self) -> core.Callback[PropertyChange]:
+        if self.__object_changed is None:
+            self.__object_changed = core.Callback[PropertyChange]()
+        return self.__object_changed
 
     def create(self, **kwargs: Any) -> None:
         assert not kwargs, kwargs
@@ -827,29 +889,50 @@ class ObjectBase(object):
     def clear_parent_container(self) -> None:
         self.__parent_container = None
         self.__index = None
+        self.__index_generation = None
 
     def set_index(self, index: int) -> None:
         assert self.__parent_container is not None
         self.__index = index
+        self.__index_generation = self.__parent_container.generation
+
+    def __current_index(self) -> Optional[int]:
+        if self.__parent_container is None:
+            return None
+        if self.__index_generation != self.__parent_container.generation:
+            self.__parent_container.update_indices()
+        return self.__index
 
     @property
     def index(self) -> int:
-        if self.__parent_container is None:
+        index = self.__current_index()
+        if index is None:
             raise ObjectNotAttachedError(self)
-        assert self.__index is not None
-        return self.__index
+        return index
 
     @property
     def is_first(self) -> bool:
-        if self.__index is None:
+        index = self.__current_index()
+        if index is None:
             raise NotListMemberError(self.id)
-        return self.__index == 0
+        return index == 0
 
     @property
     def is_last(self) -> bool:
-        if self.__index is None:
+        index = self.__current_index()
+        if index is None:
             raise NotListMemberError(self.id)
-        return self.__index == len(self.__parent_container) - 1
+        return index == len(self.__parent_container) - 1
+
+    def get_list_generation(self, prop_name: str) -> int:
+        if self.__list_generations is None:
+            return 0
+        return self.__list_generations.get(prop_name, 0)
+
+    def bump_list_generation(self, prop_name: str) -> None:
+        if self.__list_generations is None:
+            self.__list_generations = {}
+        self.__list_generations[prop_name] = self.__list_generations.get(prop_name, 0) + 1
 
     @property
     def prev_sibling(self) -> 'ObjectBase':
@@ -878,8 +961,12 @@ class ObjectBase(object):
             yield prop.name
 
     def property_changed(self, change: PropertyChange) -> None:
-        self.change_callbacks[change.prop_name].call(change)
-        self.object_changed.call(change)
+        if self.__change_callbacks is not None:
+            callback = self.__change_callbacks.get(change.prop_name)
+            if callback is not None:
+                callback.call(change)
+        if self.__object_changed is not None:
+            self.__object_changed.call(change)
         self._pool.model_changed.call(change)
 
     def list_children(self) -> Iterator['ObjectBase']:
@@ -930,6 +1017,8 @@ class ObjectBase(object):
 
 
 class ProjectChild(ObjectBase):
+    __slots__ = ()
+
     @property
     def attached_to_project(self) -> bool:
         if not self.is_attached:
@@ -948,6 +1037,12 @@ class Pool(MutableMapping[int, ObjectBase]):
         self.__class_map = {}  # type: Dict[str, Type['ObjectBase']]
         self.__root_obj = None  # type: 'ObjectBase'
 
+        # Objects from a lazily deserialized tree, which have not been accessed yet, and for each
+        # child object the (parent id, property name, index) of the place it is attached to.
+        self.__lazy_protos = {}  # type: Dict[int, model_base_pb2.ObjectBase]
+        self.__lazy_parents = {}  # type: Dict[int, Tuple[int, str, Optional[int]]]
+        self.__child_props = {}  # type: Dict[Type['ObjectBase'], List[PropertyBase]]
+
         self.model_changed = core.Callback[Mutation]()
 
     def __get_proto_type(self, cls: Type) -> str:
@@ -991,6 +1086,8 @@ class Pool(MutableMapping[int, ObjectBase]):
         try:
             return self.__obj_map[id]
         except KeyError:
+            if id in self.__lazy_protos:
+                return self.__materialize(id)
             raise KeyError("%016x" % id).with_traceback(sys.exc_info()[2]) from None
 
     def __setitem__(self, id: int, obj: 'ObjectBase') -> None:
@@ -999,31 +1096,117 @@ class Pool(MutableMapping[int, ObjectBase]):
     def __delitem__(self, id: int) -> None:
         self.delete(id)
 
+    def __contains__(self, id: object) -> bool:
+        return id in self.__obj_map or id in self.__lazy_protos
+
     def __len__(self) -> int:
-        return len(self.__obj_map)
+        return len(self.__obj_map) + len(self.__lazy_protos)
 
     def __iter__(self) -> Iterator[int]:
         yield from self.__obj_map
+        yield from list(self.__lazy_protos)
 
     @property
     def objects(self) -> Iterator['ObjectBase']:
+        self.materialize_all()
         yield from self.__obj_map.values()
 
+    def get_materialized(self, id: int) -> Optional['ObjectBase']:
+        return self.__obj_map.get(id)
+
+    @property
+    def num_lazy_objects(self) -> int:
+        return len(self.__lazy_protos)
+
+    def materialize_all(self) -> None:
+        while self.__lazy_protos:
+            self.__materialize(next(iter(self.__lazy_protos)))
+
+    def __child_properties(self, cls: Type[ObjectBase]) -> List[PropertyBase]:
+        try:
+            return self.__child_props[cls]
+        except KeyError:
+            pass
+
+        props = {}  # type: Dict[str, PropertyBase]
+        for c in cls.__mro__:
+            if not issubclass(c, ObjectBase):
+                continue  # pragma: no coverage
+
+            spec = c.get_spec()
+            if spec is None:
+                continue
+
+            for prop_name, prop in spec.__dict__.items():
+                if isinstance(prop, PropertyBase):
+                    props[prop_name] = prop
+
+        child_props = [
+            prop for _, prop in sorted(props.items())
+            if isinstance(prop, (ObjectProperty, ObjectListProperty))]
+        self.__child_props[cls] = child_props
+        return child_props
+
+    def __attach_child(
+            self, parent: ObjectBase, child_id: int, container: Optional[ObjectList], index: int
+    ) -> None:
+        child = self.__obj_map.get(child_id)
+        if child is None:
+            if child_id in self.__lazy_protos:
+                # Will be attached, when it gets materialized.
+                return
+            try:
+                child = self[child_id]
+            except KeyError:
+                raise InvalidReferenceError(
+                    "%s references unknown object %016x" % (type(parent).__name__, child_id))
+
+        child.attach(parent)
+        if container is not None:
+            child.set_parent_container(container)
+            child.set_index(index)
+
     def __attach_children(self, obj: ObjectBase) -> None:
-        for prop in obj.list_properties():
+        for prop in self.__child_properties(type(obj)):
+            pb = obj.proto.Extensions[prop.spec.proto_ext]
             if isinstance(prop, ObjectProperty):
-                try:
-                    child = obj.get_property_value(prop.name)
-                except ValueNotSetError:
-                    child = None
-                if child is not None:
-                    child.attach(obj)
-            elif isinstance(prop, ObjectListProperty):
+                if pb.HasField(prop.name):
+                    self.__attach_child(obj, getattr(pb, prop.name), None, None)
+            else:
                 children = obj.get_property_value(prop.name)
-                for idx, child in enumerate(children):
-                    child.attach(obj)
-                    child.set_parent_container(children)
-                    child.set_index(idx)
+                for idx, child_id in enumerate(getattr(pb, prop.name)):
+                    self.__attach_child(obj, child_id, children, idx)
+
+    def __materialize(self, id: int) -> 'ObjectBase':
+        parent_id, prop_name, index = self.__lazy_parents.get(id, (None, None, None))
+        if parent_id is not None and parent_id in self.__lazy_protos:
+            # Parents must exist before their children, so the children are attached right away.
+            self.__materialize(parent_id)
+            if id in self.__obj_map:
+                # The parent already needed this object during its setup.
+                return self.__obj_map[id]
+
+        self.__lazy_parents.pop(id, None)
+        pb = self.__lazy_protos.pop(id)
+        cls = self.__class_map[pb.type]
+        obj = cls(pb=pb, pool=self)
+        self.__obj_map[id] = obj
+
+        self.__attach_children(obj)
+        obj.setup()
+        obj.setup_complete()
+
+        if parent_id is not None:
+            parent = self.__obj_map[parent_id]
+            container = None  # type: ObjectList
+            if index is not None:
+                container = parent.get_property_value(prop_name)
+                if index >= len(container) or container.get_id(index) != id:
+                    index = container.index_of_id(id)
+            self.__attach_child(parent, id, container, index)
+
+        # Not reported as ObjectAdded, the object has been part of the pool all along.
+        return obj
 
     def create(
             self, cls: Type[OBJECT], id: Optional[int] = None, **kwargs: Any) -> OBJECT:
@@ -1041,7 +1224,7 @@ class Pool(MutableMapping[int, ObjectBase]):
         return obj
 
     def deserialize(self, pb: model_base_pb2.ObjectBase) -> 'ObjectBase':
-        assert pb.id not in self.__obj_map, str(pb)
+        assert pb.id not in self, str(pb)
         cls = self.__class_map[pb.type]
         obj = cls(pb=pb, pool=self)
         self.__obj_map[pb.id] = obj
@@ -1053,22 +1236,45 @@ class Pool(MutableMapping[int, ObjectBase]):
         return obj
 
     def remove(self, id: int) -> None:
-        obj = self.__obj_map[id]
+        obj = self[id]
         del self.__obj_map[id]
         self.object_removed(obj)
 
     def delete(self, id: int) -> None:
-        obj = self.__obj_map[id]
+        obj = self[id]
         for child in obj.list_children():
             self.delete(child.id)
         del self.__obj_map[id]
         self.object_removed(obj)
 
-    def deserialize_tree(self, objtree: model_base_pb2.ObjectTree) -> 'ObjectBase':
+    def deserialize_tree(
+            self, objtree: model_base_pb2.ObjectTree, *, lazy: bool = False) -> 'ObjectBase':
+        if not lazy:
+            for oproto in objtree.objects:
+                self.deserialize(oproto)
+            self.set_root(self.__obj_map[objtree.root])
+            return self.__obj_map[objtree.root]
+
+        # Only the root is materialized now, all other objects are created when they are first
+        # accessed. This just needs to know where each object is attached, which can be read
+        # directly from the protos.
         for oproto in objtree.objects:
-            self.deserialize(oproto)
-        self.set_root(self.__obj_map[objtree.root])
-        return self.__obj_map[objtree.root]
+            assert oproto.id not in self, str(oproto)
+            self.__lazy_protos[oproto.id] = oproto
+
+            cls = self.__class_map[oproto.type]
+            for prop in self.__child_properties(cls):
+                pb = oproto.Extensions[prop.spec.proto_ext]
+                if isinstance(prop, ObjectProperty):
+                    if pb.HasField(prop.name):
+                        self.__lazy_parents[getattr(pb, prop.name)] = (oproto.id, prop.name, None)
+                else:
+                    for idx, child_id in enumerate(getattr(pb, prop.name)):
+                        self.__lazy_parents[child_id] = (oproto.id, prop.name, idx)
+
+        root = self[objtree.root]
+        self.set_root(root)
+        return root
 
     def clone_tree(self, objtree: model_base_pb2.ObjectTree) -> 'ObjectBase':
         idmap = {}  # type: Dict[int, int]
@@ -79,12 +79,6 @@ class Child(ObjectBase):
         child = model_base.ObjectProperty(GrandChild)
         value = model_base.Property(str, allow_none=True)
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-
-        self.change_callbacks['child'] = core.Callback[model_base.PropertyChange]()
-        self.change_callbacks['value'] = core.Callback[model_base.PropertyChange]()
-
     def __repr__(self):
         return 'Child(%d)' % self.id
 
@@ -477,6 +471,36 @@ class ObjectTest(unittest.TestCase):
         self.assertIsInstance(serialized, model_base_pb2.ObjectTree)
         self.assertEqual(serialized.root, obj.id)
 
+    def test_slots(self):
+        class CompactObject(model_base.ObjectBase):
+            __slots__ = ()
+
+        obj = CompactObject(pb=model_base_pb2.ObjectBase(id=124), pool=self.pool)
+        self.assertFalse(hasattr(obj, '__dict__'))
+        with self.assertRaises(AttributeError):
+            obj.foo = 1
+
+    def test_shared_properties(self):
+        obj1 = self.pool.create(Root, id=124)
+        obj2 = self.pool.create(Root, id=125)
+        self.assertIs(obj1.get_class_properties(), obj2.get_class_properties())
+        self.assertIs(obj1.get_class_properties(), Root.get_class_properties())
+
+    def test_lazy_listeners(self):
+        obj = self.pool.create(Child, id=124)
+        obj.value = 'foo'
+
+        changes = []  # type: List[model_base.PropertyChange]
+        obj.change_callbacks['value'].add(changes.append)
+        obj.object_changed.add(changes.append)
+        obj.value = 'bar'
+        self.assertEqual(len(changes), 2)
+        self.assertIsInstance(changes[0], model_base.PropertyValueChange)
+        self.assertEqual(changes[0].new_value, 'bar')
+
+        obj.child = self.pool.create(GrandChild, id=125)
+        self.assertEqual(len(changes), 3)
+
 
 class PropertyTest(unittest.TestCase):
     def setup_testcase(self):
@@ -864,6 +888,40 @@ class ObjectListPropertyTest(unittest.TestCase):
         self.assertTrue(child2.is_child_of(self.obj))
         self.assertTrue(grandchild.is_child_of(self.obj))
 
+    def test_indices(self):
+        prop = model_base.ObjectListProperty(Child)
+        prop.name = 'child_list'
+        lst = prop.get_value(self.obj, self.pb, self.pool)
+
+        children = [self.pool.create(Child, id=200 + i) for i in range(10)]
+        for child in children:
+            lst.append(child)
+        generation = lst.generation
+        self.assertEqual([child.index for child in children], list(range(10)))
+
+        first = self.pool.create(Child, id=300)
+        lst.insert(0, first)
+        self.assertGreater(lst.generation, generation)
+        self.assertEqual(first.index, 0)
+        self.assertTrue(first.is_first)
+        self.assertIs(first.next_sibling, children[0])
+        self.assertEqual([child.index for child in children], list(range(1, 11)))
+        self.assertIs(children[0].prev_sibling, first)
+        self.assertTrue(children[-1].is_last)
+
+        lst.move(0, 10)
+        self.assertTrue(first.is_last)
+        self.assertIs(first.prev_sibling, children[-1])
+        self.assertEqual([child.index for child in children], list(range(10)))
+
+        del lst[3]
+        self.assertEqual(children[4].index, 3)
+        self.assertIs(children[4].prev_sibling, children[2])
+        with self.assertRaises(model_base.ObjectNotAttachedError):
+            children[3].index  # pylint: disable=pointless-statement
+        with self.assertRaises(model_base.NotListMemberError):
+            children[3].is_first  # pylint: disable=pointless-statement
+
 
 class ListMixin(unittest.AbstractTestCase):
     SUPPORTS_LIST_SET = True
@@ -1204,6 +1262,63 @@ class PoolTest(unittest.TestCase):
         self.assertIsInstance(root2.child_list[1], Child)
         self.assertEqual(root2.child_list[1].id, 112)
 
+    def test_deserialize_tree_lazy(self):
+        pool1 = model_base.Pool()
+        pool1.register_class(Root)
+        pool1.register_class(Child)
+        pool1.register_class(GrandChild)
+
+        root1 = pool1.create(Root, id=100, string_value='foo')
+        root1.child_value = pool1.create(Child, id=110)
+        root1.child_list.append(pool1.create(Child, id=111))
+        root1.child_list.append(pool1.create(Child, id=112))
+        root1.child_list[1].child = pool1.create(GrandChild, id=120)
+
+        serialized = root1.serialize()
+
+        pool2 = model_base.Pool()
+        pool2.register_class(Root)
+        pool2.register_class(Child)
+        pool2.register_class(GrandChild)
+
+        root2 = cast(Root, pool2.deserialize_tree(serialized, lazy=True))
+        self.assertEqual(root2.id, 100)
+        self.assertEqual(pool2.num_lazy_objects, 4)
+        self.assertEqual(len(pool2), 5)
+        self.assertIn(120, pool2)
+
+        # Accessing an object deep in the tree also materializes its parents.
+        grand_child = pool2[120]
+        self.assertEqual(pool2.num_lazy_objects, 2)
+        self.assertIs(grand_child.parent, root2.child_list[1])
+        self.assertIs(grand_child.parent.parent, root2)
+        self.assertEqual(grand_child.parent.index, 1)
+
+        self.assertEqual(root2.child_list[0].index, 0)
+        self.assertIs(root2.child_value.parent, root2)
+        self.assertEqual(pool2.num_lazy_objects, 0)
+        self.assertEqual(root2.serialize(), serialized)
+
+    def test_deserialize_tree_lazy_remove(self):
+        pool1 = model_base.Pool()
+        pool1.register_class(Root)
+        pool1.register_class(Child)
+
+        root1 = pool1.create(Root, id=100, string_value='foo')
+        root1.child_list.append(pool1.create(Child, id=111))
+        root1.child_list.append(pool1.create(Child, id=112))
+
+        pool2 = model_base.Pool()
+        pool2.register_class(Root)
+        pool2.register_class(Child)
+
+        root2 = cast(Root, pool2.deserialize_tree(root1.serialize(), lazy=True))
+        del root2.child_list[0]
+        del pool2[111]
+        self.assertEqual(sorted(pool2), [100, 112])
+        self.assertEqual(root2.child_list[0].id, 112)
+        self.assertEqual(root2.child_list[0].index, 0)
+
     def test_clone_tree(self):
         pool = model_base.Pool()
         pool.register_class(Root)
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+
+# @begin:license
+#
+# Copyright (c) 2015-2019, Benjamin Niemann <pink@odahoda.de>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# @end:license
+
+
+import collections
+import gc
+import sys
+import tracemalloc
+
+from noisidev import unittest
+from noisidev import unittest_mixins
+from . import loadtest_generator
+from . import project
+
+
+class ModelMemoryPerfTest(
+        unittest_mixins.NodeDBMixin,
+        unittest.AsyncTestCase):
+    async def run_test(self, spec, *, out=sys.stdout):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            mem0, _ = tracemalloc.get_traced_memory()
+            pool = project.Pool()
+            loadtest_generator.create_loadtest_project(
+                spec=spec,
+                pool=pool,
+                project_cls=project.BaseProject,
+                node_db=self.node_db)
+            gc.collect()
+            mem1, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        num_objects = len(pool)
+        class_counts = collections.Counter(type(obj).__name__ for obj in pool.objects)
+
+        out.write("\033[1mObjects: \033[32m%d\033[37m\n" % num_objects)
+        for cls_name, count in class_counts.most_common(5):
+            out.write("  %s: %d\n" % (cls_name, count))
+        out.write(
+            "\033[1mTotal: Memory: \033[32m%.1fMB\033[37m  Peak: \033[32m%.1fMB\033[37m\n"
+            % ((mem1 - mem0) / 2**20, (peak - mem0) / 2**20))
+        out.write(
+            "Per object: \033[32m%.0f bytes\033[37;0m\n" % ((mem1 - mem0) / num_objects))
+
+    async def test_score_tracks(self):
+        await self.run_test({
+            'bpm': 120,
+            'tracks': [{
+                'type': 'builtin://score-track',
+                'count': 20,
+            }],
+        })
@@ -21,10 +21,11 @@
 # @end:license
 
 import contextlib
-import copy
 import logging
 import typing
-from typing import Any, Generator
+from typing import Any, Callable, Dict, Generator, List, Optional, Set, Tuple, Type
+
+from google.protobuf import message as protobuf
 
 from noisicaa import audioproc
 from noisicaa import value_types
@@ -47,6 +48,398 @@ def _assert_equal(a: Any, b: Any) -> None:
     assert a == b, '%r != %r' % (a, b)
 
 
+# Decoders for each field of the MutationList.Slot oneof, indexed by field number. They get the
+# field's value as returned by Slot.ListFields().
+# Proto values are not copied, because the properties copy them into the object's proto anyway.
+_SLOT_DECODERS = {
+    mutations_pb2.MutationList.Slot.DESCRIPTOR.fields_by_name[field_name].number: decoder
+    for field_name, decoder in [
+        ('none', lambda value, pool: None),
+        ('obj_id', lambda value, pool: pool[value]),
+        ('string_value', lambda value, pool: value),
+        ('bytes_value', lambda value, pool: value),
+        ('bool_value', lambda value, pool: value),
+        ('int_value', lambda value, pool: value),
+        ('float_value', lambda value, pool: value),
+        ('musical_time', lambda value, pool: audioproc.MusicalTime.from_proto(value)),
+        ('musical_duration', lambda value, pool: audioproc.MusicalDuration.from_proto(value)),
+        ('plugin_state', lambda value, pool: value),
+        ('pitch', lambda value, pool: value_types.Pitch.from_proto(value)),
+        ('key_signature', lambda value, pool: value_types.KeySignature.from_proto(value)),
+        ('time_signature', lambda value, pool: value_types.TimeSignature.from_proto(value)),
+        ('clef', lambda value, pool: value_types.Clef.from_proto(value)),
+        ('pos2f', lambda value, pool: value_types.Pos2F.from_proto(value)),
+        ('sizef', lambda value, pool: value_types.SizeF.from_proto(value)),
+        ('color', lambda value, pool: value_types.Color.from_proto(value)),
+        ('control_value', lambda value, pool: value_types.ControlValue.from_proto(value)),
+        ('node_port_properties',
+         lambda value, pool: value_types.NodePortProperties.from_proto(value)),
+        ('port_description', lambda value, pool: value),
+        ('midi_event', lambda value, pool: value_types.MidiEvent.from_proto(value)),
+    ]
+}  # type: Dict[int, Callable[[Any, model_base.Pool], Any]]
+
+
+def _scalar_encoder(field_name: str) -> Callable[[mutations_pb2.MutationList.Slot, Any], None]:
+    def encode(slot: mutations_pb2.MutationList.Slot, value: Any) -> None:
+        setattr(slot, field_name, value)
+    return encode
+
+
+def _message_encoder(field_name: str) -> Callable[[mutations_pb2.MutationList.Slot, Any], None]:
+    def encode(slot: mutations_pb2.MutationList.Slot, value: Any) -> None:
+        getattr(slot, field_name).CopyFrom(value)
+    return encode
+
+
+def _proto_value_encoder(field_name: str) -> Callable[[mutations_pb2.MutationList.Slot, Any], None]:
+    def encode(slot: mutations_pb2.MutationList.Slot, value: Any) -> None:
+        getattr(slot, field_name).CopyFrom(value.to_proto())
+    return encode
+
+
+def _object_encoder(slot: mutations_pb2.MutationList.Slot, value: Any) -> None:
+    slot.obj_id = value.id
+
+
+# Encoders for the types of values, which can be stored in a slot. The order matters, because the
+# first matching entry is used (bool is a subclass of int).
+_SLOT_ENCODER_TABLE = [
+    (model_base.ObjectBase, _object_encoder),
+    (str, _scalar_encoder('string_value')),
+    (bytes, _scalar_encoder('bytes_value')),
+    (bool, _scalar_encoder('bool_value')),
+    (int, _scalar_encoder('int_value')),
+    (float, _scalar_encoder('float_value')),
+    (audioproc.MusicalTime, _proto_value_encoder('musical_time')),
+    (audioproc.MusicalDuration, _proto_value_encoder('musical_duration')),
+    (audioproc.PluginState, _message_encoder('plugin_state')),
+    (value_types.Pitch, _proto_value_encoder('pitch')),
+    (value_types.KeySignature, _proto_value_encoder('key_signature')),
+    (value_types.TimeSignature, _proto_value_encoder('time_signature')),
+    (value_types.Clef, _proto_value_encoder('clef')),
+    (value_types.Pos2F, _proto_value_encoder('pos2f')),
+    (value_types.SizeF, _proto_value_encoder('sizef')),
+    (value_types.Color, _proto_value_encoder('color')),
+    (value_types.ControlValue, _proto_value_encoder('control_value')),
+    (value_types.NodePortProperties, _proto_value_encoder('node_port_properties')),
+    (node_db.PortDescription, _message_encoder('port_description')),
+    (value_types.MidiEvent, _proto_value_encoder('midi_event')),
+]
+
+_slot_encoders = {}  # type: Dict[Type, Callable[[mutations_pb2.MutationList.Slot, Any], None]]
+
+
+def _get_slot_encoder(
+        value_type: Type) -> Callable[[mutations_pb2.MutationList.Slot, Any], None]:
+    try:
+        return _slot_encoders[value_type]
+    except KeyError:
+        pass
+
+    for cls, encoder in _SLOT_ENCODER_TABLE:
+        if issubclass(value_type, cls):
+            _slot_encoders[value_type] = encoder
+            return encoder
+
+    raise TypeError(value_type)
+
+
+def encode_slot(slot: mutations_pb2.MutationList.Slot, value: Any) -> None:
+    if value is None:
+        slot.none = True
+    else:
+        _get_slot_encoder(type(value))(slot, value)
+
+
+def decode_slot(slot: mutations_pb2.MutationList.Slot, pool: model_base.Pool) -> Any:
+    fields = slot.ListFields()
+    if not fields:
+        raise TypeError(None)
+    field, value = fields[0]
+    return _SLOT_DECODERS[field.number](value, pool)
+
+
+def _op_slot_fields(op: mutations_pb2.MutationList.Op) -> List[Tuple[protobuf.Message, str]]:
+    # Returns the (message, field name) pairs of all slot references in an op.
+    op_type = op.WhichOneof('op')
+    if op_type == 'set_property':
+        return [(op.set_property, 'old_slot'), (op.set_property, 'new_slot')]
+    elif op_type == 'set_property_batch':
+        fields = []  # type: List[Tuple[protobuf.Message, str]]
+        for change in op.set_property_batch.changes:
+            fields.extend([(change, 'old_slot'), (change, 'new_slot')])
+        return fields
+    elif op_type in ('list_insert', 'list_delete'):
+        return [(getattr(op, op_type), 'slot')]
+    elif op_type == 'list_set':
+        return [(op.list_set, 'old_slot'), (op.list_set, 'new_slot')]
+    return []
+
+
+def _op_slot_ids(op: mutations_pb2.MutationList.Op) -> List[int]:
+    ids = [getattr(msg, field) for msg, field in _op_slot_fields(op)]
+    op_type = op.WhichOneof('op')
+    if op_type in ('list_insert_range', 'list_delete_range'):
+        ids.extend(getattr(op, op_type).slots)
+    return ids
+
+
+def _remap_slots(op: mutations_pb2.MutationList.Op, slot_map: Callable[[int], int]) -> None:
+    for msg, field in _op_slot_fields(op):
+        setattr(msg, field, slot_map(getattr(msg, field)))
+    op_type = op.WhichOneof('op')
+    if op_type in ('list_insert_range', 'list_delete_range'):
+        slots = getattr(op, op_type).slots
+        for idx, slot_id in enumerate(slots):
+            slots[idx] = slot_map(slot_id)
+
+
+def concat(
+        first: mutations_pb2.MutationList, *others: mutations_pb2.MutationList
+) -> mutations_pb2.MutationList:
+    """Create a mutation list, which applies the ops of all given lists in order.
+
+    The version, name and timestamp are taken from the first list.
+    """
+
+    result = mutations_pb2.MutationList()
+    result.CopyFrom(first)
+    for other in others:
+        offset = len(result.slots)
+        result.slots.extend(other.slots)
+        for op in other.ops:
+            new_op = result.ops.add()
+            new_op.CopyFrom(op)
+            _remap_slots(new_op, lambda slot_id, offset=offset: slot_id + offset)
+    return result
+
+
+class _Coalescer(object):
+    def __init__(self, mutation_list: mutations_pb2.MutationList) -> None:
+        self.__proto = mutation_list
+
+        # Single ops with set_property_batch expanded. Canceled ops are replaced by None.
+        self.__ops = []  # type: List[Optional[mutations_pb2.MutationList.Op]]
+        for op in mutation_list.ops:
+            if op.WhichOneof('op') == 'set_property_batch':
+                for change in op.set_property_batch.changes:
+                    self.__ops.append(mutations_pb2.MutationList.Op(set_property=change))
+            else:
+                op_copy = mutations_pb2.MutationList.Op()
+                op_copy.CopyFrom(op)
+                self.__ops.append(op_copy)
+
+    def __slot(self, slot_id: int) -> mutations_pb2.MutationList.Slot:
+        return self.__proto.slots[slot_id]
+
+    def __is_value_slot(self, slot_id: int) -> bool:
+        return self.__slot(slot_id).WhichOneof('value') != 'obj_id'
+
+    def __referenced_objects(self, op: mutations_pb2.MutationList.Op) -> Set[int]:
+        obj_ids = set()  # type: Set[int]
+        for slot_id in _op_slot_ids(op):
+            slot = self.__slot(slot_id)
+            if slot.WhichOneof('value') == 'obj_id':
+                obj_ids.add(slot.obj_id)
+        return obj_ids
+
+    def __fold_property_changes(self) -> None:
+        # Consecutive changes of the same property (or list item) are folded into the first one.
+        # Only changes to plain values are folded, so the folded op never refers to an object,
+        # which does not exist at its position.
+        latest = {}  # type: Dict[Tuple[Any, ...], mutations_pb2.MutationList.Op]
+        for idx, op in enumerate(self.__ops):
+            op_type = op.WhichOneof('op')
+            if op_type in ('set_property', 'list_set'):
+                change = getattr(op, op_type)
+                if op_type == 'set_property':
+                    key = (change.obj_id, change.prop_name)  # type: Tuple[Any, ...]
+                else:
+                    key = (change.obj_id, change.prop_name, change.index)
+
+                if self.__is_value_slot(change.old_slot) and self.__is_value_slot(change.new_slot):
+                    prev = latest.get(key)
+                    if prev is not None:
+                        getattr(prev, op_type).new_slot = change.new_slot
+                        self.__ops[idx] = None
+                    else:
+                        latest[key] = op
+                    continue
+
+                latest.pop(key, None)
+
+            if op_type in ('add_object', 'remove_object'):
+                obj_id = getattr(op, op_type).object.id
+            elif op_type in ('set_property', 'list_set'):
+                continue
+            else:
+                change = getattr(op, op_type)
+                obj_id = change.obj_id
+                if op_type != 'list_set':
+                    # Any change of the list shifts the indices of the items.
+                    list_key = (obj_id, change.prop_name)
+                    for key in [k for k in latest if len(k) == 3 and k[:2] == list_key]:
+                        del latest[key]
+                    continue
+            for key in [k for k in latest if k[0] == obj_id]:
+                del latest[key]
+
+        # Drop changes, which ended up with the original value.
+        for idx, op in enumerate(self.__ops):
+            if op is None:
+                continue
+            op_type = op.WhichOneof('op')
+            if op_type in ('set_property', 'list_set'):
+                change = getattr(op, op_type)
+                if self.__slot(change.old_slot) == self.__slot(change.new_slot):
+                    self.__ops[idx] = None
+
+    def __cancel_insert_delete(self) -> None:
+        # A list_insert, which is directly followed by a list_delete of the same item (i.e. without
+        # any other op on the same list or referring to the inserted object in between), has no
+        # effect. Changes to plain properties of the inserted object do not matter.
+        pending = {}  # type: Dict[Tuple[int, str], int]
+        pending_objs = {}  # type: Dict[int, Tuple[int, str]]
+
+        for idx, op in enumerate(self.__ops):
+            if op is None:
+                continue
+
+            op_type = op.WhichOneof('op')
+            obj_ids = self.__referenced_objects(op)
+            if op_type in ('add_object', 'remove_object'):
+                obj_ids.add(getattr(op, op_type).object.id)
+            elif op_type != 'set_property' or obj_ids:
+                obj_ids.add(getattr(op, op_type).obj_id)
+
+            list_key = None  # type: Tuple[int, str]
+            if op_type in ('list_insert', 'list_delete', 'list_set', 'list_move',
+                           'list_insert_range', 'list_delete_range'):
+                change = getattr(op, op_type)
+                list_key = (change.obj_id, change.prop_name)
+
+            if list_key is not None and list_key in pending:
+                insert_idx = pending[list_key]
+                insert = self.__ops[insert_idx].list_insert
+                if (op_type == 'list_delete'
+                        and op.list_delete.index == insert.index
+                        and self.__slot(op.list_delete.slot) == self.__slot(insert.slot)):
+                    self.__drop_pending(pending, pending_objs, list_key)
+                    self.__ops[insert_idx] = None
+                    self.__ops[idx] = None
+                    continue
+
+            for obj_id in obj_ids:
+                if obj_id in pending_objs:
+                    self.__drop_pending(pending, pending_objs, pending_objs[obj_id])
+            if list_key is not None:
+                self.__drop_pending(pending, pending_objs, list_key)
+
+            if op_type == 'list_insert':
+                pending[list_key] = idx
+                slot = self.__slot(op.list_insert.slot)
+                if slot.WhichOneof('value') == 'obj_id':
+                    pending_objs[slot.obj_id] = list_key
+
+    def __drop_pending(
+            self, pending: Dict[Tuple[int, str], int], pending_objs: Dict[int, Tuple[int, str]],
+            list_key: Tuple[int, str]
+    ) -> None:
+        idx = pending.pop(list_key, None)
+        if idx is None:
+            return
+        slot = self.__slot(self.__ops[idx].list_insert.slot)
+        if slot.WhichOneof('value') == 'obj_id':
+            pending_objs.pop(slot.obj_id, None)
+
+    def __cancel_add_remove(self) -> None:
+        # An object, which is added and removed again, and which is not referenced by any op in
+        # between, can be dropped together with all changes to its properties.
+        added = {}  # type: Dict[int, List[int]]
+        for idx, op in enumerate(self.__ops):
+            if op is None:
+                continue
+
+            op_type = op.WhichOneof('op')
+            if op_type == 'add_object':
+                added[op.add_object.object.id] = [idx]
+                continue
+
+            if op_type == 'remove_object':
+                obj_id = op.remove_object.object.id
+                if obj_id in added:
+                    for op_idx in added.pop(obj_id) + [idx]:
+                        self.__ops[op_idx] = None
+                continue
+
+            for obj_id in self.__referenced_objects(op):
+                added.pop(obj_id, None)
+
+            change = getattr(op, op_type)
+            if change.obj_id in added:
+                if (op_type == 'set_property'
+                        and self.__is_value_slot(change.old_slot)
+                        and self.__is_value_slot(change.new_slot)):
+                    added[change.obj_id].append(idx)
+                else:
+                    del added[change.obj_id]
+
+    def coalesce(self) -> mutations_pb2.MutationList:
+        self.__fold_property_changes()
+        self.__cancel_insert_delete()
+        self.__cancel_add_remove()
+
+        result = mutations_pb2.MutationList(
+            version=self.__proto.version,
+            name=self.__proto.name,
+            timestamp=self.__proto.timestamp)
+
+        # Only keep the slots, which are still used.
+        slot_map = {}  # type: Dict[int, int]
+        def map_slot(slot_id: int) -> int:
+            try:
+                return slot_map[slot_id]
+            except KeyError:
+                result.slots.add().CopyFrom(self.__slot(slot_id))
+                slot_map[slot_id] = len(result.slots) - 1
+                return slot_map[slot_id]
+
+        for op in self.__ops:
+            if op is None:
+                continue
+
+            if op.WhichOneof('op') == 'set_property' and len(result.ops) > 0:
+                prev = result.ops[-1]
+                if prev.WhichOneof('op') == 'set_property':
+                    first = mutations_pb2.MutationList.SetProperty()
+                    first.CopyFrom(prev.set_property)
+                    prev.set_property_batch.changes.add().CopyFrom(first)
+                if prev.WhichOneof('op') == 'set_property_batch':
+                    change = prev.set_property_batch.changes.add()
+                    change.CopyFrom(op.set_property)
+                    change.old_slot = map_slot(change.old_slot)
+                    change.new_slot = map_slot(change.new_slot)
+                    continue
+
+            new_op = result.ops.add()
+            new_op.CopyFrom(op)
+            _remap_slots(new_op, map_slot)
+
+        return result
+
+
+def coalesce(mutation_list: mutations_pb2.MutationList) -> mutations_pb2.MutationList:
+    """Create an equivalent, but possibly shorter mutation list.
+
+    Consecutive changes of the same property are folded into one, changes, which restore the
+    original value, are dropped, and so are items, which are inserted and deleted again, and
+    objects, which are added and removed again.
+    """
+
+    return _Coalescer(mutation_list).coalesce()
+
+
 class MutationList(object):
     def __init__(
             self, pool: model_base.Pool, mutation_list: mutations_pb2.MutationList
@@ -55,82 +448,61 @@ class MutationList(object):
         self.__proto = mutation_list
 
     def get_slot(self, slot_id: int) -> Any:
-        slot = self.__proto.slots[slot_id]
-        vtype = slot.WhichOneof('value')
-
-        if vtype == 'none':
-            return None
-        elif vtype == 'obj_id':
-            return self.__pool[slot.obj_id]
-
-        elif vtype == 'string_value':
-            return slot.string_value
-        elif vtype == 'bytes_value':
-            return slot.bytes_value
-        elif vtype == 'bool_value':
-            return slot.bool_value
-        elif vtype == 'int_value':
-            return slot.int_value
-        elif vtype == 'float_value':
-            return slot.float_value
-
-        elif vtype == 'musical_time':
-            return audioproc.MusicalTime.from_proto(slot.musical_time)
-        elif vtype == 'musical_duration':
-            return audioproc.MusicalDuration.from_proto(slot.musical_duration)
-        elif vtype == 'plugin_state':
-            return copy.deepcopy(slot.plugin_state)
-        elif vtype == 'pitch':
-            return value_types.Pitch.from_proto(slot.pitch)
-        elif vtype == 'key_signature':
-            return value_types.KeySignature.from_proto(slot.key_signature)
-        elif vtype == 'time_signature':
-            return value_types.TimeSignature.from_proto(slot.time_signature)
-        elif vtype == 'clef':
-            return value_types.Clef.from_proto(slot.clef)
-        elif vtype == 'pos2f':
-            return value_types.Pos2F.from_proto(slot.pos2f)
-        elif vtype == 'sizef':
-            return value_types.SizeF.from_proto(slot.sizef)
-        elif vtype == 'color':
-            return value_types.Color.from_proto(slot.color)
-        elif vtype == 'control_value':
-            return value_types.ControlValue.from_proto(slot.control_value)
-        elif vtype == 'node_port_properties':
-            return value_types.NodePortProperties.from_proto(slot.node_port_properties)
-        elif vtype == 'port_description':
-            return copy.deepcopy(slot.port_description)
-        elif vtype == 'midi_event':
-            return value_types.MidiEvent.from_proto(slot.midi_event)
-
-        else:
-            raise TypeError(vtype)
+        return decode_slot(self.__proto.slots[slot_id], self.__pool)
+
+    def __set_property(
+            self, op: mutations_pb2.MutationList.SetProperty, forward: bool) -> None:
+        o = self.__pool[op.obj_id]
+        old_value = self.get_slot(op.old_slot)
+        new_value = self.get_slot(op.new_slot)
+        if not forward:
+            old_value, new_value = new_value, old_value
+
+        _assert_equal(getattr(o, op.prop_name), old_value)
+        o.set_property_value(op.prop_name, new_value)
+
+    def __insert_items(self, op: protobuf.Message, slots: Any) -> None:
+        o = self.__pool[op.obj_id]
+        lst = getattr(o, op.prop_name)
+        for idx, slot_id in enumerate(slots, op.index):
+            lst.insert(idx, self.get_slot(slot_id))
+
+    def __delete_items(self, op: protobuf.Message, slots: Any) -> None:
+        o = self.__pool[op.obj_id]
+        lst = getattr(o, op.prop_name)
+        for slot_id in slots:
+            _assert_equal(lst[op.index], self.get_slot(slot_id))
+            del lst[op.index]
+
+    def __remove_items(self, op: protobuf.Message, slots: Any) -> None:
+        # Reverts __insert_items().
+        o = self.__pool[op.obj_id]
+        lst = getattr(o, op.prop_name)
+        for idx in range(op.index + len(slots) - 1, op.index - 1, -1):
+            _assert_equal(lst[idx], self.get_slot(slots[idx - op.index]))
+            del lst[idx]
 
     def apply_forward(self) -> None:
         for op in self.__proto.ops:
             op_type = op.WhichOneof('op')
             if op_type == 'set_property':
-                o = self.__pool[op.set_property.obj_id]
-                old_value = self.get_slot(op.set_property.old_slot)
-                new_value = self.get_slot(op.set_property.new_slot)
+                self.__set_property(op.set_property, True)
 
-                _assert_equal(getattr(o, op.set_property.prop_name), old_value)
-                o.set_property_value(op.set_property.prop_name, new_value)
+            elif op_type == 'set_property_batch':
+                for change in op.set_property_batch.changes:
+                    self.__set_property(change, True)
 
             elif op_type == 'list_insert':
-                o = self.__pool[op.list_insert.obj_id]
-                new_value = self.get_slot(op.list_insert.slot)
+                self.__insert_items(op.list_insert, [op.list_insert.slot])
 
-                lst = getattr(o, op.list_insert.prop_name)
-                lst.insert(op.list_insert.index, new_value)
+            elif op_type == 'list_insert_range':
+                self.__insert_items(op.list_insert_range, op.list_insert_range.slots)
 
             elif op_type == 'list_delete':
-                o = self.__pool[op.list_delete.obj_id]
-                old_value = self.get_slot(op.list_delete.slot)
+                self.__delete_items(op.list_delete, [op.list_delete.slot])
 
-                lst = getattr(o, op.list_delete.prop_name)
-                _assert_equal(lst[op.list_delete.index], old_value)
-                del lst[op.list_delete.index]
+            elif op_type == 'list_delete_range':
+                self.__delete_items(op.list_delete_range, op.list_delete_range.slots)
 
             elif op_type == 'list_set':
                 o = self.__pool[op.list_set.obj_id]
@@ -162,27 +534,24 @@ class MutationList(object):
         for op in reversed(self.__proto.ops):
             op_type = op.WhichOneof('op')
             if op_type == 'set_property':
-                o = self.__pool[op.set_property.obj_id]
-                old_value = self.get_slot(op.set_property.old_slot)
-                new_value = self.get_slot(op.set_property.new_slot)
+                self.__set_property(op.set_property, False)
 
-                _assert_equal(getattr(o, op.set_property.prop_name), new_value)
-                o.set_property_value(op.set_property.prop_name, old_value)
+            elif op_type == 'set_property_batch':
+                for change in reversed(op.set_property_batch.changes):
+                    self.__set_property(change, False)
 
             elif op_type == 'list_insert':
-                o = self.__pool[op.list_insert.obj_id]
-                new_value = self.get_slot(op.list_insert.slot)
+                self.__remove_items(op.list_insert, [op.list_insert.slot])
 
-                lst = getattr(o, op.list_insert.prop_name)
-                _assert_equal(lst[op.list_insert.index], new_value)
-                del lst[op.list_insert.index]
+            elif op_type == 'list_insert_range':
+                self.__remove_items(op.list_insert_range, op.list_insert_range.slots)
 
             elif op_type == 'list_delete':
-                o = self.__pool[op.list_delete.obj_id]
-                old_value = self.get_slot(op.list_delete.slot)
+                self.__insert_items(op.list_delete, [op.list_delete.slot])
 
-                lst = getattr(o, op.list_delete.prop_name)
-                lst.insert(op.list_delete.index, old_value)
+            elif op_type == 'list_delete_range':
+                # All items were deleted at the same index, so they are inserted as a range.
+                self.__insert_items(op.list_delete_range, op.list_delete_range.slots)
 
             elif op_type == 'list_set':
                 o = self.__pool[op.list_set.obj_id]
@@ -243,20 +612,89 @@ class MutationCollector(object):
     def clear(self) -> None:
         self.__proto.Clear()
 
+    def __last_op_index(self, skip: str) -> int:
+        # New objects are added to the pool right before they are used, e.g. inserted into an
+        # ObjectList, and removed right after they have been deleted from it. Those ops are
+        # skipped, so they don't prevent merging the ops around them.
+        idx = len(self.__proto.ops) - 1
+        while idx >= 0 and self.__proto.ops[idx].WhichOneof('op') == skip:
+            idx -= 1
+        return idx
+
+    def __last_op(self, op_type: str, skip: str = 'add_object') -> Optional[protobuf.Message]:
+        idx = self.__last_op_index(skip)
+        if idx < 0:
+            return None
+        op = self.__proto.ops[idx]
+        if op.WhichOneof('op') != op_type:
+            return None
+        return getattr(op, op_type)
+
+    def __merge_op(self) -> mutations_pb2.MutationList.Op:
+        # The op found by __last_op() is about to be extended by a new change. It is moved behind
+        # the add_object ops, which were skipped, so all objects are added before they are used.
+        # remove_object ops can stay where they are, because removing an object later does no
+        # harm.
+        idx = self.__last_op_index('add_object')
+        ops = self.__proto.ops
+        if idx < len(ops) - 1:
+            op = mutations_pb2.MutationList.Op()
+            op.CopyFrom(ops[idx])
+            for i in range(idx, len(ops) - 1):
+                ops[i].CopyFrom(ops[i + 1])
+            ops[-1].CopyFrom(op)
+        return ops[-1]
+
     def __handle_model_change(self, change: model_base.Mutation) -> None:
         if isinstance(change, model_base.PropertyValueChange):
             old_slot_id = self.__add_slot(change.old_value)
             new_slot_id = self.__add_slot(change.new_value)
 
-            self.__add_operation(mutations_pb2.MutationList.Op(
-                set_property=mutations_pb2.MutationList.SetProperty(
-                    obj_id=change.obj.id,
-                    prop_name=change.prop_name,
-                    old_slot=old_slot_id,
-                    new_slot=new_slot_id)))
+            set_property = mutations_pb2.MutationList.SetProperty(
+                obj_id=change.obj.id,
+                prop_name=change.prop_name,
+                old_slot=old_slot_id,
+                new_slot=new_slot_id)
+
+            # Consecutive property changes are combined into a single op.
+            if self.__last_op('set_property_batch') is not None:
+                self.__merge_op().set_property_batch.changes.add().CopyFrom(set_property)
+                return
+
+            prev = self.__last_op('set_property')
+            if prev is not None:
+                first = mutations_pb2.MutationList.SetProperty()
+                first.CopyFrom(prev)
+                self.__merge_op().set_property_batch.changes.extend([first, set_property])
+                return
+
+            self.__add_operation(mutations_pb2.MutationList.Op(set_property=set_property))
 
         elif isinstance(change, model_base.PropertyListInsert):
             slot_id = self.__add_slot(change.new_value)
+
+            # Items inserted one after the other are combined into a single op.
+            insert_range = self.__last_op('list_insert_range')
+            if (insert_range is not None
+                    and insert_range.obj_id == change.obj.id
+                    and insert_range.prop_name == change.prop_name
+                    and change.index == insert_range.index + len(insert_range.slots)):
+                self.__merge_op().list_insert_range.slots.append(slot_id)
+                return
+
+            prev = self.__last_op('list_insert')
+            if (prev is not None
+                    and prev.obj_id == change.obj.id
+                    and prev.prop_name == change.prop_name
+                    and change.index == prev.index + 1):
+                self.__merge_op().list_insert_range.CopyFrom(
+                    mutations_pb2.MutationList.ListInsertRange(
+                        obj_id=prev.obj_id,
+                        prop_name=prev.prop_name,
+                        index=prev.index,
+                        slots=[prev.slot, slot_id]))
+                return
+
             self.__add_operation(mutations_pb2.MutationList.Op(
                 list_insert=mutations_pb2.MutationList.ListInsert(
                     obj_id=change.obj.id,
@@ -266,6 +704,29 @@ class MutationCollector(object):
 
         elif isinstance(change, model_base.PropertyListDelete):
             slot_id = self.__add_slot(change.old_value)
+
+            # Items deleted at the same index are combined into a single op.
+            delete_range = self.__last_op('list_delete_range', skip='remove_object')
+            if (delete_range is not None
+                    and delete_range.obj_id == change.obj.id
+                    and delete_range.prop_name == change.prop_name
+                    and change.index == delete_range.index):
+                delete_range.slots.append(slot_id)
+                return
+
+            prev = self.__last_op('list_delete', skip='remove_object')
+            if (prev is not None
+                    and prev.obj_id == change.obj.id
+                    and prev.prop_name == change.prop_name
+                    and change.index == prev.index):
+                self.__proto.ops[self.__last_op_index('remove_object')].list_delete_range.CopyFrom(
+                    mutations_pb2.MutationList.ListDeleteRange(
+                        obj_id=prev.obj_id,
+                        prop_name=prev.prop_name,
+                        index=prev.index,
+                        slots=[prev.slot, slot_id]))
+                return
+
             self.__add_operation(mutations_pb2.MutationList.Op(
                 list_delete=mutations_pb2.MutationList.ListDelete(
                     obj_id=change.obj.id,
@@ -306,55 +767,7 @@ class MutationCollector(object):
             raise TypeError("Unsupported change type %s" % type(change))
 
     def __add_slot(self, value: Any) -> int:
-        slot = self.__proto.slots.add()
-        if value is None:
-            slot.none = True
-        elif isinstance(value, model_base.ObjectBase):
-            slot.obj_id = value.id
-
-        elif isinstance(value, str):
-            slot.string_value = value
-        elif isinstance(value, bytes):
-            slot.bytes_value = value
-        elif isinstance(value, bool):
-            slot.bool_value = value
-        elif isinstance(value, int):
-            slot.int_value = value
-        elif isinstance(value, float):
-            slot.float_value = value
-
-        elif isinstance(value, audioproc.MusicalTime):
-            slot.musical_time.CopyFrom(value.to_proto())
-        elif isinstance(value, audioproc.MusicalDuration):
-            slot.musical_duration.CopyFrom(value.to_proto())
-        elif isinstance(value, audioproc.PluginState):
-            slot.plugin_state.CopyFrom(value)
-        elif isinstance(value, value_types.Pitch):
-            slot.pitch.CopyFrom(value.to_proto())
-        elif isinstance(value, value_types.KeySignature):
-            slot.key_signature.CopyFrom(value.to_proto())
-        elif isinstance(value, value_types.TimeSignature):
-            slot.time_signature.CopyFrom(value.to_proto())
-        elif isinstance(value, value_types.Clef):
-            slot.clef.CopyFrom(value.to_proto())
-        elif isinstance(value, value_types.Pos2F):
-            slot.pos2f.CopyFrom(value.to_proto())
-        elif isinstance(value, value_types.SizeF):
-            slot.sizef.CopyFrom(value.to_proto())
-        elif isinstance(value, value_types.Color):
-            slot.color.CopyFrom(value.to_proto())
-        elif isinstance(value, value_types.ControlValue):
-            slot.control_value.CopyFrom(value.to_proto())
-        elif isinstance(value, value_types.NodePortProperties):
-            slot.node_port_properties.CopyFrom(value.to_proto())
-        elif isinstance(value, node_db.PortDescription):
-            slot.port_description.CopyFrom(value)
-        elif isinstance(value, value_types.MidiEvent):
-            slot.midi_event.CopyFrom(value.to_proto())
-
-        else:
-            raise TypeError(type(value))
-
+        encode_slot(self.__proto.slots.add(), value)
         return len(self.__proto.slots) - 1
 
     def __add_operation(self, op: mutations_pb2.MutationList.Op) -> None:
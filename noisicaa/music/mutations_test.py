@@ -0,0 +1,277 @@
+#!/usr/bin/python3
+
+# @begin:license
+#
+# Copyright (c) 2015-2019, Benjamin Niemann <pink@odahoda.de>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# @end:license
+
+from typing import cast
+
+from noisidev import unittest
+from noisicaa import audioproc
+from noisicaa import value_types
+from . import model_base_test
+from . import mutations
+from . import mutations_pb2
+
+
+class SlotCodecTest(unittest.TestCase):
+    def test_values(self):
+        pool = model_base_test.Pool()
+        obj = pool.create(model_base_test.Child)
+
+        for value in [
+                None, obj, 'foo', b'bar', True, 12, 1.5,
+                audioproc.MusicalTime(3, 4), audioproc.MusicalDuration(1, 4),
+                value_types.Pitch('C4'), value_types.Pos2F(1, 2),
+                value_types.Color(0.1, 0.2, 0.3, 0.4)]:
+            slot = mutations_pb2.MutationList.Slot()
+            mutations.encode_slot(slot, value)
+            self.assertEqual(mutations.decode_slot(slot, pool), value)
+
+    def test_bool(self):
+        slot = mutations_pb2.MutationList.Slot()
+        mutations.encode_slot(slot, False)
+        self.assertEqual(slot.WhichOneof('value'), 'bool_value')
+
+    def test_unsupported_type(self):
+        slot = mutations_pb2.MutationList.Slot()
+        with self.assertRaises(TypeError):
+            mutations.encode_slot(slot, object())
+
+
+class MutationsTestBase(unittest.TestCase):
+    def setup_testcase(self):
+        self.pool = model_base_test.Pool()
+        self.root = cast(
+            model_base_test.Root, self.pool.create(model_base_test.Root, string_value='old'))
+        # The test model only reports changes through its own callback.
+        self.root.change.add(self.pool.model_changed.call)
+        self.root.string_list.extend(['a', 'b', 'c'])
+
+    def collect(self, func):
+        mutation_list = mutations_pb2.MutationList(version=1, name='test', timestamp=0)
+        collector = mutations.MutationCollector(self.pool, mutation_list)
+        with collector.collect():
+            func()
+        return mutation_list
+
+
+class MutationCollectorTest(MutationsTestBase):
+    def test_list_insert_range(self):
+        def func():
+            for i in range(100):
+                self.root.string_list.insert(1 + i, 'x%d' % i)
+        mutation_list = self.collect(func)
+        self.assertEqual(
+            [op.WhichOneof('op') for op in mutation_list.ops], ['list_insert_range'])
+        expected = ['a'] + ['x%d' % i for i in range(100)] + ['b', 'c']
+        self.assertEqual(list(self.root.string_list), expected)
+
+        mutations.MutationList(self.pool, mutation_list).apply_backward()
+        self.assertEqual(list(self.root.string_list), ['a', 'b', 'c'])
+        mutations.MutationList(self.pool, mutation_list).apply_forward()
+        self.assertEqual(list(self.root.string_list), expected)
+
+    def test_list_delete_range(self):
+        def func():
+            del self.root.string_list[0]
+            del self.root.string_list[0]
+            del self.root.string_list[0]
+        mutation_list = self.collect(func)
+        self.assertEqual(
+            [op.WhichOneof('op') for op in mutation_list.ops], ['list_delete_range'])
+        self.assertEqual(list(self.root.string_list), [])
+
+        mutations.MutationList(self.pool, mutation_list).apply_backward()
+        self.assertEqual(list(self.root.string_list), ['a', 'b', 'c'])
+        mutations.MutationList(self.pool, mutation_list).apply_forward()
+        self.assertEqual(list(self.root.string_list), [])
+
+    def test_paste_objects(self):
+        def func():
+            for i in range(100):
+                child = self.pool.create(model_base_test.Child, id=1000 + i, value='v%d' % i)
+                self.root.child_list.append(child)
+        mutation_list = self.collect(func)
+        self.assertEqual(
+            [op.WhichOneof('op') for op in mutation_list.ops],
+            100 * ['add_object'] + ['list_insert_range'])
+        expected = ['v%d' % i for i in range(100)]
+        self.assertEqual([child.value for child in self.root.child_list], expected)
+
+        mutations.MutationList(self.pool, mutation_list).apply_backward()
+        self.assertEqual(len(self.root.child_list), 0)
+        self.assertNotIn(1000, self.pool)
+        mutations.MutationList(self.pool, mutation_list).apply_forward()
+        self.assertEqual([child.value for child in self.root.child_list], expected)
+
+    def test_delete_objects(self):
+        for i in range(10):
+            self.root.child_list.append(self.pool.create(model_base_test.Child, id=1000 + i))
+
+        def func():
+            for i in range(10):
+                del self.root.child_list[0]
+                self.pool.delete(1000 + i)
+        mutation_list = self.collect(func)
+        self.assertEqual(
+            [op.WhichOneof('op') for op in mutation_list.ops],
+            ['list_delete_range'] + 10 * ['remove_object'])
+        self.assertEqual(len(self.root.child_list), 0)
+
+        mutations.MutationList(self.pool, mutation_list).apply_backward()
+        self.assertEqual([child.id for child in self.root.child_list], list(range(1000, 1010)))
+        mutations.MutationList(self.pool, mutation_list).apply_forward()
+        self.assertEqual(len(self.root.child_list), 0)
+        self.assertNotIn(1000, self.pool)
+
+    def test_set_properties_of_new_objects(self):
+        def func():
+            for i in range(10):
+                child = self.pool.create(model_base_test.Child, id=1000 + i, value='old')
+                child.value = 'v%d' % i
+        mutation_list = self.collect(func)
+        self.assertEqual(
+            [op.WhichOneof('op') for op in mutation_list.ops],
+            10 * ['add_object'] + ['set_property_batch'])
+
+        mutations.MutationList(self.pool, mutation_list).apply_backward()
+        self.assertNotIn(1000, self.pool)
+        mutations.MutationList(self.pool, mutation_list).apply_forward()
+        self.assertEqual(self.pool[1009].value, 'v9')
+
+    def test_set_property_batch(self):
+        def func():
+            self.root.string_value = 'foo'
+            self.root.int_value = 12
+            self.root.string_value = 'bar'
+        mutation_list = self.collect(func)
+        self.assertEqual(
+            [op.WhichOneof('op') for op in mutation_list.ops], ['set_property_batch'])
+
+        mutations.MutationList(self.pool, mutation_list).apply_backward()
+        self.assertEqual(self.root.string_value, 'old')
+        self.assertIsNone(self.root.int_value)
+        mutations.MutationList(self.pool, mutation_list).apply_forward()
+        self.assertEqual(self.root.string_value, 'bar')
+        self.assertEqual(self.root.int_value, 12)
+
+    def test_mixed_ops(self):
+        def func():
+            self.root.string_list.insert(0, 'x')
+            self.root.string_list.insert(2, 'y')
+            self.root.string_value = 'foo'
+            del self.root.string_list[0]
+        mutation_list = self.collect(func)
+        self.assertEqual(
+            [op.WhichOneof('op') for op in mutation_list.ops],
+            ['list_insert', 'list_insert', 'set_property', 'list_delete'])
+
+        mutations.MutationList(self.pool, mutation_list).apply_backward()
+        self.assertEqual(list(self.root.string_list), ['a', 'b', 'c'])
+        mutations.MutationList(self.pool, mutation_list).apply_forward()
+        self.assertEqual(list(self.root.string_list), ['a', 'y', 'b', 'c'])
+
+
+class CoalesceTest(MutationsTestBase):
+    def check_coalesce(self, func, expected_ops):
+        before = self.root.proto.SerializeToString()
+        mutation_list = self.collect(func)
+        after = self.root.proto.SerializeToString()
+
+        coalesced = mutations.coalesce(mutation_list)
+        self.assertEqual([op.WhichOneof('op') for op in coalesced.ops], expected_ops)
+
+        mutations.MutationList(self.pool, coalesced).apply_backward()
+        self.assertEqual(self.root.proto.SerializeToString(), before)
+        mutations.MutationList(self.pool, coalesced).apply_forward()
+        self.assertEqual(self.root.proto.SerializeToString(), after)
+        return coalesced
+
+    def test_fold_property_changes(self):
+        def func():
+            for i in range(10):
+                self.root.string_value = 'v%d' % i
+                self.root.int_value = i
+        coalesced = self.check_coalesce(func, ['set_property_batch'])
+        self.assertEqual(len(coalesced.ops[0].set_property_batch.changes), 2)
+        self.assertEqual(len(coalesced.slots), 4)
+
+    def test_restore_original_value(self):
+        def func():
+            self.root.string_value = 'foo'
+            self.root.string_value = 'old'
+        self.check_coalesce(func, [])
+
+    def test_list_changes_break_folding(self):
+        def func():
+            self.root.string_list[1] = 'x'
+            self.root.string_list.insert(0, 'y')
+            self.root.string_list[2] = 'z'
+        self.check_coalesce(func, ['list_set', 'list_insert', 'list_set'])
+
+    def test_insert_delete(self):
+        def func():
+            self.root.string_list.insert(1, 'x')
+            self.root.string_value = 'foo'
+            del self.root.string_list[1]
+        self.check_coalesce(func, ['set_property'])
+
+    def test_insert_delete_with_list_change_in_between(self):
+        def func():
+            self.root.string_list.insert(1, 'x')
+            self.root.string_list.insert(0, 'y')
+            del self.root.string_list[2]
+        self.check_coalesce(func, ['list_insert', 'list_insert', 'list_delete'])
+
+    def test_add_remove_object(self):
+        def func():
+            child = self.pool.create(model_base_test.Child, id=200)
+            self.root.child_list.append(child)
+            child.value = 'foo'
+            del self.root.child_list[0]
+            self.pool.delete(200)
+        self.check_coalesce(func, [])
+        self.assertNotIn(200, self.pool)
+
+    def test_concat(self):
+        a = self.collect(lambda: setattr(self.root, 'string_value', 'foo'))
+        b = self.collect(lambda: self.root.string_list.append('x'))
+        c = mutations.concat(a, b)
+        self.assertEqual(
+            [op.WhichOneof('op') for op in c.ops], ['set_property', 'list_insert'])
+        self.assertEqual(c.slots[c.ops[1].list_insert.slot].string_value, 'x')
+
+        mutations.MutationList(self.pool, c).apply_backward()
+        self.assertEqual(self.root.string_value, 'old')
+        self.assertEqual(list(self.root.string_list), ['a', 'b', 'c'])
+
+    def test_concat_many(self):
+        a = self.collect(lambda: setattr(self.root, 'string_value', 'foo'))
+        b = self.collect(lambda: self.root.string_list.append('x'))
+        c = self.collect(lambda: self.root.string_list.append('y'))
+        d = mutations.concat(a, b, c)
+        self.assertEqual(
+            [op.WhichOneof('op') for op in d.ops],
+            ['set_property', 'list_insert', 'list_insert'])
+        self.assertEqual(d.slots[d.ops[2].list_insert.slot].string_value, 'y')
+
+        mutations.MutationList(self.pool, d).apply_backward()
+        self.assertEqual(self.root.string_value, 'old')
+        self.assertEqual(list(self.root.string_list), ['a', 'b', 'c'])
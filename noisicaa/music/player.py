@@ -25,7 +25,7 @@ import concurrent.futures
 import logging
 import uuid
 import typing
-from typing import Optional, Iterator, Iterable, Dict, Tuple
+from typing import Optional, Iterator, Iterable, Dict, List, Tuple
 
 from noisicaa import core
 from noisicaa.core import ipc
@@ -66,6 +66,7 @@ class Player(object):
         self.callback_stub = None  # type: ipc.Stub
 
         self.__node_connectors = {}  # type: Dict[int, node_connector.NodeConnector]
+        self.__pending_mutations = []  # type: List[audioproc.Mutation]
 
     async def setup(self) -> None:
         logger.info("Setting up player instance %s..", self.id)
@@ -79,8 +80,8 @@ class Player(object):
             self.handle_pipeline_mutation)
 
         logger.info("Populating realm with project state...")
-        for mutation in self.project.get_add_mutations():
-            await self.publish_pipeline_mutation(mutation)
+        await self.audioproc_client.pipeline_mutations(
+            self.realm, list(self.project.get_add_mutations()))
 
         await self.audioproc_client.update_project_properties(
             self.realm,
@@ -180,13 +181,20 @@ class Player(object):
             self.__node_connectors.pop(node.id).cleanup()
 
     def handle_pipeline_mutation(self, mutation: audioproc.Mutation) -> None:
-        self.event_loop.create_task(self.publish_pipeline_mutation(mutation))
+        # Collect all mutations, which are emitted while the project is being changed (e.g. by a
+        # single undo), and send them as one batch.
+        self.__pending_mutations.append(mutation)
+        if len(self.__pending_mutations) == 1:
+            self.event_loop.create_task(self.__flush_pipeline_mutations())
+
+    async def __flush_pipeline_mutations(self) -> None:
+        mutations = self.__pending_mutations
+        self.__pending_mutations = []
 
-    async def publish_pipeline_mutation(self, mutation: audioproc.Mutation) -> None:
         if self.audioproc_client is None:
             return
 
-        await self.audioproc_client.pipeline_mutation(self.realm, mutation)
+        await self.audioproc_client.pipeline_mutations(self.realm, mutations)
 
     def send_node_message(self, msg: audioproc.ProcessorMessage) -> None:
         messages = audioproc.ProcessorMessageList()
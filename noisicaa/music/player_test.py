@@ -47,6 +47,10 @@ class MockAudioProcClient(audioproc.AbstractAudioProcClient):  # pylint: disable
     async def pipeline_mutation(self, realm, mutation):
         assert realm == 'player'
 
+    async def pipeline_mutations(self, realm, mutations):
+        assert realm == 'player'
+        assert all(isinstance(mutation, audioproc.Mutation) for mutation in mutations)
+
     async def send_node_messages(self, realm, messages):
         assert realm == 'player'
 
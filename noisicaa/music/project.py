@@ -23,7 +23,7 @@
 import contextlib
 import logging
 import time
-from typing import Any, Optional, Dict, Tuple, Iterator, Generator, Type
+from typing import Any, Optional, Dict, List, Set, Tuple, Iterable, Iterator, Generator, Type
 
 from noisicaa.core.typing_extra import down_cast
 from noisicaa.core import storage
@@ -195,6 +195,22 @@ class BaseProject(_model.Project, model_base.ObjectBase):
     def _mutation_list_applied(self, mutation_list: mutations_pb2.MutationList) -> None:
         logger.info(str(mutation_list))
 
+    # Continuous edits (e.g. dragging a fader) can be wrapped into a gesture, so all their
+    # mutations are combined into a single undo step.
+    def begin_gesture(self, name: str) -> None:
+        pass
+
+    def end_gesture(self) -> None:
+        pass
+
+    @contextlib.contextmanager
+    def gesture(self, name: str) -> Generator:
+        self.begin_gesture(name)
+        try:
+            yield
+        finally:
+            self.end_gesture()
+
     def handle_pipeline_mutation(self, mutation: audioproc.Mutation) -> None:
         self.pipeline_mutation.call(mutation)
 
@@ -287,7 +303,22 @@ class BaseProject(_model.Project, model_base.ObjectBase):
             yield from node.get_remove_mutations()
 
 
+def _encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
 class Project(BaseProject):
+    # A full checkpoint is written after this many delta checkpoints.
+    full_checkpoint_interval = 10
+
     def __init__(self, **kwargs: Any) -> None:
         super().__init__(**kwargs)
 
@@ -295,6 +326,16 @@ class Project(BaseProject):
         self.__logs_since_last_checkpoint = None  # type: int
         self.__latest_mutation_list = None  # type: mutations_pb2.MutationList
         self.__latest_mutation_time = None  # type: float
+        self.__gesture_name = None  # type: str
+        self.__gesture_depth = 0
+        self.__gesture_mutation_lists = []  # type: List[mutations_pb2.MutationList]
+
+        # Serialized objects as of the latest full checkpoint, and what changed since then.
+        self.__checkpoint_cache = {}  # type: Dict[int, bytes]
+        self.__dirty_objects = set()  # type: Set[int]
+        self.__structure_changed = False
+        self.__deltas_since_full_checkpoint = None  # type: Optional[int]
+        self.__model_changed_listener = None  # type: core.Listener
 
     def create(
             self, *, writer: Optional[writer_client.WriterClient] = None, **kwargs: Any
@@ -325,35 +366,31 @@ class Project(BaseProject):
             path: str,
             pool: 'Pool',
             writer: writer_client.WriterClient,
-            node_db: node_db_lib.NodeDBClient
+            node_db: node_db_lib.NodeDBClient,
+            lazy: bool = True,
+            validate: bool = False
     ) -> 'Project':
         checkpoint_serialized, actions = await writer.open(path)
 
         checkpoint = model_base_pb2.ObjectTree()
         checkpoint.MergeFromString(checkpoint_serialized)
 
-        project = pool.deserialize_tree(checkpoint)
+        project = pool.deserialize_tree(checkpoint, lazy=lazy)
         assert isinstance(project, Project)
 
         project.node_db = node_db
         project.__writer = writer
 
-        def validate_node(
-                parent: Optional[model_base.ObjectBase], node: model_base.ObjectBase) -> None:
-            assert node.parent is parent
-            assert node.project is project
-
-            for c in node.list_children():
-                validate_node(node, c)
+        project.__apply_mutation_lists(
+            (action, project.deserialize_mutation_list(mutation_list_serialized))
+            for action, mutation_list_serialized in actions)
+        project.__logs_since_last_checkpoint = len(actions)
 
-        validate_node(None, project)
+        if validate:
+            project.validate_tree()
 
-        project.__logs_since_last_checkpoint = 0
-        for action, mutation_list_serialized in actions:
-            project.__apply_mutation_list(
-                action,
-                project.deserialize_mutation_list(mutation_list_serialized))
-            project.__logs_since_last_checkpoint += 1
+        # Nothing is cached yet, so the next checkpoint will be a full one.
+        project.__track_changes()
 
         return project
 
@@ -368,9 +405,11 @@ class Project(BaseProject):
         project = pool.create(cls, writer=writer, node_db=node_db)
         pool.set_root(project)
 
-        checkpoint_serialized = project.serialize_object(project)
+        project.__track_changes()
+        checkpoint_serialized = project.__serialize_full_checkpoint()
         await writer.create(path, checkpoint_serialized)
         project.__logs_since_last_checkpoint = 0
+        project.__deltas_since_full_checkpoint = 0
 
         return project
 
@@ -381,16 +420,83 @@ class Project(BaseProject):
             await self.__writer.close()
             self.__writer = None
 
+        if self.__model_changed_listener is not None:
+            self.__model_changed_listener.remove()
+            self.__model_changed_listener = None
+        self.__checkpoint_cache.clear()
+        self.__dirty_objects.clear()
+        self.__deltas_since_full_checkpoint = None
+
         self.reset_state()
         self.__logs_since_last_checkpoint = None
 
         await super().close()
 
+    def __track_changes(self) -> None:
+        assert self.__model_changed_listener is None
+        self.__model_changed_listener = self._pool.model_changed.add(self.__object_changed)
+
+    def __object_changed(self, change: model_base.Mutation) -> None:
+        if isinstance(change, model_base.ObjectChange):
+            self.__dirty_objects.add(change.obj.id)
+            self.__structure_changed = True
+
+        elif isinstance(change, model_base.PropertyChange):
+            self.__dirty_objects.add(change.obj.id)
+            prop = change.obj.get_property(change.prop_name)
+            if isinstance(prop, (model_base.ObjectProperty, model_base.ObjectListProperty)):
+                self.__structure_changed = True
+
     def create_checkpoint(self) -> None:
-        checkpoint_serialized = self.serialize_object(self)
-        self.__writer.write_checkpoint(checkpoint_serialized)
+        # The checkpoint must come after the log of the latest mutations, else they would be
+        # applied twice when the project is opened.
+        self.__write_latest_mutation_list()
+
+        if (self.__deltas_since_full_checkpoint is None
+                or self.__deltas_since_full_checkpoint >= self.full_checkpoint_interval
+                or len(self.__dirty_objects) > len(self._pool) // 2):
+            self.__writer.write_checkpoint(self.__serialize_full_checkpoint())
+            self.__deltas_since_full_checkpoint = 0
+        else:
+            self.__writer.write_checkpoint(self.__serialize_delta_checkpoint(), delta=True)
+            self.__deltas_since_full_checkpoint += 1
         self.__logs_since_last_checkpoint = 0
 
+    def __serialize_full_checkpoint(self) -> bytes:
+        # Produces the same bytes as serialize_object(self), but only objects, which changed
+        # since the previous full checkpoint, have to be serialized again.
+        for obj_id in self.__dirty_objects:
+            self.__checkpoint_cache.pop(obj_id, None)
+        self.__dirty_objects.clear()
+        self.__structure_changed = False
+
+        cache = {}  # type: Dict[int, bytes]
+        parts = []
+        for obj in self.walk_object_tree():
+            obj_serialized = self.__checkpoint_cache.get(obj.id)
+            if obj_serialized is None:
+                obj_serialized = obj.proto.SerializeToString()
+            cache[obj.id] = obj_serialized
+            # ObjectTree.objects
+            parts.append(b'\x0a' + _encode_varint(len(obj_serialized)))
+            parts.append(obj_serialized)
+        parts.append(b'\x10' + _encode_varint(self.id))  # ObjectTree.root
+        self.__checkpoint_cache = cache
+
+        return b''.join(parts)
+
+    def __serialize_delta_checkpoint(self) -> bytes:
+        # Deltas are always against the latest full checkpoint, so restoring the project never
+        # needs more than two checkpoints.
+        delta = model_base_pb2.ObjectTreeDelta()
+        delta.root = self.id
+        for obj_id in sorted(self.__dirty_objects):
+            if obj_id in self._pool:
+                delta.objects.add().CopyFrom(self._pool[obj_id].proto)
+        if self.__structure_changed:
+            delta.order.extend(obj.id for obj in self.walk_object_tree())
+        return delta.SerializeToString()
+
     def serialize_object(self, obj: model_base.ObjectBase) -> bytes:
         proto = obj.serialize()
         return proto.SerializeToString()
@@ -403,61 +509,107 @@ class Project(BaseProject):
         assert mutation_list.version == LOG_VERSION
         return mutation_list
 
-    def __flush_mutations(self) -> None:
-        if self.__latest_mutation_list is not None:
-            self.__writer.write_log(self.__latest_mutation_list.SerializeToString())
+    def __write_mutation_list(self, mutation_list: mutations_pb2.MutationList) -> None:
+        if len(mutation_list.ops) > 0:
+            self.__writer.write_log(mutation_list.SerializeToString())
             self.__logs_since_last_checkpoint += 1
-            self.__latest_mutation_list = None
 
-        if self.__logs_since_last_checkpoint > 1000:
-            self.create_checkpoint()
+    def __write_latest_mutation_list(self) -> None:
+        if self.__gesture_name is not None:
+            self.__finish_gesture()
 
-    def __try_merge_mutation_list(self, mutation_list: mutations_pb2.MutationList) -> bool:
-        assert self.__latest_mutation_list is not None
+        if self.__latest_mutation_list is not None:
+            self.__write_mutation_list(self.__latest_mutation_list)
+            self.__latest_mutation_list = None
 
-        k = None  # type: Tuple[Any, ...]
+    def __flush_mutations(self) -> None:
+        self.__write_latest_mutation_list()
 
-        property_changes_a = {}  # type: Dict[Tuple[Any, ...], int]
-        for op in self.__latest_mutation_list.ops:
-            if op.WhichOneof('op') == 'set_property':
-                k = (op.set_property.obj_id, op.set_property.prop_name)
-                property_changes_a[k] = op.set_property.new_slot
-            elif op.WhichOneof('op') == 'list_set':
-                k = (op.list_set.obj_id, op.list_set.prop_name, op.list_set.index)
-                property_changes_a[k] = op.list_set.new_slot
-            else:
-                return False
+        if self.__logs_since_last_checkpoint > 1000:
+            self.create_checkpoint()
 
-        property_changes_b = {}  # type: Dict[Tuple[Any, ...], int]
+    def __get_property_changes(
+            self, mutation_list: mutations_pb2.MutationList
+    ) -> Tuple[Set[Tuple[Any, ...]], bool]:
+        # Returns the keys of all changed properties and list items, and whether the list has no
+        # other ops.
+        keys = set()  # type: Set[Tuple[Any, ...]]
+        only_property_changes = True
         for op in mutation_list.ops:
             if op.WhichOneof('op') == 'set_property':
-                k = (op.set_property.obj_id, op.set_property.prop_name)
-                property_changes_b[k] = op.set_property.new_slot
+                keys.add((op.set_property.obj_id, op.set_property.prop_name))
+            elif op.WhichOneof('op') == 'set_property_batch':
+                for change in op.set_property_batch.changes:
+                    keys.add((change.obj_id, change.prop_name))
             elif op.WhichOneof('op') == 'list_set':
-                k = (op.list_set.obj_id, op.list_set.prop_name, op.list_set.index)
-                property_changes_b[k] = op.list_set.new_slot
+                keys.add((op.list_set.obj_id, op.list_set.prop_name, op.list_set.index))
             else:
-                return False
+                only_property_changes = False
 
-        if set(property_changes_a.keys()) != set(property_changes_b.keys()):
-            return False
+        return keys, only_property_changes
 
-        for k, slot_idx_a in property_changes_a.items():
-            slot_a = self.__latest_mutation_list.slots[slot_idx_a]
-            slot_b = mutation_list.slots[property_changes_b[k]]
-            assert slot_a.WhichOneof('value') == slot_b.WhichOneof('value'), (slot_a, slot_b)
-            self.__latest_mutation_list.slots[slot_idx_a].CopyFrom(slot_b)
+    def __try_merge_mutation_list(self, mutation_list: mutations_pb2.MutationList) -> bool:
+        assert self.__latest_mutation_list is not None
+
+        # A mutation list, which only changes properties that have just been changed, is merged
+        # into the previous one, e.g. when a value is edited in several steps.
+        keys_a, _ = self.__get_property_changes(self.__latest_mutation_list)
+        keys_b, only_property_changes = self.__get_property_changes(mutation_list)
+        if not only_property_changes or not keys_b <= keys_a:
+            return False
 
+        self.__latest_mutation_list = mutations.coalesce(
+            mutations.concat(self.__latest_mutation_list, mutation_list))
         return True
 
+    def begin_gesture(self, name: str) -> None:
+        # Gestures can overlap (e.g. two controls dragged at the same time). They are merged
+        # into the outermost one, which is finished when the last of them ends.
+        if self.__gesture_depth == 0:
+            self.__gesture_name = name
+            self.__gesture_mutation_lists = []
+        self.__gesture_depth += 1
+
+    def end_gesture(self) -> None:
+        # The gesture might already have been finished, e.g. by an undo while it was active.
+        if self.__gesture_depth == 0:
+            return
+
+        self.__gesture_depth -= 1
+        if self.__gesture_depth == 0:
+            self.__finish_gesture()
+
+    def __finish_gesture(self) -> None:
+        mutation_lists = self.__gesture_mutation_lists
+        name = self.__gesture_name
+        self.__gesture_name = None
+        self.__gesture_depth = 0
+        self.__gesture_mutation_lists = []
+
+        if mutation_lists:
+            # Coalesce only once, when the gesture is done, so a long drag stays linear.
+            mutation_list = mutations.coalesce(mutations.concat(*mutation_lists))
+            mutation_list.name = name
+            if self.__latest_mutation_list is not None:
+                self.__write_mutation_list(self.__latest_mutation_list)
+            self.__latest_mutation_list = mutation_list
+            self.__latest_mutation_time = time.time()
+
     def _mutation_list_applied(self, mutation_list: mutations_pb2.MutationList) -> None:
-        if len(mutation_list.ops) != 0:
-            if (self.__latest_mutation_list is None
-                    or time.time() - self.__latest_mutation_time > 4
-                    or not self.__try_merge_mutation_list(mutation_list)):
-                self.__flush_mutations()
-                self.__latest_mutation_list = mutation_list
-                self.__latest_mutation_time = time.time()
+        if len(mutation_list.ops) == 0:
+            return
+
+        if self.__gesture_name is not None:
+            # All mutations of a gesture become a single log entry.
+            self.__gesture_mutation_lists.append(mutation_list)
+            return
+
+        if (self.__latest_mutation_list is None
+                or time.time() - self.__latest_mutation_time > 4
+                or not self.__try_merge_mutation_list(mutation_list)):
+            self.__flush_mutations()
+            self.__latest_mutation_list = mutations.coalesce(mutation_list)
+            self.__latest_mutation_time = time.time()
 
     def __apply_mutation_list(
             self,
@@ -467,35 +619,57 @@ class Project(BaseProject):
         logger.info(
             "Apply '%s' (%d operations) %s",
             mutation_list_pb.name, len(mutation_list_pb.ops), action.name)
+        self.__apply_mutation_lists([(action, mutation_list_pb)])
 
-        mutation_list = mutations.MutationList(self._pool, mutation_list_pb)
+    def __apply_mutation_lists(
+            self,
+            mutation_lists: Iterable[Tuple[storage.Action, mutations_pb2.MutationList]]
+    ) -> None:
+        num_lists = 0
+        num_ops = 0
         try:
             self._in_mutation = True
-            if action == storage.ACTION_FORWARD:
-                mutation_list.apply_forward()
-            else:
-                assert action == storage.ACTION_BACKWARD
-                mutation_list.apply_backward()
+            for action, mutation_list_pb in mutation_lists:
+                mutation_list = mutations.MutationList(self._pool, mutation_list_pb)
+                if action == storage.ACTION_FORWARD:
+                    mutation_list.apply_forward()
+                else:
+                    assert action == storage.ACTION_BACKWARD
+                    mutation_list.apply_backward()
+                num_lists += 1
+                num_ops += len(mutation_list_pb.ops)
 
         finally:
             self._in_mutation = False
 
-    async def undo(self) -> None:
+        logger.info("Applied %d mutation lists (%d operations)", num_lists, num_ops)
+
+    def validate_tree(self) -> None:
+        # Materializes all objects, so this is only meant for debugging.
+        def validate_node(
+                parent: Optional[model_base.ObjectBase], node: model_base.ObjectBase) -> None:
+            assert node.parent is parent
+            assert node.project is self
+
+            for c in node.list_children():
+                validate_node(node, c)
+
+        validate_node(None, self)
+
+    async def undo(self, count: int = 1) -> None:
         assert not self.closed
         self.__flush_mutations()
-        response = await self.__writer.undo()
-        if response is not None:
-            action, mutation_list_serialized = response
+        steps = await self.__writer.undo_n(count)
+        for action, mutation_list_serialized in steps:
             self.__apply_mutation_list(
                 action,
                 self.deserialize_mutation_list(mutation_list_serialized))
 
-    async def redo(self) -> None:
+    async def redo(self, count: int = 1) -> None:
         assert not self.closed
         self.__flush_mutations()
-        response = await self.__writer.redo()
-        if response is not None:
-            action, mutation_list_serialized = response
+        steps = await self.__writer.redo_n(count)
+        for action, mutation_list_serialized in steps:
             self.__apply_mutation_list(
                 action,
                 self.deserialize_mutation_list(mutation_list_serialized))
@@ -20,16 +20,15 @@
 #
 # @end:license
 
-import builtins
+import os.path
+import shutil
+import uuid
 from typing import cast
 
-from mox3 import stubout
-from pyfakefs import fake_filesystem
-
 from noisidev import unittest
 from noisidev import unittest_mixins
+from noisicaa.constants import TEST_OPTS
 from noisicaa.core import fileutil
-from noisicaa.core import storage
 from noisicaa import editor_main_pb2
 from noisicaa.builtin_nodes.score_track import model as score_track
 from . import model_base_pb2
@@ -76,16 +75,9 @@ class ProjectTest(
         self.writer_client = None
 
     async def setup_testcase(self):
-        self.stubs = stubout.StubOutForTesting()
-        self.addCleanup(self.stubs.SmartUnsetAll)
-
-        # Setup fake filesystem.
-        self.fs = fake_filesystem.FakeFilesystem()
-        self.fake_os = fake_filesystem.FakeOsModule(self.fs)
-        self.fake_open = fake_filesystem.FakeFileOpen(self.fs)
-        self.stubs.SmartSet(storage, 'os', self.fake_os)
-        self.stubs.SmartSet(fileutil, 'os', self.fake_os)
-        self.stubs.SmartSet(builtins, 'open', self.fake_open)
+        # The storage maps its index files into memory, so this needs a real filesystem.
+        self.path = os.path.join(TEST_OPTS.TMP_DIR, 'project-%s' % uuid.uuid4().hex)
+        self.addCleanup(shutil.rmtree, self.path, ignore_errors=True)
 
         self.setup_writer_process(inline=True)
 
@@ -112,16 +104,16 @@ class ProjectTest(
 
     async def test_create(self):
         p = await project.Project.create_blank(
-            path='/foo',
+            path=self.path,
             pool=self.pool,
             writer=self.writer_client,
             node_db=self.node_db)
         await p.close()
 
-        self.assertTrue(self.fake_os.path.isdir('/foo'))
-        self.assertTrue(self.fake_os.path.isfile('/foo/project.noise'))
+        self.assertTrue(os.path.isdir(self.path))
+        self.assertTrue(os.path.isfile(os.path.join(self.path, 'project.noise')))
 
-        f = fileutil.File('/foo/project.noise')
+        f = fileutil.File(os.path.join(self.path, 'project.noise'))
         file_info, contents = f.read_json()
         self.assertEqual(file_info.version, 1)
         self.assertEqual(file_info.filetype, 'project-header')
@@ -129,7 +121,7 @@ class ProjectTest(
 
     async def test_open_and_replay(self):
         p = await project.Project.create_blank(
-            path='/foo.noise',
+            path=self.path,
             pool=self.pool,
             writer=self.writer_client,
             node_db=self.node_db)
@@ -143,7 +135,7 @@ class ProjectTest(
 
         pool = project.Pool(project_cls=project.Project)
         p = await project.Project.open(
-            path='/foo.noise',
+            path=self.path,
             pool=pool,
             writer=self.writer_client,
             node_db=self.node_db)
@@ -153,9 +145,41 @@ class ProjectTest(
         finally:
             await p.close()
 
+    async def test_open_lazy(self):
+        p = await project.Project.create_blank(
+            path=self.path,
+            pool=self.pool,
+            writer=self.writer_client,
+            node_db=self.node_db)
+        try:
+            with p.apply_mutations('test'):
+                p.create_node('builtin://score-track')
+            p.create_checkpoint()
+            with p.apply_mutations('test'):
+                p.create_node('builtin://score-track')
+            num_nodes = len(p.nodes)
+            track_id = p.nodes[-1].id
+        finally:
+            await p.close()
+
+        pool = project.Pool(project_cls=project.Project)
+        p = await project.Project.open(
+            path=self.path,
+            pool=pool,
+            writer=self.writer_client,
+            node_db=self.node_db,
+            lazy=True,
+            validate=True)
+        try:
+            self.assertEqual(pool.num_lazy_objects, 0)
+            self.assertEqual(len(p.nodes), num_nodes)
+            self.assertEqual(p.nodes[-1].id, track_id)
+        finally:
+            await p.close()
+
     async def test_create_checkpoint(self):
         p = await project.Project.create_blank(
-            path='/foo',
+            path=self.path,
             pool=self.pool,
             writer=self.writer_client,
             node_db=self.node_db)
@@ -165,11 +189,46 @@ class ProjectTest(
             await p.close()
 
         self.assertTrue(
-            self.fake_os.path.isfile('/foo/checkpoint.000001'))
+            os.path.isfile(os.path.join(self.path, 'checkpoint.000001')))
+
+    async def test_delta_checkpoint(self):
+        p = await project.Project.create_blank(
+            path=self.path,
+            pool=self.pool,
+            writer=self.writer_client,
+            node_db=self.node_db)
+        try:
+            with p.apply_mutations('test'):
+                p.create_node('builtin://score-track')
+            p.create_checkpoint()
+
+            for _ in range(2):
+                with p.apply_mutations('test'):
+                    p.bpm = p.bpm + 1
+                p.create_checkpoint()
+
+            bpm = p.bpm
+            num_nodes = len(p.nodes)
+            track_id = p.nodes[-1].id
+        finally:
+            await p.close()
+
+        pool = project.Pool(project_cls=project.Project)
+        p = await project.Project.open(
+            path=self.path,
+            pool=pool,
+            writer=self.writer_client,
+            node_db=self.node_db)
+        try:
+            self.assertEqual(p.bpm, bpm)
+            self.assertEqual(len(p.nodes), num_nodes)
+            self.assertEqual(p.nodes[-1].id, track_id)
+        finally:
+            await p.close()
 
     async def test_merge_mutations(self):
         p = await project.Project.create_blank(
-            path='/foo.noise',
+            path=self.path,
             pool=self.pool,
             writer=self.writer_client,
             node_db=self.node_db)
@@ -190,6 +249,78 @@ class ProjectTest(
             await p.close()
 
 
+    async def test_gesture(self):
+        p = await project.Project.create_blank(
+            path=self.path,
+            pool=self.pool,
+            writer=self.writer_client,
+            node_db=self.node_db)
+        try:
+            old_bpm = p.bpm
+            num_nodes = len(p.nodes)
+
+            with p.gesture('drag'):
+                with p.apply_mutations('test'):
+                    p.create_node('builtin://score-track')
+                for i in range(old_bpm + 1, old_bpm + 10):
+                    with p.apply_mutations('test'):
+                        p.bpm = i
+
+            with p.apply_mutations('test'):
+                p.create_node('builtin://score-track')
+
+            await p.undo()
+            self.assertEqual(p.bpm, old_bpm + 9)
+            self.assertEqual(len(p.nodes), num_nodes + 1)
+
+            # The whole gesture is undone at once.
+            await p.undo()
+            self.assertEqual(p.bpm, old_bpm)
+            self.assertEqual(len(p.nodes), num_nodes)
+
+        finally:
+            await p.close()
+
+    async def test_overlapping_gestures(self):
+        p = await project.Project.create_blank(
+            path=self.path,
+            pool=self.pool,
+            writer=self.writer_client,
+            node_db=self.node_db)
+        try:
+            old_bpm = p.bpm
+            num_nodes = len(p.nodes)
+
+            p.begin_gesture('drag1')
+            with p.apply_mutations('test'):
+                p.create_node('builtin://score-track')
+            p.begin_gesture('drag2')
+            with p.apply_mutations('test'):
+                p.bpm = old_bpm + 1
+            p.end_gesture()
+            with p.apply_mutations('test'):
+                p.bpm = old_bpm + 2
+            p.end_gesture()
+
+            # A stray end does nothing.
+            p.end_gesture()
+
+            with p.apply_mutations('test'):
+                p.create_node('builtin://score-track')
+
+            await p.undo()
+            self.assertEqual(p.bpm, old_bpm + 2)
+            self.assertEqual(len(p.nodes), num_nodes + 1)
+
+            # Both gestures are undone at once.
+            await p.undo()
+            self.assertEqual(p.bpm, old_bpm)
+            self.assertEqual(len(p.nodes), num_nodes)
+
+        finally:
+            await p.close()
+
+
 class ProjectPropertiesTest(unittest_mixins.ProjectMixin, unittest.AsyncTestCase):
     async def test_set_bpm(self):
         with self.project.apply_mutations('test'):
@@ -21,10 +21,9 @@
 # @end:license
 
 import asyncio
-import functools
+import collections
 import logging
-import uuid
-from typing import Optional, Dict, List, Tuple
+from typing import Deque, Optional, List, Tuple
 
 from google.protobuf import message as protobuf
 
@@ -34,6 +33,10 @@ from . import writer_process_pb2
 
 logger = logging.getLogger(__name__)
 
+UndoStep = Tuple[storage.Action, bytes]
+# Method, request, response and the local sequence number right after the request was queued.
+QueuedWrite = Tuple[str, protobuf.Message, protobuf.Message, int]
+
 
 class WriterClient(object):
     def __init__(
@@ -42,14 +45,22 @@ class WriterClient(object):
         super().__init__()
         self.__event_loop = event_loop
 
+        # Number of recent history entries, which are kept locally, so undo and redo can be
+        # applied without waiting for the writer.
+        self.undo_cache_size = 100
+
         self.__stub = None  # type: ipc.Stub
         self.__opened = False
         self.__path = None  # type: str
         self.__data_dir = None  # type: str
-        self.__can_undo = None  # type: bool
-        self.__can_redo = None  # type: bool
-        self.__pending_writes = {}  # type: Dict[str, asyncio.Task]
+        self.__sequence_number = None  # type: int
+        self.__undo_count = None  # type: int
+        self.__redo_count = None  # type: int
+        self.__history = collections.OrderedDict()  # type: collections.OrderedDict[int, UndoStep]
+        self.__write_queue = collections.deque()  # type: Deque[QueuedWrite]
+        self.__write_task = None  # type: asyncio.Task
         self.__write_queue_empty = asyncio.Event(loop=self.__event_loop)
+        self.__pending_logs = []  # type: List[bytes]
 
     @property
     def path(self) -> str:
@@ -61,23 +72,54 @@ class WriterClient(object):
         assert self.__data_dir is not None
         return self.__data_dir
 
+    # The undo history is tracked locally in the same way as ProjectStorage does it.
     @property
     def can_undo(self) -> bool:
-        assert self.__can_undo is not None
-        return self.__can_undo
+        assert self.__sequence_number is not None
+        return self.__sequence_number - 2 * self.__undo_count > 0
 
     @property
     def can_redo(self) -> bool:
-        assert self.__can_redo is not None
-        return self.__can_redo
+        assert self.__sequence_number is not None
+        return self.__undo_count > self.__redo_count
 
     def __update_storage_state(self, state: writer_process_pb2.StorageState) -> None:
-        self.__can_undo = state.can_undo
-        self.__can_redo = state.can_redo
+        if state.sequence_number != self.__sequence_number:
+            # The writer renumbered its history (e.g. after a compaction).
+            self.__history.clear()
+        self.__sequence_number = state.sequence_number
+        self.__undo_count = state.undo_count
+        self.__redo_count = state.redo_count
+
+    def __sync_storage_state(
+            self, state: writer_process_pb2.StorageState, sequence_number: int) -> None:
+        # sequence_number is what the local state expected the writer's sequence number to be
+        # after the request. If they differ, the writer has compacted its history in the
+        # meantime and renumbered the remaining entries.
+        shift = sequence_number - state.sequence_number
+        if shift != 0:
+            logger.info("Writer history was renumbered by %d entries.", shift)
+            self.__history = collections.OrderedDict(
+                (snum - shift, step) for snum, step in self.__history.items() if snum >= shift)
+            self.__sequence_number -= shift
+            self.__write_queue = collections.deque(
+                (method, request, response, snum - shift)
+                for method, request, response, snum in self.__write_queue)
+
+        if not self.__write_queue and not self.__pending_logs:
+            # Nothing else is in flight, so the writer's state is also the local state.
+            self.__update_storage_state(state)
+
+    def __add_history_entry(self, action: storage.Action, data: bytes) -> None:
+        self.__history[self.__sequence_number] = (action, data)
+        self.__sequence_number += 1
+        while len(self.__history) > self.undo_cache_size:
+            self.__history.popitem(last=False)
 
     async def setup(self) -> None:
-        self.__pending_writes.clear()
-        self.__write_queue_empty.clear()
+        self.__write_queue.clear()
+        self.__write_queue_empty.set()
+        self.__pending_logs.clear()
 
     async def cleanup(self) -> None:
         await self.disconnect()
@@ -89,6 +131,16 @@ class WriterClient(object):
         await self.__stub.connect()
 
     async def disconnect(self) -> None:
+        if self.__write_task is not None:
+            self.__write_task.cancel()
+            try:
+                await self.__write_task
+            except asyncio.CancelledError:
+                pass
+            self.__write_task = None
+        self.__write_queue.clear()
+        self.__write_queue_empty.set()
+
         if self.__stub is not None:
             await self.__stub.close()
             self.__stub = None
@@ -96,6 +148,9 @@ class WriterClient(object):
         self.__opened = False
         self.__path = None
         self.__data_dir = None
+        self.__pending_logs.clear()
+        self.__history.clear()
+        self.__sequence_number = None
 
     async def create(self, path: str, initial_checkpoint: bytes) -> None:
         assert not self.__opened
@@ -109,9 +164,10 @@ class WriterClient(object):
         self.__opened = True
         self.__path = path
         self.__data_dir = response.data_dir
+        self.__history.clear()
         self.__update_storage_state(response.storage_state)
 
-    async def open(self, path: str) -> Tuple[bytes, List[Tuple[storage.Action, bytes]]]:
+    async def open(self, path: str) -> Tuple[bytes, List[UndoStep]]:
         assert not self.__opened
 
         request = writer_process_pb2.OpenRequest(
@@ -122,14 +178,12 @@ class WriterClient(object):
         self.__opened = True
         self.__path = path
         self.__data_dir = response.data_dir
+        self.__history.clear()
         self.__update_storage_state(response.storage_state)
 
         return (
             response.checkpoint,
-            [({writer_process_pb2.Action.FORWARD: storage.ACTION_FORWARD,
-               writer_process_pb2.Action.BACKWARD: storage.ACTION_BACKWARD}[action.direction],
-              action.data)
-             for action in response.actions])
+            [self.__action_from_proto(action) for action in response.actions])
 
     async def close(self) -> None:
         if self.__opened:
@@ -140,80 +194,177 @@ class WriterClient(object):
             self.__data_dir = None
 
     async def flush(self) -> None:
-        if len(self.__pending_writes) > 0:
-            logger.info("Waiting for %d pending writes to complete...", len(self.__pending_writes))
+        self.__flush_logs()
+        if len(self.__write_queue) > 0:
+            logger.info("Waiting for %d pending writes to complete...", len(self.__write_queue))
             await self.__write_queue_empty.wait()
-        assert len(self.__pending_writes) == 0
+        assert len(self.__write_queue) == 0
 
     def __write(
-            self,
-            method: str,
-            request: protobuf.Message,
-            response: writer_process_pb2.WriteResponse
-    ) -> None:
-        task_id = uuid.uuid4().hex
-        task = self.__event_loop.create_task(self.__stub.call(method, request))
-        task.add_done_callback(functools.partial(self.__write_done, task_id, response))
-        self.__pending_writes[task_id] = task
+            self, method: str, request: protobuf.Message, response: protobuf.Message) -> None:
+        # Writes are sent one after the other from a single task, so the writer sees them in the
+        # same order as the local state.
+        self.__write_queue.append((method, request, response, self.__sequence_number))
         self.__write_queue_empty.clear()
-
-    def __write_done(
-            self,
-            task_id: str,
-            response: writer_process_pb2.WriteResponse,
-            task: asyncio.Task
-    ) -> None:
-        self.__update_storage_state(response.storage_state)
-        del self.__pending_writes[task_id]
-        if len(self.__pending_writes) == 0:
+        if self.__write_task is None:
+            self.__write_task = self.__event_loop.create_task(self.__process_writes())
+
+    async def __process_writes(self) -> None:
+        try:
+            while self.__write_queue:
+                method, request, response, _ = self.__write_queue[0]
+                try:
+                    await self.__stub.call(method, request, response)
+                except (ipc.Error, ipc.RemoteException) as exc:
+                    logger.error("%s failed: %s", method, exc)
+                    self.__write_queue.popleft()
+                    continue
+
+                # Taken after the call, because a compaction might have renumbered it.
+                _, _, _, sequence_number = self.__write_queue.popleft()
+                self.__sync_storage_state(response.storage_state, sequence_number)
+
+        finally:
+            self.__write_task = None
             self.__write_queue_empty.set()
 
     def write_log(self, log: bytes) -> None:
         assert self.__opened
 
-        request = writer_process_pb2.WriteLogRequest(
-            log=log)
-        response = writer_process_pb2.WriteResponse()
-        self.__write('WRITE_LOG', request, response)
+        # All logs written during the same event loop iteration are sent to the writer as a
+        # single WRITE_LOGS batch.
+        if not self.__pending_logs:
+            self.__event_loop.call_soon(self.__flush_logs)
+        self.__pending_logs.append(log)
 
-    def write_checkpoint(self, checkpoint: bytes) -> None:
-        assert self.__opened
+        self.__undo_count = 0
+        self.__redo_count = 0
+        self.__add_history_entry(storage.ACTION_FORWARD, log)
 
-        request = writer_process_pb2.WriteCheckpointRequest(
-            checkpoint=checkpoint)
-        response = writer_process_pb2.WriteResponse()
-        self.__write('WRITE_CHECKPOINT', request, response)
+    def __flush_logs(self) -> None:
+        if not self.__pending_logs:
+            return
+
+        request = writer_process_pb2.WriteLogsRequest(
+            logs=self.__pending_logs)
+        self.__pending_logs = []
+        self.__write('WRITE_LOGS', request, writer_process_pb2.WriteResponse())
 
-    async def undo(self) -> Optional[Tuple[storage.Action, bytes]]:
+    def write_checkpoint(self, checkpoint: bytes, *, delta: bool = False) -> None:
         assert self.__opened
 
-        await self.flush()
-        response = writer_process_pb2.UndoResponse()
-        await self.__stub.call('UNDO', None, response)
-        self.__update_storage_state(response.storage_state)
+        self.__flush_logs()
 
-        if not response.HasField('action'):
-            return None
+        request = writer_process_pb2.WriteCheckpointRequest(
+            checkpoint=checkpoint,
+            delta=delta)
+        self.__write('WRITE_CHECKPOINT', request, writer_process_pb2.WriteResponse())
 
+    def __action_from_proto(
+            self, action: writer_process_pb2.Action) -> UndoStep:
         return (
             {writer_process_pb2.Action.FORWARD: storage.ACTION_FORWARD,
              writer_process_pb2.Action.BACKWARD: storage.ACTION_BACKWARD
-            }[response.action.direction],
-            response.action.data)
+            }[action.direction],
+            action.data)
+
+    def __cached_steps(
+            self, undo: bool, count: int) -> Optional[List[UndoStep]]:
+        # Replays ProjectStorage.undo()/redo() on the local copy of the history. Returns None, if
+        # any of the needed entries is not cached.
+        sequence_number = self.__sequence_number
+        undo_count = self.__undo_count
+        redo_count = self.__redo_count
+        indices = []  # type: List[int]
+        while len(indices) < count:
+            if undo:
+                if sequence_number - 2 * undo_count <= 0:
+                    break
+                indices.append(sequence_number - 2 * undo_count - 1)
+                undo_count += 1
+            else:
+                if undo_count <= redo_count:
+                    break
+                indices.append(sequence_number - 2 * undo_count)
+                redo_count += 1
+            sequence_number += 1
+
+        if any(idx not in self.__history for idx in indices):
+            return None
+
+        steps = []  # type: List[UndoStep]
+        for action, data in [self.__history[idx] for idx in indices]:
+            if undo:
+                action = {
+                    storage.ACTION_FORWARD: storage.ACTION_BACKWARD,
+                    storage.ACTION_BACKWARD: storage.ACTION_FORWARD,
+                }[action]
+                self.__undo_count += 1
+            else:
+                self.__redo_count += 1
+            self.__add_history_entry(action, data)
+            steps.append((action, data))
+
+        return steps
+
+    async def undo_n(self, count: int) -> List[UndoStep]:
+        assert self.__opened
+
+        steps = self.__cached_steps(True, count)
+        if steps is not None:
+            if steps:
+                self.__flush_logs()
+                self.__write(
+                    'UNDO_N',
+                    writer_process_pb2.UndoNRequest(count=len(steps), fetch=False),
+                    writer_process_pb2.UndoNResponse())
+            return steps
+
+        await self.flush()
+        request = writer_process_pb2.UndoNRequest(count=count)
+        response = writer_process_pb2.UndoNResponse()
+        await self.__stub.call('UNDO_N', request, response)
+
+        steps = [self.__action_from_proto(action) for action in response.actions]
+        for action, data in steps:
+            self.__undo_count += 1
+            self.__add_history_entry(action, data)
+        self.__update_storage_state(response.storage_state)
+        return steps
 
-    async def redo(self) -> Optional[Tuple[storage.Action, bytes]]:
+    async def redo_n(self, count: int) -> List[UndoStep]:
         assert self.__opened
 
+        steps = self.__cached_steps(False, count)
+        if steps is not None:
+            if steps:
+                self.__flush_logs()
+                self.__write(
+                    'REDO_N',
+                    writer_process_pb2.RedoNRequest(count=len(steps), fetch=False),
+                    writer_process_pb2.RedoNResponse())
+            return steps
+
         await self.flush()
-        response = writer_process_pb2.RedoResponse()
-        await self.__stub.call('REDO', None, response)
+        request = writer_process_pb2.RedoNRequest(count=count)
+        response = writer_process_pb2.RedoNResponse()
+        await self.__stub.call('REDO_N', request, response)
+
+        steps = [self.__action_from_proto(action) for action in response.actions]
+        for action, data in steps:
+            self.__redo_count += 1
+            self.__add_history_entry(action, data)
         self.__update_storage_state(response.storage_state)
+        return steps
 
-        if not response.HasField('action'):
+    async def undo(self) -> Optional[UndoStep]:
+        steps = await self.undo_n(1)
+        if not steps:
             return None
+        return steps[0]
 
-        return (
-            {writer_process_pb2.Action.FORWARD: storage.ACTION_FORWARD,
-             writer_process_pb2.Action.BACKWARD: storage.ACTION_BACKWARD
-            }[response.action.direction],
-            response.action.data)
+    async def redo(self) -> Optional[UndoStep]:
+        steps = await self.redo_n(1)
+        if not steps:
+            return None
+        return steps[0]
@@ -30,6 +30,7 @@ from noisidev import unittest
 from noisidev import unittest_mixins
 from noisicaa import editor_main_pb2
 from noisicaa.constants import TEST_OPTS
+from noisicaa.core import storage
 from . import writer_client
 
 logger = logging.getLogger(__name__)
@@ -86,3 +87,96 @@ class WriterClientTestBase(
             self.assertEqual(checkpoint, b'initial_checkpoint')
             self.assertEqual(actions, [])
             await client.close()
+
+    async def test_write_logs(self):
+        path = self.get_project_path()
+
+        async with self.connect_client() as client:
+            await client.create(path, b'initial_checkpoint')
+            for i in range(10):
+                client.write_log(b'log%d' % i)
+            await client.flush()
+            self.assertTrue(client.can_undo)
+            await client.close()
+
+        async with self.connect_client() as client:
+            checkpoint, actions = await client.open(path)
+            self.assertEqual(checkpoint, b'initial_checkpoint')
+            self.assertEqual(
+                actions,
+                [(storage.ACTION_FORWARD, b'log%d' % i) for i in range(10)])
+            await client.close()
+
+    async def test_undo_redo(self):
+        path = self.get_project_path()
+
+        async with self.connect_client() as client:
+            client.undo_cache_size = 4
+            await client.create(path, b'initial_checkpoint')
+            self.assertFalse(client.can_undo)
+            for i in range(6):
+                client.write_log(b'log%d' % i)
+            self.assertTrue(client.can_undo)
+            self.assertFalse(client.can_redo)
+
+            # Served from the local cache.
+            self.assertEqual(
+                await client.undo_n(2),
+                [(storage.ACTION_BACKWARD, b'log5'), (storage.ACTION_BACKWARD, b'log4')])
+            self.assertTrue(client.can_redo)
+            self.assertEqual(await client.redo(), (storage.ACTION_FORWARD, b'log4'))
+
+            # Older entries are fetched from the writer.
+            self.assertEqual(
+                await client.undo_n(4),
+                [(storage.ACTION_BACKWARD, b'log%d' % i) for i in (4, 3, 2, 1)])
+            self.assertEqual(await client.undo(), (storage.ACTION_BACKWARD, b'log0'))
+            self.assertFalse(client.can_undo)
+            self.assertIsNone(await client.undo())
+
+            self.assertEqual(
+                await client.redo_n(2),
+                [(storage.ACTION_FORWARD, b'log0'), (storage.ACTION_FORWARD, b'log1')])
+            await client.close()
+
+        async with self.connect_client() as client:
+            checkpoint, actions = await client.open(path)
+            fwd = storage.ACTION_FORWARD
+            bwd = storage.ACTION_BACKWARD
+            self.assertEqual(
+                actions,
+                [(fwd, b'log%d' % i) for i in range(6)]
+                + [(bwd, b'log5'), (bwd, b'log4'), (fwd, b'log4')]
+                + [(bwd, b'log%d' % i) for i in (4, 3, 2, 1, 0)]
+                + [(fwd, b'log0'), (fwd, b'log1')])
+            self.assertTrue(client.can_undo)
+            self.assertTrue(client.can_redo)
+            await client.close()
+
+    async def test_interleaved_writes(self):
+        path = self.get_project_path()
+
+        async with self.connect_client() as client:
+            await client.create(path, b'initial_checkpoint')
+            client.write_log(b'log0')
+            client.write_log(b'log1')
+            # The cached undo is sent to the writer after the logs, which were written before it.
+            self.assertEqual(await client.undo(), (storage.ACTION_BACKWARD, b'log1'))
+            client.write_log(b'log2')
+            client.write_checkpoint(b'checkpoint')
+            self.assertEqual(await client.undo(), (storage.ACTION_BACKWARD, b'log2'))
+            await client.flush()
+
+            # After all writes are done, the local state matches the writer's.
+            self.assertTrue(client.can_undo)
+            self.assertTrue(client.can_redo)
+            self.assertEqual(await client.redo(), (storage.ACTION_FORWARD, b'log2'))
+            await client.close()
+
+        async with self.connect_client() as client:
+            checkpoint, actions = await client.open(path)
+            self.assertEqual(checkpoint, b'checkpoint')
+            self.assertEqual(
+                actions,
+                [(storage.ACTION_BACKWARD, b'log2'), (storage.ACTION_FORWARD, b'log2')])
+            await client.close()
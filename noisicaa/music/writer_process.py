@@ -20,6 +20,7 @@
 #
 # @end:license
 
+import asyncio
 import logging
 from typing import Any
 
@@ -27,16 +28,45 @@ from noisicaa import core
 from noisicaa.core import storage
 from noisicaa.core import empty_message_pb2
 from noisicaa.core import ipc
+from . import model_base_pb2
 from . import writer_process_pb2
 
 logger = logging.getLogger(__name__)
 
 
+def merge_checkpoint(full: bytes, delta: bytes) -> bytes:
+    """Apply a serialized ObjectTreeDelta to a serialized ObjectTree."""
+
+    tree = model_base_pb2.ObjectTree()
+    tree.MergeFromString(full)
+    tree_delta = model_base_pb2.ObjectTreeDelta()
+    tree_delta.MergeFromString(delta)
+
+    objects = {obj.id: obj for obj in tree.objects}
+    for obj in tree_delta.objects:
+        objects[obj.id] = obj
+
+    if tree_delta.order:
+        order = list(tree_delta.order)
+    else:
+        order = [obj.id for obj in tree.objects]
+
+    merged = model_base_pb2.ObjectTree()
+    merged.root = tree_delta.root if tree_delta.HasField('root') else tree.root
+    for obj_id in order:
+        merged.objects.add().CopyFrom(objects[obj_id])
+    return merged.SerializeToString()
+
+
 class WriterProcess(core.ProcessBase):
     def __init__(self, **kwargs: Any) -> None:
         super().__init__(**kwargs)
 
         self.__storage = None  # type: storage.ProjectStorage
+        self.__sync_handle = None  # type: asyncio.TimerHandle
+        self.__compaction_handle = None  # type: asyncio.TimerHandle
+        # Compaction runs, once the project saw no writes for this many seconds.
+        self.compaction_delay = 5.0
 
     async def setup(self) -> None:
         await super().setup()
@@ -54,6 +84,9 @@ class WriterProcess(core.ProcessBase):
         endpoint.add_handler(
             'WRITE_LOG', self.__handle_write_log,
             writer_process_pb2.WriteLogRequest, writer_process_pb2.WriteResponse)
+        endpoint.add_handler(
+            'WRITE_LOGS', self.__handle_write_logs,
+            writer_process_pb2.WriteLogsRequest, writer_process_pb2.WriteResponse)
         endpoint.add_handler(
             'WRITE_CHECKPOINT', self.__handle_write_checkpoint,
             writer_process_pb2.WriteCheckpointRequest, writer_process_pb2.WriteResponse)
@@ -63,19 +96,70 @@ class WriterProcess(core.ProcessBase):
         endpoint.add_handler(
             'REDO', self.__handle_redo,
             empty_message_pb2.EmptyMessage, writer_process_pb2.RedoResponse)
+        endpoint.add_handler(
+            'UNDO_N', self.__handle_undo_n,
+            writer_process_pb2.UndoNRequest, writer_process_pb2.UndoNResponse)
+        endpoint.add_handler(
+            'REDO_N', self.__handle_redo_n,
+            writer_process_pb2.RedoNRequest, writer_process_pb2.RedoNResponse)
         await self.server.add_endpoint(endpoint)
 
     async def cleanup(self) -> None:
+        self.__close_storage()
+
+        await super().cleanup()
+
+    def __close_storage(self) -> None:
+        if self.__sync_handle is not None:
+            self.__sync_handle.cancel()
+            self.__sync_handle = None
+
+        if self.__compaction_handle is not None:
+            self.__compaction_handle.cancel()
+            self.__compaction_handle = None
+
         if self.__storage is not None:
             self.__storage.close()
             self.__storage = None
 
-        await super().cleanup()
+    def __schedule_sync(self) -> None:
+        # The storage only syncs when new entries are written, so make sure that the tail of a
+        # burst of writes also hits the disk eventually.
+        if (self.__sync_handle is None
+                and self.__storage.unsynced_entries > 0
+                and self.__storage.sync_interval is not None):
+            self.__sync_handle = self.event_loop.call_later(
+                self.__storage.sync_interval, self.__sync)
+
+    def __sync(self) -> None:
+        self.__sync_handle = None
+        if self.__storage is not None:
+            self.__storage.sync()
+
+    def __writes_done(self) -> None:
+        self.__schedule_sync()
+
+        # Compaction is deferred until writes have been quiet for a while, so it does not delay
+        # the handling of bursts of writes.
+        if self.__compaction_handle is not None:
+            self.__compaction_handle.cancel()
+            self.__compaction_handle = None
+        if self.__storage.needs_compaction:
+            self.__compaction_handle = self.event_loop.call_later(
+                self.compaction_delay, self.__compact)
+
+    def __compact(self) -> None:
+        self.__compaction_handle = None
+        if self.__storage is not None:
+            self.__storage.compact()
 
     def __get_storage_state(self) -> writer_process_pb2.StorageState:
         return writer_process_pb2.StorageState(
             can_undo=self.__storage.can_undo,
             can_redo=self.__storage.can_redo,
+            sequence_number=self.__storage.next_sequence_number,
+            undo_count=self.__storage.undo_count,
+            redo_count=self.__storage.redo_count,
         )
 
     async def __handle_create(
@@ -104,7 +188,12 @@ class WriterProcess(core.ProcessBase):
 
         checkpoint_number, actions = self.__storage.get_restore_info()
 
-        response.checkpoint = self.__storage.get_checkpoint(checkpoint_number)
+        checkpoints = self.__storage.get_checkpoint_chain(checkpoint_number)
+        if len(checkpoints) == 1:
+            response.checkpoint = checkpoints[0]
+        else:
+            full, delta = checkpoints
+            response.checkpoint = merge_checkpoint(full, delta)
 
         for action, log_number in actions:
             sequence_data = self.__storage.get_log_entry(log_number)
@@ -122,9 +211,7 @@ class WriterProcess(core.ProcessBase):
             request: empty_message_pb2.EmptyMessage,
             response: empty_message_pb2.EmptyMessage,
     ) -> None:
-        if self.__storage is not None:
-            self.__storage.close()
-            self.__storage = None
+        self.__close_storage()
 
     async def __handle_write_log(
             self,
@@ -134,6 +221,19 @@ class WriterProcess(core.ProcessBase):
         assert self.__storage is not None
 
         self.__storage.append_log_entry(request.log)
+        self.__writes_done()
+
+        response.storage_state.CopyFrom(self.__get_storage_state())
+
+    async def __handle_write_logs(
+            self,
+            request: writer_process_pb2.WriteLogsRequest,
+            response: writer_process_pb2.WriteResponse,
+    ) -> Any:
+        assert self.__storage is not None
+
+        self.__storage.append_log_entries(list(request.logs))
+        self.__writes_done()
 
         response.storage_state.CopyFrom(self.__get_storage_state())
 
@@ -144,7 +244,8 @@ class WriterProcess(core.ProcessBase):
     ) -> Any:
         assert self.__storage is not None
 
-        self.__storage.add_checkpoint(request.checkpoint)
+        self.__storage.add_checkpoint(request.checkpoint, delta=request.delta)
+        self.__writes_done()
 
         response.storage_state.CopyFrom(self.__get_storage_state())
 
@@ -158,6 +259,7 @@ class WriterProcess(core.ProcessBase):
         if self.__storage.can_undo:
             action, sequence_data = self.__storage.get_log_entry_to_undo()
             self.__storage.undo()
+            self.__writes_done()
 
             response.action.direction = {
                 storage.ACTION_FORWARD: writer_process_pb2.Action.FORWARD,
@@ -177,6 +279,7 @@ class WriterProcess(core.ProcessBase):
         if self.__storage.can_redo:
             action, sequence_data = self.__storage.get_log_entry_to_redo()
             self.__storage.redo()
+            self.__writes_done()
 
             response.action.direction = {
                 storage.ACTION_FORWARD: writer_process_pb2.Action.FORWARD,
@@ -186,6 +289,54 @@ class WriterProcess(core.ProcessBase):
 
         response.storage_state.CopyFrom(self.__get_storage_state())
 
+    async def __handle_undo_n(
+            self,
+            request: writer_process_pb2.UndoNRequest,
+            response: writer_process_pb2.UndoNResponse,
+    ) -> None:
+        assert self.__storage is not None
+
+        for _ in range(request.count):
+            if not self.__storage.can_undo:
+                break
+
+            if request.fetch:
+                action, sequence_data = self.__storage.get_log_entry_to_undo()
+                pb = response.actions.add()
+                pb.direction = {
+                    storage.ACTION_FORWARD: writer_process_pb2.Action.FORWARD,
+                    storage.ACTION_BACKWARD: writer_process_pb2.Action.BACKWARD,
+                }[action]
+                pb.data = sequence_data
+            self.__storage.undo()
+        self.__writes_done()
+
+        response.storage_state.CopyFrom(self.__get_storage_state())
+
+    async def __handle_redo_n(
+            self,
+            request: writer_process_pb2.RedoNRequest,
+            response: writer_process_pb2.RedoNResponse,
+    ) -> None:
+        assert self.__storage is not None
+
+        for _ in range(request.count):
+            if not self.__storage.can_redo:
+                break
+
+            if request.fetch:
+                action, sequence_data = self.__storage.get_log_entry_to_redo()
+                pb = response.actions.add()
+                pb.direction = {
+                    storage.ACTION_FORWARD: writer_process_pb2.Action.FORWARD,
+                    storage.ACTION_BACKWARD: writer_process_pb2.Action.BACKWARD,
+                }[action]
+                pb.data = sequence_data
+            self.__storage.redo()
+        self.__writes_done()
+
+        response.storage_state.CopyFrom(self.__get_storage_state())
+
 
 class WriterSubprocess(core.SubprocessMixin, WriterProcess):
     pass
@@ -51,6 +51,9 @@ class ControlValueConnector(
 
         self.__node = node
         self.__name = name
+        self.__mutation_name = '%s: Change control value "%s"' % (self.__node.name, self.__name)
+        self.__dragging = False
+        self.add_cleanup_function(self.__dragFinished)
 
         self.__listeners = core.ListenerList()
         self.add_cleanup_function(self.__listeners.cleanup)
@@ -65,8 +68,7 @@ class ControlValueConnector(
     def __onValueEdited(self, value: float) -> None:
         if value != self.__node.control_value_map.value(self.__name):
             self.__generation += 1
-            with self.project.apply_mutations(
-                    '%s: Change control value "%s"' % (self.__node.name, self.__name)):
+            with self.project.apply_mutations(self.__mutation_name):
                 self.__node.set_control_value(self.__name, value, self.__generation)
 
     def __onValueChanged(
@@ -81,3 +83,19 @@ class ControlValueConnector(
         getter.connect(self.setValue)
         setter(self.value())
         self.valueChanged.connect(setter)
+
+    def connectDrag(
+            self, started: QtCore.pyqtBoundSignal, finished: QtCore.pyqtBoundSignal) -> None:
+        # All changes made while dragging a widget are undone as a single step.
+        started.connect(self.__dragStarted)
+        finished.connect(self.__dragFinished)
+
+    def __dragStarted(self) -> None:
+        if not self.__dragging:
+            self.__dragging = True
+            self.project.begin_gesture(self.__mutation_name)
+
+    def __dragFinished(self) -> None:
+        if self.__dragging:
+            self.__dragging = False
+            self.project.end_gesture()
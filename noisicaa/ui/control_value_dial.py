@@ -26,15 +26,13 @@ import typing
 from typing import Optional
 
 from PyQt5.QtCore import Qt
+from PyQt5 import QtCore
 from PyQt5 import QtGui
 from PyQt5 import QtWidgets
 
 from . import slots
 from . import base_dial
 
-if typing.TYPE_CHECKING:
-    from PyQt5 import QtCore
-
 logger = logging.getLogger(__name__)
 
 
@@ -45,6 +43,10 @@ class ControlValueDial(base_dial.BaseDial[float]):
     minimum, setMinimum, minimumChanged = slots.slot(float, 'minimum', default=-1.0)
     maximum, setMaximum, maximumChanged = slots.slot(float, 'maximum', default=1.0)
 
+    # Emitted, when the user starts resp. stops dragging the dial.
+    dragStarted = QtCore.pyqtSignal()
+    dragFinished = QtCore.pyqtSignal()
+
     def __init__(self, parent: Optional[QtWidgets.QWidget] = None) -> None:
         super().__init__(parent=parent)
 
@@ -90,7 +92,9 @@ class ControlValueDial(base_dial.BaseDial[float]):
 
     def mousePressEvent(self, evt: QtGui.QMouseEvent) -> None:
         if evt.button() == Qt.LeftButton and not self.readOnly():
-            self.__dragging = True
+            if not self.__dragging:
+                self.__dragging = True
+                self.dragStarted.emit()
             self.__drag_pos = self.mapToGlobal(evt.pos())
             evt.accept()
             return
@@ -118,6 +122,7 @@ class ControlValueDial(base_dial.BaseDial[float]):
     def mouseReleaseEvent(self, evt: QtGui.QMouseEvent) -> None:
         if self.__dragging and evt.button() == Qt.LeftButton:
             self.__dragging = False
+            self.dragFinished.emit()
             evt.accept()
             return
 
@@ -498,7 +498,8 @@ class EditorApp(ui_base.AbstractEditorApp):
             name='main',
             host_parameters=audioproc.HostParameters(
                 block_size=2 ** int(self.settings.value('audio/block_size', 10)),
-                sample_rate=int(self.settings.value('audio/sample_rate', 44100))))
+                sample_rate=int(self.settings.value('audio/sample_rate', 44100))),
+            num_workers=int(self.settings.value('audio/num_workers', 0)))
         create_audioproc_response = editor_main_pb2.CreateProcessResponse()
         await self.process.manager.call(
             'CREATE_AUDIOPROC_PROCESS', create_audioproc_request, create_audioproc_response)
@@ -41,6 +41,10 @@ class GainSlider(slots.SlotContainer, QtWidgets.QWidget):
     minimum, setMinimum, minimumChanged = slots.slot(float, 'minimum', default=-20.0)
     maximum, setMaximum, maximumChanged = slots.slot(float, 'maximum', default=20.0)
 
+    # Emitted, when the user starts resp. stops dragging the slider.
+    dragStarted = QtCore.pyqtSignal()
+    dragFinished = QtCore.pyqtSignal()
+
     def __init__(self, parent: Optional[QtWidgets.QWidget]) -> None:
         super().__init__(parent=parent)
 
@@ -181,7 +185,9 @@ class GainSlider(slots.SlotContainer, QtWidgets.QWidget):
 
     def mousePressEvent(self, evt: QtGui.QMouseEvent) -> None:
         if evt.button() == Qt.LeftButton:
-            self.__dragging = True
+            if not self.__dragging:
+                self.__dragging = True
+                self.dragStarted.emit()
             self.__drag_pos = self.mapToGlobal(evt.pos())
 
             if not evt.modifiers() & Qt.ShiftModifier:
@@ -222,9 +228,10 @@ class GainSlider(slots.SlotContainer, QtWidgets.QWidget):
 
         super().mouseMoveEvent(evt)
 
-    def mouseReleasevent(self, evt: QtGui.QMouseEvent) -> None:
+    def mouseReleaseEvent(self, evt: QtGui.QMouseEvent) -> None:
         if self.__dragging and evt.button() == Qt.LeftButton:
             self.__dragging = False
+            self.dragFinished.emit()
             evt.accept()
             return
 
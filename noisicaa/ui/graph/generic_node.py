@@ -95,6 +95,7 @@ class ControlValueWidget(control_value_connector.ControlValueConnector):
             if self.__port.float_value.scale == node_db.FloatValueDescription.LOG:
                 self.__dial.setLogScale(True)
             self.connect(self.__dial.valueChanged, self.__dial.setValue)
+            self.connectDrag(self.__dial.dragStarted, self.__dial.dragFinished)
 
             self.__exposed = QtWidgets.QCheckBox(parent)
             self.__exposed.setChecked(port_properties.exposed)
@@ -32,6 +32,7 @@ from PyQt5 import QtWidgets
 
 from noisicaa import constants
 from noisicaa import core
+from noisicaa import audioproc
 from . import ui_base
 
 
@@ -101,6 +102,9 @@ class PipelinePerfMonitor(ui_base.AbstractPipelinePerfMonitor):
         self.visibilityChanged.emit(True)
         if self.__perf_stats_listener is None:
             self.__perf_stats_listener = self.audioproc_client.perf_stats.add(self.addPerfData)
+            # Spans are only recorded, while someone is looking at them.
+            self.call_async(self.audioproc_client.set_perf_stats_level(
+                audioproc.SetPerfStatsLevelRequest.OPCODE))
 
         super().showEvent(event)
 
@@ -108,6 +112,8 @@ class PipelinePerfMonitor(ui_base.AbstractPipelinePerfMonitor):
         if self.__perf_stats_listener is not None:
             self.__perf_stats_listener.remove()
             self.__perf_stats_listener = None
+            self.call_async(self.audioproc_client.set_perf_stats_level(
+                audioproc.SetPerfStatsLevelRequest.OFF))
 
         self.visibilityChanged.emit(False)
         super().hideEvent(event)
@@ -217,5 +217,25 @@ class ControlValueDialConnector(PropertyConnector[float, control_value_dial.Cont
         connection = self._widget.valueChanged.connect(self.setValue)
         self.add_cleanup_function(lambda: self._widget.valueChanged.disconnect(connection))
 
+        # All changes made while dragging the dial are undone as a single step.
+        self.__dragging = False
+        started_connection = self._widget.dragStarted.connect(self.__dragStarted)
+        self.add_cleanup_function(
+            lambda: self._widget.dragStarted.disconnect(started_connection))
+        finished_connection = self._widget.dragFinished.connect(self.__dragFinished)
+        self.add_cleanup_function(
+            lambda: self._widget.dragFinished.disconnect(finished_connection))
+        self.add_cleanup_function(self.__dragFinished)
+
+    def __dragStarted(self) -> None:
+        if not self.__dragging:
+            self.__dragging = True
+            self.project.begin_gesture(self._mutation_name)
+
+    def __dragFinished(self) -> None:
+        if self.__dragging:
+            self.__dragging = False
+            self.project.end_gesture()
+
     def _propertyChanged(self, change: music.PropertyValueChange) -> None:
         self._widget.setValue(change.new_value)